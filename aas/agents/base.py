@@ -3,15 +3,79 @@
 from __future__ import annotations
 
 import abc
-from typing import Any, Dict, Iterable, List, Optional
+import math
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 from ..models.action import Action
 from ..models.play import PlayResult
 from ..utils.logger import get_logger
 
+if TYPE_CHECKING:
+    from ..analytics.sharding import Aggregator
+    from ..llm.rationale import Rationale
+
 
 logger = get_logger(__name__)
 
+# Rows per chunk in the "chunked" analysis mode unless `params["chunk_size"]` says otherwise.
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+class InvalidParams(ValueError):
+    """A play parameter from the request is not acceptable (the API answers 400)."""
+
+
+def data_dir() -> Path:
+    """Directory that request-supplied file paths must stay inside (`AAS_DATA_DIR`, default `./data`)."""
+    return Path(os.getenv("AAS_DATA_DIR") or Path.cwd() / "data").resolve()
+
+
+def resolve_data_path(path: str) -> Path:
+    """`path` (relative to `data_dir()`, or absolute inside it); raises `InvalidParams` outside it."""
+    base = data_dir()
+    resolved = (base / path).resolve()
+    if not resolved.is_relative_to(base):
+        raise InvalidParams(f"source_path must be inside the data directory ({base})")
+    return resolved
+
+
+def int_param(params: Dict[str, Any], name: str, default: Optional[int], minimum: Optional[int] = None) -> Optional[int]:
+    """`params[name]` as an int (`default` when absent); raises `InvalidParams` unless it is a whole number >= `minimum`."""
+    value = params.get(name)
+    if value is None:
+        return default
+    number: Optional[int] = None
+    if not isinstance(value, bool):
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            number = None
+        if number is not None and not isinstance(value, str) and number != value:
+            number = None  # e.g. 2.5
+    if number is None or (minimum is not None and number < minimum):
+        bound = f" >= {minimum}" if minimum is not None else ""
+        raise InvalidParams(f"{name} must be a whole number{bound}, got {value!r}")
+    return number
+
+
+def float_param(params: Dict[str, Any], name: str, default: Optional[float], minimum: Optional[float] = None) -> Optional[float]:
+    """`params[name]` as a float (`default` when absent); raises `InvalidParams` unless it is a finite number >= `minimum`."""
+    value = params.get(name)
+    if value is None:
+        return default
+    number: Optional[float] = None
+    if not isinstance(value, bool):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = None
+    if number is None or not math.isfinite(number) or (minimum is not None and number < minimum):
+        bound = f" >= {minimum:g}" if minimum is not None else ""
+        raise InvalidParams(f"{name} must be a number{bound}, got {value!r}")
+    return number
+
 
 class AgentPlay(abc.ABC):
     """Abstract base class for all hero play agents.
@@ -22,6 +86,9 @@ class AgentPlay(abc.ABC):
     play requires a different flow.
     """
 
+    # (index in the last run's actions, LLM context) per deferred rationale.
+    pending_rationales: List[Tuple[int, str]] = []
+
     def load_data(self) -> Any:
         """Load or fetch the data needed for this play.
 
@@ -40,6 +107,92 @@ class AgentPlay(abc.ABC):
 
         raise NotImplementedError("analyze() must be implemented in subclasses")
 
+    def aggregator(self) -> Optional["Aggregator"]:
+        """Return a mergeable form of `analyze`, or `None`.
+
+        Plays that return an `Aggregator` (see `aas.analytics.sharding`) can
+        be analyzed in shards across a process pool. The default `None` keeps
+        the play on the single-process path.
+        """
+
+        return None
+
+    def analyze_sharded(
+        self,
+        data: Any,
+        partition_key: Optional[str] = None,
+        partition_by: str = "hash",
+        num_shards: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        min_rows: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Analyze `data` across a process pool, split by `partition_key`.
+
+        Returns the same dict as `analyze(data)`. Plays without an
+        aggregator fall back to `analyze`.
+        """
+
+        aggregator = self.aggregator()
+        if aggregator is None:
+            return self.analyze(data)
+
+        from ..analytics.sharding import DEFAULT_MIN_SHARD_ROWS, analyze_sharded
+
+        return analyze_sharded(
+            aggregator,
+            data,
+            partition_key=partition_key,
+            partition_by=partition_by,
+            num_shards=num_shards,
+            max_workers=max_workers,
+            min_rows=DEFAULT_MIN_SHARD_ROWS if min_rows is None else min_rows,
+        )
+
+    def iter_chunks(self, chunk_size: int) -> Iterable[Any]:
+        """Yield the play's data in bounded batches.
+
+        The base implementation yields `load_data()` as a single batch.
+        Plays over large sources should override it to stream.
+        """
+
+        yield self.load_data()
+
+    def analyze_chunked(self, chunks: Iterable[Any]) -> Dict[str, Any]:
+        """Analyze a stream of batches with memory bounded by the batch size.
+
+        Each batch is reduced to a partial state and folded into a running
+        aggregate before the next batch is read, so the result equals
+        `analyze()` over the concatenated data. Plays without an aggregator
+        concatenate the batches and fall back to `analyze`.
+        """
+
+        aggregator = self.aggregator()
+        if aggregator is None:
+            import pandas as pd  # type: ignore
+
+            frames = list(chunks)
+            return self.analyze(pd.concat(frames, ignore_index=True) if frames else pd.DataFrame())
+
+        import numpy as np
+
+        state = aggregator.merge([])
+        offset = 0
+        for chunk in chunks:
+            positions = np.arange(offset, offset + len(chunk), dtype=np.int64)
+            state = aggregator.merge([state, aggregator.partial(chunk, positions)])
+            offset += len(chunk)
+        return aggregator.finalize(state)
+
+    def iter_findings(self, run_id: str, created_at: str) -> Iterable[Any]:
+        """Yield per-record findings for `aas_findings`, a batch at a time.
+
+        Plays that score individual records (e.g. opportunities) override
+        this so a run can persist every score, not just its actions. The
+        base implementation yields nothing.
+        """
+
+        return iter(())
+
     def recommend_actions(self, analysis: Dict[str, Any]) -> List[Action]:
         """Generate recommended actions based on analysis.
 
@@ -56,16 +209,30 @@ class AgentPlay(abc.ABC):
         contains two keys: `analysis` (the findings) and `actions` (a list
         of actions encoded as dictionaries). This wrapper avoids making
         consumers import our dataclasses.
+
+        With `params["rationale_mode"] == "deferred"`, actions carry
+        placeholder rationales and `pending_rationales` lists what is left to
+        generate (see `aas.llm.enrichment`).
         """
 
         logger.info(f"Running play: {self.__class__.__name__}")
-        data = self.load_data()
-        logger.debug("Data loaded: %s", type(data))
-        analysis = self.analyze(data)
+        analysis = self._analyze_for_mode()
         logger.debug("Analysis complete: %s", analysis.keys() if isinstance(analysis, dict) else analysis)
-        actions = self.recommend_actions(analysis)
+        from ..llm.rationale import STATUS_PENDING, rationale_budget
+
+        with rationale_budget() as budget:
+            actions = self.recommend_actions(analysis)
+        if budget.degraded:
+            logger.warning(
+                "Rationale budget of %.1fs spent; %d rationales fell back to rules", budget.seconds, budget.degraded
+            )
         logger.debug("Generated %d actions", len(actions))
 
+        self.pending_rationales = [
+            (i, action.rationale_context) for i, action in enumerate(actions)
+            if action.rationale_status == STATUS_PENDING
+        ]
+
         # Convert actions to plain dicts for JSON serialisation
         actions_serialisable = [action.to_dict() for action in actions]
         return {
@@ -73,68 +240,72 @@ class AgentPlay(abc.ABC):
             "actions": actions_serialisable,
         }
 
+    def _analyze_for_mode(self) -> Dict[str, Any]:
+        """Load data and dispatch to the analysis mode requested in `params`.
+
+        * `"sharded"` runs `analyze_sharded` with the optional `partition_key`,
+          `partition_by`, `num_shards` and `max_workers` params.
+        * `"chunked"` streams `iter_chunks(params["chunk_size"])` through
+          `analyze_chunked` without loading the full dataset.
+        * Anything else runs `analyze(load_data())`.
+        """
+
+        params = getattr(self, "params", None) or {}
+        mode = params.get("analysis_mode")
+        if mode == "chunked":
+            chunk_size = int_param(params, "chunk_size", DEFAULT_CHUNK_SIZE, minimum=1)
+            return self.analyze_chunked(self.iter_chunks(chunk_size))
+
+        if mode == "sharded":
+            from ..analytics.sharding import PARTITION_BY
+
+            partition_by = params.get("partition_by", "hash")
+            if partition_by not in PARTITION_BY:
+                raise InvalidParams(f"partition_by must be one of {', '.join(PARTITION_BY)}, got {partition_by!r}")
+            # Capped at the CPU count: the pool is shared and sized to it.
+            cpus = os.cpu_count() or 1
+            max_workers = min(int_param(params, "max_workers", cpus, minimum=1), cpus)
+            num_shards = int_param(params, "num_shards", None, minimum=1)
+
+        data = self.load_data()
+        logger.debug("Data loaded: %s", type(data))
+        if mode == "sharded":
+            return self.analyze_sharded(
+                data,
+                partition_key=params.get("partition_key"),
+                partition_by=partition_by,
+                num_shards=num_shards,
+                max_workers=max_workers,
+            )
+        return self.analyze(data)
+
     def generate_rationale(self, context: str) -> str:
         """Use LLM to generate rationale for an action."""
-        import os
-        import httpx
-        
-        provider = os.getenv("LLM_PROVIDER", "none").lower()
-        api_key = os.getenv("OPENAI_API_KEY")
-        
-        # 1. OpenAI Provider
-        if provider == "openai" and api_key:
-            try:
-                headers = {
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                }
-                payload = {
-                    "model": os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
-                    "messages": [
-                        {"role": "system", "content": "You are an expert sales analyst. Briefly explain (1 sentence) why this action is critical based on the data provided."},
-                        {"role": "user", "content": context}
-                    ],
-                    "max_tokens": 60,
-                    "temperature": 0.7
-                }
-                # Use sync call with timeout
-                resp = httpx.post("https://api.openai.com/v1/chat/completions", json=payload, headers=headers, timeout=5.0)
-                if resp.status_code == 200:
-                    return resp.json()["choices"][0]["message"]["content"].strip()
-                else:
-                    logger.warning(f"OpenAI Error {resp.status_code}: {resp.text}")
-                    return "AI Rationale: Optimization opportunity detected (OpenAI unavailable)."
-            except Exception as e:
-                logger.error(f"OpenAI Call failed: {e}")
-                return "AI Rationale: Optimization opportunity detected (OpenAI connection error)."
-
-        # 2. Ollama Provider
-        elif provider == "ollama":
-            base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/api")
-            model = os.getenv("OLLAMA_MODEL", "llama3")
-            try:
-                payload = {
-                    "model": model,
-                    "prompt": f"You are an expert sales analyst. Briefly explain (1 sentence) why this action is critical based on the data provided: {context}",
-                    "stream": False
-                }
-                resp = httpx.post(f"{base_url}/generate", json=payload, timeout=10.0)
-                if resp.status_code == 200:
-                    return resp.json().get("response", "").strip()
-                else:
-                    logger.warning(f"Ollama Error {resp.status_code}: {resp.text}")
-                    return "AI Rationale: Optimization opportunity detected (Ollama unavailable)."
-            except Exception as e:
-                logger.error(f"Ollama Call failed: {e}")
-                return "AI Rationale: Optimization opportunity detected (Ollama connection error)."
-
-        # 3. Fallback / None
-        else:
-            # Deterministic fallback based on context keywords
-            if "stage" in context.lower():
-                 return "AI Rationale: Deal stalling at current stage warrants immediate intervention."
-            elif "churn" in context.lower():
-                 return "AI Rationale: High churn risk detected based on usage patterns."
-            elif "spend" in context.lower():
-                 return "AI Rationale: Unusual spend velocity requires budget review."
-            return "AI Rationale: High impact opportunity identified based on current metrics."
\ No newline at end of file
+        from ..llm.rationale import generate_rationale
+
+        return generate_rationale(context)
+
+    def generate_rationales(self, contexts: Sequence[str]) -> List[str]:
+        """Rationale texts for several actions, in order (see `generate_rationale_results`)."""
+        return [result.text for result in self.generate_rationale_results(contexts)]
+
+    def generate_rationale_results(self, contexts: Sequence[str]) -> List["Rationale"]:
+        """Rationales for several actions, in order, with their status.
+
+        With an LLM provider configured, contexts are packed several to a
+        prompt and the batches run concurrently (see
+        `aas.llm.rationale.gather_rationale_results`), so a play waits about
+        as long as its slowest call, and never past the run's latency budget.
+        A subclass or test that replaces `generate_rationale` keeps getting
+        one call per context, with an empty status. In the deferred
+        rationale mode, no calls are made and every rationale is pending.
+        """
+        from ..llm.rationale import PENDING_RATIONALE, STATUS_PENDING, Rationale, gather_rationale_results
+
+        overridden = getattr(self.generate_rationale, "__func__", None) is not AgentPlay.generate_rationale
+        if overridden:
+            return [Rationale(self.generate_rationale(context), "") for context in contexts]
+        params = getattr(self, "params", None) or {}
+        if params.get("rationale_mode") == "deferred":
+            return [Rationale(PENDING_RATIONALE, STATUS_PENDING, context) for context in contexts]
+        return gather_rationale_results(contexts)
@@ -1,73 +1,208 @@
-"""Churn Rescue hero play implementation (stub).
+"""Churn Rescue hero play implementation.
 
-Reuse pipeline data for now to simulate customer health risks.
+Scores customer accounts for churn risk from their health signals
+(see `aas.analytics.churn`) and queues retention outreach for the
+accounts with the most MRR at stake.
 """
 from __future__ import annotations
 import datetime as _dt
-from typing import Any, Dict, List
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
 
-from .pipeline_leakage import PipelineLeakageAgent
+import pandas as pd  # type: ignore
+
+from .base import AgentPlay, float_param, int_param, resolve_data_path
+from ..analytics.churn import (
+    AT_RISK_THRESHOLD,
+    CUSTOMER_COLUMNS,
+    DEFAULT_VISUAL_CONTEXT,
+    HIGH_RISK_THRESHOLD,
+    TOP_K,
+    ChurnRiskAggregator,
+)
+from ..db import get_conn
 from ..models.action import Action
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-class ChurnRescueAgent(PipelineLeakageAgent):
+SAMPLE_DATA_PATH = Path(__file__).parent.parent / "sample_data" / "churn_rescue_data.csv"
+
+CUSTOMERS_SQL = f"SELECT {', '.join(CUSTOMER_COLUMNS)} FROM aas_customers;"
+
+# Compact dtypes for large customer files.
+CUSTOMER_DTYPES = {
+    "mrr": "float64",
+    "support_tickets_30d": "Int32",
+    "nps_score": "Int8",
+    "usage_trend": "category",
+    "last_login_days": "Int32",
+    "payment_delays": "Int16",
+    "account_health_score": "Int16",
+}
+
+DEFAULT_CHUNK_SIZE = 250_000
+
+
+class ChurnRescueAgent(AgentPlay):
     """Agent that identifies customers at risk of churn."""
 
-    def analyze(self, data: Any) -> Dict[str, Any]:
-        result = super().analyze(data)
-        
-        # Override visual context for this play
-        result["visual_context"] = {
-            "view_name": "Churn Rescue",
-            "workbook": "Superstore",
-            "url": "https://10ax.online.tableau.com/#/site/agenticanalyticsstudio/views/Churn/Rescue", # Placeholder, updated via API logic
-            "note": "Embedded Churn Rescue View"
-        }
-        return result
+    # Override visual context for this play
+    visual_context = DEFAULT_VISUAL_CONTEXT
+
+    def __init__(self):
+        super().__init__()
+        self.params: Dict[str, Any] = {}
+
+    def _csv_path(self) -> Path:
+        """`params["source_path"]` inside the data directory (see `resolve_data_path`), else the sample."""
+        source_path = self.params.get("source_path")
+        return resolve_data_path(source_path) if source_path else SAMPLE_DATA_PATH
+
+    def _read_csv(self, path: Path, **kwargs):
+        header = pd.read_csv(path, nrows=0).columns
+        return pd.read_csv(
+            path,
+            usecols=[c for c in CUSTOMER_COLUMNS if c in header],
+            dtype={c: t for c, t in CUSTOMER_DTYPES.items() if c in header},
+            **kwargs,
+        )
+
+    def load_data(self) -> pd.DataFrame:
+        """Load customer accounts.
+
+        Preference order:
+        1) `params["data"]` (list of customer dicts, for tests and API callers).
+        2) Postgres `aas_customers` via DATABASE_URL.
+        3) A CSV at `params["source_path"]` (inside the data directory), else
+           the packaged sample.
+        """
+        if "data" in self.params:
+            return pd.DataFrame(self.params["data"])
+
+        if os.getenv("DATABASE_URL") and not self.params.get("source_path"):
+            try:
+                conn = get_conn()
+                with conn.cursor() as cur:
+                    cur.execute(CUSTOMERS_SQL)
+                    rows = cur.fetchall()
+                conn.close()
+                if rows:
+                    return pd.DataFrame(rows, columns=CUSTOMER_COLUMNS)
+            except Exception as e:
+                logger.warning("Failed to load customers from Postgres; falling back to CSV. Error=%s", e)
+
+        path = self._csv_path()
+        frame = self._read_csv(path)
+        logger.info(f"Loaded {len(frame)} customers from {path}")
+        return frame
+
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+        """Stream customers in bounded batches for chunked analysis.
+
+        Sources, in the same preference order as `load_data`:
+        1) Postgres server-side cursor over `aas_customers`.
+        2) A CSV file (`params["source_path"]` or the sample), read `chunk_size` rows at a time.
+        """
+        if "data" in self.params:
+            yield self.load_data()
+            return
+
+        if os.getenv("DATABASE_URL") and not self.params.get("source_path"):
+            conn = get_conn()
+            try:
+                # Named cursors are server-side and need a transaction.
+                conn.autocommit = False
+                with conn.cursor(name="aas_customer_stream") as cur:
+                    cur.itersize = chunk_size
+                    cur.execute(CUSTOMERS_SQL)
+                    while True:
+                        rows = cur.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        yield pd.DataFrame(rows, columns=CUSTOMER_COLUMNS)
+                conn.rollback()
+            finally:
+                conn.close()
+            return
+
+        with self._read_csv(self._csv_path(), chunksize=chunk_size) as reader:
+            yield from reader
+
+    def analyze(self, data: pd.DataFrame) -> Dict[str, Any]:
+        """Score every account and summarize churn exposure.
+
+        Returns:
+            A dict with keys:
+            * `at_risk_customers`: at-risk accounts with the most MRR at stake.
+            * `risk_drivers`: at-risk accounts and MRR by primary driver.
+            * `narrative`: human-readable summary of findings.
+            * `metrics`: quantified impact metrics.
+        """
+        return self.aggregator().analyze(data)
+
+    def aggregator(self) -> ChurnRiskAggregator:
+        """Mergeable form of `analyze`, used by sharded and chunked runs; raises `InvalidParams` on bad params."""
+        return ChurnRiskAggregator(
+            top_k=int_param(self.params, "top_n", TOP_K, minimum=0),
+            threshold=float_param(self.params, "risk_threshold", AT_RISK_THRESHOLD, minimum=0),
+            visual_context=self.visual_context,
+        )
 
     def recommend_actions(self, analysis: Dict[str, Any]) -> List[Action]:
         actions: List[Action] = []
-        for deal in analysis.get("at_risk_deals", []):
-            opp_id = deal.get("opportunity_id") or "unknown"
-            owner = deal.get("owner") or "account manager"
-            score = deal.get("risk_score", 0)
-            reasons = ", ".join(deal.get("reasons", []))
-            region = deal.get("region")
-            segment = deal.get("segment")
-            stage = deal.get("stage")
+        contexts: List[str] = []
+        for customer in analysis.get("at_risk_customers", []):
+            customer_id = customer.get("customer_id") or "unknown"
+            name = customer.get("name") or customer_id
+            score = customer.get("churn_risk", 0)
+            mrr = customer.get("mrr", 0)
+            reasons = ", ".join(customer.get("reasons", []))
+            renewal = customer.get("days_to_renewal")
+
+            context = (
+                f"Customer {name} ({customer_id}): churn risk {score}, MRR ${mrr:,.0f}, "
+                f"renewal in {renewal} days. Reasons: {reasons}."
+            )
+            metadata = {
+                "customer_id": customer_id,
+                "customer_name": name,
+                "mrr": mrr,
+                "churn_risk": score,
+                "primary_driver": customer.get("primary_driver"),
+                "days_to_renewal": renewal,
+            }
+
+            contexts.append(context)
 
             # 1) Retention Call Task
             actions.append(Action(
                 type="salesforce_task",
-                title=f"Retention Call: {opp_id}",
-                description=f"Schedule urgent retention review with {owner}. Health score: {100-score} (Risk: {score}%).",
-                priority="high" if score > 70 else "medium",
+                title=f"Retention Call: {name} (${mrr:,.0f} MRR)",
+                description=f"Schedule urgent retention review for {name}. Churn risk {score}. {reasons}.",
+                priority="high" if score >= HIGH_RISK_THRESHOLD else "medium",
+                impact_score=float(customer.get("mrr_at_risk", 0)),
                 metadata={
-                    "opportunity_id": opp_id,
-                    "subject": f"Retention Risk Review: {opp_id}",
-                    "owner": owner,
-                    "region": region,
-                    "segment": segment,
-                    "stage": stage,
+                    **metadata,
+                    "subject": f"Retention Risk Review: {name}",
                     "due_date": (_dt.date.today() + _dt.timedelta(days=1)).isoformat()
                 }
             ))
-            
+
             # 2) Slack Alert
             actions.append(Action(
                 type="slack_message",
-                title=f"Churn Risk: {opp_id}",
-                description=f"Notify CS team of potential churn risk for {opp_id}.",
+                title=f"Churn Risk: {name}",
+                description=f"Notify CS team of potential churn risk for {name}.",
                 priority="medium",
                 metadata={
+                    **metadata,
                     "channel": "customer-success",
-                    "text": f"🚨 High Churn Risk detected for account {opp_id}. Risk Score: {score}. Factors: {reasons}",
-                    "opportunity_id": opp_id,
-                    "region": region,
-                    "segment": segment,
-                    "stage": stage,
+                    "text": f"🚨 High Churn Risk detected for {name} ({customer_id}). Risk Score: {score}. Factors: {reasons}",
                 }
             ))
-        return actions
\ No newline at end of file
+        # Fetch every rationale together; the task of each pair carries it.
+        for i, rationale in enumerate(self.generate_rationale_results(contexts)):
+            actions[2 * i].set_rationale(rationale)
+        return actions
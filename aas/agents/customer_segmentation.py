@@ -1,59 +1,269 @@
-from typing import Any, Dict, List
-from .base import AgentPlay
+"""Customer Segmentation hero play implementation.
+
+Clusters customer accounts with mini-batch k-means over value, usage and
+health features (see `aas.analytics.segmentation`) and recommends
+retention or expansion outreach per segment.
+"""
+from __future__ import annotations
+import datetime as _dt
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+from .base import AgentPlay, InvalidParams, data_dir, int_param
+from .churn_rescue import DEFAULT_CHUNK_SIZE, ChurnRescueAgent
+from ..analytics.segmentation import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_SEGMENTS,
+    SegmentationModel,
+    segment_stats,
+    summarize_segments,
+)
+from ..models.action import Action
 from ..plays.registry import register_play
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Assumption: expansion outreach grows a healthy segment's MRR by about 10%.
+EXPANSION_RATE = 0.10
+# Segments (by MRR) that get outreach of each kind.
+MAX_SEGMENT_ACTIONS = 2
+
+# Saved models are named by the request, never located by it.
+MODEL_NAME_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,63}")
+
+
+def model_dir() -> Path:
+    """Directory of named saved models (`SEGMENTATION_MODEL_DIR`, default `<data dir>/segmentation_models`)."""
+    configured = os.getenv("SEGMENTATION_MODEL_DIR")
+    return Path(configured).resolve() if configured else data_dir() / "segmentation_models"
+
+
+def model_path_for(name: str) -> Path:
+    """The file of saved model `name` in `model_dir()`; raises `InvalidParams` for an invalid name."""
+    if not isinstance(name, str) or not MODEL_NAME_PATTERN.fullmatch(name) or ".." in name:
+        raise InvalidParams(
+            "model_name must be 1-64 letters, digits, '_', '-' or '.', starting with a letter or digit"
+        )
+    return model_dir() / f"{name}.json"
+
+
 class CustomerSegmentationAgent(AgentPlay):
     """
     Agent for Customer Segmentation play.
     Identifies high-value segments and recommends retention/upsell actions.
     """
-    
+
+    visual_context = {
+        "view_name": "Customer Segmentation",
+        "filter_state": {}
+    }
+
     def __init__(self):
-        self.params = {}
-        
-    def run(self) -> Dict[str, Any]:
-        logger.info("Running Customer Segmentation Agent")
-        
-        # Stub logic for demo parity
-        actions = [
-            {
-                "type": "salesforce_task",
-                "title": "Upsell Enterprise Segment A",
-                "description": "Enterprise customers in Segment A are showing 20% growth. Reach out with Tier 1 expansion pack.",
-                "priority": "high",
-                "impact_score": 85000,
-                "reasoning": "High growth signal detected in non-core usage.",
-                "owner": "Sarah Connors",
-                "region": "NA",
-                "segment": "Enterprise",
-                "opportunity_id": "OPP-SEG-001"
-            },
-               {
-                "type": "slack_message",
-                "title": "Retention Risk: Mid-Market",
-                "description": "Usage drop detected in Mid-Market cohort. Initiate standard health check.",
-                "priority": "medium",
-                "impact_score": 42000,
-                "reasoning": "Usage dropped by 15% WoW.",
-                "owner": "Frank Castle",
-                "region": "EMEA",
-                "segment": "Mid-Market",
-                "opportunity_id": "OPP-SEG-002"
-            }
-        ]
-        
+        super().__init__()
+        self.params: Dict[str, Any] = {}
+        self.model: Optional[SegmentationModel] = None
+        # Set by server code only; requests pick a model by `params["model_name"]`.
+        self.model_path: Optional[Path] = None
+
+    def _customers(self) -> ChurnRescueAgent:
+        """Customer accounts come from the same sources as the churn play."""
+        source = ChurnRescueAgent()
+        source.params = self.params
+        return source
+
+    def load_data(self) -> pd.DataFrame:
+        return self._customers().load_data()
+
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+        return self._customers().iter_chunks(chunk_size)
+
+    def _new_model(self) -> SegmentationModel:
+        return SegmentationModel(
+            n_segments=int(self.params.get("n_segments", DEFAULT_SEGMENTS)),
+            batch_size=int(self.params.get("batch_size", DEFAULT_BATCH_SIZE)),
+            seed=self.params.get("seed", 0),
+        )
+
+    def _model_file(self) -> Optional[Path]:
+        """`self.model_path`, else the file of `params["model_name"]`, else None (no saved model)."""
+        if self.model_path is not None:
+            return Path(self.model_path)
+        name = self.params.get("model_name")
+        return model_path_for(name) if name else None
+
+    def _saved_model(self) -> Optional[SegmentationModel]:
+        """The saved model (see `_model_file`), if one has been saved."""
+        path = self._model_file()
+        if path is not None and path.exists():
+            return SegmentationModel.load(path)
+        return None
+
+    def _save_model(self) -> None:
+        path = self._model_file()
+        if path is not None and self.model is not None:
+            self.model.save(path)
+
+    def analyze(self, data: pd.DataFrame) -> Dict[str, Any]:
+        """Segment the accounts and profile each segment.
+
+        A saved model (`params["model_name"]`) is reused: new accounts are
+        folded in with `partial_fit` rather than re-clustered. Otherwise a new
+        model is fit with mini-batch steps.
+
+        Returns:
+            A dict with keys:
+            * `segments`: per-segment size, MRR and health profile, largest MRR first.
+            * `metrics`: customers and segments counted.
+            * `narrative`: human-readable summary.
+        """
+        if data is None or len(data) == 0:
+            return {"segments": [], "metrics": {}, "narrative": "No data available.", "visual_context": self.visual_context}
+
+        self.model = self._saved_model()
+        if self.model is None:
+            self.model = self._new_model().fit(data)
+        else:
+            self.model.partial_fit(data)
+        self._save_model()
+
+        labels = self.model.assign(data)
+        return self._summary(segment_stats(data, labels, self.model.n_segments))
+
+    def analyze_chunked(self, chunks: Iterable[pd.DataFrame]) -> Dict[str, Any]:
+        """Fit in one streaming pass, then assign and profile in a second pass.
+
+        Both passes hold one chunk at a time; the second re-reads the source.
+        """
+        self.model = self._saved_model() or self._new_model()
+        self.model.fit_chunks(chunks)
+        if not self.model.is_fitted:
+            return self.analyze(pd.DataFrame())
+        self._save_model()
+
+        stats = np.zeros((self.model.n_segments, 0))
+        for chunk in self.iter_chunks(int_param(self.params, "chunk_size", DEFAULT_CHUNK_SIZE, minimum=1)):
+            chunk_stats = segment_stats(chunk, self.model.assign(chunk), self.model.n_segments)
+            stats = chunk_stats if not stats.size else stats + chunk_stats
+        return self._summary(stats)
+
+    def _summary(self, stats: np.ndarray) -> Dict[str, Any]:
+        segments = summarize_segments(stats, self.model)
+        customers = sum(s["customers"] for s in segments)
+        total_mrr = sum(s["total_mrr"] for s in segments)
+        top = segments[0]
+        narrative = (
+            f"Grouped {customers} customers into {len(segments)} segments. "
+            f"Largest by MRR: {top['name']} ({top['customers']} customers, ${top['total_mrr']:,.0f} MRR)."
+        )
         return {
-            "status": "success",
-            "actions": actions,
-            "visual_context": {
-                "view_name": "Customer Segmentation",
-                "filter_state": {}
-            }
+            "segments": segments,
+            "metrics": {"customers": customers, "segments": len(segments), "total_mrr": total_mrr},
+            "narrative": narrative,
+            "visual_context": self.visual_context,
         }
 
+    def assign(self, customers: pd.DataFrame, update: bool = False) -> List[Dict[str, Any]]:
+        """Label customers with the fitted segments, without re-clustering.
+
+        With `update=True` the customers are also folded into the centroids.
+        """
+        model = self.model or self._saved_model()
+        if model is None:
+            raise ValueError("No segmentation model: run the play or set params['model_name'] first")
+        self.model = model
+        if update:
+            model.partial_fit(customers)
+            self._save_model()
+        labels = model.assign(customers)
+        names = model.segment_names()
+        ids = customers["customer_id"] if "customer_id" in customers.columns else pd.Series(range(len(customers)))
+        return [
+            {"customer_id": cid, "segment_id": int(label), "segment": names[label]}
+            for cid, label in zip(ids.tolist(), labels)
+        ]
+
+    def recommend_actions(self, analysis: Dict[str, Any]) -> List[Action]:
+        actions: List[Action] = []
+        contexts: List[str] = []
+        segments = analysis.get("segments", [])
+        at_risk = [s for s in segments if s["name"].endswith("at risk")][:MAX_SEGMENT_ACTIONS]
+        healthy = [s for s in segments if not s["name"].endswith("at risk")][:MAX_SEGMENT_ACTIONS]
+
+        for segment in at_risk:
+            context = (
+                f"Customer segment '{segment['name']}': {segment['customers']} customers, "
+                f"${segment['total_mrr']:,.0f} MRR, avg health {segment['avg_health_score']}, "
+                f"{segment['declining_pct']}% with declining usage. Churn risk."
+            )
+            contexts.append(context)
+            actions.append(Action(
+                type="salesforce_task",
+                title=f"Retention Campaign: {segment['name']} (${segment['total_mrr']:,.0f} MRR)",
+                description=(
+                    f"{segment['customers']} customers averaging health {segment['avg_health_score']} "
+                    f"and NPS {segment['avg_nps']}; {segment['declining_pct']}% show declining usage. "
+                    "Run a structured health-check campaign."
+                ),
+                priority="high",
+                impact_score=float(segment["total_mrr"]),
+                metadata={
+                    "segment_id": segment["segment_id"],
+                    "segment": segment["name"],
+                    "customers": segment["customers"],
+                    "subject": f"Retention Campaign: {segment['name']}",
+                    "due_date": (_dt.date.today() + _dt.timedelta(days=7)).isoformat(),
+                }
+            ))
+
+        for segment in healthy:
+            context = (
+                f"Customer segment '{segment['name']}': {segment['customers']} customers, "
+                f"${segment['total_mrr']:,.0f} MRR, {segment['growing_pct']}% with growing usage. Expansion opportunity."
+            )
+            contexts.append(context)
+            actions.append(Action(
+                type="salesforce_task",
+                title=f"Expansion Outreach: {segment['name']}",
+                description=(
+                    f"{segment['customers']} customers (${segment['avg_mrr']:,.0f} avg MRR), "
+                    f"{segment['growing_pct']}% growing usage. Offer tier upgrades and add-ons."
+                ),
+                priority="medium",
+                impact_score=float(segment["total_mrr"] * EXPANSION_RATE),
+                metadata={
+                    "segment_id": segment["segment_id"],
+                    "segment": segment["name"],
+                    "customers": segment["customers"],
+                    "subject": f"Expansion Outreach: {segment['name']}",
+                    "due_date": (_dt.date.today() + _dt.timedelta(days=14)).isoformat(),
+                }
+            ))
+
+        # Campaign rationales are fetched together, one per task above.
+        for action, rationale in zip(actions, self.generate_rationale_results(contexts)):
+            action.set_rationale(rationale)
+
+        if segments:
+            summary = "; ".join(f"{s['name']}: {s['customers']} (${s['total_mrr']:,.0f})" for s in segments)
+            actions.append(Action(
+                type="slack_message",
+                title="Customer Segments Refreshed",
+                description="Share the refreshed segment profile with customer success.",
+                priority="low",
+                metadata={
+                    "channel": "customer-success",
+                    "text": f"👥 Customer segments refreshed. {summary}",
+                }
+            ))
+        return actions
+
+
 # Register the play
 register_play(
     id="customer_segmentation",
@@ -61,5 +271,32 @@ register_play(
     description="Identify high-value segments and retention risks",
     agent_class=CustomerSegmentationAgent,
     tags=["marketing", "retention"],
+    inputs_schema={
+        "n_segments": {
+            "type": "integer",
+            "description": "Number of k-means segments",
+            "default": DEFAULT_SEGMENTS
+        },
+        "batch_size": {
+            "type": "integer",
+            "description": "Customers per mini-batch step",
+            "default": DEFAULT_BATCH_SIZE
+        },
+        "seed": {
+            "type": "integer",
+            "description": "Seed for reproducible clustering",
+            "default": 0
+        },
+        "model_name": {
+            "type": "string",
+            "description": "Name of a saved model (in SEGMENTATION_MODEL_DIR) to update incrementally instead of re-clustering",
+            "optional": True
+        },
+        "source_path": {
+            "type": "string",
+            "description": "Customer CSV to segment instead of aas_customers or the sample data, relative to AAS_DATA_DIR",
+            "optional": True
+        }
+    },
     icon="👥"
 )
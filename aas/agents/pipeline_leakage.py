@@ -12,11 +12,14 @@ from __future__ import annotations
 import datetime as _dt
 import os
 from importlib import resources
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional
 
 import pandas as pd  # type: ignore
 
-from .base import AgentPlay
+from .base import DEFAULT_CHUNK_SIZE, AgentPlay, int_param, resolve_data_path
+from ..analytics.findings import opportunity_findings
+from ..analytics.pipeline_risk import DEFAULT_VISUAL_CONTEXT, PipelineRiskAggregator
+from ..analytics.pipeline_sketch import PipelineSketchAggregator
 from ..db import get_conn
 from ..models.action import Action
 from ..utils.logger import get_logger
@@ -25,15 +28,55 @@ from ..services.salesforce_client import SalesforceClient
 logger = get_logger(__name__)
 
 
+OPEN_OPPORTUNITIES_SQL = """
+    SELECT opportunity_id, owner, region, segment, stage, amount,
+           close_date, last_touch_date, stage_age_days
+    FROM aas_opportunities
+    WHERE stage NOT IN ('Closed Won','Closed Lost');
+"""
+
+OPPORTUNITY_COLUMNS = [
+    "opportunity_id",
+    "owner",
+    "region",
+    "segment",
+    "stage",
+    "amount",
+    "close_date",
+    "last_touch_date",
+    "stage_age",
+]
+
+# `aas_opportunities` column names that the scoring code knows by another
+# name. The SQL path renames positionally; CSV exports of the table (and
+# `generate_opportunities` fixtures) keep the table names.
+TABLE_COLUMN_ALIASES = {"stage_age_days": "stage_age"}
+
+
+def normalize_columns(frame: pd.DataFrame) -> pd.DataFrame:
+    """Rename `aas_opportunities` columns to the names `score_opportunities` reads."""
+    renames = {old: new for old, new in TABLE_COLUMN_ALIASES.items() if old in frame.columns and new not in frame.columns}
+    return frame.rename(columns=renames) if renames else frame
+
+
 class PipelineLeakageAgent(AgentPlay):
     """Agent that identifies at‑risk deals and proposes follow‑ups."""
 
+    visual_context: Dict[str, Any] = DEFAULT_VISUAL_CONTEXT
+
     def __init__(self):
         super().__init__()
         self.sf = SalesforceClient()
+        # The frame the last `load_data` returned, so findings reuse it.
+        self._loaded: Optional[pd.DataFrame] = None
 
     def load_data(self) -> pd.DataFrame:
-        """Load pipeline data.
+        """Load pipeline data (see `_read_source`), keeping it for `iter_findings`."""
+        self._loaded = self._read_source()
+        return self._loaded
+
+    def _read_source(self) -> pd.DataFrame:
+        """Read the whole pipeline.
 
         Preference order:
         1) Postgres ("live" demo) via DATABASE_URL + `aas_opportunities`.
@@ -45,32 +88,12 @@ class PipelineLeakageAgent(AgentPlay):
             try:
                 conn = get_conn()
                 with conn.cursor() as cur:
-                    cur.execute(
-                        """
-                        SELECT opportunity_id, owner, region, segment, stage, amount,
-                               close_date, last_touch_date, stage_age_days
-                        FROM aas_opportunities
-                        WHERE stage NOT IN ('Closed Won','Closed Lost');
-                        """
-                    )
+                    cur.execute(OPEN_OPPORTUNITIES_SQL)
                     rows = cur.fetchall()
                 conn.close()
 
                 if rows:
-                    df = pd.DataFrame(
-                        rows,
-                        columns=[
-                            "opportunity_id",
-                            "owner",
-                            "region",
-                            "segment",
-                            "stage",
-                            "amount",
-                            "close_date",
-                            "last_touch_date",
-                            "stage_age",
-                        ],
-                    )
+                    df = pd.DataFrame(rows, columns=OPPORTUNITY_COLUMNS)
                     return df
             except Exception as e:
                 logger.warning("Failed to load live data from Postgres; falling back to CSV. Error=%s", e)
@@ -78,11 +101,51 @@ class PipelineLeakageAgent(AgentPlay):
         # 2) Static demo path: packaged CSV
         try:
             with resources.open_text("aas.data", "demo_pipeline_data.csv") as f:
-                return pd.read_csv(f)
+                return normalize_columns(pd.read_csv(f))
         except FileNotFoundError:
             logger.warning("demo_pipeline_data.csv not found; returning empty DataFrame")
             return pd.DataFrame()
 
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+        """Stream pipeline data in bounded batches for chunked analysis.
+
+        Sources, in the same preference order as `load_data`:
+        1) Postgres server-side cursor over `aas_opportunities`.
+        2) A CSV file from `params["source_path"]` (inside the data directory,
+           see `resolve_data_path`), read `chunk_size` rows at a time.
+
+        Only one batch is held in memory at a time.
+        """
+
+        params = getattr(self, "params", None) or {}
+
+        if os.getenv("DATABASE_URL"):
+            conn = get_conn()
+            try:
+                # Named cursors are server-side and need a transaction.
+                conn.autocommit = False
+                with conn.cursor(name="aas_pipeline_stream") as cur:
+                    cur.itersize = chunk_size
+                    cur.execute(OPEN_OPPORTUNITIES_SQL)
+                    while True:
+                        rows = cur.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        yield pd.DataFrame(rows, columns=OPPORTUNITY_COLUMNS)
+                conn.rollback()
+            finally:
+                conn.close()
+            return
+
+        source_path = params.get("source_path")
+        if source_path:
+            with pd.read_csv(resolve_data_path(source_path), chunksize=chunk_size) as reader:
+                for chunk in reader:
+                    yield normalize_columns(chunk)
+            return
+
+        yield self.load_data()
+
     def analyze(self, data: pd.DataFrame) -> Dict[str, Any]:
         """Identify at‑risk deals and basic pipeline statistics.
 
@@ -97,134 +160,43 @@ class PipelineLeakageAgent(AgentPlay):
             * `narrative`: human‑readable summary of findings.
             * `metrics`: quantified impact metrics.
         """
-        if data.empty:
-            return {
-                "at_risk_deals": [],
-                "stage_distribution": {},
-                "narrative": "No data available."
-            }
-
-        # Convert date columns for calculation
-        today = _dt.date.today()
-        for col in ["close_date", "last_touch_date"]:
-            if col in data.columns:
-                data[col] = pd.to_datetime(data[col], errors="coerce")
+        return self.aggregator().analyze(data)
 
-        if "amount" not in data.columns:
-            data["amount"] = 0.0
-        else:
-            data["amount"] = data["amount"].astype(float)
-
-        # 1) Calculate Risk Score (0-100) and Reasons
-        data["risk_score"] = 0.0
-        data["reasons"] = [[] for _ in range(len(data))]
-
-        if "stage_age" in data.columns:
-            # stage_age component: 1 point per day, capped at 40
-            age_points = (data["stage_age"].fillna(0)).clip(0, 40)
-            data["risk_score"] += age_points
-            for idx, age in data["stage_age"].items():
-                if age > 30:
-                    data.at[idx, "reasons"].append(f"Stalled in stage {int(age)} days")
-
-        if "last_touch_date" in data.columns:
-            # days since last touch component: 2 points per day over 7 days, max 30
-            days_since = (pd.Timestamp(today) - data["last_touch_date"]).dt.days.fillna(30)
-            touch_points = ((days_since - 7).clip(0) * 2).clip(0, 30)
-            data["risk_score"] += touch_points
-            for idx, d in days_since.items():
-                if d > 14:
-                    data.at[idx, "reasons"].append(f"No activity in {int(d)} days")
-
-        if "close_date" in data.columns:
-            # close date slipped component: 30 points
-            is_past = data["close_date"].dt.date < today
-            data.loc[is_past, "risk_score"] += 30
-            for idx, past in is_past.items():
-                if past:
-                    data.at[idx, "reasons"].append("Close date slipped")
-
-        data["risk_score"] = data["risk_score"].clip(0, 100)
-
-        # Filter out low risk (< 20 say) for impact analysis? Or just use "at risk" definition (score > 50)?
-        # Let's say highly stalled = score > 50
-        stalled_mask = data["risk_score"] > 50
-        stalled_df = data[stalled_mask]
-
-        # Impact Metrics
-        num_stalled = len(stalled_df)
-        value_at_risk = stalled_df["amount"].sum()
-        avg_days_stalled = stalled_df["stage_age"].mean() if "stage_age" in stalled_df.columns and not stalled_df.empty else 0
-        expected_recovered = value_at_risk * 0.7  # Assumption: can save 70%
-
-        metrics = {
-            "num_stalled_opportunities": int(num_stalled),
-            "value_at_risk": float(value_at_risk),
-            "avg_days_stalled": float(round(avg_days_stalled, 1)),
-            "expected_revenue_recovered": float(expected_recovered)
-        }
-
-        # 2) Drivers of slowdown summary
-        drivers = {}
-        if "stage" in data.columns and "stage_age" in data.columns:
-            drivers["slowest_stages"] = data.groupby("stage")["stage_age"].mean().sort_values(ascending=False).head(3).to_dict()
-        
-        if "owner" in data.columns:
-            high_risk_df = data[data["risk_score"] > 50]
-            drivers["top_high_risk_owners"] = high_risk_df["owner"].value_counts().head(3).to_dict()
-
-        # 3) Stage distribution (existing)
-        if "stage" in data.columns:
-            stage_counts = data["stage"].value_counts().to_dict()
+    def aggregator(self) -> PipelineRiskAggregator:
+        """Mergeable form of `analyze`, used by sharded and chunked runs.
+
+        With `params["approximate"]` the stage, owner and account rollups use
+        fixed-size sketches (see `aas.analytics.pipeline_sketch`).
+        """
+        params = getattr(self, "params", None) or {}
+        if params.get("approximate"):
+            return PipelineSketchAggregator(visual_context=self.visual_context)
+        return PipelineRiskAggregator(visual_context=self.visual_context)
+
+    def iter_findings(self, run_id: str, created_at: str) -> Iterator[pd.DataFrame]:
+        """Score every opportunity for `aas_findings`, `params["chunk_size"]` rows at a time.
+
+        Yields `aas_findings` rows (see `aas.analytics.findings`). Reuses the
+        frame the analysis loaded; only a chunked run, which never held the
+        whole pipeline, reads its source again via `iter_chunks`.
+        """
+        params = getattr(self, "params", None) or {}
+        chunk_size = int_param(params, "chunk_size", DEFAULT_CHUNK_SIZE, minimum=1)
+        today = _dt.date.today()
+        if self._loaded is not None:
+            loaded = self._loaded
+            chunks: Iterator[pd.DataFrame] = (loaded.iloc[i:i + chunk_size] for i in range(0, len(loaded), chunk_size))
         else:
-            stage_counts = {}
-
-        # 4) Select top 5 at-risk deals
-        at_risk_df = data.sort_values("risk_score", ascending=False).head(5).copy()
-        
-        # Convert dates to strings for JSON serialisation
-        for col in ["close_date", "last_touch_date"]:
-            if col in at_risk_df.columns:
-                at_risk_df[col] = at_risk_df[col].dt.strftime('%Y-%m-%d')
-
-        # Select a subset of fields to include in the result
-        cols = [c for c in [
-            "opportunity_id",
-            "segment",
-            "region",
-            "stage",
-            "owner",
-            "stage_age",
-            "amount",
-            "close_date",
-            "risk_score",
-            "reasons",
-        ] if c in at_risk_df.columns]
-        at_risk_list = at_risk_df[cols].to_dict(orient="records")
-
-        narrative = (
-            f"Identified {len(at_risk_list)} deals at risk seeking attention. "
-            f"Total value at risk is ${value_at_risk:,.0f} across {num_stalled} stalled opportunities. "
-            f"Top drivers include stages: {', '.join(drivers.get('slowest_stages', {}).keys())}."
-        )
-
-        return {
-            "at_risk_deals": at_risk_list,
-            "stage_distribution": stage_counts,
-            "drivers_of_slowdown": drivers,
-            "narrative": narrative,
-            "metrics": metrics,
-            "visual_context": {
-                "view_name": "Superstore Overview",
-                "workbook": "Superstore",
-                "url": "https://10ax.online.tableau.com/#/site/agenticanalyticsstudio/views/Superstore/Overview",
-                "note": "Embedded Tableau context for this analysis"
-            }
-        }
+            chunks = iter(self.iter_chunks(chunk_size))
+        offset = 0
+        for chunk in chunks:
+            yield opportunity_findings(chunk, run_id, created_at, today, offset)
+            offset += len(chunk)
 
     def recommend_actions(self, analysis: Dict[str, Any]) -> List[Action]:
         """Generate follow‑up actions for each at‑risk deal."""
         actions: List[Action] = []
+        contexts: List[str] = []
         for deal in analysis.get("at_risk_deals", []):
             opp_id = deal.get("opportunity_id") or "unknown"
             owner = deal.get("owner") or "the owner"
@@ -244,10 +216,9 @@ class PipelineLeakageAgent(AgentPlay):
             )
             created_task_id = sf_res.get("id")
 
-            # Generate AI Rationale
-            context = f"Opportunity {opp_id}: Stage {stage}, Age {deal.get('stage_age')} days, Amount ${amount}, Risk Score {score}. Reasons: {reasons}."
-            rationale = self.generate_rationale(context)
-            
+            # AI Rationale, filled in below once every deal's context is known
+            contexts.append(f"Opportunity {opp_id}: Stage {stage}, Age {deal.get('stage_age')} days, Amount ${amount}, Risk Score {score}. Reasons: {reasons}.")
+
             # 1) Salesforce Task Action
             actions.append(Action(
                 type="salesforce_task",
@@ -255,7 +226,6 @@ class PipelineLeakageAgent(AgentPlay):
                 description=f"Salesforce Task {created_task_id} created. Follow up with {owner}. Risk: {reasons}",
                 priority="high" if score > 70 else "medium",
                 impact_score=float(amount),
-                reasoning=rationale,
                 metadata={
                     "opportunity_id": opp_id,
                     "task_id": created_task_id,
@@ -275,7 +245,6 @@ class PipelineLeakageAgent(AgentPlay):
                 description=f"Alert sales-ops regarding high risk deal {opp_id} ({score}% risk).",
                 priority="medium",
                 impact_score=float(amount * 0.1), # Heuristic: notification value? 
-                reasoning=rationale,
                 metadata={
                     "channel": "sales-alerts",
                     "text": f"⚠️ High risk deal {opp_id} (${amount:,.0f}) is stalled. Score: {score}%. Factors: {reasons}. Salesforce Task already created.",
@@ -286,6 +255,11 @@ class PipelineLeakageAgent(AgentPlay):
                 }
             ))
 
+        # Rationales for all deals are fetched together; each deal's task and alert share one.
+        for i, rationale in enumerate(self.generate_rationale_results(contexts)):
+            actions[2 * i].set_rationale(rationale)
+            actions[2 * i + 1].set_rationale(rationale)
+
         # Sort actions by impact score descending
         actions.sort(key=lambda x: x.impact_score, reverse=True)
         return actions
\ No newline at end of file
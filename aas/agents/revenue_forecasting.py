@@ -4,11 +4,13 @@ from __future__ import annotations
 
 import os
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Sequence, Union
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
-from .base import AgentPlay
+from .base import AgentPlay, InvalidParams, int_param
+from ..analytics.monte_carlo import DEFAULT_SCENARIOS, close_in_window_probability, simulate_revenue
 from ..models.action import Action
 from ..utils.logger import get_logger
 
@@ -25,6 +27,9 @@ class RevenueForecastingAgent(AgentPlay):
     4. Identifies shortfalls and recommends proactive actions
     """
 
+    OPEN_STAGES = ["Prospecting", "Qualification", "Proposal", "Negotiation"]
+    SWEEP_AXES = ("target_revenue", "forecast_period_days", "win_rate")
+
     def __init__(self):
         self.params = {}
         self.target_revenue = None
@@ -53,39 +58,9 @@ class RevenueForecastingAgent(AgentPlay):
 
     def _generate_mock_data(self) -> pd.DataFrame:
         """Generate realistic mock deal data for demo purposes."""
-        import random
-        from datetime import datetime, timedelta
-        
-        stages = ["Prospecting", "Qualification", "Proposal", "Negotiation", "Closed Won", "Closed Lost"]
-        regions = ["North America", "EMEA", "APAC", "LATAM"]
-        segments = ["Enterprise", "Mid-Market", "SMB"]
-        
-        deals = []
-        base_date = datetime.now() - timedelta(days=180)
-        
-        for i in range(200):
-            close_date = base_date + timedelta(days=random.randint(0, 270))
-            stage = random.choice(stages)
-            
-            # Simulate realistic deal progression
-            if close_date < datetime.now() - timedelta(days=90):
-                stage = random.choice(["Closed Won", "Closed Lost"])
-            
-            deal = {
-                "opportunity_id": f"OPP-{1000 + i}",
-                "opportunity_name": f"Deal {i+1}",
-                "amount": random.randint(10, 500) * 1000,
-                "close_date": close_date.strftime("%Y-%m-%d"),
-                "stage": stage,
-                "probability": self._stage_to_probability(stage),
-                "region": random.choice(regions),
-                "segment": random.choice(segments),
-                "owner": f"Rep {random.randint(1, 10)}",
-                "created_date": (close_date - timedelta(days=random.randint(30, 120))).strftime("%Y-%m-%d"),
-            }
-            deals.append(deal)
+        from ..utils.synthetic_data import generate_deals
         
-        return pd.DataFrame(deals)
+        return generate_deals(int(self.params.get("mock_rows", 200)), seed=self.params.get("mock_seed"))
 
     def _stage_to_probability(self, stage: str) -> int:
         """Map stage to probability percentage."""
@@ -100,51 +75,45 @@ class RevenueForecastingAgent(AgentPlay):
         return stage_prob.get(stage, 50)
 
     def analyze(self, data: pd.DataFrame) -> Dict[str, Any]:
-        """Analyze pipeline health and forecast revenue."""
+        """Analyze pipeline health and forecast revenue.
+
+        All per-segment figures (pipeline, weighted pipeline, wins, losses and
+        deal velocity) come from a single grouped pass over the deals. Open
+        deals only count toward the forecast if they are expected to close by
+        the end of the forecast window (`forecast_period_days` from today).
+
+        Alongside the point estimate, a Monte Carlo simulation of the open
+        deals gives P10/P50/P90 window revenue per segment and region
+        (`simulation_scenarios` param, 0 to disable).
+        """
         if data is None or len(data) == 0:
             return {"error": "No data available for analysis"}
         
-        # Convert dates to datetime
-        data["close_date"] = pd.to_datetime(data["close_date"])
-        data["created_date"] = pd.to_datetime(data["created_date"])
-        
         # Set forecast parameters
+        period_days = self._period_days()
         today = datetime.now()
-        forecast_end = today + timedelta(days=self.forecast_period_days)
+        forecast_end = today + timedelta(days=period_days)
         
-        # Filter to relevant deals (open or recently closed)
-        pipeline = data[
-            (data["stage"].isin(["Prospecting", "Qualification", "Proposal", "Negotiation"])) |
-            ((data["stage"] == "Closed Won") & (data["close_date"] >= today - timedelta(days=180)))
-        ].copy()
+        deals = self._deal_measures(data, today, forecast_end)
         
-        # Calculate weighted pipeline (amount * probability)
-        pipeline["weighted_amount"] = pipeline["amount"] * pipeline["probability"] / 100
-        
-        # Forecast by segment
-        forecast_by_segment = pipeline.groupby("segment").agg({
-            "amount": "sum",
-            "weighted_amount": "sum",
-            "opportunity_id": "count"
-        }).rename(columns={"opportunity_id": "deal_count"})
+        # One grouped pass: every measure is a column, so a single sum per
+        # segment yields pipeline, win/loss and velocity figures together.
+        by_segment = deals.groupby(data["segment"].to_numpy(), sort=False, dropna=False).sum()
+        totals = by_segment.sum()
         
         # Calculate historical win rate
-        historical = data[data["stage"].isin(["Closed Won", "Closed Lost"])]
-        if len(historical) > 0:
-            win_rate = len(historical[historical["stage"] == "Closed Won"]) / len(historical)
-        else:
-            win_rate = 0.5  # Default assumption
+        num_closed = totals["won"] + totals["lost"]
+        win_rate = float(totals["won"] / num_closed) if num_closed > 0 else 0.5  # Default assumption
         
         # Calculate average deal velocity (days from created to close)
-        closed_won = data[data["stage"] == "Closed Won"].copy()
-        if len(closed_won) > 0:
-            closed_won["days_to_close"] = (closed_won["close_date"] - closed_won["created_date"]).dt.days
-            avg_velocity = closed_won["days_to_close"].mean()
+        if totals["velocity_count"] > 0:
+            avg_velocity = float(totals["velocity_days"] / totals["velocity_count"])
         else:
             avg_velocity = 60  # Default assumption
         
         # Forecast revenue (weighted pipeline * historical win rate)
-        forecasted_revenue = pipeline["weighted_amount"].sum() * win_rate
+        weighted_pipeline = float(totals["weighted_amount"])
+        forecasted_revenue = weighted_pipeline * win_rate
         
         # Get target from params or use default
         target_revenue = self.params.get("target_revenue", forecasted_revenue * 1.2)
@@ -153,6 +122,17 @@ class RevenueForecastingAgent(AgentPlay):
         shortfall = target_revenue - forecasted_revenue
         shortfall_pct = (shortfall / target_revenue * 100) if target_revenue > 0 else 0
         
+        # Forecast by segment (segments with deals in the forecast window)
+        in_window = by_segment[by_segment["deal_count"] > 0]
+        forecast_by_segment = {
+            segment: {
+                "amount": float(row.amount),
+                "weighted_amount": float(row.weighted_amount),
+                "deal_count": int(row.deal_count),
+            }
+            for segment, row in in_window.iterrows()
+        }
+        
         # Identify at-risk segments (below target)
         segment_targets = {
             "Enterprise": target_revenue * 0.5,
@@ -162,8 +142,8 @@ class RevenueForecastingAgent(AgentPlay):
         
         at_risk_segments = []
         for segment, target in segment_targets.items():
-            if segment in forecast_by_segment.index:
-                actual = forecast_by_segment.loc[segment, "weighted_amount"] * win_rate
+            if segment in forecast_by_segment:
+                actual = forecast_by_segment[segment]["weighted_amount"] * win_rate
                 if actual < target:
                     at_risk_segments.append({
                         "segment": segment,
@@ -172,24 +152,254 @@ class RevenueForecastingAgent(AgentPlay):
                         "gap": target - actual,
                     })
         
-        return {
-            "forecast_period_days": self.forecast_period_days,
+        distribution = self._simulate(data, today, period_days)
+        
+        open_deals = int(totals["deal_count"])
+        metrics = {
+            "forecasted_revenue": forecasted_revenue,
+            "target_revenue": target_revenue,
+            "shortfall": shortfall,
+            "win_rate": win_rate,
+            "avg_deal_velocity_days": avg_velocity,
+            "open_deals": open_deals,
+        }
+        if distribution:
+            metrics.update({
+                f"forecast_{key}": value
+                for key, value in distribution["total"].items()
+                if key != "expected"
+            })
+        summary = (
+            f"Forecasting ${forecasted_revenue:,.0f} over the next {period_days} days "
+            f"against a ${target_revenue:,.0f} target ({shortfall_pct:.1f}% shortfall) "
+            f"from {open_deals} deals at a {win_rate:.0%} win rate."
+        )
+        
+        analysis = {
+            "forecast_period_days": period_days,
+            "forecast_window": {
+                "start": today.date().isoformat(),
+                "end": forecast_end.date().isoformat(),
+            },
             "target_revenue": target_revenue,
             "forecasted_revenue": forecasted_revenue,
             "shortfall": shortfall,
             "shortfall_pct": shortfall_pct,
             "win_rate": win_rate,
             "avg_deal_velocity_days": avg_velocity,
-            "total_pipeline_value": pipeline["amount"].sum(),
-            "weighted_pipeline_value": pipeline["weighted_amount"].sum(),
-            "open_deals": len(pipeline),
+            "total_pipeline_value": float(totals["amount"]),
+            "weighted_pipeline_value": weighted_pipeline,
+            "open_deals": open_deals,
             "at_risk_segments": at_risk_segments,
-            "forecast_by_segment": forecast_by_segment.to_dict("index"),
+            "forecast_by_segment": forecast_by_segment,
+            "forecast_distribution": distribution,
+            "metrics": metrics,
+            "summary": summary,
         }
+        if self.params.get("sweep"):
+            analysis["sweep"] = self.sweep(data, **self._sweep_params(self.params["sweep"]))
+        return analysis
+
+    def _period_days(self) -> int:
+        """The `forecast_period_days` param (default `self.forecast_period_days`); raises `InvalidParams` unless >= 1."""
+        return int_param(self.params, "forecast_period_days", self.forecast_period_days, minimum=1)
+
+    def _sweep_params(self, sweep: Any) -> Dict[str, Any]:
+        """The `sweep` param as `sweep` keyword arguments; raises `InvalidParams` on anything else."""
+        if not isinstance(sweep, dict):
+            raise InvalidParams("sweep must be an object with target_revenue, forecast_period_days and/or win_rate")
+        unknown = sorted(set(sweep) - set(self.SWEEP_AXES))
+        if unknown:
+            raise InvalidParams(f"Unknown sweep keys: {', '.join(map(str, unknown))} (expected {', '.join(self.SWEEP_AXES)})")
+
+        kwargs = {}
+        for key in self.SWEEP_AXES:
+            if key not in sweep:
+                continue
+            value = sweep[key]
+            values = value if isinstance(value, (list, tuple)) else [value]
+            nullable = key != "forecast_period_days"
+            for v in values:
+                if (v is None and not nullable) or (v is not None and (isinstance(v, bool) or not isinstance(v, (int, float)))):
+                    raise InvalidParams(f"sweep.{key} must be a number or a list of numbers, got {v!r}")
+            kwargs[key] = value
+        return kwargs
+
+    def _deal_measures(self, data: pd.DataFrame, today: datetime, forecast_end: datetime) -> pd.DataFrame:
+        """Per-deal additive measures for the grouped forecast pass.
+
+        Builds a new numeric frame (the input is never modified) whose
+        columns can be summed per group:
+
+        * `amount`, `weighted_amount`, `deal_count`: deals counted in the
+          forecast — open deals closing by `forecast_end`, plus deals won in
+          the last 180 days.
+        * `won`, `lost`: closed deals, for the historical win rate.
+        * `velocity_days`, `velocity_count`: created-to-close days of won deals.
+        """
+        # Parse dates into local Series rather than writing them back: the
+        # input frame may be a shared snapshot used by concurrent runs.
+        close_date = pd.to_datetime(data["close_date"])
+        created_date = pd.to_datetime(data["created_date"])
+        stage = data["stage"]
+        amount = data["amount"].astype(float)
+        if "probability" in data.columns:
+            probability = data["probability"].astype(float)
+        else:
+            probability = stage.map(self._stage_to_probability).astype(float)
+
+        is_won = stage == "Closed Won"
+        is_lost = stage == "Closed Lost"
+        is_open = stage.isin(self.OPEN_STAGES)
+        in_forecast = (is_open & (close_date <= forecast_end)) | (
+            is_won & (close_date >= today - timedelta(days=180))
+        )
+
+        velocity = (close_date - created_date).dt.days.where(is_won)
+
+        return pd.DataFrame({
+            "amount": amount.where(in_forecast, 0.0),
+            # Calculate weighted pipeline (amount * probability)
+            "weighted_amount": (amount * probability / 100).where(in_forecast, 0.0),
+            "deal_count": in_forecast.astype(int),
+            "won": is_won.astype(int),
+            "lost": is_lost.astype(int),
+            "velocity_days": velocity.fillna(0.0),
+            "velocity_count": velocity.notna().astype(int),
+        })
+
+    def sweep(
+        self,
+        data: pd.DataFrame,
+        target_revenue: Union[None, float, Sequence[Optional[float]]] = None,
+        forecast_period_days: Union[None, int, Sequence[int]] = None,
+        win_rate: Union[None, float, Sequence[Optional[float]]] = None,
+    ) -> Dict[str, Any]:
+        """Evaluate a grid of what-if forecasts in one vectorized pass.
+
+        Every combination of target, horizon and win rate gives the same
+        figures `analyze` would return for those params, but the deals are
+        scanned once: open deals are bucketed against all horizons at once and
+        targets and win rates are broadcast over the result.
+
+        Args:
+            data: Deal rows, as passed to `analyze`.
+            target_revenue: Target(s); `None` entries use the default target
+                (120% of the forecast), as in `analyze`.
+            forecast_period_days: Horizon(s) in days.
+            win_rate: Win-rate override(s); `None` entries use the historical
+                win rate.
+
+        Returns:
+            Dict with the resolved `axes` and `[target][horizon][win_rate]`
+            matrices of `shortfall`, `shortfall_pct` and `target_revenue`, plus
+            `[horizon][win_rate]` `forecasted_revenue` and per-horizon
+            pipeline figures (overall and by segment).
+        """
+        def axis(values: Any, default: Any) -> list:
+            if values is None:
+                return [default]
+            return list(values) if isinstance(values, (list, tuple)) else [values]
+
+        targets = axis(target_revenue, self.params.get("target_revenue"))
+        horizons = [int(h) for h in axis(forecast_period_days, self._period_days())]
+        today = datetime.now()
+
+        close_date = pd.to_datetime(data["close_date"])
+        stage = data["stage"]
+        amount = data["amount"].to_numpy(dtype=float)
+        if "probability" in data.columns:
+            probability = data["probability"].to_numpy(dtype=float)
+        else:
+            probability = stage.map(self._stage_to_probability).to_numpy(dtype=float)
+        weighted = amount * probability / 100
+
+        is_won = (stage == "Closed Won").to_numpy()
+        is_lost = (stage == "Closed Lost").to_numpy()
+        is_open = stage.isin(self.OPEN_STAGES).to_numpy()
+        recently_won = is_won & (close_date >= today - timedelta(days=180)).to_numpy()
+        num_closed = is_won.sum() + is_lost.sum()
+        historical_win_rate = float(is_won.sum() / num_closed) if num_closed > 0 else 0.5
+        rates = np.array([historical_win_rate if w is None else float(w) for w in axis(win_rate, None)])
+
+        # (deals × horizons) membership: the only horizon-dependent part.
+        ends = np.array([np.datetime64(today + timedelta(days=h)) for h in horizons], dtype="datetime64[ns]")
+        close = close_date.to_numpy(dtype="datetime64[ns]")
+        in_forecast = (is_open[:, None] & (close[:, None] <= ends[None, :])) | recently_won[:, None]
+
+        segments, segment_codes = np.unique(data["segment"].astype(str).to_numpy(), return_inverse=True)
+        by_segment = np.zeros((len(segments), len(horizons)))
+        np.add.at(by_segment, segment_codes, weighted[:, None] * in_forecast)
+
+        weighted_pipeline = by_segment.sum(axis=0)                       # [h]
+        forecasted = weighted_pipeline[:, None] * rates[None, :]         # [h][w]
+        target = np.array([np.nan if t is None else float(t) for t in targets])
+        target = np.where(np.isnan(target)[:, None, None], forecasted[None] * 1.2, target[:, None, None])
+        shortfall = target - forecasted[None]                            # [t][h][w]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shortfall_pct = np.where(target > 0, shortfall / target * 100, 0.0)
+
+        return {
+            "axes": {
+                "target_revenue": targets,
+                "forecast_period_days": horizons,
+                "win_rate": rates.tolist(),
+            },
+            "historical_win_rate": historical_win_rate,
+            "weighted_pipeline": weighted_pipeline.tolist(),
+            "open_deals": (in_forecast.sum(axis=0)).tolist(),
+            "weighted_by_segment": dict(zip(segments.tolist(), by_segment.tolist())),
+            "forecasted_revenue": forecasted.tolist(),
+            "target_revenue": target.tolist(),
+            "shortfall": shortfall.tolist(),
+            "shortfall_pct": shortfall_pct.tolist(),
+        }
+
+    def _simulate(self, data: pd.DataFrame, today: datetime, period_days: int) -> Dict[str, Any]:
+        """Monte Carlo distribution of revenue from open deals closing in the window.
+
+        Each open deal is won with its stage probability and closes inside the
+        window with the probability given by the sales-cycle distribution of
+        historical won deals (see `aas.analytics.monte_carlo`).
+        """
+        n_scenarios = int(self.params.get("simulation_scenarios", DEFAULT_SCENARIOS))
+        if n_scenarios <= 0:
+            return {}
+
+        close_date = pd.to_datetime(data["close_date"])
+        created_date = pd.to_datetime(data["created_date"])
+        stage = data["stage"]
+        if "probability" in data.columns:
+            probability = data["probability"].astype(float)
+        else:
+            probability = stage.map(self._stage_to_probability).astype(float)
+
+        # Region is optional in deal exports; group those deals as "Unknown".
+        region = data["region"] if "region" in data.columns else pd.Series("Unknown", index=data.index)
+
+        is_won = stage == "Closed Won"
+        is_open = stage.isin(self.OPEN_STAGES).to_numpy()
+        velocity = (close_date - created_date).dt.days[is_won].to_numpy()
+        in_window = close_in_window_probability(
+            age_days=(today - created_date).dt.days.to_numpy()[is_open],
+            days_to_close=(close_date - today).dt.days.to_numpy()[is_open],
+            window_days=period_days,
+            velocity_days=velocity,
+        )
+
+        return simulate_revenue(
+            amount=data["amount"].to_numpy(dtype=float)[is_open],
+            probability=probability.to_numpy()[is_open] / 100 * in_window,
+            segment=data["segment"].to_numpy()[is_open],
+            region=region.to_numpy()[is_open],
+            n_scenarios=n_scenarios,
+            seed=self.params.get("simulation_seed"),
+        )
 
     def recommend_actions(self, analysis: Dict[str, Any]) -> List[Action]:
         """Generate recommended actions based on revenue forecast."""
         actions = []
+        contexts = []
         
         shortfall = analysis.get("shortfall", 0)
         shortfall_pct = analysis.get("shortfall_pct", 0)
@@ -199,6 +409,7 @@ class RevenueForecastingAgent(AgentPlay):
         if shortfall > 0 and shortfall_pct > 10:
             context = f"Revenue forecast shows ${shortfall:,.0f} shortfall ({shortfall_pct:.1f}% below target). " \
                      f"Win rate: {analysis.get('win_rate', 0):.1%}, Avg velocity: {analysis.get('avg_deal_velocity_days', 0):.0f} days."
+            contexts.append(context)
             
             actions.append(Action(
                 type="budget_reallocation",
@@ -213,7 +424,6 @@ class RevenueForecastingAgent(AgentPlay):
                     "target_revenue": analysis.get("target_revenue", 0),
                     "forecasted_revenue": analysis.get("forecasted_revenue", 0),
                 },
-                reasoning=self.generate_rationale(context),
             ))
         
         # Action 2: Targeted outreach for at-risk segments
@@ -223,6 +433,7 @@ class RevenueForecastingAgent(AgentPlay):
             
             context = f"{segment} segment is ${gap:,.0f} below target. " \
                      f"Current forecast: ${segment_data['forecast']:,.0f}, Target: ${segment_data['target']:,.0f}."
+            contexts.append(context)
             
             actions.append(Action(
                 type="targeted_outreach",
@@ -237,7 +448,6 @@ class RevenueForecastingAgent(AgentPlay):
                     "target": segment_data["target"],
                     "forecast": segment_data["forecast"],
                 },
-                reasoning=self.generate_rationale(context),
             ))
         
         # Action 3: If velocity is slow, recommend process improvement
@@ -245,6 +455,7 @@ class RevenueForecastingAgent(AgentPlay):
         if avg_velocity > 90:
             context = f"Average deal velocity is {avg_velocity:.0f} days, which is above industry benchmark. " \
                      f"Slow velocity impacts revenue realization."
+            contexts.append(context)
             
             actions.append(Action(
                 type="process_improvement",
@@ -257,7 +468,6 @@ class RevenueForecastingAgent(AgentPlay):
                     "avg_velocity_days": avg_velocity,
                     "target_velocity_days": 60,
                 },
-                reasoning=self.generate_rationale(context),
             ))
         
         # Action 4: If win rate is low, recommend enablement
@@ -265,6 +475,7 @@ class RevenueForecastingAgent(AgentPlay):
         if win_rate < 0.4:
             context = f"Historical win rate is {win_rate:.1%}, below industry average. " \
                      f"Improving win rate by 10% could add ${analysis.get('weighted_pipeline_value', 0) * 0.1:,.0f} in revenue."
+            contexts.append(context)
             
             actions.append(Action(
                 type="sales_enablement",
@@ -278,8 +489,11 @@ class RevenueForecastingAgent(AgentPlay):
                     "target_win_rate": 0.5,
                     "potential_impact": analysis.get("weighted_pipeline_value", 0) * 0.1,
                 },
-                reasoning=self.generate_rationale(context),
             ))
         
+        # Fetch all rationales together rather than one blocking call per action.
+        for action, rationale in zip(actions, self.generate_rationale_results(contexts)):
+            action.set_rationale(rationale)
+
         logger.info(f"Generated {len(actions)} revenue forecasting actions")
         return actions
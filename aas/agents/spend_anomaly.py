@@ -1,76 +1,203 @@
-"""Spend Anomaly hero play implementation (stub).
+"""Spend Anomaly hero play implementation.
 
-Reuse pipeline data for now to simulate vendor/spend anomalies.
+Scores ledger transactions against trailing robust baselines per
+vendor / department / category (see `aas.analytics.spend`) and queues
+budget reviews for the largest anomalies.
 """
 from __future__ import annotations
 import datetime as _dt
-from typing import Any, Dict, List
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
 
-from .pipeline_leakage import PipelineLeakageAgent
+import pandas as pd  # type: ignore
+
+from .base import AgentPlay, float_param, int_param, resolve_data_path
+from ..analytics.spend import SPEND_COLUMNS, SpendDetectorConfig, score_transactions, summarize_anomalies
+from ..analytics.spend_stream import OnlineSpendScorer
 from ..models.action import Action
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-class SpendAnomalyAgent(PipelineLeakageAgent):
+SAMPLE_DATA_PATH = Path(__file__).parent.parent / "sample_data" / "spend_anomaly_data.csv"
+
+# Anomalies that get a review task and alert.
+MAX_ACTIONED_ANOMALIES = 5
+
+
+class SpendAnomalyAgent(AgentPlay):
     """Agent that identifies unusual spend patterns."""
 
-    def analyze(self, data: Any) -> Dict[str, Any]:
-        result = super().analyze(data)
-        
-        # Override visual context for this play
-        result["visual_context"] = {
-            "view_name": "Spend Anomaly",
-            "workbook": "Superstore",
-            "url": "https://10ax.online.tableau.com/#/site/agenticanalyticsstudio/views/Spend/Anomaly", # Placeholder
-            "note": "Embedded Spend Anomaly View"
+    # Override visual context for this play
+    visual_context = {
+        "view_name": "Spend Anomaly",
+        "workbook": "Superstore",
+        "url": "https://10ax.online.tableau.com/#/site/agenticanalyticsstudio/views/Spend/Anomaly", # Placeholder
+        "note": "Embedded Spend Anomaly View"
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.params: Dict[str, Any] = {}
+
+    def load_data(self) -> pd.DataFrame:
+        """Load transactions.
+
+        Preference order:
+        1) `params["data"]` (list of transaction dicts, for tests and API callers).
+        2) A CSV or Parquet ledger at `params["source_path"]` (inside the
+           data directory, see `resolve_data_path`).
+        3) The packaged sample ledger.
+
+        Only the columns the detector uses are read, with the key columns as
+        categoricals, to keep large ledgers compact in memory.
+        """
+        if "data" in self.params:
+            return pd.DataFrame(self.params["data"])
+
+        source_path = self.params.get("source_path")
+        path = resolve_data_path(source_path) if source_path else SAMPLE_DATA_PATH
+        if path.suffix.lower() in (".parquet", ".pq"):
+            frame = pd.read_parquet(path)
+            return frame[[c for c in SPEND_COLUMNS if c in frame.columns]]
+
+        header = pd.read_csv(path, nrows=0).columns
+        frame = pd.read_csv(
+            path,
+            usecols=[c for c in SPEND_COLUMNS if c in header],
+            dtype={"department": "category", "category": "category", "vendor": "category", "approver": "category"},
+        )
+        logger.info(f"Loaded {len(frame)} transactions from {path}")
+        return frame
+
+    def detector_config(self) -> SpendDetectorConfig:
+        """Detector settings, overridable through params; raises `InvalidParams` on unusable values."""
+        defaults = SpendDetectorConfig()
+        return SpendDetectorConfig(
+            window=int_param(self.params, "window", defaults.window, minimum=1),
+            min_history=int_param(self.params, "min_history", defaults.min_history, minimum=1),
+            threshold=float_param(self.params, "threshold", defaults.threshold, minimum=0),
+            min_scale_ratio=float_param(self.params, "min_scale_ratio", defaults.min_scale_ratio, minimum=0),
+        )
+
+    def analyze(self, data: pd.DataFrame) -> Dict[str, Any]:
+        """Flag transactions far above their vendor's (or category's) baseline.
+
+        Returns:
+            A dict with keys:
+            * `anomalies`: flagged transactions, highest robust z first.
+            * `by_department` / `by_vendor`: anomaly counts and excess spend.
+            * `metrics`: totals, anomaly count and excess spend.
+            * `narrative`: human-readable summary.
+        """
+        if data is None or len(data) == 0:
+            return {"anomalies": [], "metrics": {}, "narrative": "No data available.", "visual_context": self.visual_context}
+
+        config = self.detector_config()
+        top_n = int_param(self.params, "top_n", 20, minimum=0)
+        scores = score_transactions(data, config)
+        analysis = summarize_anomalies(data, scores, top_n=top_n)
+        analysis["visual_context"] = self.visual_context
+        return analysis
+
+    def ingest(self, transactions: Iterable[Dict[str, Any]], scorer: OnlineSpendScorer) -> Dict[str, Any]:
+        """Score newly posted transactions online and act only on anomalies.
+
+        Each transaction is scored in constant time against the scorer's
+        running baselines (see `aas.analytics.spend_stream`); the full ledger
+        is never re-analyzed. Actions are generated only for transactions
+        that trip the threshold.
+
+        Returns:
+            Dict with `scored`, `anomalies` (same shape as the batch
+            analysis), `actions` and the scorer's `state` counters.
+        """
+        results = scorer.score_batch(transactions)
+        anomalies = [
+            {
+                "transaction_id": str(r.get("transaction_id", "")),
+                "date": str(r.get("date", ""))[:10],
+                "vendor": r.get("vendor"),
+                "department": r.get("department"),
+                "category": r.get("category"),
+                "approver": r.get("approver"),
+                "amount": float(r["amount"]),
+                "baseline": float(r["baseline"]),
+                "excess": float(r["amount"]) - float(r["baseline"]),
+                "robust_z": round(float(r["robust_z"]), 2),
+                "baseline_level": r["baseline_level"],
+                "history": int(r["history"]),
+            }
+            for r in results
+            if r["is_anomaly"]
+        ]
+        anomalies.sort(key=lambda a: -a["robust_z"])
+        actions = self.recommend_actions({"anomalies": anomalies}) if anomalies else []
+        return {
+            "scored": len(results),
+            "anomalies": anomalies,
+            "actions": [a.to_dict() for a in actions],
+            "state": scorer.stats(),
         }
-        return result
 
     def recommend_actions(self, analysis: Dict[str, Any]) -> List[Action]:
         actions: List[Action] = []
-        for deal in analysis.get("at_risk_deals", []):
-            opp_id = deal.get("opportunity_id") or "unknown"
-            owner = deal.get("owner") or "finance manager"
-            score = deal.get("risk_score", 0)
-            amount = deal.get("amount") or 0
-            
-            # Simulate "Anomaly" by treating high risk deals as high variance spend
-            reasons = ", ".join(deal.get("reasons", []))
-            region = deal.get("region")
-            segment = deal.get("segment")
-            stage = deal.get("stage")
+        contexts: List[str] = []
+        for anomaly in analysis.get("anomalies", [])[:MAX_ACTIONED_ANOMALIES]:
+            txn_id = anomaly["transaction_id"]
+            vendor = anomaly["vendor"]
+            department = anomaly["department"]
+            approver = anomaly.get("approver")
+            owner = approver if pd.notna(approver) and approver else "finance manager"
+            amount = anomaly["amount"]
+            baseline = anomaly["baseline"]
+            z = anomaly["robust_z"]
+            excess = anomaly["excess"]
+
+            context = (
+                f"Spend anomaly: {vendor} charged ${amount:,.0f} to {department} on {anomaly['date']} "
+                f"vs a typical ${baseline:,.0f} (robust z {z}, ${excess:,.0f} above baseline)."
+            )
+            metadata = {
+                "transaction_id": txn_id,
+                "vendor": vendor,
+                "department": department,
+                "category": anomaly["category"],
+                "amount": amount,
+                "baseline": baseline,
+                "robust_z": z,
+                "owner": owner,
+            }
+
+            contexts.append(context)
 
             # 1) Contract Review Task
             actions.append(Action(
                 type="salesforce_task",
-                title=f"Review Vendor Contract: {opp_id}",
-                description=f"Investigate spend variance for vendor {opp_id}. Amount: ${amount}. Score: {score}.",
-                priority="high" if score > 80 else "medium",
+                title=f"Review Vendor Spend: {vendor} (${amount:,.0f})",
+                description=f"Investigate {txn_id}: ${amount:,.0f} vs ${baseline:,.0f} typical for {vendor} in {department}.",
+                priority="high" if z >= 10 else "medium",
+                impact_score=float(max(excess, 0)),
                 metadata={
-                    "opportunity_id": opp_id,
-                    "subject": f"Vendor Spend Review: {opp_id}",
-                    "owner": owner,
-                    "region": region,
-                    "segment": segment,
-                    "stage": stage,
+                    **metadata,
+                    "subject": f"Vendor Spend Review: {vendor}",
                     "due_date": (_dt.date.today() + _dt.timedelta(days=3)).isoformat()
                 }
             ))
-            
+
             # 2) Slack Alert
             actions.append(Action(
                 type="slack_message",
-                title=f"Spend Alert: {opp_id}",
-                description=f"Automated alert for unusual spend pattern on {opp_id}.",
+                title=f"Spend Alert: {vendor}",
+                description=f"Automated alert for unusual spend on {txn_id}.",
                 priority="medium",
                 metadata={
+                    **metadata,
                     "channel": "finance-alerts",
-                    "text": f"💸 Spend Anomaly detected for {opp_id}. Amount: ${amount}. Variance Score: {score}. Please investigate.",
-                    "opportunity_id": opp_id,
-                    "region": region,
-                    "segment": segment,
-                    "stage": stage,
+                    "text": f"💸 Spend Anomaly: {vendor} charged ${amount:,.0f} to {department} (typical ${baseline:,.0f}, z={z}). Please investigate.",
                 }
             ))
-        return actions
\ No newline at end of file
+        # Fetch every rationale together; the task of each pair carries it.
+        for i, rationale in enumerate(self.generate_rationale_results(contexts)):
+            actions[2 * i].set_rationale(rationale)
+        return actions
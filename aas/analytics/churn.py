@@ -0,0 +1,345 @@
+"""
+Churn Risk Scoring
+
+Scores customer accounts for churn risk from their health signals and reduces
+the scored rows to the churn play's analysis. Scoring is a handful of
+vectorized column operations; the reduction is a mergeable `Aggregator`, so
+in-memory, sharded and chunked runs (millions of accounts streamed from
+`aas_customers`) share one code path and return the same result.
+
+The 0-100 churn risk is a sum of capped components:
+
+    account health     (100 - account_health_score) × 0.30    max 30
+    usage trend        declining 15, stable 5, growing 0       max 15
+    NPS                detractors, (7 - nps) / 7 × 15          max 15
+    support tickets    tickets in 30 days, 1 pt each           max 10
+    last login         days since last login / 2               max 15
+    payment delays     5 pts per delay                         max 15
+
+Missing signal columns contribute nothing.
+"""
+
+from __future__ import annotations
+
+import datetime as _dt
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+from .pipeline_risk import ExactSum, _top_k
+from .sharding import Aggregator
+
+TOP_K = 5
+AT_RISK_THRESHOLD = 50
+HIGH_RISK_THRESHOLD = 70
+RENEWAL_WINDOW_DAYS = 90
+# Assumption: a retention play saves about half of the at-risk MRR.
+RETENTION_SAVE_RATE = 0.5
+
+USAGE_TREND_POINTS = {"declining": 15.0, "stable": 5.0, "growing": 0.0}
+
+# component -> (source column, cap)
+RISK_COMPONENTS: Dict[str, Tuple[str, float]] = {
+    "low_health_score": ("account_health_score", 30.0),
+    "declining_usage": ("usage_trend", 15.0),
+    "low_nps": ("nps_score", 15.0),
+    "support_tickets": ("support_tickets_30d", 10.0),
+    "inactive_logins": ("last_login_days", 15.0),
+    "payment_delays": ("payment_delays", 15.0),
+}
+
+CUSTOMER_COLUMNS = [
+    "customer_id", "name", "mrr", "contract_end_date", "support_tickets_30d", "nps_score",
+    "usage_trend", "last_login_days", "payment_delays", "account_health_score",
+]
+
+AT_RISK_COLUMNS = [
+    "customer_id", "name", "mrr", "contract_end_date", "usage_trend", "nps_score",
+    "support_tickets_30d", "last_login_days", "payment_delays", "account_health_score",
+]
+
+_CAPS = np.array([cap for _, cap in RISK_COMPONENTS.values()])
+
+DEFAULT_VISUAL_CONTEXT = {
+    "view_name": "Churn Rescue",
+    "workbook": "Superstore",
+    "url": "https://10ax.online.tableau.com/#/site/agenticanalyticsstudio/views/Churn/Rescue",
+    "note": "Embedded Churn Rescue View"
+}
+
+
+def _numeric(data: pd.DataFrame, col: str) -> Optional[np.ndarray]:
+    """``data[col]`` as float64 (NaN for blanks), or ``None`` if absent."""
+    if col not in data.columns:
+        return None
+    return pd.to_numeric(data[col], errors="coerce").to_numpy(dtype=float)
+
+
+def risk_components(data: pd.DataFrame) -> np.ndarray:
+    """
+    Per-account risk points for each of `RISK_COMPONENTS`.
+
+    Returns:
+        Array of shape ``(len(data), len(RISK_COMPONENTS))``; columns follow
+        the order of `RISK_COMPONENTS`.
+    """
+    n = len(data)
+    points = np.zeros((n, len(RISK_COMPONENTS)))
+
+    health = _numeric(data, "account_health_score")
+    if health is not None:
+        points[:, 0] = np.nan_to_num((100 - health) * 0.30)
+    if "usage_trend" in data.columns:
+        # Map the few distinct labels, not every row; code -1 (missing) maps to the trailing 0.
+        codes, labels = pd.factorize(data["usage_trend"])
+        lookup = [USAGE_TREND_POINTS.get(str(label).lower(), 0.0) for label in labels]
+        points[:, 1] = np.asarray(lookup + [0.0])[codes]
+    nps = _numeric(data, "nps_score")
+    if nps is not None:
+        points[:, 2] = np.nan_to_num((7 - nps) / 7 * 15)
+    tickets = _numeric(data, "support_tickets_30d")
+    if tickets is not None:
+        points[:, 3] = np.nan_to_num(tickets)
+    login = _numeric(data, "last_login_days")
+    if login is not None:
+        points[:, 4] = np.nan_to_num(login / 2)
+    delays = _numeric(data, "payment_delays")
+    if delays is not None:
+        points[:, 5] = np.nan_to_num(delays * 5)
+
+    return np.clip(points, 0, _CAPS)
+
+
+def primary_drivers(components: np.ndarray) -> np.ndarray:
+    """Index of each account's leading component, relative to its cap."""
+    return (components / _CAPS).argmax(axis=1)
+
+
+@dataclass
+class ChurnScores:
+    """Per-account scores, aligned to the scored frame."""
+
+    churn_risk: np.ndarray
+    components: np.ndarray
+    mrr: np.ndarray
+    days_to_renewal: Optional[np.ndarray] = None
+
+
+def score_customers(data: pd.DataFrame, today: _dt.date) -> ChurnScores:
+    """
+    Compute the 0-100 churn risk for every account.
+
+    The input frame is never modified.
+    """
+    components = risk_components(data)
+    mrr = _numeric(data, "mrr")
+    days_to_renewal = None
+    if "contract_end_date" in data.columns:
+        end = pd.to_datetime(data["contract_end_date"], errors="coerce")
+        days_to_renewal = (end - pd.Timestamp(today)).dt.days.to_numpy(dtype=float)
+    return ChurnScores(
+        churn_risk=components.sum(axis=1).round(1),
+        components=components,
+        mrr=np.zeros(len(data)) if mrr is None else np.nan_to_num(mrr),
+        days_to_renewal=days_to_renewal,
+    )
+
+
+def _signal(row: pd.Series, column: str) -> Optional[float]:
+    """`row[column]` as a float, or None when absent or missing (None, NaN, pd.NA)."""
+    value = row.get(column)
+    return None if value is None or pd.isna(value) else float(value)
+
+
+def churn_reasons(row: pd.Series, days_to_renewal: Optional[float]) -> List[str]:
+    """Human-readable churn reasons for a single scored account.
+
+    Missing signals (e.g. NA in the nullable integer columns) give no reason.
+    """
+    reasons: List[str] = []
+    health = _signal(row, "account_health_score")
+    if health is not None and health < 50:
+        reasons.append(f"Health score {int(health)}")
+    if str(row.get("usage_trend", "")).lower() == "declining":
+        reasons.append("Usage declining")
+    nps = _signal(row, "nps_score")
+    if nps is not None and nps <= 6:
+        reasons.append(f"NPS detractor ({int(nps)})")
+    tickets = _signal(row, "support_tickets_30d")
+    if tickets is not None and tickets >= 5:
+        reasons.append(f"{int(tickets)} support tickets in 30 days")
+    last_login = _signal(row, "last_login_days")
+    if last_login is not None and last_login >= 14:
+        reasons.append(f"No login in {int(last_login)} days")
+    delays = _signal(row, "payment_delays")
+    if delays is not None and delays > 0:
+        reasons.append(f"{int(delays)} late payments")
+    if days_to_renewal is not None and 0 <= days_to_renewal <= RENEWAL_WINDOW_DAYS:
+        reasons.append(f"Renewal in {int(days_to_renewal)} days")
+    return reasons
+
+
+@dataclass
+class ChurnRiskState:
+    """Partial aggregate of scored accounts."""
+
+    rows: int = 0
+    at_risk: int = 0
+    high_risk: int = 0
+    renewals_at_risk: int = 0
+    risk_sum: ExactSum = field(default_factory=ExactSum)
+    mrr_total: ExactSum = field(default_factory=ExactSum)
+    mrr_at_risk: ExactSum = field(default_factory=ExactSum)
+    driver_counts: Dict[str, int] = field(default_factory=dict)  # primary driver -> at-risk accounts
+    driver_mrr: Dict[str, ExactSum] = field(default_factory=dict)
+    top: List[Tuple[float, int, Dict[str, Any]]] = field(default_factory=list)  # (mrr at risk, pos, record)
+
+
+class ChurnRiskAggregator(Aggregator):
+    """Mergeable reduction behind the churn play's `analyze()`."""
+
+    def __init__(
+        self,
+        today: Optional[_dt.date] = None,
+        top_k: int = TOP_K,
+        threshold: float = AT_RISK_THRESHOLD,
+        visual_context: Optional[Dict[str, Any]] = None,
+    ):
+        # Pin "today" once so every shard/chunk scores against the same date.
+        self.today = today or _dt.date.today()
+        self.top_k = top_k
+        self.threshold = threshold
+        self.visual_context = visual_context or DEFAULT_VISUAL_CONTEXT
+
+    def partial(self, frame: pd.DataFrame, positions: Optional[np.ndarray] = None) -> ChurnRiskState:
+        state = ChurnRiskState(rows=len(frame))
+        if frame.empty:
+            return state
+        if positions is None:
+            positions = np.arange(len(frame), dtype=np.int64)
+
+        scores = score_customers(frame, self.today)
+        risk = scores.churn_risk
+        at_risk = risk >= self.threshold
+        exposure = scores.mrr * risk / 100
+
+        state.at_risk = int(at_risk.sum())
+        state.high_risk = int((risk >= HIGH_RISK_THRESHOLD).sum())
+        state.risk_sum = ExactSum.of(risk)
+        state.mrr_total = ExactSum.of(scores.mrr)
+        state.mrr_at_risk = ExactSum.of(scores.mrr[at_risk])
+        if scores.days_to_renewal is not None:
+            renewing = (scores.days_to_renewal >= 0) & (scores.days_to_renewal <= RENEWAL_WINDOW_DAYS)
+            state.renewals_at_risk = int((at_risk & renewing).sum())
+
+        if state.at_risk:
+            names = list(RISK_COMPONENTS)
+            primary = primary_drivers(scores.components[at_risk])
+            mrr = scores.mrr[at_risk]
+            for code in np.unique(primary):
+                mask = primary == code
+                state.driver_counts[names[code]] = int(mask.sum())
+                state.driver_mrr[names[code]] = ExactSum.of(mrr[mask])
+
+        state.top = self._top_records(frame, scores, np.where(at_risk, exposure, -np.inf), positions)
+        return state
+
+    def _top_records(
+        self,
+        frame: pd.DataFrame,
+        scores: ChurnScores,
+        exposure: np.ndarray,
+        positions: np.ndarray,
+    ) -> List[Tuple[float, int, Dict[str, Any]]]:
+        """Materialise records for this slice's top-K at-risk accounts only."""
+        candidates = np.flatnonzero(np.isfinite(exposure))
+        if not len(candidates):
+            return []
+        order = np.lexsort((positions[candidates], -exposure[candidates]))
+        top_local = candidates[order][: self.top_k]
+
+        names = list(RISK_COMPONENTS)
+        drivers = primary_drivers(scores.components[top_local])
+        cols = [c for c in AT_RISK_COLUMNS if c in frame.columns]
+        rows = frame.iloc[top_local][cols]
+        records = []
+        for i, driver, (_, row) in zip(top_local, drivers, rows.iterrows()):
+            days = scores.days_to_renewal[i] if scores.days_to_renewal is not None else None
+            days = None if days is None or np.isnan(days) else float(days)
+            record = {k: (v.item() if isinstance(v, np.generic) else v) for k, v in row.items()}
+            if "contract_end_date" in record:
+                record["contract_end_date"] = str(record["contract_end_date"])[:10]
+            record.update({
+                "mrr": float(scores.mrr[i]),
+                "churn_risk": float(scores.churn_risk[i]),
+                "mrr_at_risk": float(exposure[i]),
+                "days_to_renewal": None if days is None else int(days),
+                "primary_driver": names[int(driver)],
+                "reasons": churn_reasons(row, days),
+            })
+            records.append((float(exposure[i]), int(positions[i]), record))
+        return records
+
+    def merge(self, states: Sequence[ChurnRiskState]) -> ChurnRiskState:
+        merged = ChurnRiskState()
+        for state in states:
+            merged.rows += state.rows
+            merged.at_risk += state.at_risk
+            merged.high_risk += state.high_risk
+            merged.renewals_at_risk += state.renewals_at_risk
+            merged.risk_sum += state.risk_sum
+            merged.mrr_total += state.mrr_total
+            merged.mrr_at_risk += state.mrr_at_risk
+            for driver, count in state.driver_counts.items():
+                merged.driver_counts[driver] = merged.driver_counts.get(driver, 0) + count
+                merged.driver_mrr[driver] = merged.driver_mrr.get(driver, ExactSum()) + state.driver_mrr[driver]
+            merged.top = _top_k(merged.top + state.top, self.top_k)
+        return merged
+
+    def finalize(self, state: ChurnRiskState) -> Dict[str, Any]:
+        if state.rows == 0:
+            return {
+                "at_risk_customers": [],
+                "risk_drivers": {},
+                "narrative": "No data available."
+            }
+
+        mrr_at_risk = float(state.mrr_at_risk)
+        mrr_total = float(state.mrr_total)
+        metrics = {
+            "customers_scored": state.rows,
+            "at_risk_customers": state.at_risk,
+            "high_risk_customers": state.high_risk,
+            "renewals_at_risk": state.renewals_at_risk,
+            "avg_churn_risk": round(float(state.risk_sum) / state.rows, 1),
+            "mrr_at_risk": mrr_at_risk,
+            "mrr_at_risk_pct": round(mrr_at_risk / mrr_total * 100, 1) if mrr_total else 0.0,
+            "expected_mrr_retained": mrr_at_risk * RETENTION_SAVE_RATE,
+        }
+
+        order = list(RISK_COMPONENTS)
+        drivers = sorted(state.driver_counts, key=lambda d: (-state.driver_counts[d], order.index(d)))
+        risk_drivers = {
+            d: {"customers": state.driver_counts[d], "mrr": float(state.driver_mrr[d])} for d in drivers
+        }
+
+        at_risk_list = [record for _, _, record in state.top]
+        if state.at_risk:
+            narrative = (
+                f"{state.at_risk} of {state.rows} customers are at risk of churning, "
+                f"${mrr_at_risk:,.0f} MRR ({metrics['mrr_at_risk_pct']}%). "
+                f"{state.renewals_at_risk} renew within {RENEWAL_WINDOW_DAYS} days. "
+                f"Leading driver: {drivers[0].replace('_', ' ')}."
+            )
+        else:
+            narrative = f"No churn-risk customers among {state.rows} accounts."
+
+        return {
+            "at_risk_customers": at_risk_list,
+            "risk_drivers": risk_drivers,
+            "narrative": narrative,
+            "metrics": metrics,
+            "visual_context": dict(self.visual_context),
+        }
@@ -0,0 +1,103 @@
+"""
+Per-Opportunity Findings
+
+Turns scored opportunities into `aas_findings` rows, so a run keeps every
+deal's risk score and main driver, not only the top deals that become
+actions. Dashboards and later plays can read these instead of re-scoring.
+
+Rows are built a batch at a time with vectorized pandas / NumPy calls and
+bulk-loaded with `aas.db.copy_frame`.
+"""
+
+from __future__ import annotations
+
+import datetime as _dt
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+from .pipeline_risk import score_opportunities
+
+FINDING_COLUMNS = [
+    "finding_id",
+    "run_id",
+    "opportunity_id",
+    "risk_score",
+    "risk_driver",
+    "details",
+    "created_at",
+]
+
+# Score components, in tie-break order, named as stored in `risk_driver`.
+RISK_DRIVERS = ["stage_age", "no_recent_touch", "close_slipped"]
+NO_DRIVER = "none"
+
+DETAIL_COLUMNS = ["owner", "region", "segment", "stage", "amount", "stage_age"]
+
+
+def risk_points(data: pd.DataFrame, today: _dt.date) -> np.ndarray:
+    """Points per `RISK_DRIVERS` component, one row per opportunity.
+
+    Rows sum to the unclipped score of `score_opportunities`.
+    """
+    scores = score_opportunities(data, today)
+    points = np.zeros((len(data), len(RISK_DRIVERS)))
+    if scores.stage_age is not None:
+        points[:, 0] = scores.stage_age.fillna(0).clip(0, 40).to_numpy(dtype=float)
+    if scores.days_since_touch is not None:
+        points[:, 1] = ((scores.days_since_touch - 7).clip(0) * 2).clip(0, 30).to_numpy(dtype=float)
+    if scores.close_slipped is not None:
+        points[:, 2] = scores.close_slipped.to_numpy(dtype=float) * 30.0
+    return points
+
+
+def opportunity_findings(
+    data: pd.DataFrame,
+    run_id: str,
+    created_at: str,
+    today: _dt.date,
+    offset: int = 0,
+) -> pd.DataFrame:
+    """Build `aas_findings` rows for one batch of opportunities.
+
+    Args:
+        data: Opportunity records (as for the pipeline play).
+        run_id: Run the findings belong to.
+        created_at: ISO timestamp stored on every row.
+        today: Scoring date; pin it once per run.
+        offset: Position of the batch's first row in the run, so
+            `finding_id` (`<run_id>-<position>`) stays unique across batches.
+
+    Returns:
+        A frame with `FINDING_COLUMNS`; `details` holds a JSON object with the
+        deal's context and score components.
+    """
+    n = len(data)
+    if n == 0:
+        return pd.DataFrame(columns=FINDING_COLUMNS)
+
+    points = risk_points(data, today)
+    total = points.sum(axis=1)
+    drivers = np.asarray(RISK_DRIVERS, dtype=object)[points.argmax(axis=1)]
+    drivers[total == 0] = NO_DRIVER
+
+    details: Dict[str, Any] = {c: data[c].to_numpy() for c in DETAIL_COLUMNS if c in data.columns}
+    for i, name in enumerate(RISK_DRIVERS):
+        details[f"{name}_points"] = points[:, i]
+    detail_json = pd.DataFrame(details).to_json(orient="records", lines=True).splitlines()
+
+    if "opportunity_id" in data.columns:
+        opportunity_id = data["opportunity_id"].to_numpy()
+    else:
+        opportunity_id = np.full(n, None, dtype=object)
+
+    return pd.DataFrame({
+        "finding_id": f"{run_id}-" + pd.Series(np.arange(offset, offset + n)).astype(str),
+        "run_id": run_id,
+        "opportunity_id": opportunity_id,
+        "risk_score": np.round(total.clip(0, 100), 3),
+        "risk_driver": drivers,
+        "details": detail_json,
+        "created_at": created_at,
+    })
@@ -0,0 +1,272 @@
+"""
+Forecast Cube
+
+Materialized revenue measures at every combination of segment, region, owner,
+close week and close month. Slices and rollups (e.g. "Enterprise by owner for
+Q1", "EMEA by month") are answered by summing cube cells instead of
+re-running the revenue analysis over every deal.
+
+The cube keeps a ledger of each deal's contribution keyed by
+`opportunity_id`, so when a deal changes only its old contribution is
+subtracted and the new one added; nothing else is rescanned.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+DIMENSIONS = ("segment", "region", "owner", "close_week", "close_month")
+
+MEASURES = (
+    "deal_count",
+    "open_count",
+    "pipeline_amount",
+    "weighted_amount",
+    "won_count",
+    "won_amount",
+    "lost_count",
+    "velocity_days",
+    "velocity_count",
+)
+
+REQUIRED_COLUMNS = ("opportunity_id", "amount", "stage", "close_date")
+
+OPEN_STAGES = ["Prospecting", "Qualification", "Proposal", "Negotiation"]
+
+STAGE_PROBABILITY = {
+    "Prospecting": 10,
+    "Qualification": 25,
+    "Proposal": 50,
+    "Negotiation": 75,
+    "Closed Won": 100,
+    "Closed Lost": 0,
+}
+
+# Win rate assumed for slices with no closed deals (as in the revenue play).
+DEFAULT_WIN_RATE = 0.5
+
+
+def deal_contributions(deals: pd.DataFrame, open_stages: Sequence[str] = OPEN_STAGES) -> pd.DataFrame:
+    """
+    Per-deal cube coordinates and additive measures.
+
+    Args:
+        deals: Deal rows with `opportunity_id`, `amount`, `stage`, `close_date`
+            and optionally `probability`, `created_date`, `segment`, `region`
+            and `owner`.
+        open_stages: Stages counted as open pipeline.
+
+    Returns:
+        Frame indexed by `opportunity_id` with the `DIMENSIONS` and `MEASURES`
+        columns. Duplicate ids keep their last row.
+
+    Raises:
+        ValueError: If a required column is missing.
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in deals.columns]
+    if missing:
+        raise ValueError(f"Deals are missing required column(s): {missing}")
+    deals = deals.drop_duplicates("opportunity_id", keep="last")
+    index = pd.Index(deals["opportunity_id"].astype(str), name="opportunity_id")
+
+    def column(name: str) -> pd.Series:
+        if name in deals.columns:
+            return deals[name].fillna("Unknown").astype(str)
+        return pd.Series("Unknown", index=deals.index)
+
+    close_date = pd.to_datetime(deals["close_date"])
+    stage = deals["stage"]
+    amount = deals["amount"].astype(float).fillna(0.0)
+    if "probability" in deals.columns:
+        probability = deals["probability"].astype(float)
+    else:
+        probability = stage.map(STAGE_PROBABILITY).fillna(50).astype(float)
+
+    is_open = stage.isin(open_stages)
+    is_won = stage == "Closed Won"
+    is_lost = stage == "Closed Lost"
+    if "created_date" in deals.columns:
+        velocity = (close_date - pd.to_datetime(deals["created_date"])).dt.days.where(is_won)
+    else:
+        velocity = pd.Series(np.nan, index=deals.index)
+
+    week_start = close_date.dt.normalize() - pd.to_timedelta(close_date.dt.weekday, unit="D")
+    frame = pd.DataFrame({
+        "segment": column("segment"),
+        "region": column("region"),
+        "owner": column("owner"),
+        "close_week": week_start.dt.strftime("%Y-%m-%d").fillna("Unknown"),
+        "close_month": close_date.dt.strftime("%Y-%m").fillna("Unknown"),
+        "deal_count": 1,
+        "open_count": is_open.astype(int),
+        "pipeline_amount": amount.where(is_open, 0.0),
+        "weighted_amount": (amount * probability / 100).where(is_open, 0.0),
+        "won_count": is_won.astype(int),
+        "won_amount": amount.where(is_won, 0.0),
+        "lost_count": is_lost.astype(int),
+        "velocity_days": velocity.fillna(0.0),
+        "velocity_count": velocity.notna().astype(int),
+    })
+    frame.index = index
+    return frame
+
+
+def _derived(row: Dict[str, Any], fallback_win_rate: float) -> Dict[str, Any]:
+    """Add ratio measures that cannot be summed across cells."""
+    closed = row["won_count"] + row["lost_count"]
+    win_rate = row["won_count"] / closed if closed else fallback_win_rate
+    row["win_rate"] = float(win_rate)
+    row["avg_velocity_days"] = (
+        float(row["velocity_days"] / row["velocity_count"]) if row["velocity_count"] else None
+    )
+    row["forecasted_revenue"] = float(row["weighted_amount"] * win_rate)
+    return row
+
+
+class ForecastCube:
+    """
+    Incrementally maintained segment × region × owner × week × month cube.
+
+    Usage:
+        cube = ForecastCube.from_deals(deals)
+        cube.query(group_by=["segment"], filters={"close_month": {"from": "2026-01", "to": "2026-03"}})
+        cube.upsert(changed_deals)
+        cube.remove(["OPP-2001"])
+    """
+
+    def __init__(self, open_stages: Sequence[str] = OPEN_STAGES):
+        self.open_stages = list(open_stages)
+        self._lock = threading.Lock()
+        self._ledger = deal_contributions(
+            pd.DataFrame({"opportunity_id": [], "amount": [], "stage": [], "close_date": []}), self.open_stages
+        )
+        self._cells = self._group(self._ledger)
+
+    @classmethod
+    def from_deals(cls, deals: pd.DataFrame, open_stages: Sequence[str] = OPEN_STAGES) -> "ForecastCube":
+        """Build a cube from a full deal snapshot."""
+        cube = cls(open_stages)
+        cube.upsert(deals)
+        return cube
+
+    def __len__(self) -> int:
+        """Number of deals in the cube."""
+        return len(self._ledger)
+
+    @property
+    def cells(self) -> pd.DataFrame:
+        """The materialized cells, indexed by `DIMENSIONS`."""
+        return self._cells.copy()
+
+    @staticmethod
+    def _group(contributions: pd.DataFrame) -> pd.DataFrame:
+        return contributions.groupby(list(DIMENSIONS), sort=False)[list(MEASURES)].sum()
+
+    def _apply(self, delta: pd.DataFrame) -> None:
+        """Add signed per-deal contributions to the touched cells only."""
+        if delta.empty:
+            return
+        delta = self._group(delta)
+        existing = delta.index.isin(self._cells.index)
+        if existing.any():
+            keys = delta.index[existing]
+            self._cells.loc[keys, list(MEASURES)] += delta[existing].to_numpy()
+            emptied = keys[self._cells.loc[keys, "deal_count"].to_numpy() == 0]
+            if len(emptied):
+                self._cells = self._cells.drop(emptied)
+        if not existing.all():
+            self._cells = pd.concat([self._cells, delta[~existing]])
+
+    def upsert(self, deals: pd.DataFrame) -> int:
+        """
+        Add new deals or replace changed ones.
+
+        Returns:
+            Number of deals applied.
+        """
+        if deals is None or len(deals) == 0:
+            return 0
+        contributions = deal_contributions(deals, self.open_stages)
+        with self._lock:
+            known = contributions.index.isin(self._ledger.index)
+            previous = self._ledger.loc[contributions.index[known]]
+            retracted = previous.assign(**{m: -previous[m] for m in MEASURES})
+            self._apply(pd.concat([retracted, contributions]))
+            if known.any():
+                self._ledger.loc[contributions.index[known]] = contributions[known]
+            if not known.all():
+                self._ledger = pd.concat([self._ledger, contributions[~known]])
+        return len(contributions)
+
+    def remove(self, opportunity_ids: Iterable[str]) -> int:
+        """
+        Remove deals by id. Unknown ids are ignored.
+
+        Returns:
+            Number of deals removed.
+        """
+        ids = pd.Index([str(i) for i in opportunity_ids])
+        with self._lock:
+            ids = ids[ids.isin(self._ledger.index)].unique()
+            if not len(ids):
+                return 0
+            previous = self._ledger.loc[ids]
+            self._apply(previous.assign(**{m: -previous[m] for m in MEASURES}))
+            self._ledger = self._ledger.drop(ids)
+        return len(ids)
+
+    def query(
+        self,
+        group_by: Sequence[str] = (),
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Answer a slice or rollup from the cube cells.
+
+        Args:
+            group_by: Dimensions to group by (any subset of `DIMENSIONS`); empty
+                for a single total.
+            filters: Per-dimension filters. A value may be a scalar, a list of
+                allowed values, or a `{"from": ..., "to": ...}` inclusive range
+                (ISO weeks and months compare as strings).
+
+        Returns:
+            Dict with `rows` (one per group, measures plus `win_rate`,
+            `avg_velocity_days` and `forecasted_revenue`) and the slice `total`.
+
+        Raises:
+            ValueError: If a group-by or filter dimension is unknown.
+        """
+        group_by = list(group_by)
+        filters = filters or {}
+        unknown = [d for d in [*group_by, *filters] if d not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown cube dimension(s): {unknown}. Use any of {list(DIMENSIONS)}.")
+
+        with self._lock:
+            cells = self._cells
+            mask = np.ones(len(cells), dtype=bool)
+            for dim, allowed in filters.items():
+                values = cells.index.get_level_values(dim)
+                if isinstance(allowed, dict):
+                    if allowed.get("from") is not None:
+                        mask &= values >= str(allowed["from"])
+                    if allowed.get("to") is not None:
+                        mask &= values <= str(allowed["to"])
+                elif isinstance(allowed, (list, tuple, set)):
+                    mask &= values.isin([str(v) for v in allowed])
+                else:
+                    mask &= values == str(allowed)
+            selected = cells[mask]
+
+        total = _derived({m: selected[m].sum().item() for m in MEASURES}, DEFAULT_WIN_RATE)
+        rows: List[Dict[str, Any]] = []
+        if group_by:
+            grouped = selected.groupby(level=group_by, sort=True).sum().reset_index()
+            rows = [_derived(row, total["win_rate"]) for row in grouped.to_dict("records")]
+
+        return {"group_by": group_by, "filters": filters, "rows": rows, "total": total}
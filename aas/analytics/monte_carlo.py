@@ -0,0 +1,233 @@
+"""
+Monte Carlo Revenue Forecast
+
+Simulates open-deal outcomes to put a confidence interval around the revenue
+forecast. Each open deal closes inside the forecast window with probability
+
+    P(win) = stage probability
+    P(in window) = P(cycle <= age + window | cycle > age)
+
+where the sales-cycle distribution is the empirical created-to-close time of
+historical won deals. Revenue is simulated per segment × region cell and
+rolled up to segments, regions and the total, so every rollup is consistent
+within a scenario.
+
+Drawing one Bernoulli per deal per scenario is exact but costs
+`deals × scenarios` draws. Above `EXACT_DRAW_BUDGET` deals are instead grouped
+into strata (cell × amount band): strata with enough expected variance are
+summed analytically into one moment-matched normal per cell (sums of many
+independent Bernoullis are close to normal), and the deals of the few sparse
+strata are still drawn one by one, so their spread stays exact. That keeps
+100k scenarios over 50k deals well under a second.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+DEFAULT_SCENARIOS = 10_000
+DEFAULT_PERCENTILES = (10, 50, 90)
+
+# Deal × scenario draws up to which every deal is simulated individually.
+EXACT_DRAW_BUDGET = 20_000_000
+# Draws per block in the exact path, to bound memory.
+EXACT_BLOCK_DRAWS = 4_000_000
+# Amount bands per cell in the stratified path.
+AMOUNT_BANDS = 8
+# Strata whose win-count variance is below this are drawn deal by deal;
+# above it the normal approximation is accurate.
+NORMAL_MIN_VARIANCE = 9.0
+# Fewer historical won deals than this and the velocity CDF is not trusted.
+MIN_VELOCITY_SAMPLES = 5
+
+
+def close_in_window_probability(
+    age_days: np.ndarray,
+    days_to_close: np.ndarray,
+    window_days: int,
+    velocity_days: np.ndarray,
+) -> np.ndarray:
+    """
+    Probability that each open deal closes within the forecast window.
+
+    Args:
+        age_days: Days since each deal was created.
+        days_to_close: Days from today to each deal's expected close date.
+        window_days: Length of the forecast window.
+        velocity_days: Created-to-close days of historical won deals.
+
+    Returns:
+        Array of probabilities. Deals older than every historical cycle, or
+        all deals when there is too little history, fall back to their own
+        close date: 1 if it falls by the end of the window, else 0.
+    """
+    age = np.clip(np.asarray(age_days, dtype=float), 0, None)
+    by_close_date = (np.asarray(days_to_close, dtype=float) <= window_days).astype(float)
+
+    velocity = np.sort(np.asarray(velocity_days, dtype=float))
+    velocity = velocity[np.isfinite(velocity)]
+    if len(velocity) < MIN_VELOCITY_SAMPLES:
+        return by_close_date
+
+    cdf_age = np.searchsorted(velocity, age, side="right") / len(velocity)
+    cdf_end = np.searchsorted(velocity, age + window_days, side="right") / len(velocity)
+    survival = 1.0 - cdf_age
+    with np.errstate(divide="ignore", invalid="ignore"):
+        conditional = (cdf_end - cdf_age) / survival
+    return np.where(survival > 0, conditional, by_close_date)
+
+
+def _exact_cell_revenue(
+    rng: np.random.Generator,
+    amount: np.ndarray,
+    probability: np.ndarray,
+    cell: np.ndarray,
+    num_cells: int,
+    n_scenarios: int,
+) -> np.ndarray:
+    """One Bernoulli draw per deal per scenario, summed per cell."""
+    weights = np.zeros((len(amount), num_cells))
+    weights[np.arange(len(amount)), cell] = amount
+    revenue = np.empty((n_scenarios, num_cells))
+    block = max(1, EXACT_BLOCK_DRAWS // max(1, len(amount)))
+    for start in range(0, n_scenarios, block):
+        stop = min(n_scenarios, start + block)
+        wins = rng.random((stop - start, len(amount))) < probability
+        revenue[start:stop] = wins @ weights
+    return revenue
+
+
+def _stratified_cell_revenue(
+    rng: np.random.Generator,
+    amount: np.ndarray,
+    probability: np.ndarray,
+    cell: np.ndarray,
+    num_cells: int,
+    n_scenarios: int,
+) -> np.ndarray:
+    """Moment-matched normal per cell plus per-deal draws for sparse strata."""
+    edges = np.unique(np.quantile(amount, np.linspace(0, 1, AMOUNT_BANDS + 1)[1:-1]))
+    stratum = cell * (len(edges) + 1) + np.searchsorted(edges, amount, side="right")
+    num_strata = num_cells * (len(edges) + 1)
+
+    def per_stratum(values: np.ndarray) -> np.ndarray:
+        return np.bincount(stratum, weights=values, minlength=num_strata)
+
+    pq = probability * (1 - probability)
+    count = np.bincount(stratum, minlength=num_strata)
+    sum_p = per_stratum(probability)
+    sum_ap = per_stratum(amount * probability)
+    sum_a2pq = per_stratum(amount * amount * pq)
+    count_var = per_stratum(pq)
+    stratum_cell = np.arange(num_strata) // (len(edges) + 1)
+
+    dense = count_var >= NORMAL_MIN_VARIANCE
+    mean = np.bincount(stratum_cell[dense], weights=sum_ap[dense], minlength=num_cells)
+    std = np.sqrt(np.bincount(stratum_cell[dense], weights=sum_a2pq[dense], minlength=num_cells))
+    z = rng.standard_normal((n_scenarios, num_cells), dtype=np.float32)
+    revenue = np.clip(mean + std * z, 0, None)
+
+    # A binomial over a sparse stratum's mean probability would overstate its
+    # variance (n·p̄(1-p̄) >= Σp(1-p)) and pay every win the mean amount, so
+    # those deals get their own Bernoulli draws. Certain outcomes need none.
+    in_sparse = ~dense[stratum]
+    revenue += np.bincount(cell[in_sparse & (probability >= 1)], weights=amount[in_sparse & (probability >= 1)],
+                           minlength=num_cells)
+    uncertain = in_sparse & (probability > 0) & (probability < 1)
+    if uncertain.any():
+        revenue += _exact_cell_revenue(
+            rng, amount[uncertain], probability[uncertain], cell[uncertain], num_cells, n_scenarios
+        )
+    return revenue
+
+
+def _summarize(revenue: np.ndarray, expected: np.ndarray, percentiles: Sequence[float]) -> list:
+    """Percentile and expected-value summary for each column of `revenue`."""
+    values = np.percentile(revenue, percentiles, axis=0)
+    return [
+        {
+            **{f"p{q:g}": float(values[i, col]) for i, q in enumerate(percentiles)},
+            "expected": float(expected[col]),
+        }
+        for col in range(revenue.shape[1])
+    ]
+
+
+def simulate_revenue(
+    amount: Any,
+    probability: Any,
+    segment: Any,
+    region: Any,
+    n_scenarios: int = DEFAULT_SCENARIOS,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Simulate window revenue from open deals.
+
+    Args:
+        amount: Deal amounts.
+        probability: Probability (0-1) that each deal is won inside the window.
+        segment: Segment label of each deal.
+        region: Region label of each deal.
+        n_scenarios: Number of simulated scenarios.
+        percentiles: Percentiles to report (e.g. P10/P50/P90).
+        seed: Seed for a reproducible simulation.
+
+    Returns:
+        Dict with `total`, `by_segment`, `by_region` and `by_segment_region`
+        summaries, each holding the requested percentiles (`p10`, `p50`, ...)
+        and the analytic `expected` revenue.
+    """
+    amount = np.nan_to_num(np.asarray(amount, dtype=float))
+    probability = np.clip(np.nan_to_num(np.asarray(probability, dtype=float)), 0, 1)
+    n_scenarios = max(1, int(n_scenarios))
+    percentiles = [float(q) for q in percentiles]
+    rng = np.random.default_rng(seed)
+
+    cells = pd.MultiIndex.from_arrays([
+        pd.Series(segment, dtype=object).fillna("Unknown").to_numpy(),
+        pd.Series(region, dtype=object).fillna("Unknown").to_numpy(),
+    ])
+    cell, cell_labels = pd.factorize(cells)
+    num_cells = len(cell_labels)
+
+    if num_cells == 0:
+        revenue = np.zeros((n_scenarios, 0))
+        method = "exact"
+    elif len(amount) * n_scenarios <= EXACT_DRAW_BUDGET:
+        revenue = _exact_cell_revenue(rng, amount, probability, cell, num_cells, n_scenarios)
+        method = "exact"
+    else:
+        revenue = _stratified_cell_revenue(rng, amount, probability, cell, num_cells, n_scenarios)
+        method = "stratified"
+
+    expected = np.bincount(cell, weights=amount * probability, minlength=num_cells)
+    segments, segment_of_cell = np.unique(cell_labels.get_level_values(0).astype(str), return_inverse=True)
+    regions, region_of_cell = np.unique(cell_labels.get_level_values(1).astype(str), return_inverse=True)
+
+    def rollup(keys: np.ndarray, num_keys: int):
+        indicator = np.zeros((num_cells, num_keys))
+        indicator[np.arange(num_cells), keys] = 1.0
+        return revenue @ indicator, expected @ indicator
+
+    seg_revenue, seg_expected = rollup(segment_of_cell, len(segments))
+    reg_revenue, reg_expected = rollup(region_of_cell, len(regions))
+    total_revenue, total_expected = rollup(np.zeros(num_cells, dtype=int), 1)
+
+    by_cell = _summarize(revenue, expected, percentiles)
+    return {
+        "scenarios": n_scenarios,
+        "method": method,
+        "percentiles": percentiles,
+        "total": _summarize(total_revenue, total_expected, percentiles)[0],
+        "by_segment": dict(zip(segments.tolist(), _summarize(seg_revenue, seg_expected, percentiles))),
+        "by_region": dict(zip(regions.tolist(), _summarize(reg_revenue, reg_expected, percentiles))),
+        "by_segment_region": [
+            {"segment": str(seg), "region": str(reg), **summary}
+            for (seg, reg), summary in zip(cell_labels, by_cell)
+        ],
+    }
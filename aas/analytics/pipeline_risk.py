@@ -0,0 +1,369 @@
+"""
+Pipeline Risk Aggregation
+
+Scores opportunities for leakage risk and reduces the scored rows to the
+pipeline play's analysis. The reduction is expressed as a mergeable
+`Aggregator`, so in-memory, sharded and chunked runs share one code path and
+return the same result.
+"""
+
+from __future__ import annotations
+
+import datetime as _dt
+import heapq
+from dataclasses import dataclass, field
+from fractions import Fraction
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+from .sharding import Aggregator
+
+TOP_K = 5
+STALLED_THRESHOLD = 50
+
+AT_RISK_COLUMNS = ["opportunity_id", "segment", "region", "stage", "owner", "stage_age"]
+
+DEFAULT_VISUAL_CONTEXT = {
+    "view_name": "Superstore Overview",
+    "workbook": "Superstore",
+    "url": "https://10ax.online.tableau.com/#/site/agenticanalyticsstudio/views/Superstore/Overview",
+    "note": "Embedded Tableau context for this analysis"
+}
+
+
+class ExactSum:
+    """
+    Order-independent sum of floats.
+
+    A float64 is an integer mantissa times a power of two, so summing the
+    mantissas per exponent in Python ints is exact. Partial sums from shards
+    and chunks can be merged in any order and still round to the same float,
+    which keeps chunked/sharded results bit-identical to the in-memory path.
+    NaNs are skipped, as in `pandas.Series.sum`.
+    """
+
+    __slots__ = ("terms",)
+
+    def __init__(self, terms: Optional[Dict[int, int]] = None):
+        self.terms = terms or {}
+
+    @classmethod
+    def of(cls, values: Any) -> "ExactSum":
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values) & (values != 0)]
+        if not len(values):
+            return cls()
+        mantissa, exponent = np.frexp(values)
+        ints = np.ldexp(mantissa, 53).astype(np.int64)
+        # Split into 27/26-bit halves so int64 sums cannot overflow.
+        hi, lo = ints >> 26, ints & ((1 << 26) - 1)
+        terms = {}
+        for e in np.unique(exponent):
+            mask = exponent == e
+            terms[int(e)] = (int(hi[mask].sum()) << 26) + int(lo[mask].sum())
+        return cls(terms)
+
+    def __add__(self, other: "ExactSum") -> "ExactSum":
+        terms = dict(self.terms)
+        for e, v in other.terms.items():
+            terms[e] = terms.get(e, 0) + v
+        return ExactSum(terms)
+
+    def __float__(self) -> float:
+        if not self.terms:
+            return 0.0
+        emin = min(self.terms)
+        total = sum(v << (e - emin) for e, v in self.terms.items())
+        return float(Fraction(total) * Fraction(2) ** (emin - 53))
+
+
+@dataclass
+class RiskScores:
+    """Per-row risk components, aligned to the scored frame."""
+
+    risk_score: pd.Series
+    amount: pd.Series
+    stage_age: Optional[pd.Series] = None
+    close_date: Optional[pd.Series] = None
+    days_since_touch: Optional[pd.Series] = None
+    close_slipped: Optional[pd.Series] = None
+
+
+def _datetime_column(data: pd.DataFrame, col: str) -> Optional[pd.Series]:
+    """Return ``data[col]`` parsed as datetimes, or ``None`` if absent."""
+    if col not in data.columns:
+        return None
+    return pd.to_datetime(data[col], errors="coerce")
+
+
+def score_opportunities(data: pd.DataFrame, today: _dt.date) -> RiskScores:
+    """
+    Compute the 0-100 leakage risk score for every opportunity.
+
+    Components: days in stage (1 pt/day, max 40), days since last touch
+    (2 pts/day over 7 days, max 30) and a slipped close date (30 pts).
+    The input frame is never modified.
+    """
+    today_ts = pd.Timestamp(today)
+    close_date = _datetime_column(data, "close_date")
+    last_touch = _datetime_column(data, "last_touch_date")
+    stage_age = data["stage_age"] if "stage_age" in data.columns else None
+    if "amount" in data.columns:
+        amount = data["amount"].astype(float)
+    else:
+        amount = pd.Series(0.0, index=data.index)
+
+    risk_score = pd.Series(0.0, index=data.index)
+    days_since = None
+    is_past = None
+
+    if stage_age is not None:
+        risk_score += stage_age.fillna(0).clip(0, 40)
+
+    if last_touch is not None:
+        days_since = (today_ts - last_touch).dt.days.fillna(30)
+        risk_score += ((days_since - 7).clip(0) * 2).clip(0, 30)
+
+    if close_date is not None:
+        is_past = close_date < today_ts
+        risk_score += is_past * 30.0
+
+    return RiskScores(
+        risk_score=risk_score.clip(0, 100),
+        amount=amount,
+        stage_age=stage_age,
+        close_date=close_date,
+        days_since_touch=days_since,
+        close_slipped=is_past,
+    )
+
+
+def risk_reasons(stage_age: Any, days_since: Any, is_past: bool) -> List[str]:
+    """Human-readable risk reasons for a single scored opportunity."""
+    reasons: List[str] = []
+    if stage_age is not None and stage_age > 30:
+        reasons.append(f"Stalled in stage {int(stage_age)} days")
+    if days_since is not None and days_since > 14:
+        reasons.append(f"No activity in {int(days_since)} days")
+    if is_past:
+        reasons.append("Close date slipped")
+    return reasons
+
+
+@dataclass
+class PipelineRiskState:
+    """
+    Partial aggregate of scored opportunities.
+
+    Keyed counters store `[value..., first_position]` so rankings can break
+    ties by the key's first appearance in the full dataset.
+    """
+
+    rows: int = 0
+    num_stalled: int = 0
+    value_at_risk: ExactSum = field(default_factory=ExactSum)
+    stalled_age_sum: ExactSum = field(default_factory=ExactSum)
+    stalled_age_count: int = 0
+    has_stage: bool = False
+    has_stage_age: bool = False
+    has_owner: bool = False
+    stage_counts: Dict[Any, List[int]] = field(default_factory=dict)  # stage -> [count, first_pos]
+    stage_age: Dict[Any, List[Any]] = field(default_factory=dict)  # stage -> [ExactSum, count, first_pos]
+    owner_counts: Dict[Any, List[int]] = field(default_factory=dict)  # owner -> [count, first_pos]
+    top: List[Tuple[float, int, Dict[str, Any]]] = field(default_factory=list)  # (score, pos, record)
+
+
+def _keyed_counts(keys: pd.Series, positions: np.ndarray) -> Dict[Any, List[int]]:
+    """Count rows per key, remembering each key's first global position."""
+    grouped = pd.DataFrame({"key": keys.to_numpy(), "pos": positions}).groupby("key", sort=False)["pos"]
+    agg = grouped.agg(["size", "min"])
+    return {k: [int(c), int(p)] for k, c, p in zip(agg.index, agg["size"], agg["min"])}
+
+
+def _keyed_sums(keys: pd.Series, values: np.ndarray, positions: np.ndarray) -> Dict[Any, List[Any]]:
+    """Exact per-key sums and non-null counts, plus each key's first position."""
+    codes, uniques = pd.factorize(keys)
+    out: Dict[Any, List[Any]] = {}
+    for code, key in enumerate(uniques):
+        mask = codes == code
+        vals = values[mask]
+        out[key] = [ExactSum.of(vals), int(np.count_nonzero(~np.isnan(vals))), int(positions[mask].min())]
+    return out
+
+
+def _merge_keyed(target: Dict[Any, List], source: Dict[Any, List]) -> None:
+    """Add `source` counters into `target`; the last slot is a min-position."""
+    for key, values in source.items():
+        current = target.get(key)
+        if current is None:
+            target[key] = list(values)
+        else:
+            for i in range(len(values) - 1):
+                current[i] += values[i]
+            current[-1] = min(current[-1], values[-1])
+
+
+def _top_k(items: Sequence[Tuple[float, int, Dict[str, Any]]], k: int) -> List[Tuple[float, int, Dict[str, Any]]]:
+    """Highest scores first; ties go to the earliest row."""
+    return heapq.nsmallest(k, items, key=lambda item: (-item[0], item[1]))
+
+
+def _ranked(counters: Dict[Any, List], value, limit: int) -> Dict[Any, Any]:
+    """Top `limit` keys by `value(counter)` descending, ties by first position."""
+    ranked = sorted(counters.items(), key=lambda kv: (-value(kv[1]), kv[1][-1]))
+    return {key: value(counter) for key, counter in ranked[:limit]}
+
+
+class PipelineRiskAggregator(Aggregator):
+    """Mergeable reduction behind the pipeline-family `analyze()`."""
+
+    def __init__(
+        self,
+        today: Optional[_dt.date] = None,
+        top_k: int = TOP_K,
+        visual_context: Optional[Dict[str, Any]] = None,
+    ):
+        # Pin "today" once so every shard/chunk scores against the same date.
+        self.today = today or _dt.date.today()
+        self.top_k = top_k
+        self.visual_context = visual_context or DEFAULT_VISUAL_CONTEXT
+
+    def partial(self, frame: pd.DataFrame, positions: Optional[np.ndarray] = None) -> PipelineRiskState:
+        state = PipelineRiskState(rows=len(frame))
+        if frame.empty:
+            return state
+        if positions is None:
+            positions = np.arange(len(frame), dtype=np.int64)
+
+        scores = score_opportunities(frame, self.today)
+        score_values = scores.risk_score.to_numpy(dtype=float)
+        stalled = score_values > STALLED_THRESHOLD
+
+        state.num_stalled = int(stalled.sum())
+        state.value_at_risk = ExactSum.of(scores.amount.to_numpy(dtype=float)[stalled])
+
+        state.has_stage = "stage" in frame.columns
+        state.has_stage_age = scores.stage_age is not None
+        state.has_owner = "owner" in frame.columns
+
+        if scores.stage_age is not None:
+            stalled_ages = scores.stage_age.to_numpy(dtype=float)[stalled]
+            state.stalled_age_sum = ExactSum.of(stalled_ages)
+            state.stalled_age_count = int(np.count_nonzero(~np.isnan(stalled_ages)))
+
+        if state.has_stage:
+            state.stage_counts = _keyed_counts(frame["stage"], positions)
+            if scores.stage_age is not None:
+                state.stage_age = _keyed_sums(
+                    frame["stage"], scores.stage_age.to_numpy(dtype=float), positions
+                )
+
+        if state.has_owner and state.num_stalled:
+            state.owner_counts = _keyed_counts(frame["owner"][stalled], positions[stalled])
+
+        state.top = self._top_records(frame, scores, score_values, positions)
+        return state
+
+    def _top_records(
+        self,
+        frame: pd.DataFrame,
+        scores: RiskScores,
+        score_values: np.ndarray,
+        positions: np.ndarray,
+    ) -> List[Tuple[float, int, Dict[str, Any]]]:
+        """Materialise records for this slice's top-K rows only."""
+        n = len(score_values)
+        k = min(self.top_k, n)
+        if k == 0:
+            return []
+        if n > k:
+            kth = np.partition(score_values, n - k)[n - k]
+            candidates = np.flatnonzero(score_values >= kth)
+        else:
+            candidates = np.arange(n)
+        order = np.lexsort((positions[candidates], -score_values[candidates]))
+        top_local = candidates[order][:k]
+
+        cols = [c for c in AT_RISK_COLUMNS if c in frame.columns]
+        top_df = frame.iloc[top_local][cols].assign(amount=scores.amount.iloc[top_local].to_numpy())
+        if scores.close_date is not None:
+            # Convert dates to strings for JSON serialisation
+            top_df["close_date"] = scores.close_date.iloc[top_local].dt.strftime('%Y-%m-%d').to_numpy()
+        top_df["risk_score"] = score_values[top_local]
+        top_df["reasons"] = [
+            risk_reasons(
+                scores.stage_age.iloc[i] if scores.stage_age is not None else None,
+                scores.days_since_touch.iloc[i] if scores.days_since_touch is not None else None,
+                bool(scores.close_slipped.iloc[i]) if scores.close_slipped is not None else False,
+            )
+            for i in top_local
+        ]
+        records = top_df.to_dict(orient="records")
+        return [(float(score_values[i]), int(positions[i]), rec) for i, rec in zip(top_local, records)]
+
+    def merge(self, states: Sequence[PipelineRiskState]) -> PipelineRiskState:
+        merged = PipelineRiskState()
+        for state in states:
+            merged.rows += state.rows
+            merged.num_stalled += state.num_stalled
+            merged.value_at_risk += state.value_at_risk
+            merged.stalled_age_sum += state.stalled_age_sum
+            merged.stalled_age_count += state.stalled_age_count
+            merged.has_stage |= state.has_stage
+            merged.has_stage_age |= state.has_stage_age
+            merged.has_owner |= state.has_owner
+            _merge_keyed(merged.stage_counts, state.stage_counts)
+            _merge_keyed(merged.stage_age, state.stage_age)
+            _merge_keyed(merged.owner_counts, state.owner_counts)
+            merged.top = _top_k(merged.top + state.top, self.top_k)
+        return merged
+
+    def finalize(self, state: PipelineRiskState) -> Dict[str, Any]:
+        if state.rows == 0:
+            return {
+                "at_risk_deals": [],
+                "stage_distribution": {},
+                "narrative": "No data available."
+            }
+
+        num_stalled = state.num_stalled
+        value_at_risk = float(state.value_at_risk)
+        avg_days_stalled = (
+            float(state.stalled_age_sum) / state.stalled_age_count if state.stalled_age_count else 0
+        )
+        expected_recovered = value_at_risk * 0.7  # Assumption: can save 70%
+
+        metrics = {
+            "num_stalled_opportunities": int(num_stalled),
+            "value_at_risk": float(value_at_risk),
+            "avg_days_stalled": float(round(avg_days_stalled, 1)),
+            "expected_revenue_recovered": float(expected_recovered)
+        }
+
+        drivers: Dict[str, Any] = {}
+        if state.has_stage and state.has_stage_age:
+            with_age = {k: v for k, v in state.stage_age.items() if v[1]}
+            drivers["slowest_stages"] = _ranked(with_age, lambda v: float(v[0]) / v[1], 3)
+        if state.has_owner:
+            drivers["top_high_risk_owners"] = _ranked(state.owner_counts, lambda v: v[0], 3)
+
+        stage_counts = _ranked(state.stage_counts, lambda v: v[0], len(state.stage_counts))
+
+        at_risk_list = [record for _, _, record in state.top]
+
+        narrative = (
+            f"Identified {len(at_risk_list)} deals at risk seeking attention. "
+            f"Total value at risk is ${value_at_risk:,.0f} across {num_stalled} stalled opportunities. "
+            f"Top drivers include stages: {', '.join(str(s) for s in drivers.get('slowest_stages', {}))}."
+        )
+
+        return {
+            "at_risk_deals": at_risk_list,
+            "stage_distribution": stage_counts,
+            "drivers_of_slowdown": drivers,
+            "narrative": narrative,
+            "metrics": metrics,
+            "visual_context": dict(self.visual_context),
+        }
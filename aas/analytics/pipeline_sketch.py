@@ -0,0 +1,199 @@
+"""
+Approximate Pipeline Aggregation
+
+Sketch-backed variant of `PipelineRiskAggregator` for interactive previews
+over very large pipeline histories. Every partial state has a fixed size,
+whatever the number of rows, owners or accounts behind it:
+
+* stage and owner counts are `HeavyHitters` (exact while the distinct keys
+  fit the capacity),
+* stage ages are `TDigest`s, giving percentiles as well as means,
+* distinct accounts are counted with a `HyperLogLog`.
+
+Counts of stalled deals, value at risk and the top at-risk deals stay exact.
+The analysis has the same keys as the exact path plus an `approximate`
+section with percentiles, distinct counts and error bounds.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+from .pipeline_risk import STALLED_THRESHOLD, ExactSum, PipelineRiskAggregator, _top_k, score_opportunities
+from .sketches import DEFAULT_COMPRESSION, DEFAULT_HEAVY_HITTERS, DEFAULT_HLL_PRECISION, HeavyHitters, HyperLogLog, TDigest
+
+# Columns tried, in order, as the account identity for the distinct count.
+ACCOUNT_COLUMNS = ["account_id", "account_name", "opportunity_id"]
+PERCENTILES = (50, 90, 99)
+
+
+@dataclass
+class PipelineSketchState:
+    """Fixed-size partial aggregate of scored opportunities."""
+
+    rows: int = 0
+    num_stalled: int = 0
+    value_at_risk: ExactSum = field(default_factory=ExactSum)
+    stalled_age: TDigest = field(default_factory=TDigest)
+    stage_age_all: TDigest = field(default_factory=TDigest)
+    has_stage: bool = False
+    has_stage_age: bool = False
+    has_owner: bool = False
+    stage_counts: Optional[HeavyHitters] = None
+    stage_age: Dict[Any, TDigest] = field(default_factory=dict)
+    owner_counts: Optional[HeavyHitters] = None
+    account_column: Optional[str] = None
+    accounts: Optional[HyperLogLog] = None
+    top: List[Tuple[float, int, Dict[str, Any]]] = field(default_factory=list)
+
+
+def _add(a: Any, b: Any) -> Any:
+    """Merge two optional sketches."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a + b
+
+
+class PipelineSketchAggregator(PipelineRiskAggregator):
+    """Mergeable, bounded-memory approximation of the pipeline analysis."""
+
+    def __init__(
+        self,
+        today=None,
+        top_k: int = 5,
+        visual_context: Optional[Dict[str, Any]] = None,
+        heavy_hitters: int = DEFAULT_HEAVY_HITTERS,
+        compression: float = DEFAULT_COMPRESSION,
+        precision: int = DEFAULT_HLL_PRECISION,
+    ):
+        super().__init__(today=today, top_k=top_k, visual_context=visual_context)
+        self.heavy_hitters = heavy_hitters
+        self.compression = compression
+        self.precision = precision
+
+    def partial(self, frame: pd.DataFrame, positions: Optional[np.ndarray] = None) -> PipelineSketchState:
+        state = PipelineSketchState(rows=len(frame))
+        if frame.empty:
+            return state
+        if positions is None:
+            positions = np.arange(len(frame), dtype=np.int64)
+
+        scores = score_opportunities(frame, self.today)
+        score_values = scores.risk_score.to_numpy(dtype=float)
+        stalled = score_values > STALLED_THRESHOLD
+
+        state.num_stalled = int(stalled.sum())
+        state.value_at_risk = ExactSum.of(scores.amount.to_numpy(dtype=float)[stalled])
+        state.has_stage = "stage" in frame.columns
+        state.has_stage_age = scores.stage_age is not None
+        state.has_owner = "owner" in frame.columns
+
+        if scores.stage_age is not None:
+            ages = scores.stage_age.to_numpy(dtype=float)
+            state.stalled_age = TDigest.of(ages[stalled], self.compression)
+            state.stage_age_all = TDigest.of(ages, self.compression)
+            if state.has_stage:
+                codes, stages = pd.factorize(frame["stage"])
+                for code, stage in enumerate(stages):
+                    state.stage_age[stage] = TDigest.of(ages[codes == code], self.compression)
+
+        if state.has_stage:
+            state.stage_counts = HeavyHitters.of(frame["stage"], self.heavy_hitters)
+        if state.has_owner:
+            state.owner_counts = HeavyHitters.of(frame["owner"][stalled], self.heavy_hitters)
+
+        state.account_column = next((c for c in ACCOUNT_COLUMNS if c in frame.columns), None)
+        if state.account_column:
+            state.accounts = HyperLogLog.of(frame[state.account_column], self.precision)
+
+        state.top = self._top_records(frame, scores, score_values, positions)
+        return state
+
+    def merge(self, states: Sequence[PipelineSketchState]) -> PipelineSketchState:
+        merged = PipelineSketchState()
+        for state in states:
+            merged.rows += state.rows
+            merged.num_stalled += state.num_stalled
+            merged.value_at_risk += state.value_at_risk
+            merged.stalled_age = merged.stalled_age + state.stalled_age
+            merged.stage_age_all = merged.stage_age_all + state.stage_age_all
+            merged.has_stage |= state.has_stage
+            merged.has_stage_age |= state.has_stage_age
+            merged.has_owner |= state.has_owner
+            merged.stage_counts = _add(merged.stage_counts, state.stage_counts)
+            merged.owner_counts = _add(merged.owner_counts, state.owner_counts)
+            merged.accounts = _add(merged.accounts, state.accounts)
+            merged.account_column = merged.account_column or state.account_column
+            for stage, digest in state.stage_age.items():
+                merged.stage_age[stage] = _add(merged.stage_age.get(stage), digest)
+            merged.top = _top_k(merged.top + state.top, self.top_k)
+        return merged
+
+    def finalize(self, state: PipelineSketchState) -> Dict[str, Any]:
+        if state.rows == 0:
+            return {
+                "at_risk_deals": [],
+                "stage_distribution": {},
+                "narrative": "No data available.",
+                "approximate": {},
+            }
+
+        value_at_risk = float(state.value_at_risk)
+        avg_days_stalled = state.stalled_age.mean() if state.stalled_age.count else 0
+        metrics = {
+            "num_stalled_opportunities": int(state.num_stalled),
+            "value_at_risk": value_at_risk,
+            "avg_days_stalled": float(round(avg_days_stalled, 1)),
+            "expected_revenue_recovered": value_at_risk * 0.7,  # Assumption: can save 70%
+        }
+
+        drivers: Dict[str, Any] = {}
+        if state.has_stage and state.has_stage_age:
+            means = {s: d.mean() for s, d in state.stage_age.items() if d.count}
+            ranked = sorted(means.items(), key=lambda kv: (-kv[1], str(kv[0])))
+            drivers["slowest_stages"] = dict(ranked[:3])
+        if state.has_owner and state.owner_counts is not None:
+            drivers["top_high_risk_owners"] = dict(state.owner_counts.top(3))
+
+        stage_counts = dict(state.stage_counts.top()) if state.stage_counts is not None else {}
+
+        approximate: Dict[str, Any] = {"rows": state.rows}
+        if state.stage_age_all.count:
+            approximate["stage_age_percentiles"] = {
+                f"p{p}": round(state.stage_age_all.quantile(p / 100), 1) for p in PERCENTILES
+            }
+            approximate["stage_age_percentiles_by_stage"] = {
+                stage: {f"p{p}": round(d.quantile(p / 100), 1) for p in PERCENTILES}
+                for stage, d in state.stage_age.items() if d.count
+            }
+        if state.accounts is not None:
+            approximate["distinct_accounts"] = int(round(state.accounts.estimate()))
+            approximate["distinct_accounts_column"] = state.account_column
+        if state.stage_counts is not None:
+            approximate["stage_count_error"] = state.stage_counts.error
+        if state.owner_counts is not None:
+            approximate["owner_count_error"] = state.owner_counts.error
+
+        at_risk_list = [record for _, _, record in state.top]
+        narrative = (
+            f"Identified {len(at_risk_list)} deals at risk seeking attention. "
+            f"Total value at risk is ${value_at_risk:,.0f} across {state.num_stalled} stalled opportunities. "
+            f"Top drivers include stages: {', '.join(str(s) for s in drivers.get('slowest_stages', {}))}. "
+            "(Approximate preview.)"
+        )
+
+        return {
+            "at_risk_deals": at_risk_list,
+            "stage_distribution": stage_counts,
+            "drivers_of_slowdown": drivers,
+            "narrative": narrative,
+            "metrics": metrics,
+            "approximate": approximate,
+            "visual_context": dict(self.visual_context),
+        }
@@ -0,0 +1,316 @@
+"""
+Customer Segmentation
+
+Clusters customer accounts on value, engagement and health features with
+mini-batch k-means (Sculley, 2010) in NumPy. Each step draws a small batch,
+assigns it to the nearest centroids and moves every centroid toward its
+batch members with a per-centroid learning rate of 1 / (points seen), so
+memory and per-step cost are bounded by the batch size, not the customer
+count.
+
+The fitted `SegmentationModel` (feature scaling + centroids + counts) is a
+few hundred numbers: it can be saved, updated with `partial_fit` as new
+accounts arrive, and used to `assign` customers without re-clustering.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+DEFAULT_SEGMENTS = 5
+DEFAULT_BATCH_SIZE = 10_000
+DEFAULT_MAX_STEPS = 100
+# Stop early once no centroid moves more than this (in standardized units).
+DEFAULT_TOLERANCE = 1e-3
+# Rows assigned per block when labeling a large frame.
+ASSIGN_BLOCK_ROWS = 500_000
+
+USAGE_TREND_VALUES = {"declining": -1.0, "stable": 0.0, "growing": 1.0}
+
+# feature -> source column. Heavy-tailed values are log-scaled.
+SEGMENT_FEATURES: Dict[str, str] = {
+    "log_mrr": "mrr",
+    "account_health_score": "account_health_score",
+    "nps_score": "nps_score",
+    "usage_trend": "usage_trend",
+    "log_support_tickets": "support_tickets_30d",
+    "log_last_login_days": "last_login_days",
+    "payment_delays": "payment_delays",
+}
+_LOG_FEATURES = {"log_mrr", "log_support_tickets", "log_last_login_days"}
+
+
+def feature_matrix(data: pd.DataFrame) -> np.ndarray:
+    """
+    Raw (unscaled) segmentation features, one row per account.
+
+    Missing columns or values are NaN; `SegmentationModel` fills them with
+    the feature mean, so they pull toward no segment in particular.
+    """
+    out = np.full((len(data), len(SEGMENT_FEATURES)), np.nan)
+    for j, (feature, column) in enumerate(SEGMENT_FEATURES.items()):
+        if column not in data.columns:
+            continue
+        if column == "usage_trend":
+            codes, labels = pd.factorize(data[column])
+            lookup = [USAGE_TREND_VALUES.get(str(label).lower(), np.nan) for label in labels]
+            out[:, j] = np.asarray(lookup + [np.nan])[codes]
+            continue
+        values = pd.to_numeric(data[column], errors="coerce").to_numpy(dtype=float)
+        out[:, j] = np.log1p(np.clip(values, 0, None)) if feature in _LOG_FEATURES else values
+    return out
+
+
+def _squared_distances(x: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Pairwise squared Euclidean distances, ``(len(x), len(centers))``."""
+    d = (x * x).sum(axis=1)[:, None] - 2 * x @ centers.T + (centers * centers).sum(axis=1)[None, :]
+    return np.maximum(d, 0)
+
+
+def _kmeans_plus_plus(x: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++ seeding on one batch."""
+    centers = [x[rng.integers(len(x))]]
+    closest = _squared_distances(x, centers[0][None, :])[:, 0]
+    for _ in range(1, k):
+        total = closest.sum()
+        idx = rng.choice(len(x), p=closest / total) if total > 0 else rng.integers(len(x))
+        centers.append(x[idx])
+        closest = np.minimum(closest, _squared_distances(x, x[idx][None, :])[:, 0])
+    return np.array(centers)
+
+
+class SegmentationModel:
+    """
+    Incrementally trainable k-means segmentation.
+
+    Usage:
+        model = SegmentationModel(n_segments=5, seed=0)
+        model.fit(customers)                # mini-batch steps over a frame
+        model.partial_fit(new_customers)    # fold in new accounts
+        labels = model.assign(more_customers)
+    """
+
+    def __init__(
+        self,
+        n_segments: int = DEFAULT_SEGMENTS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        seed: Optional[int] = None,
+    ):
+        if n_segments < 1:
+            raise ValueError("n_segments must be at least 1")
+        self.n_segments = n_segments
+        self.batch_size = batch_size
+        self.seed = seed
+        self.mean: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+        self.centers: Optional[np.ndarray] = None
+        self.counts = np.zeros(n_segments)
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.centers is not None
+
+    def _standardize(self, raw: np.ndarray) -> np.ndarray:
+        if self.mean is None:
+            # Scaling is frozen from the first data seen, so centroids stay comparable across updates.
+            mean = np.nanmean(raw, axis=0) if len(raw) else np.zeros(raw.shape[1])
+            std = np.nanstd(raw, axis=0) if len(raw) else np.ones(raw.shape[1])
+            self.mean = np.nan_to_num(mean)
+            self.scale = np.where(np.nan_to_num(std) > 0, np.nan_to_num(std), 1.0)
+        x = (raw - self.mean) / self.scale
+        return np.nan_to_num(x, nan=0.0)
+
+    def _step(self, x: np.ndarray) -> float:
+        """One mini-batch update; returns the largest centroid move."""
+        if self.centers is None:
+            k = min(self.n_segments, len(x))
+            centers = _kmeans_plus_plus(x, k, self._rng)
+            if k < self.n_segments:
+                centers = np.vstack([centers, np.repeat(centers[-1:], self.n_segments - k, axis=0)])
+            self.centers = centers
+        labels = _squared_distances(x, self.centers).argmin(axis=1)
+        batch_counts = np.bincount(labels, minlength=self.n_segments).astype(float)
+        sums = np.column_stack([
+            np.bincount(labels, weights=x[:, j], minlength=self.n_segments) for j in range(x.shape[1])
+        ])
+
+        self.counts += batch_counts
+        hit = batch_counts > 0
+        previous = self.centers[hit].copy()
+        # Equivalent to per-point updates with learning rate 1 / count.
+        self.centers[hit] += (sums[hit] - batch_counts[hit, None] * self.centers[hit]) / self.counts[hit, None]
+        return float(np.abs(self.centers[hit] - previous).max()) if hit.any() else 0.0
+
+    def fit(
+        self,
+        data: pd.DataFrame,
+        max_steps: int = DEFAULT_MAX_STEPS,
+        tolerance: float = DEFAULT_TOLERANCE,
+    ) -> "SegmentationModel":
+        """Run mini-batch steps on random batches of `data` until centroids settle."""
+        if len(data) == 0:
+            return self
+        x = self._standardize(feature_matrix(data))
+        size = min(self.batch_size, len(x))
+        for _ in range(max_steps):
+            batch = x[self._rng.integers(0, len(x), size=size)] if size < len(x) else x
+            if self._step(batch) < tolerance and self.counts.sum() >= len(x):
+                break
+        return self
+
+    def partial_fit(self, data: pd.DataFrame) -> "SegmentationModel":
+        """Fold a batch of new or changed accounts into the centroids (one pass)."""
+        if len(data) == 0:
+            return self
+        x = self._standardize(feature_matrix(data))
+        for start in range(0, len(x), self.batch_size):
+            self._step(x[start:start + self.batch_size])
+        return self
+
+    def fit_chunks(self, chunks: Iterable[pd.DataFrame]) -> "SegmentationModel":
+        """One streaming pass over data too large to hold in memory."""
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self
+
+    def assign(self, data: pd.DataFrame) -> np.ndarray:
+        """Nearest segment for each account, without updating the model."""
+        if not self.is_fitted:
+            raise ValueError("Segmentation model is not fitted")
+        x = self._standardize(feature_matrix(data))
+        labels = np.empty(len(x), dtype=np.int64)
+        for start in range(0, len(x), ASSIGN_BLOCK_ROWS):
+            block = x[start:start + ASSIGN_BLOCK_ROWS]
+            labels[start:start + len(block)] = _squared_distances(block, self.centers).argmin(axis=1)
+        return labels
+
+    def centroids(self) -> pd.DataFrame:
+        """Centroids in original feature units (log features back-transformed)."""
+        if not self.is_fitted:
+            raise ValueError("Segmentation model is not fitted")
+        raw = self.centers * self.scale + self.mean
+        frame = pd.DataFrame(raw, columns=list(SEGMENT_FEATURES))
+        for feature in _LOG_FEATURES:
+            frame[feature] = np.expm1(frame[feature])
+        return frame.rename(columns={
+            "log_mrr": "mrr", "log_support_tickets": "support_tickets_30d", "log_last_login_days": "last_login_days",
+        })
+
+    def segment_names(self) -> List[str]:
+        """Readable name per segment from its centroid's value and health."""
+        centroids = self.centroids()
+        ranks = centroids["mrr"].rank(method="first").to_numpy()
+        tier = max(1, round(self.n_segments / 3))
+        names = []
+        for rank, (_, c) in zip(ranks, centroids.iterrows()):
+            value = "High value" if rank > self.n_segments - tier else ("Low value" if rank <= tier else "Mid value")
+            if c["account_health_score"] < 50 or c["usage_trend"] < -0.5:
+                health = "at risk"
+            elif c["account_health_score"] >= 70 and c["usage_trend"] > 0.25:
+                health = "growing"
+            else:
+                health = "steady"
+            names.append(f"{value}, {health}")
+        return names
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "n_segments": self.n_segments,
+            "batch_size": self.batch_size,
+            "seed": self.seed,
+            "features": list(SEGMENT_FEATURES),
+            "mean": None if self.mean is None else self.mean.tolist(),
+            "scale": None if self.scale is None else self.scale.tolist(),
+            "centers": None if self.centers is None else self.centers.tolist(),
+            "counts": self.counts.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "SegmentationModel":
+        if state.get("features", list(SEGMENT_FEATURES)) != list(SEGMENT_FEATURES):
+            raise ValueError("Saved segmentation model uses a different feature set")
+        model = cls(state["n_segments"], state.get("batch_size", DEFAULT_BATCH_SIZE), state.get("seed"))
+        for name in ("mean", "scale", "centers"):
+            if state.get(name) is not None:
+                setattr(model, name, np.asarray(state[name], dtype=float))
+        model.counts = np.asarray(state["counts"], dtype=float)
+        return model
+
+    def save(self, path: Union[str, Path]) -> Path:
+        """Write the model as JSON atomically (write, then rename)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.to_dict()), encoding="utf-8")
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "SegmentationModel":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+# Columns of the per-segment accumulator built by `segment_stats`.
+_STATS = ["customers", "mrr", "health_sum", "health_n", "nps_sum", "nps_n", "declining", "growing"]
+
+
+def segment_stats(data: pd.DataFrame, labels: np.ndarray, n_segments: int) -> np.ndarray:
+    """
+    Additive per-segment totals, ``(n_segments, len(_STATS))``.
+
+    Totals from separate chunks can simply be summed, so chunked runs
+    summarize millions of accounts without holding them all.
+    """
+    raw = feature_matrix(data)
+    features = list(SEGMENT_FEATURES)
+    out = np.zeros((n_segments, len(_STATS)))
+
+    def add(col: str, weights: Optional[np.ndarray] = None, mask: Optional[np.ndarray] = None) -> None:
+        lab = labels if mask is None else labels[mask]
+        w = None if weights is None else (weights if mask is None else weights[mask])
+        out[:, _STATS.index(col)] = np.bincount(lab, weights=w, minlength=n_segments)
+
+    add("customers")
+    if "mrr" in data.columns:
+        add("mrr", np.nan_to_num(pd.to_numeric(data["mrr"], errors="coerce").to_numpy(dtype=float)))
+    for feature, prefix in (("account_health_score", "health"), ("nps_score", "nps")):
+        values = raw[:, features.index(feature)]
+        present = ~np.isnan(values)
+        add(f"{prefix}_sum", values, present)
+        add(f"{prefix}_n", mask=present)
+    trend = raw[:, features.index("usage_trend")]
+    add("declining", (trend < 0).astype(float))
+    add("growing", (trend > 0).astype(float))
+    return out
+
+
+def summarize_segments(stats: np.ndarray, model: SegmentationModel) -> List[Dict[str, Any]]:
+    """Per-segment size, MRR and health profile from `segment_stats`, largest MRR first."""
+    names = model.segment_names()
+    col = {name: stats[:, i] for i, name in enumerate(_STATS)}
+    segments = []
+    for s in range(model.n_segments):
+        size = col["customers"][s]
+        if not size:
+            continue
+        health_n, nps_n = col["health_n"][s], col["nps_n"][s]
+        segments.append({
+            "segment_id": s,
+            "name": names[s],
+            "customers": int(size),
+            "total_mrr": float(col["mrr"][s]),
+            "avg_mrr": float(col["mrr"][s] / size),
+            "avg_health_score": round(float(col["health_sum"][s] / health_n), 1) if health_n else None,
+            "avg_nps": round(float(col["nps_sum"][s] / nps_n), 1) if nps_n else None,
+            "declining_pct": round(float(col["declining"][s] / size * 100), 1),
+            "growing_pct": round(float(col["growing"][s] / size * 100), 1),
+        })
+    segments.sort(key=lambda seg: (-seg["total_mrr"], seg["segment_id"]))
+    return segments
@@ -0,0 +1,179 @@
+"""
+Sharded Analysis
+
+Runs a play's analysis across a process pool. A play opts in by exposing an
+`Aggregator`: a small, picklable object that turns a slice of rows into a
+partial state, merges partial states, and finalizes the merged state into the
+same `analysis` dict the single-process path returns.
+
+Every partial receives the global row positions of its rows, so order-dependent
+results (tie-breaks in top-K lists and rankings) come out identical no matter
+how the frame was split.
+"""
+
+from __future__ import annotations
+
+import abc
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Below this many rows the pool overhead outweighs the parallel speedup.
+DEFAULT_MIN_SHARD_ROWS = 100_000
+
+PARTITION_BY = ("hash", "value")
+
+
+class Aggregator(abc.ABC):
+    """Mergeable analysis: partial -> merge -> finalize."""
+
+    @abc.abstractmethod
+    def partial(self, frame: pd.DataFrame, positions: Optional[np.ndarray] = None) -> Any:
+        """
+        Reduce a slice of rows to a partial state.
+
+        Args:
+            frame: The rows to reduce.
+            positions: Global row position of each row in `frame`. Defaults to
+                `0..len(frame)-1` when the frame is the whole dataset.
+        """
+
+    @abc.abstractmethod
+    def merge(self, states: Sequence[Any]) -> Any:
+        """Combine partial states into one."""
+
+    @abc.abstractmethod
+    def finalize(self, state: Any) -> Dict[str, Any]:
+        """Turn a merged state into the play's `analysis` dict."""
+
+    def analyze(self, frame: pd.DataFrame) -> Dict[str, Any]:
+        """Single-process analysis of a whole frame."""
+        return self.finalize(self.partial(frame))
+
+
+def partition_frame(
+    data: pd.DataFrame,
+    num_shards: int,
+    partition_key: Optional[str] = None,
+    partition_by: str = "hash",
+) -> List[Tuple[pd.DataFrame, np.ndarray]]:
+    """
+    Split a frame into shards, each paired with its global row positions.
+
+    Args:
+        data: Frame to split.
+        num_shards: Number of shards for hash/range partitioning.
+        partition_key: Column to partition on. Without it (or if the column is
+            missing) the frame is cut into contiguous row ranges.
+        partition_by: "hash" buckets `hash(partition_key) % num_shards`;
+            "value" puts each distinct key value (e.g. each region) in its own shard.
+
+    Returns:
+        List of `(shard_frame, positions)` tuples; empty shards are dropped.
+    """
+    n = len(data)
+    num_shards = max(1, min(int(num_shards), n))
+
+    if partition_key is None or partition_key not in data.columns:
+        bounds = np.linspace(0, n, num_shards + 1, dtype=np.int64)
+        return [
+            (data.iloc[start:stop], np.arange(start, stop, dtype=np.int64))
+            for start, stop in zip(bounds[:-1], bounds[1:])
+            if stop > start
+        ]
+
+    if partition_by == "value":
+        codes, _ = pd.factorize(data[partition_key])
+        shard_ids = codes + 1  # missing keys (-1) get their own shard
+    elif partition_by == "hash":
+        hashes = pd.util.hash_pandas_object(data[partition_key], index=False).to_numpy()
+        shard_ids = (hashes % np.uint64(num_shards)).astype(np.int64)
+    else:
+        raise ValueError(f"Unknown partition_by: {partition_by!r}. Use one of {PARTITION_BY}.")
+
+    order = np.argsort(shard_ids, kind="stable")
+    bounds = np.cumsum(np.bincount(shard_ids))[:-1]
+    return [(data.iloc[idx], idx) for idx in np.split(order, bounds) if len(idx)]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """The shared process pool (one worker per CPU), so requests don't pay fork costs."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    return _pool
+
+
+def shutdown_pools() -> None:
+    """Shut down the shared process pool."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _partial_worker(aggregator: Aggregator, frame: pd.DataFrame, positions: np.ndarray) -> Any:
+    """Process-pool entry point (must be module level to be picklable)."""
+    return aggregator.partial(frame, positions)
+
+
+def analyze_sharded(
+    aggregator: Aggregator,
+    data: pd.DataFrame,
+    partition_key: Optional[str] = None,
+    partition_by: str = "hash",
+    num_shards: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    min_rows: int = DEFAULT_MIN_SHARD_ROWS,
+) -> Dict[str, Any]:
+    """
+    Analyze a frame across a process pool and merge the partial results.
+
+    Args:
+        aggregator: The play's mergeable analysis.
+        data: Full input frame.
+        partition_key: Column to shard on (e.g. "region", "opportunity_id").
+        partition_by: "hash" or "value" (see `partition_frame`).
+        num_shards: Number of shards; defaults to the worker count.
+        max_workers: Parallelism (the default shard count), at most and by
+            default `os.cpu_count()`, the size of the shared pool. With 1
+            worker the shards are reduced in-process (useful for debugging merges).
+        min_rows: Frames smaller than this are analyzed in-process.
+
+    Returns:
+        The same `analysis` dict `aggregator.analyze(data)` would return.
+    """
+    cpus = os.cpu_count() or 1
+    max_workers = min(max_workers or cpus, cpus)
+    if len(data) < min_rows:
+        return aggregator.analyze(data)
+
+    shards = partition_frame(data, num_shards or max_workers, partition_key, partition_by)
+    logger.info(f"Sharded analysis: {len(data)} rows in {len(shards)} shards over {max_workers} workers")
+
+    if max_workers == 1 or len(shards) <= 1:
+        partials = [aggregator.partial(frame, positions) for frame, positions in shards]
+    else:
+        pool = _get_pool()
+        futures = [
+            pool.submit(_partial_worker, aggregator, frame, positions)
+            for frame, positions in shards
+        ]
+        partials = [f.result() for f in futures]
+
+    return aggregator.finalize(aggregator.merge(partials))
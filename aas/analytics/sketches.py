@@ -0,0 +1,187 @@
+"""
+Mergeable Sketches
+
+Fixed-size summaries for approximate analytics over data too large to hold:
+
+* `HeavyHitters` - Misra-Gries frequent items; exact while the number of
+  distinct keys fits the capacity, otherwise each count is low by at most
+  `error` (≤ n / (capacity + 1)).
+* `TDigest` - quantiles from a merging t-digest; accurate to a fraction of a
+  percent in the tails, bounded to about `compression / 2` centroids.
+* `HyperLogLog` - distinct counts in `2 ** precision` one-byte registers,
+  about 1.04 / sqrt(2 ** precision) relative error (0.8% at the default).
+
+Each sketch is built from a batch with `of(...)` and merged with `+`, so
+partial sketches from shards and chunks combine in any order, like
+`ExactSum` does for sums. Batches are summarized with vectorized NumPy /
+pandas calls; no per-row Python loops.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+DEFAULT_HEAVY_HITTERS = 64
+DEFAULT_COMPRESSION = 200
+DEFAULT_HLL_PRECISION = 14
+
+
+class HeavyHitters:
+    """Misra-Gries summary of the most frequent keys."""
+
+    __slots__ = ("capacity", "counts", "total", "error")
+
+    def __init__(self, capacity: int = DEFAULT_HEAVY_HITTERS, counts: Optional[Dict[Any, int]] = None,
+                 total: int = 0, error: int = 0):
+        self.capacity = capacity
+        self.counts = counts or {}
+        self.total = total
+        self.error = error
+        self._reduce()
+
+    @classmethod
+    def of(cls, keys: Any, capacity: int = DEFAULT_HEAVY_HITTERS) -> "HeavyHitters":
+        series = pd.Series(keys)
+        counts = series.value_counts(sort=False, dropna=True)
+        return cls(capacity, {k: int(c) for k, c in counts.items()}, total=int(counts.sum()))
+
+    def _reduce(self) -> None:
+        """Keep at most `capacity` counters (the Misra-Gries decrement)."""
+        if len(self.counts) <= self.capacity:
+            return
+        values = np.fromiter(self.counts.values(), dtype=np.int64, count=len(self.counts))
+        cut = int(np.partition(values, len(values) - self.capacity - 1)[len(values) - self.capacity - 1])
+        self.counts = {k: c - cut for k, c in self.counts.items() if c > cut}
+        self.error += cut
+
+    def __add__(self, other: "HeavyHitters") -> "HeavyHitters":
+        counts = dict(self.counts)
+        for key, count in other.counts.items():
+            counts[key] = counts.get(key, 0) + count
+        return HeavyHitters(min(self.capacity, other.capacity), counts,
+                            self.total + other.total, self.error + other.error)
+
+    @property
+    def exact(self) -> bool:
+        return self.error == 0
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[Any, int]]:
+        """Most frequent keys with their (lower-bound) counts; ties by key."""
+        ranked = sorted(self.counts.items(), key=lambda kv: (-kv[1], str(kv[0])))
+        return ranked if n is None else ranked[:n]
+
+
+class TDigest:
+    """Merging t-digest for approximate quantiles."""
+
+    __slots__ = ("compression", "means", "weights", "min", "max")
+
+    def __init__(self, compression: float = DEFAULT_COMPRESSION, means: Optional[np.ndarray] = None,
+                 weights: Optional[np.ndarray] = None, min: float = math.inf, max: float = -math.inf):
+        self.compression = compression
+        self.means = np.empty(0) if means is None else means
+        self.weights = np.empty(0) if weights is None else weights
+        self.min = min
+        self.max = max
+
+    @classmethod
+    def of(cls, values: Any, compression: float = DEFAULT_COMPRESSION) -> "TDigest":
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return cls(compression)
+        values = np.sort(values)
+        digest = cls(compression, min=float(values[0]), max=float(values[-1]))
+        digest.means, digest.weights = _compress(values, np.ones(len(values)), compression)
+        return digest
+
+    def __add__(self, other: "TDigest") -> "TDigest":
+        if not len(other.weights):
+            return self
+        if not len(self.weights):
+            return other
+        compression = min(self.compression, other.compression)
+        means = np.concatenate([self.means, other.means])
+        weights = np.concatenate([self.weights, other.weights])
+        order = np.argsort(means, kind="stable")
+        merged = TDigest(compression, min=min(self.min, other.min), max=max(self.max, other.max))
+        merged.means, merged.weights = _compress(means[order], weights[order], compression)
+        return merged
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def mean(self) -> float:
+        total = self.count
+        return float((self.means * self.weights).sum() / total) if total else math.nan
+
+    def quantile(self, q: float) -> float:
+        """Approximate `q`-quantile (0 ≤ q ≤ 1); NaN when empty."""
+        total = self.count
+        if not total:
+            return math.nan
+        mids = np.cumsum(self.weights) - self.weights / 2
+        xs = np.concatenate([[0.0], mids, [total]])
+        ys = np.concatenate([[self.min], self.means, [self.max]])
+        return float(np.interp(q * total, xs, ys))
+
+
+def _compress(means: np.ndarray, weights: np.ndarray, compression: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge sorted centroids so each spans at most one unit of the k1 scale."""
+    total = weights.sum()
+    q = (np.cumsum(weights) - weights / 2) / total
+    # k1 scale: small centroids in the tails, large ones near the median.
+    k = compression / (2 * math.pi) * np.arcsin(2 * q - 1)
+    groups = np.floor(k - k[0]).astype(np.int64)
+    w = np.bincount(groups, weights=weights)
+    keep = w > 0
+    m = np.bincount(groups, weights=means * weights)[keep] / w[keep]
+    return m, w[keep]
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter."""
+
+    __slots__ = ("precision", "registers")
+
+    def __init__(self, precision: int = DEFAULT_HLL_PRECISION, registers: Optional[np.ndarray] = None):
+        if not 11 <= precision <= 16:
+            raise ValueError("HyperLogLog precision must be between 11 and 16")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8) if registers is None else registers
+
+    @classmethod
+    def of(cls, values: Any, precision: int = DEFAULT_HLL_PRECISION) -> "HyperLogLog":
+        sketch = cls(precision)
+        series = pd.Series(values).dropna()
+        if not len(series):
+            return sketch
+        # Hash the string form so ids hash alike whether read as text or numbers.
+        hashes = pd.util.hash_array(series.astype(str).to_numpy(dtype=object), categorize=False)
+        rest_bits = 64 - precision
+        index = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # rest < 2**53 is exact in float64, so frexp's exponent is its bit length.
+        bit_length = np.frexp(rest.astype(float))[1]
+        rank = (rest_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(sketch.registers, index, rank)
+        return sketch
+
+    def __add__(self, other: "HyperLogLog") -> "HyperLogLog":
+        if self.precision != other.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        return HyperLogLog(self.precision, np.maximum(self.registers, other.registers))
+
+    def estimate(self) -> float:
+        m = float(len(self.registers))
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        zeros = int((self.registers == 0).sum())
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)  # linear counting for small cardinalities
+        return float(raw)
@@ -0,0 +1,254 @@
+"""
+Spend Anomaly Detection
+
+Scores each transaction against a trailing, robust baseline of earlier
+transactions for the same vendor / department / category:
+
+    robust_z = (amount - median) / (1.4826 * MAD)
+
+where median and MAD (median absolute deviation) come from the previous
+`window` transactions of the key. Median and MAD ignore the spikes they are
+meant to find, so one anomaly does not hide the next. Keys with too little
+history fall back to the department / category baseline.
+
+Rows are sorted by key and date once; each row's trailing window is then a
+fixed-width slice of that order, gathered for a block of rows at a time, so
+working memory is `block_rows × window` regardless of ledger size.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+KEY_COLUMNS = ["vendor", "department", "category"]
+FALLBACK_KEY_COLUMNS = ["department", "category"]
+
+DEFAULT_WINDOW = 30
+DEFAULT_MIN_HISTORY = 3
+DEFAULT_THRESHOLD = 3.5
+# Scale floor as a fraction of the baseline: a perfectly steady recurring
+# charge has MAD 0, and a 5% price change should not look infinitely odd.
+DEFAULT_MIN_SCALE_RATIO = 0.05
+DEFAULT_BLOCK_ROWS = 250_000
+MAD_TO_SIGMA = 1.4826
+
+SPEND_COLUMNS = [
+    "transaction_id", "date", "department", "category", "vendor", "amount", "approver", "is_recurring",
+]
+
+
+@dataclass
+class SpendDetectorConfig:
+    """Tuning knobs for `score_transactions`."""
+
+    window: int = DEFAULT_WINDOW
+    min_history: int = DEFAULT_MIN_HISTORY
+    threshold: float = DEFAULT_THRESHOLD
+    min_scale_ratio: float = DEFAULT_MIN_SCALE_RATIO
+    block_rows: int = DEFAULT_BLOCK_ROWS
+
+
+def _sorted_median(window: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Median of each row's first `counts` values (rows sorted, NaNs last)."""
+    rows = np.arange(len(window))
+    lo = np.maximum(counts - 1, 0) // 2
+    hi = counts // 2
+    return (window[rows, lo] + window[rows, hi]) / 2
+
+
+def trailing_median_mad(
+    values: np.ndarray,
+    group_start: np.ndarray,
+    window: int,
+    block_rows: int = DEFAULT_BLOCK_ROWS,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Median and MAD of the previous `window` values within each row's group.
+
+    Args:
+        values: Values sorted by group, then time.
+        group_start: For each row, the position of its group's first row.
+        window: Number of trailing values per baseline.
+        block_rows: Rows gathered per block (memory is `block_rows × window`).
+
+    Returns:
+        `(median, mad, history)`; median and MAD are NaN where a row has no
+        earlier values in its group, `history` is the count used.
+    """
+    n = len(values)
+    median = np.full(n, np.nan)
+    mad = np.full(n, np.nan)
+    history = np.zeros(n, dtype=np.int64)
+    padded = np.concatenate([np.full(window, np.nan), values.astype(float)])
+    offsets = np.arange(window)
+
+    for start in range(0, n, block_rows):
+        stop = min(n, start + block_rows)
+        rows = np.arange(start, stop)
+        # padded[i : i + window] == values[i - window : i]
+        block = np.lib.stride_tricks.sliding_window_view(padded, window)[start:stop].copy()
+        source = rows[:, None] - window + offsets[None, :]
+        block[source < group_start[start:stop, None]] = np.nan
+
+        counts = np.count_nonzero(~np.isnan(block), axis=1)
+        block.sort(axis=1)  # NaNs sort last
+        med = _sorted_median(block, counts)
+        deviation = np.abs(block - med[:, None])
+        deviation.sort(axis=1)
+        spread = _sorted_median(deviation, counts)
+
+        empty = counts == 0
+        med[empty] = np.nan
+        spread[empty] = np.nan
+        median[start:stop], mad[start:stop], history[start:stop] = med, spread, counts
+
+    return median, mad, history
+
+
+def _baseline(
+    frame: pd.DataFrame,
+    keys: Sequence[str],
+    dates: np.ndarray,
+    tie_break: np.ndarray,
+    amounts: np.ndarray,
+    config: SpendDetectorConfig,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Trailing median/MAD/history for each row, grouped by `keys`, in input order."""
+    codes = frame.groupby(list(keys), sort=False, dropna=False).ngroup().to_numpy()
+    order = np.lexsort((tie_break, dates, codes))
+    sorted_codes = codes[order]
+    is_start = np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]
+    group_start = np.maximum.accumulate(np.where(is_start, np.arange(len(frame)), 0))
+
+    median, mad, history = trailing_median_mad(amounts[order], group_start, config.window, config.block_rows)
+    restore = np.empty_like(order)
+    restore[order] = np.arange(len(order))
+    return median[restore], mad[restore], history[restore]
+
+
+def score_transactions(data: pd.DataFrame, config: Optional[SpendDetectorConfig] = None) -> pd.DataFrame:
+    """
+    Score every transaction against its trailing robust baseline.
+
+    Args:
+        data: Transactions with `date`, `amount` and the `KEY_COLUMNS`.
+        config: Detector settings.
+
+    Returns:
+        Frame aligned with `data` with `baseline`, `scale`, `robust_z`,
+        `history`, `baseline_level` ("vendor", "category" or None when the
+        row has too little history) and `is_anomaly`.
+    """
+    config = config or SpendDetectorConfig()
+    dates = pd.to_datetime(data["date"]).to_numpy(dtype="datetime64[ns]")
+    amounts = data["amount"].to_numpy(dtype=float)
+    # Same-day transactions are ordered by id, so scores don't depend on row order.
+    if "transaction_id" in data.columns:
+        tie_break = pd.factorize(data["transaction_id"], sort=True)[0]
+    else:
+        tie_break = np.arange(len(data))
+
+    median, mad, history = _baseline(data, KEY_COLUMNS, dates, tie_break, amounts, config)
+    fb_median, fb_mad, fb_history = _baseline(data, FALLBACK_KEY_COLUMNS, dates, tie_break, amounts, config)
+
+    use_key = history >= config.min_history
+    use_fallback = ~use_key & (fb_history >= config.min_history)
+    baseline = np.where(use_key, median, np.where(use_fallback, fb_median, np.nan))
+    spread = np.where(use_key, mad, np.where(use_fallback, fb_mad, np.nan))
+    scale = np.maximum(MAD_TO_SIGMA * spread, config.min_scale_ratio * np.abs(baseline))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        robust_z = (amounts - baseline) / scale
+
+    level = np.where(use_key, "vendor", np.where(use_fallback, "category", None))
+    return pd.DataFrame({
+        "baseline": baseline,
+        "scale": scale,
+        "robust_z": robust_z,
+        "history": np.where(use_key, history, np.where(use_fallback, fb_history, 0)),
+        "baseline_level": level,
+        "is_anomaly": np.nan_to_num(robust_z, nan=0.0) >= config.threshold,
+    }, index=data.index)
+
+
+def summarize_anomalies(
+    data: pd.DataFrame,
+    scores: pd.DataFrame,
+    top_n: int = 20,
+) -> Dict[str, Any]:
+    """
+    Reduce scored transactions to the spend play's analysis.
+
+    Returns:
+        Dict with `anomalies` (the `top_n` highest-scoring flagged rows),
+        `by_department`, `by_vendor`, `metrics` and `narrative`.
+    """
+    flagged = scores["is_anomaly"].to_numpy()
+    excess = (data["amount"].to_numpy(dtype=float) - scores["baseline"].to_numpy())
+    total_spend = float(data["amount"].sum()) if len(data) else 0.0
+
+    flagged_idx = np.flatnonzero(flagged)
+    z = scores["robust_z"].to_numpy()[flagged_idx]
+    top = flagged_idx[np.lexsort((flagged_idx, -z))][:top_n]
+
+    anomalies: List[Dict[str, Any]] = []
+    for i in top:
+        row = data.iloc[i]
+        anomalies.append({
+            "transaction_id": str(row.get("transaction_id", i)),
+            "date": pd.Timestamp(row["date"]).date().isoformat(),
+            "vendor": row["vendor"],
+            "department": row["department"],
+            "category": row["category"],
+            "approver": row.get("approver"),
+            "amount": float(row["amount"]),
+            "baseline": float(scores["baseline"].iat[i]),
+            "excess": float(excess[i]),
+            "robust_z": round(float(scores["robust_z"].iat[i]), 2),
+            "baseline_level": scores["baseline_level"].iat[i],
+            "history": int(scores["history"].iat[i]),
+        })
+
+    flagged_frame = pd.DataFrame({
+        "department": data["department"].to_numpy()[flagged_idx],
+        "vendor": data["vendor"].to_numpy()[flagged_idx],
+        "excess": excess[flagged_idx],
+    })
+
+    def rollup(column: str) -> Dict[str, Any]:
+        grouped = flagged_frame.groupby(column)["excess"].agg(["count", "sum"]).sort_values("sum", ascending=False)
+        return {
+            str(key): {"anomalies": int(row["count"]), "excess_spend": float(row["sum"])}
+            for key, row in grouped.iterrows()
+        }
+
+    total_excess = float(excess[flagged_idx].sum()) if len(flagged_idx) else 0.0
+    scored = int(np.isfinite(scores["robust_z"].to_numpy()).sum())
+    metrics = {
+        "transactions": int(len(data)),
+        "transactions_scored": scored,
+        "anomalies_detected": int(len(flagged_idx)),
+        "total_spend": total_spend,
+        "excess_spend": total_excess,
+        "excess_spend_pct": (total_excess / total_spend * 100) if total_spend else 0.0,
+    }
+    if len(flagged_idx):
+        worst = anomalies[0]
+        narrative = (
+            f"{len(flagged_idx)} of {scored} scored transactions are anomalous, "
+            f"${total_excess:,.0f} above baseline. Largest: {worst['vendor']} "
+            f"(${worst['amount']:,.0f} vs ${worst['baseline']:,.0f} typical, z={worst['robust_z']})."
+        )
+    else:
+        narrative = f"No spend anomalies found in {scored} scored transactions."
+
+    return {
+        "anomalies": anomalies,
+        "by_department": rollup("department"),
+        "by_vendor": rollup("vendor"),
+        "metrics": metrics,
+        "narrative": narrative,
+    }
@@ -0,0 +1,295 @@
+"""
+Streaming Spend Scoring
+
+Online counterpart of `aas.analytics.spend`: scores transactions as they post
+instead of re-running the batch detector. For every vendor / department /
+category key the scorer keeps an exponentially weighted mean and variance,
+plus one per day-of-week bucket so weekday and weekend spend are judged
+against their own baseline. Keys with too little history fall back to their
+department / category stats, as in the batch detector. Scoring and updating an event is a couple of dict
+lookups and a few float operations: constant time, whatever the history.
+
+Anomalies are folded into the baseline winsorized (capped at
+`mean + threshold·σ`), so a spike does not raise the bar for the next one.
+State is checkpointed to JSON periodically and on demand, and reloaded on
+start.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import pandas as pd  # type: ignore
+
+from ..utils.logger import get_logger
+from .spend import DEFAULT_MIN_SCALE_RATIO, DEFAULT_THRESHOLD, FALLBACK_KEY_COLUMNS, KEY_COLUMNS
+
+logger = get_logger(__name__)
+
+DEFAULT_ALPHA = 0.1
+DEFAULT_MIN_HISTORY = 5
+# Bucket stats replace key stats once a bucket has seen this many events.
+DEFAULT_MIN_BUCKET_HISTORY = 5
+DEFAULT_CHECKPOINT_EVERY = 10_000
+DEFAULT_CHECKPOINT_SECONDS = 60.0
+
+_SEP = "\x1f"
+
+
+def _weekday(value: Any) -> Optional[int]:
+    """Day of week of an ISO date string or datetime-like value."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10]).weekday()
+    return pd.Timestamp(value).weekday()
+
+
+def validate_events(events: List[Dict[str, Any]]) -> None:
+    """
+    Check that every event can be scored before any is folded in.
+
+    Raises:
+        ValueError: Naming the positions whose `amount` is missing or not a
+            finite number, or whose `date` does not parse.
+    """
+    problems = []
+    for i, event in enumerate(events):
+        try:
+            amount = float(event["amount"])
+        except KeyError:
+            problems.append(f"{i}: missing 'amount'")
+            continue
+        except (TypeError, ValueError):
+            problems.append(f"{i}: 'amount' is not a number")
+            continue
+        if not math.isfinite(amount):
+            problems.append(f"{i}: 'amount' is not finite")
+            continue
+        try:
+            _weekday(event.get("date"))
+        except (TypeError, ValueError, OverflowError):
+            problems.append(f"{i}: 'date' is not a date")
+    if problems:
+        more = f" (and {len(problems) - 10} more)" if len(problems) > 10 else ""
+        raise ValueError(f"Invalid transactions at {'; '.join(problems[:10])}{more}")
+
+
+class EwmStats:
+    """Exponentially weighted mean/variance with a cumulative warm-up."""
+
+    __slots__ = ("count", "mean", "var")
+
+    def __init__(self, count: int = 0, mean: float = 0.0, var: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.var = var
+
+    def update(self, value: float, alpha: float) -> None:
+        self.count += 1
+        # Plain running mean until 1/alpha events, then a fixed decay.
+        weight = max(alpha, 1.0 / self.count)
+        delta = value - self.mean
+        self.mean += weight * delta
+        self.var = (1 - weight) * (self.var + weight * delta * delta)
+
+    def to_list(self) -> List[float]:
+        return [self.count, self.mean, self.var]
+
+
+class OnlineSpendScorer:
+    """
+    Constant-time per-event spend anomaly scorer.
+
+    Usage:
+        scorer = OnlineSpendScorer(checkpoint_path="data/spend_stream_state.json")
+        results = scorer.score_batch(transactions)
+        anomalies = [r for r in results if r["is_anomaly"]]
+    """
+
+    def __init__(
+        self,
+        alpha: float = DEFAULT_ALPHA,
+        threshold: float = DEFAULT_THRESHOLD,
+        min_history: int = DEFAULT_MIN_HISTORY,
+        min_bucket_history: int = DEFAULT_MIN_BUCKET_HISTORY,
+        min_scale_ratio: float = DEFAULT_MIN_SCALE_RATIO,
+        checkpoint_path: Optional[Union[str, Path]] = None,
+        checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+        checkpoint_seconds: float = DEFAULT_CHECKPOINT_SECONDS,
+    ):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.min_history = min_history
+        self.min_bucket_history = min_bucket_history
+        self.min_scale_ratio = min_scale_ratio
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_seconds = checkpoint_seconds
+
+        self.keys: Dict[str, EwmStats] = {}
+        self.buckets: Dict[str, EwmStats] = {}
+        self.categories: Dict[str, EwmStats] = {}
+        self.events = 0
+        self._since_checkpoint = 0
+        self._last_checkpoint = time.monotonic()
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, checkpoint_path: Union[str, Path], **kwargs) -> "OnlineSpendScorer":
+        """Restore a scorer from its checkpoint, or start empty if there is none."""
+        scorer = cls(checkpoint_path=checkpoint_path, **kwargs)
+        path = Path(checkpoint_path)
+        if path.exists():
+            state = json.loads(path.read_text(encoding="utf-8"))
+            scorer.events = state.get("events", 0)
+            scorer.keys = {k: EwmStats(*v) for k, v in state.get("keys", {}).items()}
+            scorer.buckets = {k: EwmStats(*v) for k, v in state.get("buckets", {}).items()}
+            scorer.categories = {k: EwmStats(*v) for k, v in state.get("categories", {}).items()}
+            logger.info(f"Restored spend stream state: {len(scorer.keys)} keys, {scorer.events} events")
+        return scorer
+
+    def checkpoint(self) -> Optional[Path]:
+        """Write state to `checkpoint_path` atomically (write, then rename).
+
+        Checkpoints are serialized so an older snapshot never replaces a newer
+        one, and each writes its own temporary file in the target directory.
+        Scoring only waits for the snapshot, not for the write.
+        """
+        if not self.checkpoint_path:
+            return None
+        with self._checkpoint_lock:
+            with self._lock:
+                state = {
+                    "events": self.events,
+                    "keys": {k: s.to_list() for k, s in self.keys.items()},
+                    "buckets": {k: s.to_list() for k, s in self.buckets.items()},
+                    "categories": {k: s.to_list() for k, s in self.categories.items()},
+                }
+                self._since_checkpoint = 0
+                self._last_checkpoint = time.monotonic()
+            self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=self.checkpoint_path.parent,
+                prefix=f".{self.checkpoint_path.name}.", suffix=".tmp", delete=False,
+            ) as tmp:
+                json.dump(state, tmp)
+            try:
+                os.replace(tmp.name, self.checkpoint_path)
+            except OSError:
+                os.unlink(tmp.name)
+                raise
+        return self.checkpoint_path
+
+    @staticmethod
+    def _key(event: Dict[str, Any], columns: List[str]) -> str:
+        return _SEP.join(str(event.get(c, "")) for c in columns)
+
+    @staticmethod
+    def _stats(table: Dict[str, EwmStats], key: str) -> EwmStats:
+        stats = table.get(key)
+        if stats is None:
+            stats = table[key] = EwmStats()
+        return stats
+
+    def score(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Score one transaction, then fold it into the baseline.
+
+        Args:
+            event: Transaction with `amount`, `date` and the `KEY_COLUMNS`.
+
+        Returns:
+            Dict with `baseline`, `robust_z` (None until the key or its
+            category has `min_history` events), `baseline_level` ("bucket",
+            "vendor", "category" or None), `history` and `is_anomaly`.
+        """
+        amount = float(event["amount"])
+        key = self._key(event, KEY_COLUMNS)
+        category_key = self._key(event, FALLBACK_KEY_COLUMNS)
+        weekday = _weekday(event.get("date"))
+        bucket_key = f"{key}{_SEP}{weekday}"
+
+        with self._lock:
+            stats = self._stats(self.keys, key)
+            bucket = self._stats(self.buckets, bucket_key)
+            category = self._stats(self.categories, category_key)
+
+            if weekday is not None and bucket.count >= self.min_bucket_history:
+                reference, level = bucket, "bucket"
+            elif stats.count >= self.min_history:
+                reference, level = stats, "vendor"
+            elif category.count >= self.min_history:
+                reference, level = category, "category"
+            else:
+                reference, level = None, None
+
+            z = None
+            is_anomaly = False
+            value = amount
+            if reference is not None:
+                scale = max(math.sqrt(reference.var), self.min_scale_ratio * abs(reference.mean))
+                z = (amount - reference.mean) / scale if scale > 0 else 0.0
+                is_anomaly = z >= self.threshold
+                # Winsorize anomalies so they don't inflate the baseline.
+                if is_anomaly:
+                    value = reference.mean + self.threshold * scale
+
+            result = {
+                "baseline": reference.mean if reference is not None else None,
+                "robust_z": z,
+                "baseline_level": level,
+                "history": reference.count if reference is not None else stats.count,
+                "is_anomaly": is_anomaly,
+            }
+
+            stats.update(value, self.alpha)
+            category.update(value, self.alpha)
+            if weekday is not None:
+                bucket.update(value, self.alpha)
+            self.events += 1
+            self._since_checkpoint += 1
+            due = self.checkpoint_path is not None and (
+                self._since_checkpoint >= self.checkpoint_every
+                or time.monotonic() - self._last_checkpoint >= self.checkpoint_seconds
+            )
+
+        if due:
+            self.checkpoint()
+        return result
+
+    def score_batch(self, events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Score events in order; each result also carries the event's fields.
+
+        The whole batch is validated first (see `validate_events`), so a bad
+        event raises `ValueError` without folding in the ones before it.
+        """
+        events = list(events)
+        validate_events(events)
+        return [{**event, **self.score(event)} for event in events]
+
+    def warm_start(self, ledger: pd.DataFrame) -> int:
+        """Replay a historical ledger (oldest first) to seed the baselines."""
+        if ledger is None or len(ledger) == 0:
+            return 0
+        ordered = ledger.sort_values("date", kind="stable")
+        for event in ordered[["date", "amount", *KEY_COLUMNS]].to_dict("records"):
+            self.score(event)
+        return len(ordered)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "events": self.events,
+            "keys": len(self.keys),
+            "buckets": len(self.buckets),
+            "categories": len(self.categories),
+        }
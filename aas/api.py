@@ -3,15 +3,17 @@ from __future__ import annotations
 import os
 import json
 import csv
+import threading
 import time
+from contextlib import asynccontextmanager
 from pathlib import Path
 from uuid import uuid4
 from datetime import datetime, timezone, timedelta
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, Optional
 from urllib.parse import quote
 import jwt
 
-from .db import get_conn
+from .db import copy_frame, get_conn
 
 from dotenv import load_dotenv
 
@@ -19,9 +21,9 @@ from dotenv import load_dotenv
 _env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(_env_path, override=True)
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 
@@ -32,7 +34,13 @@ from .agents.churn_rescue import ChurnRescueAgent
 from .agents.spend_anomaly import SpendAnomalyAgent
 from .agents.revenue_forecasting import RevenueForecastingAgent
 from .agents.customer_segmentation import CustomerSegmentationAgent
+from .agents.base import InvalidParams
+from .analytics.findings import FINDING_COLUMNS
+from .analytics.sharding import shutdown_pools
 from .executor import execute_actions
+from .llm import get_llm_router
+from .llm.clients import close_clients
+from .llm.enrichment import get_enricher
 from .services.tableau_client import TableauClient
 
 # Import and initialize play registry
@@ -51,7 +59,17 @@ except Exception:
 
 logger = get_logger(__name__)
 
-app = FastAPI(title="Agentic Analytics Studio API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Finish deferred rationales in progress, then close pooled LLM
+    # connections and their background event loop, and the shard workers.
+    get_enricher().shutdown()
+    close_clients()
+    shutdown_pools()
+
+
+app = FastAPI(title="Agentic Analytics Studio API", version="0.1.0", lifespan=lifespan)
 
 # Dev-friendly CORS (lock down later)
 # Note: allow_origins=["*"] conflicts with allow_credentials=True, so we must list explicit origins.
@@ -166,76 +184,14 @@ def plays():
         return {"plays": list(AGENTS.keys())}
 
 
-@app.post("/run/{play}")
-def run_play(play: str, req: RunRequest = RunRequest()):
-    play = play.lower().strip()
-    agent_cls = AGENTS.get(play)
-    if not agent_cls:
-        raise HTTPException(status_code=400, detail=f"Unknown play '{play}'. Try one of: {list(AGENTS.keys())}")
-
-    agent = agent_cls()  # some agents don't accept constructor args yet
-
-    # Attach params in a consistent way
-    if hasattr(agent, "params") and isinstance(getattr(agent, "params"), dict):
-        agent.params.update(req.params)
-    else:
-        agent.params = req.params
-
-    run_id = str(uuid4())
-    generated_at = datetime.now(timezone.utc).isoformat()
-
-    result = agent.run()
-
-    # Support both PlayResult (preferred) and raw dict (current)
-    if hasattr(result, "to_dict"):
-        payload = result.to_dict()
-    elif isinstance(result, dict):
-        payload = result
-    else:
-        payload = {"result": str(result)}
-
-    # Enrich actions with Tableau embed URLs if possible
-    if "actions" in payload and isinstance(payload["actions"], list):
-        try:
-            from .services.tableau_client import TableauClient
-            server_url = os.getenv("TABLEAU_SERVER_URL")
-            if server_url:
-                client = TableauClient(
-                    server_url=server_url,
-                    site_id=os.getenv("TABLEAU_SITE_ID", ""),
-                    token_name=os.getenv("TABLEAU_TOKEN_NAME", ""),
-                    token_secret=os.getenv("TABLEAU_TOKEN_SECRET", "")
-                )
-                views = client.get_views()
-                if views:
-                    # Default to first view if not specified, 
-                    # or try to match view_name from visual_context
-                    pref_view = views[0]
-                    viz_ctx = payload.get("visual_context", {})
-                    if viz_ctx.get("view_name"):
-                        match = next((v for v in views if viz_ctx["view_name"].lower() in v["name"].lower()), None)
-                        if match:
-                            pref_view = match
-                    
-                    for action in payload["actions"]:
-                        if "metadata" not in action:
-                            action["metadata"] = {}
-                        if "embed_url" not in action["metadata"]:
-                            action["metadata"]["embed_url"] = pref_view["embed_url"]
-        except Exception as e:
-            # Silent fail for enrichment
-            pass
-
-    # Add run metadata to the top-level response
-    if isinstance(payload, dict):
-        payload = {
-            "run_id": run_id,
-            "play": play,
-            "generated_at": generated_at,
-            **payload,
-        }
-
-    # --- DB PERSISTENCE START ---
+def _persist_run(
+    run_id: str,
+    generated_at: str,
+    play: str,
+    payload: Dict[str, Any],
+    notes: str = "api run",
+) -> None:
+    """Record a run and its actions in Postgres (no-op without a DB); adds `action_id` to each action."""
     try:
         conn = get_conn()
         if conn:
@@ -245,7 +201,7 @@ def run_play(play: str, req: RunRequest = RunRequest()):
             with conn.cursor() as cur:
                 cur.execute(
                     "INSERT INTO aas_pipeline_runs (run_id, run_ts, play, notes) VALUES (%s, %s, %s, %s)",
-                    (run_id, run_ts, play, "api run"),
+                    (run_id, run_ts, play, notes),
                 )
 
                 # 2. Insert Actions
@@ -316,7 +272,142 @@ def run_play(play: str, req: RunRequest = RunRequest()):
             conn.close()
     except Exception as e:
         print(f"Warning: Failed to persist run to DB: {e}")
-    # --- DB PERSISTENCE END ---
+
+
+def _persist_run_findings(run_id: str, findings: Iterable[Any]) -> None:
+    """Background task: COPY a run's findings once its response has been sent.
+
+    Runs after `_persist_run`, so the run row already exists. Building the
+    findings may re-read a chunked source; none of that delays the response.
+    """
+    try:
+        conn = get_conn()
+    except Exception as e:
+        logger.warning("Failed to persist findings for run %s: %s", run_id, e)
+        return
+    try:
+        _persist_findings(conn, run_id, findings)
+    finally:
+        conn.close()
+
+
+def _persist_findings(conn, run_id: str, findings: Iterable[Any]) -> int:
+    """COPY finding batches into `aas_findings`; failures leave the run and its actions in place."""
+    written = 0
+    try:
+        for frame in findings:
+            written += copy_frame(conn, frame, "aas_findings", FINDING_COLUMNS)
+        logger.info("Persisted %d findings for run %s", written, run_id)
+    except Exception as e:
+        logger.warning("Failed to persist findings for run %s after %d rows: %s", run_id, written, e)
+    return written
+
+
+def _persist_rationales(run_id: str, rationales: list[Dict[str, Any]]) -> None:
+    """Write finished deferred rationales into their actions' payloads (no-op without a DB)."""
+    rows = [
+        (json.dumps({"reasoning": r["reasoning"], "rationale_status": r["rationale_status"]}), r["action_id"])
+        for r in rationales
+        if r.get("action_id")
+    ]
+    if not rows:
+        return
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.executemany("UPDATE aas_actions SET payload = payload || %s::jsonb WHERE action_id = %s", rows)
+        logger.info("Persisted %d deferred rationales for run %s", len(rows), run_id)
+    finally:
+        conn.close()
+
+
+@app.post("/run/{play}")
+def run_play(play: str, background_tasks: BackgroundTasks, req: RunRequest = RunRequest()):
+    play = play.lower().strip()
+    agent_cls = AGENTS.get(play)
+    if not agent_cls:
+        raise HTTPException(status_code=400, detail=f"Unknown play '{play}'. Try one of: {list(AGENTS.keys())}")
+
+    agent = agent_cls()  # some agents don't accept constructor args yet
+
+    # Attach params in a consistent way
+    if hasattr(agent, "params") and isinstance(getattr(agent, "params"), dict):
+        agent.params.update(req.params)
+    else:
+        agent.params = req.params
+
+    run_id = str(uuid4())
+    generated_at = datetime.now(timezone.utc).isoformat()
+
+    try:
+        result = agent.run()
+    except InvalidParams as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Support both PlayResult (preferred) and raw dict (current)
+    if hasattr(result, "to_dict"):
+        payload = result.to_dict()
+    elif isinstance(result, dict):
+        payload = result
+    else:
+        payload = {"result": str(result)}
+
+    # Enrich actions with Tableau embed URLs if possible
+    if "actions" in payload and isinstance(payload["actions"], list):
+        try:
+            from .services.tableau_client import TableauClient
+            server_url = os.getenv("TABLEAU_SERVER_URL")
+            if server_url:
+                client = TableauClient(
+                    server_url=server_url,
+                    site_id=os.getenv("TABLEAU_SITE_ID", ""),
+                    token_name=os.getenv("TABLEAU_TOKEN_NAME", ""),
+                    token_secret=os.getenv("TABLEAU_TOKEN_SECRET", "")
+                )
+                views = client.get_views()
+                if views:
+                    # Default to first view if not specified, 
+                    # or try to match view_name from visual_context
+                    pref_view = views[0]
+                    viz_ctx = payload.get("visual_context", {})
+                    if viz_ctx.get("view_name"):
+                        match = next((v for v in views if viz_ctx["view_name"].lower() in v["name"].lower()), None)
+                        if match:
+                            pref_view = match
+                    
+                    for action in payload["actions"]:
+                        if "metadata" not in action:
+                            action["metadata"] = {}
+                        if "embed_url" not in action["metadata"]:
+                            action["metadata"]["embed_url"] = pref_view["embed_url"]
+        except Exception as e:
+            # Silent fail for enrichment
+            pass
+
+    # Add run metadata to the top-level response
+    if isinstance(payload, dict):
+        payload = {
+            "run_id": run_id,
+            "play": play,
+            "generated_at": generated_at,
+            **payload,
+        }
+
+    pending = getattr(agent, "pending_rationales", None)
+    if pending and isinstance(payload, dict):
+        payload["rationales_url"] = f"/runs/{run_id}/rationales"
+
+    _persist_run(run_id, generated_at, play, payload)
+    if os.getenv("DATABASE_URL"):
+        background_tasks.add_task(_persist_run_findings, run_id, agent.iter_findings(run_id, generated_at))
+
+    if pending and isinstance(payload, dict):
+        actions = payload.get("actions") or []
+        get_enricher().submit(
+            run_id,
+            [(i, actions[i].get("action_id"), context) for i, context in pending],
+            persist=_persist_rationales,
+        )
 
     return jsonable_encoder(payload, custom_encoder=CUSTOM_ENCODERS)
 
@@ -717,3 +808,331 @@ def export_impact_report(format: str = "csv"):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
 
+
+
+# --- Forecast Cube Endpoints ---
+
+from .analytics.forecast_cube import ForecastCube
+
+_forecast_cube: ForecastCube | None = None
+_forecast_cube_lock = threading.Lock()
+
+
+class CubeQueryRequest(BaseModel):
+    group_by: list[str] = Field(default_factory=list, description="Dimensions to group by")
+    filters: Dict[str, Any] = Field(default_factory=dict, description="Per-dimension value, list or {from, to} range")
+
+
+class CubeUpdateRequest(BaseModel):
+    upsert: list[Dict[str, Any]] = Field(default_factory=list, description="New or changed deal rows")
+    remove: list[str] = Field(default_factory=list, description="opportunity_ids of deleted deals")
+
+
+def _get_forecast_cube() -> ForecastCube:
+    """Build the cube from the revenue play's deal source on first use."""
+    global _forecast_cube
+    if _forecast_cube is None:
+        with _forecast_cube_lock:
+            if _forecast_cube is None:
+                agent = RevenueForecastingAgent()
+                _forecast_cube = ForecastCube.from_deals(agent.load_data(), agent.OPEN_STAGES)
+    return _forecast_cube
+
+
+@app.post("/forecast/cube/query")
+def query_forecast_cube(req: CubeQueryRequest = CubeQueryRequest()):
+    """
+    Slice or roll up the forecast cube (segment × region × owner × close week/month).
+
+    Example body: {"group_by": ["owner"], "filters": {"segment": "Enterprise",
+    "close_month": {"from": "2026-01", "to": "2026-03"}}}
+    """
+    try:
+        return _get_forecast_cube().query(req.group_by, req.filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/forecast/cube/deals")
+def update_forecast_cube(req: CubeUpdateRequest):
+    """Apply changed and deleted deals to the cube incrementally."""
+    cube = _get_forecast_cube()
+    try:
+        upserted = cube.upsert(pd.DataFrame(req.upsert)) if req.upsert else 0
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    removed = cube.remove(req.remove)
+    return {"upserted": upserted, "removed": removed, "deals": len(cube)}
+
+
+# --- Forecast Sweep Endpoint ---
+
+
+class SweepRequest(BaseModel):
+    target_revenue: list[float | None] | None = Field(default=None, description="Targets; null uses the default target")
+    forecast_period_days: list[int] | None = Field(default=None, description="Horizons in days")
+    win_rate: list[float | None] | None = Field(default=None, description="Win-rate overrides; null uses the historical rate")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Extra revenue play params (e.g. data)")
+
+
+@app.post("/forecast/sweep")
+def forecast_sweep(req: SweepRequest = SweepRequest()):
+    """
+    Evaluate a what-if grid (targets × horizons × win rates) in one pass over the deals.
+
+    Returns the resolved axes and compact result matrices; no actions are generated.
+    """
+    agent = RevenueForecastingAgent()
+    agent.params.update(req.params)
+    data = agent.load_data()
+    if data is None or len(data) == 0:
+        raise HTTPException(status_code=400, detail="No deal data available for the sweep")
+    return agent.sweep(
+        data,
+        target_revenue=req.target_revenue,
+        forecast_period_days=req.forecast_period_days,
+        win_rate=req.win_rate,
+    )
+
+
+# --- Streaming Spend Ingest ---
+
+from .analytics.spend_stream import OnlineSpendScorer, validate_events
+
+SPEND_STREAM_STATE = APPROVALS_DIR / "spend_stream_state.json"
+_spend_scorer: OnlineSpendScorer | None = None
+_spend_scorer_lock = threading.Lock()
+
+
+class SpendIngestRequest(BaseModel):
+    transactions: list[Dict[str, Any]] = Field(default_factory=list, description="Newly posted transactions, oldest first")
+
+
+def _get_spend_scorer() -> OnlineSpendScorer:
+    """Restore the scorer from its checkpoint, or warm it on the spend play's ledger."""
+    global _spend_scorer
+    if _spend_scorer is None:
+        with _spend_scorer_lock:
+            if _spend_scorer is None:
+                scorer = OnlineSpendScorer.load(SPEND_STREAM_STATE)
+                if not scorer.events:
+                    scorer.warm_start(SpendAnomalyAgent().load_data())
+                    scorer.checkpoint()
+                _spend_scorer = scorer
+    return _spend_scorer
+
+
+@app.post("/ingest/spend")
+def ingest_spend(req: SpendIngestRequest):
+    """
+    Score a batch of transactions as they post, in constant time per event.
+
+    Only anomalous transactions produce actions; those runs are persisted like
+    `/run/spend`. Quiet batches just update the running baselines.
+    """
+    try:
+        validate_events(req.transactions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    result = SpendAnomalyAgent().ingest(req.transactions, _get_spend_scorer())
+    payload: Dict[str, Any] = {"play": "spend", **result}
+    if result["actions"]:
+        payload["run_id"] = str(uuid4())
+        payload["generated_at"] = datetime.now(timezone.utc).isoformat()
+        _persist_run(payload["run_id"], payload["generated_at"], "spend", payload, notes="stream ingest")
+    return jsonable_encoder(payload, custom_encoder=CUSTOM_ENCODERS)
+
+
+# --- Customer Segment Assignment ---
+
+SEGMENTATION_MODEL_PATH = APPROVALS_DIR / "segmentation_model.json"
+
+
+class SegmentAssignRequest(BaseModel):
+    customers: list[Dict[str, Any]] = Field(default_factory=list, description="Customer rows to label")
+    update: bool = Field(default=False, description="Also fold these customers into the segment centroids")
+
+
+@app.post("/segments/assign")
+def assign_segments(req: SegmentAssignRequest):
+    """
+    Label customers with the saved segmentation model, without re-clustering.
+
+    The model is fit once on the customer base the first time it is needed.
+    """
+    agent = CustomerSegmentationAgent()
+    agent.model_path = SEGMENTATION_MODEL_PATH
+    if not SEGMENTATION_MODEL_PATH.exists():
+        agent.analyze(agent.load_data())
+    try:
+        return {"assignments": agent.assign(pd.DataFrame(req.customers), update=req.update)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# --- Opportunity Findings ---
+
+MAX_FINDINGS = 1000
+
+
+@app.get("/findings")
+def findings(
+    run_id: str | None = None,
+    opportunity_id: str | None = None,
+    risk_driver: str | None = None,
+    min_risk_score: float | None = None,
+    limit: int = 100,
+):
+    """
+    Query persisted per-opportunity findings, highest risk first.
+
+    `run_id="latest"` selects the most recent pipeline run. Filters combine
+    with AND; each is backed by an index on `aas_findings`.
+    """
+    if not 1 <= limit <= MAX_FINDINGS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_FINDINGS}")
+
+    try:
+        conn = get_conn()
+    except Exception:
+        return {"findings": [], "status": "no_db_configured"}
+
+    where = []
+    args: list[Any] = []
+    if run_id == "latest":
+        where.append(
+            "f.run_id = (SELECT run_id FROM aas_pipeline_runs WHERE play = 'pipeline' ORDER BY run_ts DESC LIMIT 1)"
+        )
+    elif run_id:
+        where.append("f.run_id = %s")
+        args.append(run_id)
+    if opportunity_id:
+        where.append("f.opportunity_id = %s")
+        args.append(opportunity_id)
+    if risk_driver:
+        where.append("f.risk_driver = %s")
+        args.append(risk_driver)
+    if min_risk_score is not None:
+        where.append("f.risk_score >= %s")
+        args.append(min_risk_score)
+
+    sql = (
+        "SELECT f.finding_id, f.run_id, f.opportunity_id, f.risk_score, f.risk_driver, f.details, f.created_at "
+        "FROM aas_findings f"
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + " ORDER BY f.risk_score DESC, f.created_at DESC LIMIT %s"
+    )
+    args.append(limit)
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql, tuple(args))
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+
+    out = []
+    for r in rows:
+        details = r[5]
+        if isinstance(details, (str, bytes, bytearray)):
+            details = json.loads(details)
+        out.append({
+            "finding_id": r[0],
+            "run_id": r[1],
+            "opportunity_id": r[2],
+            "risk_score": float(r[3]),
+            "risk_driver": r[4],
+            "details": details,
+            "created_at": r[6],
+        })
+    return jsonable_encoder({
+        "findings": out,
+        "filters": {
+            "run_id": run_id,
+            "opportunity_id": opportunity_id,
+            "risk_driver": risk_driver,
+            "min_risk_score": min_risk_score,
+        },
+    })
+
+
+# --- Deferred Rationales ---
+
+MAX_RATIONALE_WAIT = 30.0
+
+
+@app.get("/runs/{run_id}/rationales")
+def run_rationales(run_id: str, wait: float = 0.0):
+    """
+    Rationales of a run started with `rationale_mode: "deferred"`.
+
+    `status` is "pending" until every rationale is filled in. With `wait`,
+    the call blocks up to that many seconds (at most 30) for them to finish,
+    so clients can long-poll instead of re-requesting. Runs no longer held
+    in memory are read back from `aas_actions`.
+    """
+    if not 0 <= wait <= MAX_RATIONALE_WAIT:
+        raise HTTPException(status_code=400, detail=f"wait must be between 0 and {MAX_RATIONALE_WAIT:g} seconds")
+
+    run = get_enricher().wait(run_id, wait)
+    if run is not None:
+        return run.to_dict()
+
+    try:
+        conn = get_conn()
+    except Exception:
+        raise HTTPException(status_code=404, detail=f"No deferred rationales for run '{run_id}'")
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT action_id, payload->>'reasoning', payload->>'rationale_status' "
+                "FROM aas_actions WHERE run_id = %s ORDER BY action_id",
+                (run_id,),
+            )
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"No deferred rationales for run '{run_id}'")
+
+    rationales = [{"action_id": r[0], "reasoning": r[1], "rationale_status": r[2]} for r in rows]
+    status = "pending" if any(r["rationale_status"] == "pending" for r in rationales) else "complete"
+    return {"run_id": run_id, "status": status, "rationales": rationales}
+
+
+# --- Streaming Text ---
+
+
+class StreamRequest(BaseModel):
+    prompt_key: str = Field(default="analysis_summary_template", description="Template key in prompts.yaml")
+    context: Dict[str, Any] = Field(default_factory=dict, description="Template variables")
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/llm/stream")
+def stream_text(req: StreamRequest):
+    """
+    Generate text from a prompt template as server-sent events.
+
+    Each `token` event carries the next chunk of text as the provider sends
+    it, so clients can render long narratives from the first token instead
+    of waiting for the whole answer; a final `done` event closes the stream.
+    """
+    router = get_llm_router()
+    if req.prompt_key not in router.registry.templates:
+        raise HTTPException(status_code=404, detail=f"Unknown prompt '{req.prompt_key}'")
+
+    def _events() -> Iterable[str]:
+        for chunk in router.stream(req.prompt_key, req.context):
+            yield _sse("token", {"text": chunk})
+        yield _sse("done", {"provider": router.get_provider_name()})
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,6 +1,13 @@
+import io
 import os
+from typing import Optional, Sequence
+
 import psycopg2
 
+# Rows serialized per COPY buffer; bounds memory for multi-million-row loads.
+COPY_CHUNK_ROWS = 100_000
+
+
 def get_conn():
     db = os.getenv("DATABASE_URL")
     if not db:
@@ -8,3 +15,47 @@ def get_conn():
     conn = psycopg2.connect(db)
     conn.autocommit = True
     return conn
+
+
+def copy_frame(
+    conn,
+    frame,
+    table: str,
+    columns: Optional[Sequence[str]] = None,
+    on_conflict_do_nothing: bool = False,
+    chunk_rows: int = COPY_CHUNK_ROWS,
+) -> int:
+    """
+    Bulk-load a DataFrame into a table with COPY.
+
+    Args:
+        conn: psycopg2 connection.
+        frame: Rows to load; columns are matched by name.
+        table: Target table.
+        columns: Columns to load (defaults to all frame columns).
+        on_conflict_do_nothing: COPY into a temp staging table and insert with
+            ON CONFLICT DO NOTHING, so re-running a load skips existing keys.
+        chunk_rows: Rows serialized per COPY buffer.
+
+    Returns:
+        Number of rows sent.
+    """
+    columns = list(columns or frame.columns)
+    column_sql = ", ".join(columns)
+    target = table
+    with conn.cursor() as cur:
+        if on_conflict_do_nothing:
+            target = f"_aas_copy_{table}"
+            cur.execute(f"DROP TABLE IF EXISTS {target}")
+            cur.execute(f"CREATE TEMP TABLE {target} (LIKE {table} INCLUDING DEFAULTS)")
+        for start in range(0, len(frame), chunk_rows):
+            buf = io.StringIO()
+            frame.iloc[start:start + chunk_rows][columns].to_csv(buf, index=False, header=False)
+            buf.seek(0)
+            cur.copy_expert(f"COPY {target} ({column_sql}) FROM STDIN WITH (FORMAT csv)", buf)
+        if on_conflict_do_nothing:
+            cur.execute(
+                f"INSERT INTO {table} ({column_sql}) SELECT {column_sql} FROM {target} ON CONFLICT DO NOTHING"
+            )
+            cur.execute(f"DROP TABLE {target}")
+    return len(frame)
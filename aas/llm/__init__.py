@@ -5,10 +5,17 @@ This module provides a unified interface for multiple LLM providers and
 manages prompt templates for consistent AI-generated content.
 """
 
+import json
 import os
-import yaml
-from pathlib import Path
-from typing import Optional, Dict, Any
+import threading
+import time
+from typing import Optional, Dict, Any, Iterable, Iterator, List
+
+from ..utils.cache import LLMCache, get_llm_cache
+from ..utils.logger import get_logger
+from .breaker import get_breaker
+from .clients import get_client
+from .prompts import get_prompt_registry, max_prompt_tokens
 
 # Import providers
 try:
@@ -18,6 +25,48 @@ except ImportError:
     AnthropicProvider = None
     GeminiProvider = None
 
+logger = get_logger(__name__)
+
+PROVIDER_NAMES = ("openai", "ollama", "anthropic", "gemini", "none")
+FALLBACK_PROMPTS = {
+    "high": "fallback_rationale_high_priority",
+    "medium": "fallback_rationale_medium_priority",
+    "low": "fallback_rationale_low_priority",
+}
+
+# HTTP timeout for router calls (seconds), before any run budget cuts it.
+ROUTER_TIMEOUT = 30.0
+
+_UNSET = object()
+
+
+def _sse_tokens(lines: Iterable[str]) -> Iterator[str]:
+    """Text deltas of an OpenAI chat-completions event stream."""
+    for line in lines:
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        choices = json.loads(data).get("choices") or [{}]
+        delta = (choices[0].get("delta") or {}).get("content")
+        if delta:
+            yield delta
+
+
+def _ndjson_tokens(lines: Iterable[str]) -> Iterator[str]:
+    """Text pieces of an Ollama `/generate` stream (one JSON object per line)."""
+    for line in lines:
+        if not line.strip():
+            continue
+        chunk = json.loads(line)
+        if chunk.get("error"):
+            raise RuntimeError(chunk["error"])
+        if chunk.get("response"):
+            yield chunk["response"]
+        if chunk.get("done"):
+            return
+
 
 class LLMRouter:
     """
@@ -30,52 +79,57 @@ class LLMRouter:
         """
         Initialize LLM router.
         
+        Construction is cheap: prompts come from the shared, precompiled
+        registry, and the provider client (with its SDK import) is only
+        created when first needed.
+        
         Args:
             provider: Provider name (openai, ollama, anthropic, gemini, none)
                      If not provided, uses LLM_PROVIDER env var
         """
         self.provider_name = (provider or os.getenv("LLM_PROVIDER", "none")).lower()
-        self.provider = None
-        self.prompts = self._load_prompts()
-        
-        # Initialize the appropriate provider
+        if self.provider_name not in PROVIDER_NAMES:
+            raise ValueError(f"Unknown LLM provider: {self.provider_name}")
+        self.registry = get_prompt_registry()
+        self._provider: Any = _UNSET
+        self._provider_lock = threading.Lock()
+    
+    @property
+    def provider(self) -> Any:
+        """The provider client, created on first use (`None` in rule-based mode)."""
+        if self._provider is _UNSET:
+            with self._provider_lock:
+                if self._provider is _UNSET:
+                    self._provider = self._init_provider()
+        return self._provider
+    
+    @provider.setter
+    def provider(self, value: Any) -> None:
+        self._provider = value
+    
+    @property
+    def prompts(self) -> Dict[str, str]:
+        """Raw prompt templates by key."""
+        return self.registry.raw
+    
+    def _init_provider(self) -> Any:
         if self.provider_name == "openai":
-            self.provider = self._init_openai()
+            return self._init_openai()
         elif self.provider_name == "ollama":
-            self.provider = self._init_ollama()
+            return self._init_ollama()
         elif self.provider_name == "anthropic":
-            self.provider = self._init_anthropic()
+            return self._init_anthropic()
         elif self.provider_name == "gemini":
-            self.provider = self._init_gemini()
-        elif self.provider_name == "none":
-            self.provider = None  # Use rule-based fallback
-        else:
-            raise ValueError(f"Unknown LLM provider: {self.provider_name}")
-    
-    def _load_prompts(self) -> Dict[str, str]:
-        """Load prompt templates from prompts.yaml."""
-        prompts_path = Path(__file__).parent / "prompts.yaml"
-        
-        if prompts_path.exists():
-            with open(prompts_path, 'r') as f:
-                return yaml.safe_load(f)
-        else:
-            print(f"Warning: prompts.yaml not found at {prompts_path}")
-            return {}
+            return self._init_gemini()
+        return None  # "none": rule-based fallback
     
     def _init_openai(self):
-        """Initialize OpenAI provider."""
-        try:
-            import openai
-            api_key = os.getenv("OPENAI_API_KEY")
-            if api_key:
-                openai.api_key = api_key
-                return "openai"  # Simplified for now
-            else:
-                print("Warning: OPENAI_API_KEY not set. Falling back to rule-based mode.")
-                return None
-        except ImportError:
-            print("Warning: openai library not installed. Falling back to rule-based mode.")
+        """Initialize OpenAI provider (REST API over the shared HTTP client)."""
+        api_key = os.getenv("OPENAI_API_KEY")
+        if api_key:
+            return "openai"  # Simplified for now
+        else:
+            logger.warning("OPENAI_API_KEY not set. Falling back to rule-based mode.")
             return None
     
     def _init_ollama(self):
@@ -90,7 +144,7 @@ class LLMRouter:
         if AnthropicProvider:
             return AnthropicProvider()
         else:
-            print("Warning: Anthropic provider not available. Falling back to rule-based mode.")
+            logger.warning("Anthropic provider not available. Falling back to rule-based mode.")
             return None
     
     def _init_gemini(self):
@@ -98,13 +152,101 @@ class LLMRouter:
         if GeminiProvider:
             return GeminiProvider()
         else:
-            print("Warning: Gemini provider not available. Falling back to rule-based mode.")
+            logger.warning("Gemini provider not available. Falling back to rule-based mode.")
             return None
     
+    def _render(self, prompt_key: str, context: Dict[str, Any]) -> str:
+        """Fill the `prompt_key` template (or the generic one) with `context`, within `LLM_MAX_PROMPT_TOKENS`."""
+        return self.registry.render(prompt_key, context, max_tokens=max_prompt_tokens())
+    
+    def _complete(self, prompt: str, max_tokens: int = 500) -> Optional[str]:
+        """Send `prompt` to the configured provider; `None` in rule-based mode or on error.
+        
+        Calls go through the provider's circuit breaker (shared with the
+        action rationale path), so while the provider keeps failing they
+        return `None` at once instead of waiting for the timeout.
+        
+        Inside a run's `rationale_budget()`, the call is charged to the budget,
+        its HTTP timeout is cut to what is left, and once the budget is spent
+        no call is made (`None`, so callers use the rule-based text).
+        """
+        from .rationale import current_budget
+        
+        if self.provider is None:
+            return None
+        budget = current_budget()
+        if budget is not None and budget.exhausted:
+            return None
+        breaker = get_breaker(self.provider_name)
+        permit = breaker.allow()
+        if permit is None:
+            return None
+        
+        start = time.perf_counter()
+        try:
+            if budget is None:
+                text = self._call(prompt, max_tokens, ROUTER_TIMEOUT)
+            else:
+                with budget.timing():
+                    text = self._call(prompt, max_tokens, budget.clip(ROUTER_TIMEOUT))
+        except Exception:
+            breaker.record(False, permit=permit)
+            raise
+        except BaseException:
+            breaker.release(permit)
+            raise
+        breaker.record(text is not None, time.perf_counter() - start, permit)
+        return text
+    
+    def _call(self, prompt: str, max_tokens: int, timeout: float) -> Optional[str]:
+        if self.provider_name == "anthropic" and isinstance(self.provider, AnthropicProvider):
+            return self._generate_sdk(prompt, max_tokens=max_tokens)
+        
+        elif self.provider_name == "gemini" and isinstance(self.provider, GeminiProvider):
+            return self._generate_sdk(prompt, max_tokens=max_tokens)
+        
+        elif self.provider_name == "openai" and self.provider:
+            return self._generate_openai(prompt, max_tokens=max_tokens, timeout=timeout)
+        
+        elif self.provider_name == "ollama" and self.provider:
+            return self._generate_ollama(prompt, timeout=timeout)
+        
+        return None
+    
+    def _generate_sdk(self, prompt: str, max_tokens: int = 500) -> Optional[str]:
+        """Call the Anthropic / Gemini wrapper; `None` on error rather than its stub text, which must not be cached."""
+        try:
+            return self.provider.generate(prompt, max_tokens=max_tokens, fallback=False)
+        except Exception as e:
+            logger.error(f"Error calling {self.provider_name}: {e}")
+            return None
+    
+    def _model_name(self) -> str:
+        if self.provider_name == "openai":
+            return os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+        if isinstance(self.provider, dict):
+            return self.provider.get("model", "")
+        return getattr(self.provider, "model", None) or getattr(self.provider, "model_name", "")
+    
+    def _cache(self):
+        """The shared disk cache, unless answers come from rules or a provider stub."""
+        if self.provider is None or not getattr(self.provider, "is_available", lambda: True)():
+            return None
+        return get_llm_cache()
+    
+    def _cache_key(self, prompt_key: str, context: Dict[str, Any]) -> str:
+        """Disk-cache key; includes the template text so prompt edits miss the cache."""
+        template = self.registry.get(prompt_key)
+        text = template.text if template is not None else ""
+        return LLMCache.key(self.provider_name, self._model_name(), f"{prompt_key}\n{text}", context)
+    
     def generate(self, prompt_key: str, context: Dict[str, Any]) -> str:
         """
         Generate text using the configured provider.
         
+        Provider answers are kept in the shared disk cache, so the same
+        prompt and context are only sent once per TTL.
+        
         Args:
             prompt_key: Key for prompt template in prompts.yaml
             context: Dictionary of variables to fill in the template
@@ -112,76 +254,200 @@ class LLMRouter:
         Returns:
             Generated text
         """
-        # Get prompt template
-        prompt_template = self.prompts.get(prompt_key, "")
+        cache = self._cache()
+        key = self._cache_key(prompt_key, context) if cache else None
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            return cached
         
-        if not prompt_template:
-            # Fallback to generic template
-            prompt_template = self.prompts.get("rationale_template", "")
+        text = self._complete(self._render(prompt_key, context))
+        if text is None:
+            # Rule-based fallback
+            return self._generate_fallback(context)
+        if cache:
+            cache.set(key, text)
+        return text
+    
+    def generate_batch(self, prompt_key: str, contexts: List[Dict[str, Any]]) -> List[str]:
+        """
+        Generate text for several contexts with one provider call.
         
-        # Fill in template
-        try:
-            prompt = prompt_template.format(**context)
-        except KeyError as e:
-            print(f"Warning: Missing context variable {e}. Using partial prompt.")
-            prompt = prompt_template
+        Cached answers are reused; the remaining prompts are numbered into a
+        single request and the reply is split per item. Items missing from
+        the reply fall back to `generate`.
         
-        # Generate using provider
-        if self.provider_name == "anthropic" and isinstance(self.provider, AnthropicProvider):
-            return self.provider.generate(prompt)
+        Args:
+            prompt_key: Key for prompt template in prompts.yaml
+            contexts: One dictionary of template variables per item
         
-        elif self.provider_name == "gemini" and isinstance(self.provider, GeminiProvider):
-            return self.provider.generate(prompt)
+        Returns:
+            Generated text per context, in order
+        """
+        from .rationale import batch_prompt, parse_batch
         
-        elif self.provider_name == "openai" and self.provider:
-            return self._generate_openai(prompt)
+        if self.provider is None:
+            return [self._generate_fallback(context) for context in contexts]
         
-        elif self.provider_name == "ollama" and self.provider:
-            return self._generate_ollama(prompt)
+        cache = self._cache()
+        keys = [self._cache_key(prompt_key, context) for context in contexts] if cache else []
+        cached = cache.get_many(keys) if cache else {}
+        answers: List[Optional[str]] = [cached.get(key) for key in keys] if cache else [None] * len(contexts)
+        todo = [i for i, answer in enumerate(answers) if answer is None]
         
-        else:
-            # Rule-based fallback
-            return self._generate_fallback(context)
+        if len(todo) == 1:
+            answers[todo[0]] = self.generate(prompt_key, contexts[todo[0]])
+        elif todo:
+            prompts = [self._render(prompt_key, contexts[i]) for i in todo]
+            text = self._complete(batch_prompt(prompts), max_tokens=500 * len(prompts))
+            parsed = parse_batch(text, len(todo)) if text is not None else [None] * len(todo)
+            fresh = []
+            for i, answer in zip(todo, parsed):
+                if answer is None:
+                    answers[i] = self.generate(prompt_key, contexts[i])
+                else:
+                    answers[i] = answer
+                    if cache:
+                        fresh.append((keys[i], answer))
+            if cache and fresh:
+                cache.set_many(fresh)
+        return answers  # type: ignore[return-value]
+    
+    def stream(self, prompt_key: str, context: Dict[str, Any], max_tokens: int = 500) -> Iterator[str]:
+        """
+        Generate text like `generate`, yielding it as the provider sends it.
+        
+        The first chunk arrives after the provider's time-to-first-token
+        rather than its full generation time. Cached answers and rule-based
+        text are yielded whole. If the provider fails before sending
+        anything, the rule-based text is yielded instead; a stream cut off
+        part-way just ends, and is not cached.
+        
+        Args:
+            prompt_key: Key for prompt template in prompts.yaml
+            context: Dictionary of variables to fill in the template
+            max_tokens: Maximum tokens in the response
+        
+        Yields:
+            Text chunks
+        """
+        cache = self._cache()
+        key = self._cache_key(prompt_key, context) if cache else None
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            yield cached
+            return
+        
+        breaker = get_breaker(self.provider_name)
+        permit = breaker.allow() if self.provider is not None else None
+        if permit is None:
+            yield self._generate_fallback(context)
+            return
+        
+        prompt = self._render(prompt_key, context)
+        parts: List[str] = []
+        failed = False
+        try:
+            for chunk in self._stream_call(prompt, max_tokens):
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            failed = True
+            logger.error(f"Streaming from {self.provider_name} failed: {e}")
+        finally:
+            # Stream durations are not call latencies, so none is recorded for hedging.
+            breaker.record(bool(parts) and not failed, permit=permit)
+        
+        if not parts:
+            yield self._generate_fallback(context)
+        elif cache and not failed:
+            cache.set(key, "".join(parts))
     
-    def _generate_openai(self, prompt: str) -> str:
-        """Generate using OpenAI."""
+    def _stream_call(self, prompt: str, max_tokens: int) -> Iterator[str]:
+        if self.provider_name in ("anthropic", "gemini"):
+            return self.provider.stream(prompt, max_tokens=max_tokens, fallback=False)
+        elif self.provider_name == "openai":
+            return self._stream_openai(prompt, max_tokens=max_tokens)
+        return self._stream_ollama(prompt)
+    
+    def _stream_openai(self, prompt: str, max_tokens: int = 500, timeout: float = ROUTER_TIMEOUT) -> Iterator[str]:
+        """Stream from OpenAI (server-sent events); raises on an HTTP error."""
+        from .rationale import openai_url
+        
+        with get_client("openai").stream(
+            "POST",
+            openai_url(),
+            json={
+                "model": os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": max_tokens,
+                "temperature": 0.7,
+                "stream": True,
+            },
+            headers={"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"},
+            timeout=timeout
+        ) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"OpenAI API error: {response.status_code}")
+            yield from _sse_tokens(response.iter_lines())
+    
+    def _stream_ollama(self, prompt: str, timeout: float = ROUTER_TIMEOUT) -> Iterator[str]:
+        """Stream from Ollama (newline-delimited JSON); raises on an HTTP error."""
+        with get_client("ollama").stream(
+            "POST",
+            f"{self.provider['base_url']}/generate",
+            json={"model": self.provider["model"], "prompt": prompt, "stream": True},
+            timeout=timeout
+        ) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"Ollama API error: {response.status_code}")
+            yield from _ndjson_tokens(response.iter_lines())
+    
+    def _generate_openai(self, prompt: str, max_tokens: int = 500, timeout: float = ROUTER_TIMEOUT) -> Optional[str]:
+        """Generate using OpenAI; `None` on error."""
         try:
-            import openai
-            model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+            from .rationale import openai_url
             
-            response = openai.ChatCompletion.create(
-                model=model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=500,
-                temperature=0.7
+            response = get_client("openai").post(
+                openai_url(),
+                json={
+                    "model": os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
+                    "messages": [{"role": "user", "content": prompt}],
+                    "max_tokens": max_tokens,
+                    "temperature": 0.7,
+                },
+                headers={"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"},
+                timeout=timeout
             )
-            return response.choices[0].message.content
+            
+            if response.status_code == 200:
+                return response.json()["choices"][0]["message"]["content"]
+            else:
+                logger.warning(f"OpenAI API error: {response.status_code}")
+                return None
         except Exception as e:
-            print(f"Error calling OpenAI: {e}")
-            return self._generate_fallback({})
+            logger.error(f"Error calling OpenAI: {e}")
+            return None
     
-    def _generate_ollama(self, prompt: str) -> str:
-        """Generate using Ollama."""
+    def _generate_ollama(self, prompt: str, timeout: float = ROUTER_TIMEOUT) -> Optional[str]:
+        """Generate using Ollama; `None` on error."""
         try:
-            import httpx
-            
             base_url = self.provider["base_url"]
             model = self.provider["model"]
             
-            response = httpx.post(
+            response = get_client("ollama").post(
                 f"{base_url}/generate",
-                json={"model": model, "prompt": prompt},
-                timeout=30.0
+                json={"model": model, "prompt": prompt, "stream": False},
+                timeout=timeout
             )
             
             if response.status_code == 200:
                 return response.json().get("response", "")
             else:
-                print(f"Ollama API error: {response.status_code}")
-                return self._generate_fallback({})
+                logger.warning(f"Ollama API error: {response.status_code}")
+                return None
         except Exception as e:
-            print(f"Error calling Ollama: {e}")
-            return self._generate_fallback({})
+            logger.error(f"Error calling Ollama: {e}")
+            return None
     
     def _generate_fallback(self, context: Dict[str, Any]) -> str:
         """Generate using rule-based fallback."""
@@ -189,18 +455,12 @@ class LLMRouter:
         impact_score = context.get("impact_score", 0)
         
         # Use priority-based fallback prompts
-        if priority == "high":
-            template = self.prompts.get("fallback_rationale_high_priority", "")
-        elif priority == "low":
-            template = self.prompts.get("fallback_rationale_low_priority", "")
-        else:
-            template = self.prompts.get("fallback_rationale_medium_priority", "")
-        
-        try:
-            return template.format(impact_score=impact_score)
-        except:
+        key = FALLBACK_PROMPTS.get(priority, FALLBACK_PROMPTS["medium"])
+        template = self.registry.get(key, default=None)
+        if template is None:
             return (f"This action has an estimated impact of {impact_score} and should be "
                    f"prioritized accordingly based on data-driven analysis.")
+        return template.render({"impact_score": impact_score})
     
     def get_provider_name(self) -> str:
         """Return the current provider name."""
@@ -238,3 +498,33 @@ def generate_rationale(prompt_key: str, context: Dict[str, Any]) -> str:
     """
     router = get_llm_router()
     return router.generate(prompt_key, context)
+
+
+def stream_text(prompt_key: str, context: Dict[str, Any]) -> Iterator[str]:
+    """
+    Convenience function to stream generated text using global router.
+    
+    Args:
+        prompt_key: Key for prompt template
+        context: Context variables
+    
+    Yields:
+        Text chunks as the provider sends them
+    """
+    router = get_llm_router()
+    return router.stream(prompt_key, context)
+
+
+def generate_rationales(prompt_key: str, contexts: List[Dict[str, Any]]) -> List[str]:
+    """
+    Convenience function to generate several rationales in one batched call.
+    
+    Args:
+        prompt_key: Key for prompt template
+        contexts: Context variables per rationale
+    
+    Returns:
+        Generated rationale text per context
+    """
+    router = get_llm_router()
+    return router.generate_batch(prompt_key, contexts)
@@ -0,0 +1,178 @@
+"""
+LLM Provider Circuit Breakers
+
+One breaker per provider, shared by `aas.llm.rationale` and `LLMRouter`, so
+a provider that keeps failing is skipped at once instead of every call
+waiting out its timeout:
+
+* closed - calls go through; the last `LLM_BREAKER_WINDOW` outcomes are
+  kept, and once at least `LLM_BREAKER_MIN_CALLS` of them show a failure
+  rate of `LLM_BREAKER_FAILURE_RATE` or more, the breaker opens,
+* open - calls are refused for `LLM_BREAKER_COOLDOWN` seconds,
+* half-open - after the cooldown one probe call is let through; success
+  closes the breaker, failure opens it again. Only the probe decides:
+  `allow` hands out a `Permit`, and results of calls let through before
+  the breaker opened are merely counted.
+
+Breakers also keep recent successful-call latencies, which the rationale
+path uses to decide when to hedge a slow call to a second provider.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
+
+import numpy as np
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_WINDOW = 20
+DEFAULT_MIN_CALLS = 5
+DEFAULT_FAILURE_RATE = 0.5
+DEFAULT_COOLDOWN = 30.0
+LATENCY_SAMPLES = 100
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider's breaker is refusing calls."""
+
+
+@dataclass(frozen=True)
+class Permit:
+    """A call let through by `CircuitBreaker.allow`; pass it back to `record` or `release`."""
+
+    probe: bool = False  # holds the half-open probe slot
+
+
+CALL = Permit()
+PROBE = Permit(probe=True)
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker for one provider."""
+
+    def __init__(
+        self,
+        name: str,
+        window: int = DEFAULT_WINDOW,
+        min_calls: int = DEFAULT_MIN_CALLS,
+        failure_rate: float = DEFAULT_FAILURE_RATE,
+        cooldown: float = DEFAULT_COOLDOWN,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> Optional[Permit]:
+        """A `Permit` if a call may go out now (`PROBE` when it claims the half-open slot), else `None`."""
+        with self._lock:
+            if self._state == CLOSED:
+                return CALL
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return None
+                self._state = HALF_OPEN
+            if self._probing:
+                return None
+            self._probing = True
+            return PROBE
+
+    def record(self, ok: bool, latency: Optional[float] = None, permit: Permit = CALL) -> None:
+        """Record a call's outcome (and, on success, its latency).
+
+        Only the holder of the `PROBE` permit closes or re-opens a half-open
+        breaker; a call let through earlier that finishes late is just counted.
+        """
+        with self._lock:
+            if ok and latency is not None:
+                self._latencies.append(latency)
+            if permit.probe:
+                self._probing = False
+                if self._state == HALF_OPEN:
+                    if ok:
+                        self._state = CLOSED
+                        self._outcomes.clear()
+                        logger.info("LLM provider %s recovered; circuit closed", self.name)
+                    else:
+                        self._trip()
+                return
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if (
+                self._state == CLOSED
+                and len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                self._trip()
+
+    def release(self, permit: Permit = CALL) -> None:
+        """Give back a call's permit without an outcome (e.g. it was cancelled).
+
+        A cancelled half-open probe says nothing about the provider, so the
+        circuit stays half-open and the next call becomes the probe.
+        """
+        if permit.probe:
+            with self._lock:
+                self._probing = False
+
+    def _trip(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        logger.warning("LLM provider %s failing; circuit open for %.0fs", self.name, self.cooldown)
+
+    def latency_percentile(self, q: float) -> Optional[float]:
+        """`q`-th percentile of recent successful-call latencies; `None` before `min_calls` samples."""
+        with self._lock:
+            if len(self._latencies) < self.min_calls:
+                return None
+            return float(np.percentile(np.fromiter(self._latencies, dtype=float), q))
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """The shared breaker for provider `name`, configured from the environment."""
+    with _lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(
+                name,
+                window=int(os.getenv("LLM_BREAKER_WINDOW", DEFAULT_WINDOW)),
+                min_calls=int(os.getenv("LLM_BREAKER_MIN_CALLS", DEFAULT_MIN_CALLS)),
+                failure_rate=float(os.getenv("LLM_BREAKER_FAILURE_RATE", DEFAULT_FAILURE_RATE)),
+                cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", DEFAULT_COOLDOWN)),
+            )
+        return _breakers[name]
+
+
+def reset_breakers() -> None:
+    """Forget every breaker's state (tests, or after reconfiguring providers)."""
+    with _lock:
+        _breakers.clear()
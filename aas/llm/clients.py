@@ -0,0 +1,130 @@
+"""
+Shared LLM HTTP Clients
+
+Process-wide registry of keep-alive `httpx` clients, one connection pool
+per provider, so rationale calls reuse open TCP/TLS connections instead of
+opening one per request (module-level `httpx.post` does that).
+
+* `get_client(name)` - blocking `httpx.Client`, safe to share across threads.
+* `get_async_client(name)` - `httpx.AsyncClient` bound to the background
+  event loop that `run(coro)` executes on; call it from that loop.
+* `close_clients()` - closes every pool and stops the loop; the API calls
+  it from its lifespan on shutdown. Clients are recreated on next use.
+
+Pool sizes follow `LLM_MAX_CONCURRENCY`; idle connections are kept for
+`LLM_KEEPALIVE_EXPIRY` seconds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+
+def max_concurrency() -> int:
+    return max(1, int(os.getenv("LLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)))
+
+
+def client_limits() -> httpx.Limits:
+    """Pool limits: room for every in-flight call, all of them kept alive."""
+    concurrency = max_concurrency()
+    return httpx.Limits(
+        max_connections=2 * concurrency,
+        max_keepalive_connections=concurrency,
+        keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY)),
+    )
+
+
+class ClientRegistry:
+    """Keep-alive clients per provider, plus the event loop the async ones live on."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[str, httpx.Client] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        # Created on the loop thread.
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def client(self, name: str) -> httpx.Client:
+        with self._lock:
+            if name not in self._clients:
+                self._clients[name] = httpx.Client(limits=client_limits(), timeout=DEFAULT_TIMEOUT)
+            return self._clients[name]
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name="aas-llm", daemon=True)
+                self._thread.start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro) -> Any:
+        """Run `coro` on the background loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._start()).result()
+
+    def async_client(self, name: str) -> httpx.AsyncClient:
+        if name not in self._async_clients:
+            self._async_clients[name] = httpx.AsyncClient(limits=client_limits(), timeout=DEFAULT_TIMEOUT)
+        return self._async_clients[name]
+
+    def semaphore(self, name: str) -> asyncio.Semaphore:
+        """Per-provider concurrency limit on the background loop."""
+        if name not in self._semaphores:
+            self._semaphores[name] = asyncio.Semaphore(max_concurrency())
+        return self._semaphores[name]
+
+    def close(self) -> None:
+        """Close every client and stop the loop."""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+            async_clients, self._async_clients = self._async_clients, {}
+            self._semaphores = {}
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        for client in clients.values():
+            client.close()
+        if loop is not None:
+
+            async def _aclose() -> None:
+                for client in async_clients.values():
+                    await client.aclose()
+
+            asyncio.run_coroutine_threadsafe(_aclose(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+
+registry = ClientRegistry()
+
+
+def get_client(name: str) -> httpx.Client:
+    """Shared blocking client for provider `name`."""
+    return registry.client(name)
+
+
+def get_async_client(name: str) -> httpx.AsyncClient:
+    """Shared async client for provider `name`; call from `run()` coroutines."""
+    return registry.async_client(name)
+
+
+def run(coro) -> Any:
+    """Run `coro` on the shared background loop and wait for the result."""
+    return registry.run(coro)
+
+
+def close_clients() -> None:
+    """Close all pooled connections (FastAPI shutdown)."""
+    registry.close()
@@ -0,0 +1,145 @@
+"""
+Deferred Rationale Enrichment
+
+With `rationale_mode: "deferred"` a play returns its actions straight away,
+each with placeholder text and `rationale_status: "pending"`, and the LLM
+rationales are filled in afterwards by a background worker:
+
+* `RationaleEnricher.submit` queues a run's pending rationales; the worker
+  fetches them with `gather_rationale_results` (each distinct context
+  once), then hands the finished rationales to a `persist` callback (the
+  API updates `aas_actions.payload`),
+* `get` / `wait` return a run's rationales, so clients can poll or block
+  until they are done (`GET /runs/{run_id}/rationales`).
+
+Recent runs are kept in memory (`MAX_RUNS`); older ones are only in the DB.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from ..utils.logger import get_logger
+from .rationale import STATUS_UNAVAILABLE, fallback_rationale, gather_rationale_results
+
+logger = get_logger(__name__)
+
+MAX_RUNS = 256
+
+# (index in the run's action list, action_id or None, context)
+PendingRationale = Tuple[int, Optional[str], str]
+PersistFn = Callable[[str, List[Dict[str, Any]]], None]
+
+
+@dataclass
+class DeferredRun:
+    """A run's deferred rationales, one entry per pending action."""
+
+    run_id: str
+    rationales: List[Dict[str, Any]]
+    done: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def status(self) -> str:
+        return "complete" if self.done.is_set() else "pending"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"run_id": self.run_id, "status": self.status, "rationales": list(self.rationales)}
+
+
+class RationaleEnricher:
+    """Background worker that fills in deferred rationales."""
+
+    def __init__(self, max_runs: int = MAX_RUNS, max_workers: int = 2):
+        self.max_runs = max_runs
+        self.max_workers = max_workers
+        self._runs: "OrderedDict[str, DeferredRun]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, run_id: str, pending: Sequence[PendingRationale], persist: Optional[PersistFn] = None) -> DeferredRun:
+        """Queue `pending` rationales of `run_id`; `persist(run_id, rationales)` runs once they are done."""
+        run = DeferredRun(
+            run_id,
+            [
+                {"index": index, "action_id": action_id, "reasoning": None, "rationale_status": "pending"}
+                for index, action_id, _ in pending
+            ],
+        )
+        contexts = [context for _, _, context in pending]
+        with self._lock:
+            self._runs[run_id] = run
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="aas-enrich")
+            future = self._executor.submit(self._fill, run, contexts, persist)
+        future.add_done_callback(lambda f: f.cancelled() and self._abandon(run, contexts, persist))
+        return run
+
+    def _fill(self, run: DeferredRun, contexts: List[str], persist: Optional[PersistFn]) -> None:
+        try:
+            unique = list(dict.fromkeys(contexts))
+            try:
+                by_context = dict(zip(unique, gather_rationale_results(unique)))
+            except Exception as e:
+                logger.error("Deferred rationales failed for run %s: %s", run.run_id, e)
+                by_context = {}
+            self._finish(run, contexts, by_context, persist)
+        finally:
+            run.done.set()
+
+    def _abandon(self, run: DeferredRun, contexts: List[str], persist: Optional[PersistFn]) -> None:
+        """A queued run dropped at shutdown: record its rationales as unavailable."""
+        logger.warning("Deferred rationales for run %s dropped at shutdown", run.run_id)
+        try:
+            self._finish(run, contexts, {}, persist)
+        finally:
+            run.done.set()
+
+    @staticmethod
+    def _finish(run: DeferredRun, contexts: List[str], by_context: Dict[str, Any], persist: Optional[PersistFn]) -> None:
+        for entry, context in zip(run.rationales, contexts):
+            result = by_context.get(context)
+            entry["reasoning"] = result.text if result else fallback_rationale(context)
+            entry["rationale_status"] = result.status if result else STATUS_UNAVAILABLE
+        if persist is not None:
+            try:
+                persist(run.run_id, run.rationales)
+            except Exception as e:
+                logger.warning("Failed to persist deferred rationales for run %s: %s", run.run_id, e)
+
+    def get(self, run_id: str) -> Optional[DeferredRun]:
+        with self._lock:
+            return self._runs.get(run_id)
+
+    def wait(self, run_id: str, timeout: float = 0.0) -> Optional[DeferredRun]:
+        """The run's rationales, after waiting up to `timeout` seconds for them to finish."""
+        run = self.get(run_id)
+        if run is not None and timeout > 0:
+            run.done.wait(timeout)
+        return run
+
+    def shutdown(self) -> None:
+        """Wait for runs in progress; queued runs are finished with unavailable rationales."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_enricher: Optional[RationaleEnricher] = None
+_enricher_lock = threading.Lock()
+
+
+def get_enricher() -> RationaleEnricher:
+    """The process-wide enrichment worker."""
+    global _enricher
+    with _enricher_lock:
+        if _enricher is None:
+            _enricher = RationaleEnricher()
+        return _enricher
@@ -0,0 +1,322 @@
+"""
+Fake LLM Server
+
+A local HTTP server that speaks the two wire formats the rationale and
+router paths use, so the whole HTTP path (pooled clients, concurrency
+limits, deadlines, breakers, batching) can be benchmarked without paying a
+real provider:
+
+* OpenAI chat completions - `POST /v1/chat/completions`, plain or
+  `stream: true` (server-sent events),
+* Ollama generate - `POST /api/generate`, plain or `stream: true`
+  (one JSON object per line).
+
+Point the app at it with `OPENAI_BASE_URL={url}/v1` or
+`OLLAMA_BASE_URL={url}/api`. Replies behave like a provider's:
+
+* time to first token is drawn from a latency distribution (`fixed`,
+  `uniform` or `lognormal`), then tokens are produced at
+  `tokens_per_second`,
+* `error_rate` of requests fail with `error_status` after the
+  first-token delay,
+* batch prompts (numbered items and a request for JSON, as built by
+  `batch_prompt`) get a JSON object with one sentence per item, so
+  `parse_batch` sees a well-formed reply.
+
+`GET /stats` returns request, error and latency counters.
+
+Run standalone with `python -m aas.llm.fake_server --port 8089`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+_NUMBERED_ITEM = re.compile(r"^(\d+)\. ", re.MULTILINE)
+_WORDS = (
+    "this action protects revenue because the account shows clear risk signals "
+    "and acting now costs less than recovering the loss later"
+).split()
+
+
+@dataclass
+class FakeLLMConfig:
+    """How the fake provider behaves."""
+
+    latency: str = "lognormal"  # distribution of time to first token
+    latency_ms: float = 300.0  # the fixed value, or the median (lognormal / uniform)
+    latency_sigma: float = 0.5  # lognormal shape; uniform spreads over latency_ms * (1 ± sigma)
+    tokens_per_second: float = 50.0  # 0 for instant replies
+    reply_tokens: int = 20  # tokens per answer (per item in a batch)
+    error_rate: float = 0.0
+    error_status: int = 503
+    seed: Optional[int] = None
+
+    def __post_init__(self) -> None:
+        if self.latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency must be one of {LATENCY_DISTRIBUTIONS}, got '{self.latency}'")
+        if not 0 <= self.error_rate <= 1:
+            raise ValueError("error_rate must be between 0 and 1")
+
+
+class FakeLLMStats:
+    """Thread-safe request counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+        self.errors = 0
+        self.streams = 0
+        self.batch_items = 0
+        self.tokens = 0
+        self.first_token_ms: List[float] = []
+
+    def record(self, endpoint: str, first_token_ms: float, error: bool, stream: bool, items: int, tokens: int) -> None:
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.errors += error
+            self.streams += stream
+            self.batch_items += items
+            self.tokens += tokens
+            self.first_token_ms.append(first_token_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = sorted(self.first_token_ms)
+            return {
+                "requests": dict(self.requests),
+                "total": sum(self.requests.values()),
+                "errors": self.errors,
+                "streams": self.streams,
+                "batch_items": self.batch_items,
+                "tokens": self.tokens,
+                "first_token_ms_p50": samples[len(samples) // 2] if samples else None,
+                "first_token_ms_max": samples[-1] if samples else None,
+            }
+
+
+class FakeLLMServer:
+    """The fake provider on a background thread; use as a context manager."""
+
+    def __init__(self, config: Optional[FakeLLMConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeLLMConfig()
+        self.stats = FakeLLMStats()
+        self._random = random.Random(self.config.seed)
+        self._random_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _handler(self))
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05}, name="fake-llm", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._httpd.shutdown()  # waits for serve_forever, so only once started
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    # --- Behaviour ---
+
+    def first_token_delay(self) -> float:
+        """Seconds before the first token, drawn from the configured distribution."""
+        config = self.config
+        with self._random_lock:
+            if config.latency == "fixed":
+                ms = config.latency_ms
+            elif config.latency == "uniform":
+                spread = config.latency_ms * min(config.latency_sigma, 1.0)
+                ms = self._random.uniform(config.latency_ms - spread, config.latency_ms + spread)
+            else:
+                ms = self._random.lognormvariate(0.0, config.latency_sigma) * config.latency_ms
+        return max(ms, 0.0) / 1000
+
+    def should_fail(self) -> bool:
+        with self._random_lock:
+            return self._random.random() < self.config.error_rate
+
+    def reply(self, prompt: str) -> str:
+        """A JSON object of sentences for a batch prompt, else one sentence."""
+        items = batch_items(prompt)
+        if items:
+            return json.dumps({n: self.sentence() for n in items})
+        return self.sentence()
+
+    def sentence(self) -> str:
+        words = [_WORDS[i % len(_WORDS)] for i in range(self.config.reply_tokens)]
+        return " ".join(words).capitalize() + "."
+
+    def pace(self, tokens: List[str]) -> Iterator[str]:
+        """Yield `tokens` at the configured throughput."""
+        interval = 1 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0.0
+        for token in tokens:
+            if interval:
+                time.sleep(interval)
+            yield token
+
+
+def batch_items(prompt: str) -> List[str]:
+    """Item numbers of a batch prompt; empty for a single-answer prompt."""
+    items = _NUMBERED_ITEM.findall(prompt)
+    return items if len(items) > 1 and "JSON" in prompt else []
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"\S+\s*", text)
+
+
+def _handler(server: FakeLLMServer) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            if self.path.rstrip("/") == "/stats":
+                self._json(200, {"config": asdict(server.config), **server.stats.to_dict()})
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            path = self.path.rstrip("/")
+            if path.endswith("/chat/completions"):
+                endpoint, prompt = "openai", "\n".join(m.get("content", "") for m in body.get("messages", []))
+            elif path.endswith("/generate"):
+                endpoint, prompt = "ollama", body.get("prompt", "")
+            else:
+                self._json(404, {"error": "not found"})
+                return
+
+            stream = bool(body.get("stream"))
+            delay = server.first_token_delay()
+            time.sleep(delay)
+            if server.should_fail():
+                server.stats.record(endpoint, delay * 1000, True, stream, 0, 0)
+                self._json(server.config.error_status, {"error": "fake provider error"})
+                return
+
+            items = len(batch_items(prompt))
+            tokens = _tokens(server.reply(prompt))
+            server.stats.record(endpoint, delay * 1000, False, stream, items, len(tokens))
+            if stream:
+                self._stream(endpoint, body, server.pace(tokens))
+            else:
+                text = "".join(server.pace(tokens))
+                self._json(200, _completion(endpoint, body, text))
+
+        def _json(self, status: int, payload: Dict[str, Any]) -> None:
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, endpoint: str, body: Dict[str, Any], tokens: Iterator[str]) -> None:
+            openai = endpoint == "openai"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream" if openai else "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in tokens:
+                if openai:
+                    self._chunk(f"data: {json.dumps({'choices': [{'index': 0, 'delta': {'content': token}}]})}\n\n")
+                else:
+                    self._chunk(json.dumps({"model": body.get("model"), "response": token, "done": False}) + "\n")
+            if openai:
+                self._chunk("data: [DONE]\n\n")
+            else:
+                self._chunk(json.dumps({"model": body.get("model"), "response": "", "done": True}) + "\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _chunk(self, text: str) -> None:
+            data = text.encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+    return Handler
+
+
+def _completion(endpoint: str, body: Dict[str, Any], text: str) -> Dict[str, Any]:
+    if endpoint == "openai":
+        return {
+            "object": "chat.completion",
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        }
+    return {"model": body.get("model"), "response": text, "done": True}
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    """`FakeLLMConfig` options, shared with `scripts/benchmark_llm.py`."""
+    defaults = FakeLLMConfig()
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default=defaults.latency)
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="Fixed value or median")
+    parser.add_argument("--latency-sigma", type=float, default=defaults.latency_sigma)
+    parser.add_argument("--tokens-per-second", type=float, default=defaults.tokens_per_second)
+    parser.add_argument("--reply-tokens", type=int, default=defaults.reply_tokens)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--error-status", type=int, default=defaults.error_status)
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeLLMConfig:
+    return FakeLLMConfig(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake OpenAI/Ollama-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(config_from_args(args), host=args.host, port=args.port)
+    print(f"Fake LLM server on {server.url}")
+    print(f"  OPENAI_BASE_URL={server.url}/v1")
+    print(f"  OLLAMA_BASE_URL={server.url}/api")
+    try:
+        server.start()._thread.join()  # type: ignore[union-attr]
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Prompt Registry
+
+`prompts.yaml` is read once per process, not once per `LLMRouter`, and
+each template is compiled into a `PromptTemplate`: its literal text and
+`{field:spec}` slots are split up front, so a malformed template fails at
+load time, the variables each template declares are known, and rendering
+is a join of pre-split literals and formatted values.
+
+Rendering never fails on the data: a missing variable renders as
+`MISSING_VALUE`, and a value its format spec does not fit (e.g. `{:,}` on
+text) is rendered with `str()`. With a token budget, the longest values
+are cut first so the prompt fits, keeping the instructions intact.
+"""
+
+from __future__ import annotations
+
+import os
+import string
+import threading
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PROMPTS_PATH = Path(__file__).parent / "prompts.yaml"
+DEFAULT_TEMPLATE = "rationale_template"
+DEFAULT_MAX_PROMPT_TOKENS = 2000
+CHARS_PER_TOKEN = 4  # rough estimate for English text
+MISSING_VALUE = "n/a"
+ELLIPSIS = "…"
+
+# (field name, format spec, conversion) per slot.
+_Slot = Tuple[str, str, Optional[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def max_prompt_tokens() -> int:
+    return int(os.getenv("LLM_MAX_PROMPT_TOKENS", DEFAULT_MAX_PROMPT_TOKENS))
+
+
+def _format(value: Any, spec: str, conversion: Optional[str]) -> str:
+    if not spec and not conversion and type(value) is str:
+        return value
+    if conversion == "r":
+        value = repr(value)
+    elif conversion in ("s", "a"):
+        value = str(value) if conversion == "s" else ascii(value)
+    try:
+        return format(value, spec)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _fit(values: List[str], budget: int) -> List[str]:
+    """Cut the longest `values` so their total length is at most `budget`."""
+    if sum(map(len, values)) <= budget:
+        return values
+    allowed = [0] * len(values)
+    remaining = max(budget, 0)
+    order = sorted(range(len(values)), key=lambda i: len(values[i]))
+    for rank, i in enumerate(order):
+        share = remaining // (len(values) - rank)
+        allowed[i] = min(len(values[i]), share)
+        remaining -= allowed[i]
+    return [
+        value if len(value) <= limit else value[:max(limit - 1, 0)] + ELLIPSIS
+        for value, limit in zip(values, allowed)
+    ]
+
+
+class PromptTemplate:
+    """A compiled `str.format`-style template."""
+
+    __slots__ = ("key", "text", "literals", "slots", "variables", "fixed")
+
+    def __init__(self, key: str, text: str):
+        self.key = key
+        self.text = text
+        self.literals: List[str] = []
+        self.slots: List[_Slot] = []
+        try:
+            parsed = list(string.Formatter().parse(text))
+        except ValueError as e:
+            raise ValueError(f"Prompt template '{key}' is malformed: {e}") from e
+        pending = ""  # escaped braces split the literal text into several chunks
+        for literal, name, spec, conversion in parsed:
+            pending += literal
+            if name is None:
+                continue
+            if not name.isidentifier():
+                raise ValueError(f"Prompt template '{key}' has an unsupported field '{{{name}}}'")
+            if spec and "{" in spec:
+                raise ValueError(f"Prompt template '{key}' nests fields in '{{{name}:{spec}}}'")
+            self.literals.append(pending)
+            self.slots.append((name, spec or "", conversion))
+            pending = ""
+        self.literals.append(pending)
+        self.fixed = sum(map(len, self.literals))
+        self.variables: FrozenSet[str] = frozenset(name for name, _, _ in self.slots)
+
+    def missing(self, context: Mapping[str, Any]) -> FrozenSet[str]:
+        """Declared variables `context` does not provide."""
+        return frozenset(name for name in self.variables if name not in context)
+
+    def render(self, context: Mapping[str, Any], max_tokens: Optional[int] = None) -> str:
+        """Fill the template from `context`, within `max_tokens` if given."""
+        values = [
+            _format(context[name], spec, conversion) if name in context else MISSING_VALUE
+            for name, spec, conversion in self.slots
+        ]
+        if max_tokens is not None:
+            values = _fit(values, max_tokens * CHARS_PER_TOKEN - self.fixed)
+        parts = [self.literals[0]]
+        for value, literal in zip(values, self.literals[1:]):
+            parts.append(value)
+            parts.append(literal)
+        return "".join(parts)
+
+
+class PromptRegistry:
+    """Compiled templates by key."""
+
+    def __init__(self, templates: Mapping[str, str]):
+        self.raw: Dict[str, str] = dict(templates)
+        self.templates: Dict[str, PromptTemplate] = {
+            key: PromptTemplate(key, text) for key, text in self.raw.items() if isinstance(text, str)
+        }
+
+    @classmethod
+    def load(cls, path: Path = PROMPTS_PATH) -> "PromptRegistry":
+        if not path.exists():
+            logger.warning("prompts.yaml not found at %s", path)
+            return cls({})
+        import yaml
+
+        with open(path, "r") as f:
+            return cls(yaml.safe_load(f) or {})
+
+    def get(self, key: str, default: Optional[str] = DEFAULT_TEMPLATE) -> Optional[PromptTemplate]:
+        """The template for `key`, else the `default` one."""
+        template = self.templates.get(key)
+        if template is None and default is not None:
+            template = self.templates.get(default)
+        return template
+
+    def render(
+        self, key: str, context: Mapping[str, Any], max_tokens: Optional[int] = None,
+        default: Optional[str] = DEFAULT_TEMPLATE,
+    ) -> str:
+        """Render `key` (or `default`); empty when neither exists."""
+        template = self.get(key, default)
+        if template is None:
+            return ""
+        missing = template.missing(context)
+        if missing:
+            logger.debug("Prompt '%s' rendered without %s", template.key, ", ".join(sorted(missing)))
+        return template.render(context, max_tokens)
+
+
+_registry: Optional[PromptRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """The process-wide registry, compiled from `prompts.yaml` on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PromptRegistry.load()
+        return _registry
@@ -6,7 +6,8 @@ AI-powered rationales and recommendations.
 """
 
 import os
-from typing import Optional
+import re
+from typing import Iterator, Optional
 
 
 class AnthropicProvider:
@@ -32,7 +33,9 @@ class AnthropicProvider:
             try:
                 # Try to import anthropic library
                 import anthropic
-                self.client = anthropic.Anthropic(api_key=self.api_key)
+                from ..clients import get_client
+                # Reuse the shared keep-alive pool rather than a per-instance one
+                self.client = anthropic.Anthropic(api_key=self.api_key, http_client=get_client("anthropic"))
             except ImportError:
                 print("Warning: anthropic library not installed. Running in stub mode.")
                 print("Install with: pip install anthropic")
@@ -40,13 +43,16 @@ class AnthropicProvider:
         else:
             print("Info: No Anthropic API key provided. Running in stub mode.")
     
-    def generate(self, prompt: str, max_tokens: int = 500) -> str:
+    def generate(self, prompt: str, max_tokens: int = 500, fallback: bool = True) -> str:
         """
         Generate text using Claude.
         
         Args:
             prompt: The prompt to send to Claude
             max_tokens: Maximum tokens in response
+            fallback: Answer with the stub text if the API call fails. With
+                False the error is raised instead, so callers can tell a real
+                answer from a stub (and keep stubs out of caches).
         
         Returns:
             Generated text response
@@ -63,12 +69,50 @@ class AnthropicProvider:
                 )
                 return message.content[0].text
             except Exception as e:
+                if not fallback:
+                    raise
                 print(f"Error calling Anthropic API: {e}")
                 return self._generate_stub_response(prompt)
         else:
             # Stub mode
             return self._generate_stub_response(prompt)
     
+    def stream(self, prompt: str, max_tokens: int = 500, fallback: bool = True) -> Iterator[str]:
+        """
+        Generate text using Claude, yielding it as it arrives.
+        
+        Args:
+            prompt: The prompt to send to Claude
+            max_tokens: Maximum tokens in response
+            fallback: Continue with the stub text if the API call fails
+                before any text arrives. With False every error is raised.
+        
+        Yields:
+            Text chunks of the response
+        """
+        if self.client:
+            emitted = False
+            try:
+                with self.client.messages.stream(
+                    model=self.model,
+                    max_tokens=max_tokens,
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ]
+                ) as stream:
+                    for text in stream.text_stream:
+                        emitted = True
+                        yield text
+                return
+            except Exception as e:
+                if not fallback:
+                    raise
+                print(f"Error streaming from Anthropic API: {e}")
+                if emitted:
+                    return
+        # Stub mode, word by word
+        yield from re.findall(r"\S+\s*", self._generate_stub_response(prompt))
+    
     def _generate_stub_response(self, prompt: str) -> str:
         """
         Generate a deterministic stub response based on prompt content.
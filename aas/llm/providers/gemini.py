@@ -6,7 +6,8 @@ AI-powered rationales and recommendations.
 """
 
 import os
-from typing import Optional
+import re
+from typing import Iterator, Optional
 
 
 class GeminiProvider:
@@ -41,13 +42,16 @@ class GeminiProvider:
         else:
             print("Info: No Gemini API key provided. Running in stub mode.")
     
-    def generate(self, prompt: str, max_tokens: int = 500) -> str:
+    def generate(self, prompt: str, max_tokens: int = 500, fallback: bool = True) -> str:
         """
         Generate text using Gemini.
         
         Args:
             prompt: The prompt to send to Gemini
             max_tokens: Maximum tokens in response (note: Gemini uses different config)
+            fallback: Answer with the stub text if the API call fails. With
+                False the error is raised instead, so callers can tell a real
+                answer from a stub (and keep stubs out of caches).
         
         Returns:
             Generated text response
@@ -58,12 +62,44 @@ class GeminiProvider:
                 response = self.client.generate_content(prompt)
                 return response.text
             except Exception as e:
+                if not fallback:
+                    raise
                 print(f"Error calling Gemini API: {e}")
                 return self._generate_stub_response(prompt)
         else:
             # Stub mode
             return self._generate_stub_response(prompt)
     
+    def stream(self, prompt: str, max_tokens: int = 500, fallback: bool = True) -> Iterator[str]:
+        """
+        Generate text using Gemini, yielding it as it arrives.
+        
+        Args:
+            prompt: The prompt to send to Gemini
+            max_tokens: Maximum tokens in response (note: Gemini uses different config)
+            fallback: Continue with the stub text if the API call fails
+                before any text arrives. With False every error is raised.
+        
+        Yields:
+            Text chunks of the response
+        """
+        if self.client:
+            emitted = False
+            try:
+                for chunk in self.client.generate_content(prompt, stream=True):
+                    if chunk.text:
+                        emitted = True
+                        yield chunk.text
+                return
+            except Exception as e:
+                if not fallback:
+                    raise
+                print(f"Error streaming from Gemini API: {e}")
+                if emitted:
+                    return
+        # Stub mode, word by word
+        yield from re.findall(r"\S+\s*", self._generate_stub_response(prompt))
+    
     def _generate_stub_response(self, prompt: str) -> str:
         """
         Generate a deterministic stub response based on prompt content.
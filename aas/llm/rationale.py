@@ -0,0 +1,673 @@
+"""
+Action Rationale Generation
+
+One-sentence LLM rationales for recommended actions, from the provider set
+by `LLM_PROVIDER` (openai, ollama, anthropic, gemini; rule-based text when
+the provider is unset or unconfigured).
+
+`generate_rationale` makes one blocking call. `gather_rationales` handles a
+play's whole set of actions:
+
+* contexts are packed `LLM_BATCH_SIZE` at a time into one numbered prompt,
+  so ten actions cost one round-trip and one copy of the instructions;
+  answers that fail to parse are retried with single-action calls,
+* batches run concurrently on the provider's shared keep-alive client
+  (`aas.llm.clients`), at most `LLM_MAX_CONCURRENCY` calls per provider
+  in flight,
+* each call has its own deadline (`LLM_CALL_TIMEOUT`, else the provider's
+  usual timeout; batches get `BATCH_TIMEOUT_FACTOR` times that); a call
+  that errors or misses it gets the same "unavailable" text as the
+  blocking path,
+* answers are kept in the shared disk cache (`aas.utils.cache.LLMCache`)
+  keyed by provider, model, prompt and context, so re-runs over unchanged
+  actions make no calls. Failures are never cached,
+* a context that misses the cache but closely matches one answered
+  before (same wording, other numbers) reuses that answer with its own
+  numbers templated in (`aas.llm.similarity`),
+* inside `rationale_budget()` (opened by `AgentPlay.run`), all calls of a
+  run share one latency budget (`LLM_RUN_BUDGET` seconds). Calls are cut
+  short when it runs out and the remaining actions get the rule-based
+  text, so a slow provider cannot stretch a run past the budget.
+
+`Rationale.status` records where each text came from (`STATUS_*`); plays
+copy it to `Action.rationale_status` so the payload shows which
+rationales are degraded.
+
+Every call goes through the provider's circuit breaker
+(`aas.llm.breaker`): while a provider keeps failing, calls are refused
+at once rather than each waiting for its timeout. With
+`LLM_HEDGE_PROVIDER` set, a concurrent call still running after the
+primary's `LLM_HEDGE_PERCENTILE` latency is repeated on that provider and
+the first answer wins; calls refused by an open breaker go straight to it.
+
+The async work runs on the registry's background event loop, so callers
+need not be async themselves and may call from any thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import httpx
+
+from . import clients
+from .breaker import CircuitOpenError, get_breaker
+from .similarity import get_similarity_index
+from ..utils.cache import LLMCache, get_llm_cache
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SYSTEM_PROMPT = (
+    "You are an expert sales analyst. Briefly explain (1 sentence) why this action is critical "
+    "based on the data provided."
+)
+BATCH_SYSTEM_PROMPT = (
+    "You are an expert sales analyst. For each numbered action, briefly explain (1 sentence) "
+    "why it is critical based on the data provided."
+)
+BATCH_INSTRUCTIONS = (
+    'Reply with only a JSON object mapping each action number to its sentence, e.g. {"1": "...", "2": "..."}.'
+)
+OPENAI_URL = "https://api.openai.com/v1/chat/completions"
+
+# Providers reached over HTTP directly, and through their SDK wrappers.
+HTTP_PROVIDERS = ("openai", "ollama")
+SDK_PROVIDERS = ("anthropic", "gemini")
+PROVIDER_LABELS = {"openai": "OpenAI", "ollama": "Ollama", "anthropic": "Anthropic", "gemini": "Gemini"}
+DEFAULT_TIMEOUTS = {"openai": 5.0, "ollama": 10.0, "anthropic": 10.0, "gemini": 10.0}
+MODEL_ENV = {
+    "openai": ("OPENAI_MODEL", "gpt-3.5-turbo"),
+    "ollama": ("OLLAMA_MODEL", "llama3"),
+    "anthropic": ("ANTHROPIC_MODEL", "claude-3-sonnet-20240229"),
+    "gemini": ("GEMINI_MODEL", "gemini-pro"),
+}
+DEFAULT_BATCH_SIZE = 10
+BATCH_TIMEOUT_FACTOR = 2.0
+RATIONALE_MAX_TOKENS = 60
+DEFAULT_RUN_BUDGET = 15.0
+DEFAULT_HEDGE_PERCENTILE = 95.0
+
+# Where a rationale's text came from.
+STATUS_GENERATED = "generated"  # answered by the provider
+STATUS_CACHED = "cached"  # provider answer from the disk cache
+STATUS_REUSED = "reused"  # a similar action's answer, with this action's numbers
+STATUS_FALLBACK = "fallback"  # rule-based; no provider configured
+STATUS_UNAVAILABLE = "unavailable"  # provider call failed or timed out
+STATUS_DEGRADED = "degraded"  # rule-based; the run's latency budget was spent
+STATUS_PENDING = "pending"  # deferred; filled in later by `aas.llm.enrichment`
+
+PENDING_RATIONALE = "AI Rationale: being generated."
+
+_sdk_providers: Dict[str, Any] = {}
+
+
+def _sdk_provider(provider: str) -> Any:
+    """Shared Anthropic / Gemini provider wrapper."""
+    if provider not in _sdk_providers:
+        from . import AnthropicProvider, GeminiProvider
+
+        cls = AnthropicProvider if provider == "anthropic" else GeminiProvider
+        _sdk_providers[provider] = cls() if cls else None
+    return _sdk_providers[provider]
+
+
+def provider_available(provider: str) -> bool:
+    """Whether `provider` is known and configured."""
+    if provider == "openai":
+        return bool(os.getenv("OPENAI_API_KEY"))
+    if provider in SDK_PROVIDERS:
+        client = _sdk_provider(provider)
+        return client is not None and client.is_available()
+    return provider in HTTP_PROVIDERS
+
+
+def active_provider() -> str:
+    """The provider rationales will come from ("none" when unconfigured)."""
+    provider = os.getenv("LLM_PROVIDER", "none").lower()
+    return provider if provider_available(provider) else "none"
+
+
+def hedge_provider(provider: str) -> Optional[str]:
+    """The configured second provider for `provider`'s slow calls, if usable."""
+    hedge = os.getenv("LLM_HEDGE_PROVIDER", "").lower()
+    return hedge if hedge and hedge != provider and provider_available(hedge) else None
+
+
+def hedge_delay(provider: str) -> Optional[float]:
+    """Seconds to wait on `provider` before hedging; `None` until enough latencies are known."""
+    return get_breaker(provider).latency_percentile(
+        float(os.getenv("LLM_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE))
+    )
+
+
+def openai_url() -> str:
+    """Chat-completions endpoint; `OPENAI_BASE_URL` points it at a compatible server."""
+    base_url = os.getenv("OPENAI_BASE_URL")
+    return f"{base_url.rstrip('/')}/chat/completions" if base_url else OPENAI_URL
+
+
+def model_name(provider: str) -> str:
+    env, default = MODEL_ENV[provider]
+    return os.getenv(env, default)
+
+
+def cache_key(provider: str, context: str) -> str:
+    """Disk-cache key for one action rationale; batched and single answers share it."""
+    return LLMCache.key(provider, model_name(provider), SYSTEM_PROMPT, context)
+
+
+def similarity_namespace(provider: str) -> str:
+    """Answers are only reused between contexts sent to the same model."""
+    return f"{provider}:{model_name(provider)}"
+
+
+def call_timeout(provider: str) -> float:
+    """Per-call deadline in seconds."""
+    return float(os.getenv("LLM_CALL_TIMEOUT", DEFAULT_TIMEOUTS.get(provider, 10.0)))
+
+
+def batch_size() -> int:
+    return max(1, int(os.getenv("LLM_BATCH_SIZE", DEFAULT_BATCH_SIZE)))
+
+
+def run_budget_seconds() -> float:
+    return max(0.0, float(os.getenv("LLM_RUN_BUDGET", DEFAULT_RUN_BUDGET)))
+
+
+def fallback_rationale(context: str) -> str:
+    """Deterministic rationale from context keywords, used without an LLM."""
+    lowered = context.lower()
+    if "stage" in lowered:
+        return "AI Rationale: Deal stalling at current stage warrants immediate intervention."
+    elif "churn" in lowered:
+        return "AI Rationale: High churn risk detected based on usage patterns."
+    elif "spend" in lowered:
+        return "AI Rationale: Unusual spend velocity requires budget review."
+    return "AI Rationale: High impact opportunity identified based on current metrics."
+
+
+def unavailable_rationale(provider: str, reason: str = "unavailable") -> str:
+    return f"AI Rationale: Optimization opportunity detected ({PROVIDER_LABELS[provider]} {reason})."
+
+
+class ProviderError(RuntimeError):
+    """A provider answered with an HTTP error."""
+
+
+@dataclass
+class Rationale:
+    """A rationale's text and where it came from (one of `STATUS_*`).
+
+    Pending rationales keep their `context` so they can be generated later.
+    """
+
+    text: str
+    status: str
+    context: str = ""
+
+
+# --- Run budget ---
+
+
+class RationaleBudget:
+    """Wall-clock seconds one run may spend waiting on rationale calls."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.spent = 0.0
+        self.degraded = 0
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return max(0.0, self.seconds - self.spent)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.remaining() <= 0
+
+    def clip(self, timeout: float) -> float:
+        """`timeout`, cut to what is left of the budget."""
+        return min(timeout, self.remaining())
+
+    @contextmanager
+    def timing(self) -> Iterator[None]:
+        """Charge the time spent in the block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.spent += time.perf_counter() - start
+
+    def degrade(self, context: str) -> Rationale:
+        """Rule-based rationale in place of a call the budget no longer allows."""
+        with self._lock:
+            self.degraded += 1
+        return Rationale(fallback_rationale(context), STATUS_DEGRADED)
+
+
+_budget: ContextVar[Optional[RationaleBudget]] = ContextVar("rationale_budget", default=None)
+
+
+def current_budget() -> Optional[RationaleBudget]:
+    """The budget of the enclosing `rationale_budget()` block, if any."""
+    return _budget.get()
+
+
+@contextmanager
+def rationale_budget(seconds: Optional[float] = None) -> Iterator[RationaleBudget]:
+    """Share one latency budget (default `LLM_RUN_BUDGET`) across the block's rationale calls."""
+    budget = RationaleBudget(run_budget_seconds() if seconds is None else seconds)
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+
+# --- Prompts ---
+
+
+def batch_prompt(contexts: Sequence[str]) -> str:
+    """Number the action contexts into one prompt."""
+    items = "\n".join(f"{i}. {context}" for i, context in enumerate(contexts, 1))
+    return f"{BATCH_INSTRUCTIONS}\n\n{items}"
+
+
+_NUMBERED_LINE = re.compile(r"^\s*(?:\*\*)?(\d+)(?:\*\*)?\s*[.):-]\s*(.+?)\s*$", re.MULTILINE)
+
+
+def parse_batch(text: str, n: int) -> List[Optional[str]]:
+    """Per-action answers from a batch reply; `None` where one is missing.
+
+    Accepts the requested JSON object (also inside a code fence), a JSON
+    list, or numbered lines.
+    """
+    answers: List[Optional[str]] = [None] * n
+    match = re.search(r"[\[{].*[\]}]", text or "", re.DOTALL)
+    parsed: Any = None
+    if match:
+        try:
+            parsed = json.loads(match.group(0))
+        except ValueError:
+            parsed = None
+    if isinstance(parsed, dict):
+        items = parsed.items()
+    elif isinstance(parsed, list):
+        items = ((i, value) for i, value in enumerate(parsed, 1))
+    else:
+        items = ((m.group(1), m.group(2)) for m in _NUMBERED_LINE.finditer(text or ""))
+
+    for key, value in items:
+        try:
+            index = int(key) - 1
+        except (TypeError, ValueError):
+            continue
+        if 0 <= index < n and isinstance(value, str) and value.strip():
+            answers[index] = value.strip()
+    return answers
+
+
+# --- Provider calls ---
+
+
+@dataclass
+class RationaleRequest:
+    """One provider HTTP call."""
+
+    url: str
+    json: Dict[str, Any]
+    headers: Dict[str, str]
+
+
+def build_request(
+    provider: str, prompt: str, system: str = SYSTEM_PROMPT, max_tokens: int = RATIONALE_MAX_TOKENS
+) -> RationaleRequest:
+    if provider == "openai":
+        return RationaleRequest(
+            url=openai_url(),
+            json={
+                "model": model_name("openai"),
+                "messages": [
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": prompt},
+                ],
+                "max_tokens": max_tokens,
+                "temperature": 0.7,
+            },
+            headers={
+                "Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}",
+                "Content-Type": "application/json",
+            },
+        )
+    base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/api")
+    return RationaleRequest(
+        url=f"{base_url}/generate",
+        json={
+            "model": model_name("ollama"),
+            "prompt": f"{system[:-1]}: {prompt}",
+            "stream": False,
+        },
+        headers={},
+    )
+
+
+def parse_response(provider: str, resp: httpx.Response) -> str:
+    """Completion text from a provider response; raises `ProviderError` on an HTTP error."""
+    if resp.status_code != 200:
+        logger.warning(f"{PROVIDER_LABELS[provider]} Error {resp.status_code}: {resp.text}")
+        raise ProviderError(f"HTTP {resp.status_code}")
+    if provider == "openai":
+        return resp.json()["choices"][0]["message"]["content"].strip()
+    return resp.json().get("response", "").strip()
+
+
+def _sdk_complete(provider: str, prompt: str, system: str, max_tokens: int) -> str:
+    """Raises on an API error: the wrapper's stub text is not an answer to cache."""
+    return _sdk_provider(provider).generate(f"{system}\n\n{prompt}", max_tokens=max_tokens, fallback=False).strip()
+
+
+def complete(
+    provider: str,
+    prompt: str,
+    system: str = SYSTEM_PROMPT,
+    max_tokens: int = RATIONALE_MAX_TOKENS,
+    timeout: Optional[float] = None,
+) -> str:
+    """One blocking completion through the provider's breaker; raises on failure."""
+    breaker = get_breaker(provider)
+    permit = breaker.allow()
+    if permit is None:
+        raise CircuitOpenError(provider)
+    start = time.perf_counter()
+    try:
+        if provider in SDK_PROVIDERS:
+            text = _sdk_complete(provider, prompt, system, max_tokens)
+        else:
+            request = build_request(provider, prompt, system, max_tokens)
+            resp = clients.get_client(provider).post(
+                request.url,
+                json=request.json,
+                headers=request.headers,
+                timeout=call_timeout(provider) if timeout is None else timeout,
+            )
+            text = parse_response(provider, resp)
+    except Exception:
+        breaker.record(False, permit=permit)
+        raise
+    except BaseException:
+        breaker.release(permit)
+        raise
+    breaker.record(True, time.perf_counter() - start, permit)
+    return text
+
+
+def _failure_text(provider: str, error: Exception) -> str:
+    if isinstance(error, CircuitOpenError):
+        return unavailable_rationale(provider, "circuit open")
+    if isinstance(error, ProviderError):
+        return unavailable_rationale(provider)
+    logger.error(f"{PROVIDER_LABELS[provider]} Call failed: {error}")
+    return unavailable_rationale(provider, "connection error")
+
+
+def rationale_result(context: str) -> Rationale:
+    """One rationale with a blocking call, unless it is cached or the run budget is spent."""
+    provider = active_provider()
+    if provider == "none":
+        return Rationale(fallback_rationale(context), STATUS_FALLBACK)
+    cache = get_llm_cache()
+    key = cache_key(provider, context)
+    cached = cache.get(key) if cache else None
+    if cached is not None:
+        return Rationale(cached, STATUS_CACHED)
+    index = get_similarity_index()
+    reused = index.lookup(similarity_namespace(provider), context) if index is not None else None
+    if reused is not None:
+        return Rationale(reused, STATUS_REUSED)
+
+    budget = current_budget()
+    if budget is None:
+        timeout = call_timeout(provider)
+    elif budget.exhausted:
+        return budget.degrade(context)
+    else:
+        timeout = budget.clip(call_timeout(provider))
+    try:
+        if budget is None:
+            text = complete(provider, context, timeout=timeout)
+        else:
+            with budget.timing():
+                text = complete(provider, context, timeout=timeout)
+    except Exception as e:
+        if budget is not None and budget.exhausted:
+            return budget.degrade(context)
+        return Rationale(_failure_text(provider, e), STATUS_UNAVAILABLE)
+    if cache:
+        cache.set(key, text)
+    if index is not None:
+        index.add(similarity_namespace(provider), context, text)
+    return Rationale(text, STATUS_GENERATED)
+
+
+def generate_rationale(context: str) -> str:
+    """One rationale with a blocking call, unless it is cached."""
+    return rationale_result(context).text
+
+
+# --- Concurrent fan-out ---
+
+
+async def acomplete(
+    provider: str,
+    prompt: str,
+    system: str = SYSTEM_PROMPT,
+    max_tokens: int = RATIONALE_MAX_TOKENS,
+    timeout: Optional[float] = None,
+) -> str:
+    """One completion within the provider's breaker, concurrency limit and a deadline; raises on failure."""
+    timeout = call_timeout(provider) if timeout is None else timeout
+    breaker = get_breaker(provider)
+    async with clients.registry.semaphore(provider):
+        permit = breaker.allow()
+        if permit is None:
+            raise CircuitOpenError(provider)
+        start = time.perf_counter()
+        try:
+            if provider in SDK_PROVIDERS:
+                call = asyncio.to_thread(_sdk_complete, provider, prompt, system, max_tokens)
+                text = await asyncio.wait_for(call, timeout=timeout)
+            else:
+                request = build_request(provider, prompt, system, max_tokens)
+                post = clients.get_async_client(provider).post(request.url, json=request.json, headers=request.headers)
+                text = parse_response(provider, await asyncio.wait_for(post, timeout=timeout))
+        except Exception:
+            breaker.record(False, permit=permit)
+            raise
+        except BaseException:
+            # Cancelled (e.g. the losing side of a hedge): no outcome, but free the probe.
+            breaker.release(permit)
+            raise
+        breaker.record(True, time.perf_counter() - start, permit)
+        return text
+
+
+async def ahedged(
+    provider: str,
+    prompt: str,
+    system: str = SYSTEM_PROMPT,
+    max_tokens: int = RATIONALE_MAX_TOKENS,
+    timeout: Optional[float] = None,
+) -> str:
+    """`acomplete`, repeated on the hedge provider when `provider` is slow or its breaker is open.
+
+    "Slow" means still running after `hedge_delay`; until the primary has
+    enough recorded latencies, only an open breaker triggers the hedge. The
+    first successful answer wins and the other call is cancelled; if both
+    fail, the primary's error is raised.
+    """
+    hedge = hedge_provider(provider)
+    if hedge is None:
+        return await acomplete(provider, prompt, system, max_tokens, timeout)
+
+    primary = asyncio.ensure_future(acomplete(provider, prompt, system, max_tokens, timeout))
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_delay(provider))
+        if primary in done and not isinstance(primary.exception(), CircuitOpenError):
+            return primary.result()
+
+        logger.info(f"Hedging {PROVIDER_LABELS[provider]} call to {PROVIDER_LABELS[hedge]}")
+        tasks.append(asyncio.ensure_future(acomplete(hedge, prompt, system, max_tokens, timeout)))
+        pending = set(tasks) - done
+        while pending:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                if task.exception() is None:
+                    return task.result()
+        return primary.result()
+    finally:
+        # The losing call, or both when the caller is cancelled.
+        for task in tasks:
+            task.cancel()
+
+
+async def _agenerate(context: str, provider: str) -> Rationale:
+    """One rationale from the provider, or the failure text."""
+    try:
+        return Rationale(await ahedged(provider, context), STATUS_GENERATED)
+    except asyncio.TimeoutError:
+        logger.warning(f"{PROVIDER_LABELS[provider]} call exceeded {call_timeout(provider)}s deadline")
+        return Rationale(unavailable_rationale(provider, "timeout"), STATUS_UNAVAILABLE)
+    except Exception as e:
+        return Rationale(_failure_text(provider, e), STATUS_UNAVAILABLE)
+
+
+async def agenerate_rationale(context: str, provider: Optional[str] = None) -> str:
+    """One rationale on the shared async client; call from the background loop."""
+    provider = provider or active_provider()
+    if provider == "none":
+        return fallback_rationale(context)
+    return (await _agenerate(context, provider)).text
+
+
+async def _abatch(contexts: Sequence[str], provider: str) -> List[Rationale]:
+    """Rationales for `contexts` from one packed prompt.
+
+    Items missing from the reply are retried one by one; if the batch call
+    itself fails, every item gets the unavailable text (a retry would most
+    likely fail the same way).
+    """
+    if len(contexts) == 1:
+        return [await _agenerate(contexts[0], provider)]
+    timeout = call_timeout(provider) * BATCH_TIMEOUT_FACTOR
+    try:
+        text = await ahedged(
+            provider,
+            batch_prompt(contexts),
+            system=BATCH_SYSTEM_PROMPT,
+            max_tokens=RATIONALE_MAX_TOKENS * len(contexts),
+            timeout=timeout,
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"{PROVIDER_LABELS[provider]} batch call exceeded {timeout}s deadline")
+        return [Rationale(unavailable_rationale(provider, "timeout"), STATUS_UNAVAILABLE)] * len(contexts)
+    except Exception as e:
+        return [Rationale(_failure_text(provider, e), STATUS_UNAVAILABLE)] * len(contexts)
+
+    answers = parse_batch(text, len(contexts))
+    results = [Rationale(answer, STATUS_GENERATED) if answer is not None else None for answer in answers]
+    missing = [i for i, answer in enumerate(answers) if answer is None]
+    if missing:
+        logger.info("Batch reply missed %d of %d rationales; retrying them singly", len(missing), len(contexts))
+        retried = await asyncio.gather(*(_agenerate(contexts[i], provider) for i in missing))
+        for i, result in zip(missing, retried):
+            results[i] = result
+    return results  # type: ignore[return-value]
+
+
+def gather_rationale_results(
+    contexts: Sequence[str], provider: Optional[str] = None, size: Optional[int] = None
+) -> List[Rationale]:
+    """Rationales for `contexts`, in order: cached or reused answers first, the rest batched concurrently.
+
+    Inside `rationale_budget()`, batches still running when the budget runs
+    out are cancelled and their actions get `STATUS_DEGRADED` rule-based text.
+    """
+    provider = provider or active_provider()
+    if provider == "none" or not contexts:
+        return [Rationale(fallback_rationale(c), STATUS_FALLBACK) for c in contexts]
+
+    cache = get_llm_cache()
+    keys = [cache_key(provider, context) for context in contexts]
+    cached = cache.get_many(keys) if cache else {}
+    results: List[Optional[Rationale]] = [
+        Rationale(cached[key], STATUS_CACHED) if key in cached else None for key in keys
+    ]
+    index = get_similarity_index()
+    namespace = similarity_namespace(provider)
+    if index is not None:
+        for i, result in enumerate(results):
+            reused = index.lookup(namespace, contexts[i]) if result is None else None
+            if reused is not None:
+                results[i] = Rationale(reused, STATUS_REUSED)
+    todo = [i for i, result in enumerate(results) if result is None]
+    if not todo:
+        return results  # type: ignore[return-value]
+
+    budget = current_budget()
+    if budget is not None and budget.exhausted:
+        for i in todo:
+            results[i] = budget.degrade(contexts[i])
+        return results  # type: ignore[return-value]
+
+    size = size or batch_size()
+    batches = [todo[i:i + size] for i in range(0, len(todo), size)]
+
+    async def _gather() -> List[Optional[List[Rationale]]]:
+        tasks = [asyncio.ensure_future(_abatch([contexts[i] for i in batch], provider)) for batch in batches]
+        _, pending = await asyncio.wait(tasks, timeout=budget.remaining() if budget is not None else None)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return [None if task in pending else task.result() for task in tasks]
+
+    if budget is None:
+        batch_results = clients.run(_gather())
+    else:
+        with budget.timing():
+            batch_results = clients.run(_gather())
+
+    fresh = []
+    for batch, batch_result in zip(batches, batch_results):
+        if batch_result is None:
+            for i in batch:
+                results[i] = budget.degrade(contexts[i])  # type: ignore[union-attr]
+            continue
+        for i, result in zip(batch, batch_result):
+            results[i] = result
+            if result.status == STATUS_GENERATED:
+                fresh.append((i, result.text))
+    if cache and fresh:
+        cache.set_many([(keys[i], text) for i, text in fresh])
+    if index is not None:
+        for i, text in fresh:
+            index.add(namespace, contexts[i], text)
+    return results  # type: ignore[return-value]
+
+
+def gather_rationales(
+    contexts: Sequence[str], provider: Optional[str] = None, size: Optional[int] = None
+) -> List[str]:
+    """Rationale texts for `contexts`, in order (see `gather_rationale_results`)."""
+    return [result.text for result in gather_rationale_results(contexts, provider, size)]
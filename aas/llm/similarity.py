@@ -0,0 +1,161 @@
+"""
+Similar-Context Rationale Reuse
+
+Many actions differ only in their numbers ("Stalled in stage 45 days" vs.
+"Stalled in stage 52 days"), so their contexts miss the exact-key cache.
+`SimilarityIndex` keeps previously generated rationales under a
+feature-hashed vector of their context with the numbers masked out, and
+looks new contexts up by cosine similarity (one NumPy matrix-vector
+product). A match at or above the threshold is reused with the new
+context's numbers templated in.
+
+Reuse is conservative: the two contexts must hold the same count of
+numbers, every number in the stored rationale must come from its context,
+and the rationale must not mention a word (a name, a stage) that the new
+context lacks, so nothing specific to the old action is carried over.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_DIM = 1024
+DEFAULT_THRESHOLD = 0.92
+DEFAULT_MAX_ENTRIES = 5000
+
+_NUMBER = re.compile(r"\d+(?:,\d{3})*(?:\.\d+)?")
+_TOKEN = re.compile(r"[a-z]+|#")
+_WORD = re.compile(r"[a-z]+")
+
+
+def split_numbers(context: str) -> Tuple[str, List[str]]:
+    """`context` with each number replaced by "#", and the numbers in order."""
+    return _NUMBER.sub("#", context), _NUMBER.findall(context)
+
+
+def embed(template: str, dim: int = DEFAULT_DIM) -> np.ndarray:
+    """Unit-length feature-hashed bag of words and word bigrams."""
+    tokens = _TOKEN.findall(template.lower())
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    vector = np.zeros(dim, dtype=np.float32)
+    if not features:
+        return vector
+    hashes = np.fromiter((zlib.crc32(f.encode()) for f in features), dtype=np.uint32, count=len(features))
+    signs = np.where(hashes & np.uint32(1 << 31), -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, (hashes % np.uint32(dim)).astype(np.int64), signs)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+def retarget(text: str, old_context: str, new_context: str) -> Optional[str]:
+    """`text`, written for `old_context`, with its numbers swapped for `new_context`'s.
+
+    `None` when the numbers do not line up, `text` holds a number that is
+    not from `old_context`, or it mentions a word `new_context` lacks.
+    """
+    old_words = set(_WORD.findall(old_context.lower()))
+    changed = old_words - set(_WORD.findall(new_context.lower()))
+    if changed & set(_WORD.findall(text.lower())):
+        return None
+    old, new = _NUMBER.findall(old_context), _NUMBER.findall(new_context)
+    if len(old) != len(new):
+        return None
+    mapping: Dict[str, str] = {}
+    for a, b in zip(old, new):
+        if mapping.setdefault(a, b) != b:
+            return None  # one old value maps to two new ones
+    if any(n not in mapping for n in _NUMBER.findall(text)):
+        return None
+    return _NUMBER.sub(lambda m: mapping[m.group(0)], text)
+
+
+class _Namespace:
+    """Vectors and rationales of one provider/model, in a ring buffer."""
+
+    def __init__(self, dim: int, capacity: int):
+        self.vectors = np.zeros((min(capacity, 64), dim), dtype=np.float32)
+        self.entries: List[Tuple[str, str]] = []
+        self.capacity = capacity
+        self.next = 0
+
+    def add(self, vector: np.ndarray, context: str, text: str) -> None:
+        size = len(self.entries)
+        if size < self.capacity:
+            if size == len(self.vectors):
+                grown = np.zeros((min(self.capacity, 2 * size), self.vectors.shape[1]), dtype=np.float32)
+                grown[:size] = self.vectors
+                self.vectors = grown
+            self.vectors[size] = vector
+            self.entries.append((context, text))
+            return
+        self.vectors[self.next] = vector
+        self.entries[self.next] = (context, text)
+        self.next = (self.next + 1) % self.capacity
+
+
+class SimilarityIndex:
+    """Nearest-context lookup of generated rationales."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, dim: int = DEFAULT_DIM,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.threshold = threshold
+        self.dim = dim
+        self.max_entries = max_entries
+        self._spaces: Dict[str, _Namespace] = {}
+        self._lock = threading.Lock()
+
+    def add(self, namespace: str, context: str, text: str) -> None:
+        """Remember `text` as the rationale for `context`."""
+        vector = embed(split_numbers(context)[0], self.dim)
+        with self._lock:
+            space = self._spaces.setdefault(namespace, _Namespace(self.dim, self.max_entries))
+            space.add(vector, context, text)
+
+    def lookup(self, namespace: str, context: str) -> Optional[str]:
+        """A stored rationale for a context like `context`, with its numbers updated; else `None`."""
+        vector = embed(split_numbers(context)[0], self.dim)
+        with self._lock:
+            space = self._spaces.get(namespace)
+            if space is None or not space.entries:
+                return None
+            scores = space.vectors[:len(space.entries)] @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            old_context, text = space.entries[best]
+        return retarget(text, old_context, context)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(space.entries) for space in self._spaces.values())
+
+
+_index: Optional[SimilarityIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_similarity_index() -> Optional[SimilarityIndex]:
+    """The process-wide index, or `None` when `LLM_SIMILARITY=off`."""
+    global _index
+    if os.getenv("LLM_SIMILARITY", "on").lower() in ("off", "0", "false", "no"):
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = SimilarityIndex(
+                threshold=float(os.getenv("LLM_SIMILARITY_THRESHOLD", DEFAULT_THRESHOLD)),
+                max_entries=int(os.getenv("LLM_SIMILARITY_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            )
+        return _index
+
+
+def reset_similarity_index() -> None:
+    """Drop the process-wide index (tests, or after prompt changes)."""
+    global _index
+    with _index_lock:
+        _index = None
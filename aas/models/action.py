@@ -16,6 +16,11 @@ class Action:
         id: Unique identifier for the action.
         title: Short descriptive title.
         priority: Action priority ("low"|"medium"|"high").
+        reasoning: Rationale shown with the action.
+        rationale_status: Where `reasoning` came from ("generated", "cached",
+            "reused", "fallback", "unavailable", "degraded" or "pending";
+            empty when not tracked).
+        rationale_context: LLM context of a pending rationale (not serialised).
     """
 
     type: str
@@ -26,6 +31,14 @@ class Action:
     priority: str = "medium"
     impact_score: float = 0.0
     reasoning: str = ""
+    rationale_status: str = ""
+    rationale_context: str = field(default="", repr=False)
+
+    def set_rationale(self, rationale: Any) -> None:
+        """Attach an `aas.llm.rationale.Rationale`: its text and status."""
+        self.reasoning = rationale.text
+        self.rationale_status = rationale.status
+        self.rationale_context = rationale.context
 
     def to_dict(self) -> Dict[str, Any]:
         """Return a JSON‑serialisable representation of the action."""
@@ -38,4 +51,5 @@ class Action:
             "metadata": self.metadata,
             "impact_score": self.impact_score,
             "reasoning": self.reasoning,
+            "rationale_status": self.rationale_status,
         }
\ No newline at end of file
@@ -27,6 +27,26 @@ def register_all_plays():
                 "type": "integer",
                 "description": "Minimum days in stage to flag as stalled",
                 "default": 14
+            },
+            "analysis_mode": {
+                "type": "string",
+                "description": "'sharded' analyzes across a process pool; 'chunked' streams the source in bounded batches",
+                "optional": True
+            },
+            "partition_key": {
+                "type": "string",
+                "description": "Column to shard on in sharded mode (e.g. region, opportunity_id)",
+                "optional": True
+            },
+            "chunk_size": {
+                "type": "integer",
+                "description": "Rows per batch in chunked mode",
+                "default": 50000
+            },
+            "approximate": {
+                "type": "boolean",
+                "description": "Use fixed-size sketches (heavy hitters, t-digest, HyperLogLog) for a bounded-memory preview",
+                "default": False
             }
         },
         demo_seed="pipeline_demo_1",
@@ -40,7 +60,23 @@ def register_all_plays():
         description="Detect churn-risk customers and queue retention outreach",
         agent_class=ChurnRescueAgent,
         tags=["customer-success", "retention", "churn"],
-        inputs_schema={},
+        inputs_schema={
+            "risk_threshold": {
+                "type": "number",
+                "description": "Churn risk (0-100) at which an account counts as at risk",
+                "default": 50
+            },
+            "top_n": {
+                "type": "integer",
+                "description": "At-risk accounts (by MRR at stake) to queue outreach for",
+                "default": 5
+            },
+            "source_path": {
+                "type": "string",
+                "description": "Customer CSV to score instead of aas_customers or the sample data, relative to AAS_DATA_DIR",
+                "optional": True
+            }
+        },
         demo_seed="churn_demo_1",
         icon="🛟"
     )
@@ -52,7 +88,28 @@ def register_all_plays():
         description="Detect unusual spending patterns and trigger budget reviews",
         agent_class=SpendAnomalyAgent,
         tags=["finance", "budget", "anomaly"],
-        inputs_schema={},
+        inputs_schema={
+            "threshold": {
+                "type": "number",
+                "description": "Robust z-score above which a transaction is flagged",
+                "default": 3.5
+            },
+            "window": {
+                "type": "integer",
+                "description": "Trailing transactions per vendor baseline",
+                "default": 30
+            },
+            "min_history": {
+                "type": "integer",
+                "description": "Earlier transactions needed before a vendor (or category) is scored",
+                "default": 3
+            },
+            "source_path": {
+                "type": "string",
+                "description": "CSV or Parquet ledger to analyze instead of the sample data, relative to AAS_DATA_DIR",
+                "optional": True
+            }
+        },
         demo_seed="spend_demo_1",
         icon="📊"
     )
@@ -74,6 +131,21 @@ def register_all_plays():
                 "type": "integer",
                 "description": "Number of days to forecast",
                 "default": 90
+            },
+            "simulation_scenarios": {
+                "type": "integer",
+                "description": "Monte Carlo scenarios for the P10/P50/P90 forecast (0 disables)",
+                "default": 10000
+            },
+            "simulation_seed": {
+                "type": "integer",
+                "description": "Seed for a reproducible simulation",
+                "optional": True
+            },
+            "sweep": {
+                "type": "object",
+                "description": "What-if grid: lists of target_revenue, forecast_period_days and win_rate evaluated in one pass",
+                "optional": True
             }
         },
         demo_seed="revenue_demo_1",
@@ -2,15 +2,25 @@
 Caching utilities for Agentic Analytics Studio.
 
 Provides simple in-memory caching for expensive operations like
-Tableau metadata requests and LLM responses.
+Tableau metadata requests and LLM responses, and `LLMCache`, a
+disk-backed LLM response cache shared by every process on the host.
 """
 
 from functools import lru_cache, wraps
-from typing import Any, Callable, Optional
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+import os
+import re
+import sqlite3
+import threading
 import time
 import hashlib
 import json
 
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
 
 class SimpleCache:
     """
@@ -72,9 +82,183 @@ class SimpleCache:
         return len(self.cache)
 
 
+DEFAULT_LLM_CACHE_TTL = 7 * 24 * 3600  # 1 week
+DEFAULT_LLM_CACHE_ENTRIES = 50_000
+# After the cache file fails to open, run uncached this long before retrying.
+LLM_CACHE_RETRY_SECONDS = 60.0
+
+
+class LLMCache:
+    """
+    SQLite-backed LLM response cache with TTL and size-bounded LRU eviction.
+    
+    The database runs in WAL mode, so every uvicorn worker (and script) on
+    the host can read and write the same file concurrently. Entries older
+    than `ttl` are never returned; past `max_entries`, the least recently
+    read entries are dropped.
+    
+    The cache never fails a generation: a read error (e.g. "database is
+    locked" past the busy timeout) is logged and counts as a miss, and a
+    write error is logged and dropped.
+    """
+    
+    def __init__(self, path: Any, ttl: int = DEFAULT_LLM_CACHE_TTL, max_entries: int = DEFAULT_LLM_CACHE_ENTRIES):
+        """
+        Initialize cache.
+        
+        Args:
+            path: SQLite database file (created if missing)
+            ttl: Time-to-live in seconds
+            max_entries: Entries kept before LRU eviction
+        """
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at)")
+    
+    @staticmethod
+    def key(provider: str, model: str, template: str, context: Any) -> str:
+        """
+        Cache key for one generation.
+        
+        String contexts are whitespace-normalized; other contexts are
+        serialized as sorted JSON, so equal inputs share a key.
+        """
+        if isinstance(context, str):
+            context = re.sub(r"\s+", " ", context).strip()
+        else:
+            context = json.dumps(context, sort_keys=True, default=str)
+        payload = json.dumps([provider, model, template, context])
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached value, or None if missing or expired."""
+        return self.get_many([key]).get(key)
+    
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Return the cached, unexpired values among `keys`, refreshing their LRU position."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        found: Dict[str, str] = {}
+        with self._lock:
+            try:
+                for start in range(0, len(keys), 500):
+                    batch = keys[start:start + 500]
+                    marks = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT key, value FROM llm_cache WHERE key IN ({marks}) AND created_at >= ?",
+                        (*batch, now - self.ttl),
+                    ).fetchall()
+                    found.update(rows)
+                if found:
+                    self._conn.executemany(
+                        "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", [(now, k) for k in found]
+                    )
+            except sqlite3.Error as e:
+                logger.warning("LLM cache read failed (%s): %s", self.path, e)
+        return found
+    
+    def set(self, key: str, value: str) -> None:
+        """Store a value."""
+        self.set_many([(key, value)])
+    
+    def set_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        """Store several values in one transaction, then evict."""
+        now = time.time()
+        rows = [(k, v, now, now) for k, v in items]
+        if not rows:
+            return
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._conn.executemany("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)", rows)
+                    self._evict(now)
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    if self._conn.in_transaction:
+                        self._conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error as e:
+                logger.warning("LLM cache write of %d entries failed (%s): %s", len(rows), self.path, e)
+    
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then the least recently read ones over `max_entries`."""
+        self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+        excess = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+    
+    def clear(self) -> None:
+        """Clear all cached values."""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+    
+    def size(self) -> int:
+        """Return number of cached items."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
 # Global cache instances
 _tableau_cache = SimpleCache(ttl=600)  # 10 minutes for Tableau metadata
 _llm_cache = SimpleCache(ttl=3600)  # 1 hour for LLM responses
+_persistent_llm_caches: Dict[str, LLMCache] = {}
+_persistent_llm_lock = threading.Lock()
+_failed_llm_caches: Dict[str, float] = {}  # path -> monotonic time of the failed open
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """
+    Shared disk-backed LLM cache, or None when `LLM_CACHE=off`.
+    
+    Configured by `LLM_CACHE_PATH` (default `data/llm_cache.sqlite3` under
+    the working directory), `LLM_CACHE_TTL` (seconds) and
+    `LLM_CACHE_MAX_ENTRIES`. If the file cannot be opened (say the directory
+    is not writable), the failure is logged and callers run uncached (None)
+    for `LLM_CACHE_RETRY_SECONDS` before it is tried again.
+    """
+    if os.getenv("LLM_CACHE", "on").lower() in ("off", "0", "false", "no"):
+        return None
+    path = os.getenv("LLM_CACHE_PATH") or str(Path.cwd() / "data" / "llm_cache.sqlite3")
+    with _persistent_llm_lock:
+        cache = _persistent_llm_caches.get(path)
+        if cache is None:
+            failed_at = _failed_llm_caches.get(path)
+            if failed_at is not None and time.monotonic() - failed_at < LLM_CACHE_RETRY_SECONDS:
+                return None
+            try:
+                cache = LLMCache(
+                    path,
+                    ttl=int(os.getenv("LLM_CACHE_TTL", DEFAULT_LLM_CACHE_TTL)),
+                    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", DEFAULT_LLM_CACHE_ENTRIES)),
+                )
+            except (OSError, sqlite3.Error) as e:
+                _failed_llm_caches[path] = time.monotonic()
+                logger.warning("LLM cache unavailable at %s, running uncached: %s", path, e)
+                return None
+            _failed_llm_caches.pop(path, None)
+            _persistent_llm_caches[path] = cache
+        return cache
 
 
 def cached_tableau(func: Callable) -> Callable:
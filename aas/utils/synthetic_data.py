@@ -0,0 +1,275 @@
+"""
+Synthetic Data
+
+Seeded, vectorized generators for benchmark and demo fixtures: pipeline
+opportunities, revenue deals, spend transactions and customers. Every column
+is drawn as a NumPy array, so millions of rows take seconds, and the same
+`seed` always yields the same frame.
+
+The frames match the schemas the plays read (the `aas_opportunities` table
+and the CSVs under `aas/sample_data/`), and can be written to CSV/Parquet
+with `write_frame` or to Postgres with `aas.db.copy_frame`.
+"""
+
+from __future__ import annotations
+
+import datetime as _dt
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+
+import numpy as np
+import pandas as pd  # type: ignore
+
+PIPELINE_STAGES = [
+    "Prospecting", "Qualification", "Discovery", "Proposal", "Negotiation", "Closed Won", "Closed Lost",
+]
+PIPELINE_STAGE_WEIGHTS = [18, 18, 16, 14, 10, 12, 12]
+# Typical amount and days-in-stage for each pipeline stage.
+PIPELINE_STAGE_AMOUNT = [15000, 25000, 35000, 50000, 70000, 60000, 45000]
+PIPELINE_STAGE_AGE = [7, 14, 18, 25, 35, 2, 2]
+
+PIPELINE_REGIONS = ["East", "Central", "West", "South"]
+SEGMENTS = ["SMB", "Mid-Market", "Enterprise"]
+OWNERS = ["Alice", "Bob", "Carol", "Dave", "Eve", "Frank", "Grace", "Heidi"]
+
+DEAL_STAGES = ["Prospecting", "Qualification", "Proposal", "Negotiation", "Closed Won", "Closed Lost"]
+DEAL_STAGE_PROBABILITY = [10, 25, 50, 75, 100, 0]
+DEAL_REGIONS = ["North America", "EMEA", "APAC", "LATAM"]
+
+# (department, category, vendor, budget_category, typical amount, recurring)
+SPEND_VENDORS = [
+    ("Engineering", "Cloud Services", "AWS", "Infrastructure", 12500, True),
+    ("Engineering", "Cloud Services", "Google Cloud", "Infrastructure", 6000, True),
+    ("Engineering", "Software", "GitHub", "Engineering Tools", 2100, True),
+    ("Engineering", "Software", "Datadog", "Engineering Tools", 4800, True),
+    ("Marketing", "Advertising", "Google Ads", "Marketing", 8500, False),
+    ("Marketing", "Advertising", "LinkedIn Ads", "Marketing", 5200, False),
+    ("Marketing", "Events", "Eventbrite", "Marketing", 3000, False),
+    ("Sales", "Software", "Salesforce", "Sales Tools", 15000, True),
+    ("Sales", "Travel", "Delta Airlines", "Travel", 1800, False),
+    ("Sales", "Travel", "Marriott", "Travel", 900, False),
+    ("Operations", "Office Supplies", "Staples", "Facilities", 450, False),
+    ("Operations", "Facilities", "WeWork", "Facilities", 22000, True),
+    ("HR", "Software", "Workday", "HR Tools", 7000, True),
+    ("HR", "Recruiting", "LinkedIn Recruiter", "HR Tools", 3500, False),
+    ("Finance", "Professional Services", "Deloitte", "Professional Services", 18000, False),
+]
+APPROVERS = {
+    "Engineering": "John Smith",
+    "Marketing": "Jane Doe",
+    "Sales": "Bob Johnson",
+    "Operations": "Alice Brown",
+    "HR": "Carol White",
+    "Finance": "David Lee",
+}
+
+USAGE_TRENDS = ["declining", "stable", "growing"]
+
+
+def _rng(seed: Optional[int]) -> np.random.Generator:
+    return np.random.default_rng(seed)
+
+
+def _ids(prefix: str, n: int, start: int = 1, width: int = 5) -> np.ndarray:
+    """Zero-padded string ids, e.g. OPP00001."""
+    numbers = pd.Series(np.arange(start, start + n)).astype(str).str.zfill(width)
+    return (prefix + numbers).to_numpy()
+
+
+def _today(today: Optional[_dt.date]) -> np.datetime64:
+    return np.datetime64(today or _dt.date.today(), "D")
+
+
+def _days(base: np.datetime64, offsets: np.ndarray) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex(base + offsets.astype("timedelta64[D]"))
+
+
+def generate_opportunities(n: int, seed: Optional[int] = None, today: Optional[_dt.date] = None) -> pd.DataFrame:
+    """
+    Pipeline opportunities in the `aas_opportunities` schema.
+
+    Later stages carry larger amounts and longer stage ages, as in the demo
+    seed data. The column is the table's `stage_age_days`; the pipeline play
+    reads it as `stage_age` when loading a CSV (see `normalize_columns`).
+    """
+    rng = _rng(seed)
+    now = _today(today)
+    weights = np.asarray(PIPELINE_STAGE_WEIGHTS, dtype=float)
+    stage = rng.choice(len(PIPELINE_STAGES), size=n, p=weights / weights.sum())
+
+    base_amount = np.asarray(PIPELINE_STAGE_AMOUNT, dtype=float)[stage]
+    amount = np.maximum(1000, rng.normal(base_amount, base_amount * 0.55)).round(2)
+    base_age = np.asarray(PIPELINE_STAGE_AGE, dtype=float)[stage]
+    stage_age = np.maximum(1, rng.normal(base_age, base_age * 0.55)).astype(int)
+
+    created_at = pd.DatetimeIndex(
+        now.astype("datetime64[s]") - rng.integers(5 * 86400, 120 * 86400, size=n).astype("timedelta64[s]")
+    ).tz_localize("UTC")
+
+    return pd.DataFrame({
+        "opportunity_id": _ids("OPP", n),
+        "owner": np.asarray(OWNERS)[rng.integers(0, len(OWNERS), size=n)],
+        "region": np.asarray(PIPELINE_REGIONS)[rng.integers(0, len(PIPELINE_REGIONS), size=n)],
+        "segment": np.asarray(SEGMENTS)[rng.integers(0, len(SEGMENTS), size=n)],
+        "stage": np.asarray(PIPELINE_STAGES)[stage],
+        "amount": amount,
+        "created_at": created_at,
+        "close_date": _days(now, rng.integers(-10, 111, size=n)),
+        "last_touch_date": _days(now, -rng.integers(0, 61, size=n)),
+        "stage_age_days": stage_age,
+    })
+
+
+def generate_deals(n: int, seed: Optional[int] = None, today: Optional[_dt.date] = None) -> pd.DataFrame:
+    """
+    Revenue deals in the `revenue_forecast_data.csv` schema.
+
+    Close dates span the last 180 days to 90 days out; deals that should have
+    closed more than 90 days ago are Closed Won or Closed Lost.
+    """
+    rng = _rng(seed)
+    now = _today(today)
+    close_offset = rng.integers(-180, 91, size=n)
+    stage = rng.integers(0, len(DEAL_STAGES), size=n)
+    stale = close_offset < -90
+    stage = np.where(stale, rng.integers(4, 6, size=n), stage)
+    close_date = _days(now, close_offset)
+
+    return pd.DataFrame({
+        "opportunity_id": _ids("OPP-", n, start=1000, width=4),
+        "opportunity_name": "Deal " + pd.Series(np.arange(1, n + 1)).astype(str).to_numpy(),
+        "amount": rng.integers(10, 501, size=n) * 1000,
+        "close_date": close_date,
+        "stage": np.asarray(DEAL_STAGES)[stage],
+        "probability": np.asarray(DEAL_STAGE_PROBABILITY)[stage],
+        "region": np.asarray(DEAL_REGIONS)[rng.integers(0, len(DEAL_REGIONS), size=n)],
+        "segment": np.asarray(SEGMENTS)[rng.integers(0, len(SEGMENTS), size=n)],
+        "owner": "Rep " + pd.Series(rng.integers(1, 11, size=n)).astype(str).to_numpy(),
+        "created_date": close_date - pd.to_timedelta(rng.integers(30, 121, size=n), unit="D"),
+    })
+
+
+def generate_transactions(
+    n: int,
+    seed: Optional[int] = None,
+    today: Optional[_dt.date] = None,
+    days: int = 365,
+    anomaly_rate: float = 0.01,
+    labels: bool = False,
+) -> pd.DataFrame:
+    """
+    Spend transactions in the `spend_anomaly_data.csv` schema, sorted by date.
+
+    Amounts are log-normal around each vendor's typical spend with a weekday
+    pattern; a fraction `anomaly_rate` of rows is inflated 3-10x. With
+    `labels=True` an `is_injected_anomaly` column marks those rows, for
+    scoring detectors against ground truth.
+    """
+    rng = _rng(seed)
+    now = _today(today)
+    vendors = pd.DataFrame(
+        SPEND_VENDORS,
+        columns=["department", "category", "vendor", "budget_category", "typical", "is_recurring"],
+    )
+    vendor = rng.integers(0, len(vendors), size=n)
+    offset = np.sort(rng.integers(-days + 1, 1, size=n))
+    date = _days(now, offset)
+
+    typical = vendors["typical"].to_numpy(dtype=float)[vendor]
+    recurring = vendors["is_recurring"].to_numpy()[vendor]
+    sigma = np.where(recurring, 0.08, 0.35)
+    weekday_factor = np.where(date.dayofweek >= 5, 0.6, 1.0)
+    amount = typical * weekday_factor * rng.lognormal(0.0, sigma)
+    anomaly = rng.random(n) < anomaly_rate
+    amount = np.where(anomaly, amount * rng.uniform(3, 10, size=n), amount).round(2)
+
+    department = vendors["department"].to_numpy()[vendor]
+    frame = pd.DataFrame({
+        "transaction_id": _ids("T", n, width=7),
+        "date": date,
+        "department": department,
+        "category": vendors["category"].to_numpy()[vendor],
+        "vendor": vendors["vendor"].to_numpy()[vendor],
+        "amount": amount,
+        "budget_category": vendors["budget_category"].to_numpy()[vendor],
+        "approver": pd.Series(department).map(APPROVERS).to_numpy(),
+        "description": np.where(recurring, "Recurring charge", "Ad-hoc purchase"),
+        "is_recurring": recurring,
+    })
+    if labels:
+        frame["is_injected_anomaly"] = anomaly
+    return frame
+
+
+def generate_customers(n: int, seed: Optional[int] = None, today: Optional[_dt.date] = None) -> pd.DataFrame:
+    """
+    Customer accounts in the `churn_rescue_data.csv` schema.
+
+    A latent health value drives every signal (tickets, NPS, usage trend,
+    logins, payment delays), so unhealthy accounts look unhealthy across the
+    board, as in real churn data.
+    """
+    rng = _rng(seed)
+    now = _today(today)
+    health = rng.beta(4, 2, size=n)  # 0 = about to churn, 1 = thriving
+    sick = 1 - health
+
+    trend_score = health + rng.normal(0, 0.15, size=n)
+    usage_trend = np.asarray(USAGE_TRENDS)[np.digitize(trend_score, [0.45, 0.8])]
+    account_health = np.clip(health * 100 + rng.normal(0, 5, size=n), 0, 100).round().astype(int)
+
+    return pd.DataFrame({
+        "customer_id": _ids("C", n, width=6),
+        "name": "Customer " + pd.Series(np.arange(1, n + 1)).astype(str).to_numpy(),
+        "mrr": (rng.lognormal(8.3, 1.0, size=n) // 100 * 100 + 100).astype(int),
+        "contract_end_date": _days(now, rng.integers(15, 366, size=n)),
+        "support_tickets_30d": rng.poisson(0.5 + sick * 10),
+        "nps_score": np.clip(np.round(health * 10 + rng.normal(0, 1.2, size=n)), 0, 10).astype(int),
+        "usage_trend": usage_trend,
+        "last_login_days": rng.poisson(sick ** 2 * 30),
+        "payment_delays": rng.poisson(sick ** 3 * 4),
+        "account_health_score": account_health,
+    })
+
+
+GENERATORS: Dict[str, Callable[..., pd.DataFrame]] = {
+    "opportunities": generate_opportunities,
+    "deals": generate_deals,
+    "transactions": generate_transactions,
+    "customers": generate_customers,
+}
+
+
+def generate(kind: str, n: int, seed: Optional[int] = None, **kwargs) -> pd.DataFrame:
+    """
+    Generate a fixture by name.
+
+    Raises:
+        ValueError: If `kind` is not one of `GENERATORS`.
+    """
+    if kind not in GENERATORS:
+        raise ValueError(f"Unknown synthetic data kind: {kind!r}. Use one of {list(GENERATORS)}.")
+    return GENERATORS[kind](n, seed=seed, **kwargs)
+
+
+def write_frame(frame: pd.DataFrame, path: Union[str, Path]) -> Path:
+    """
+    Write a frame as CSV or Parquet, chosen by file extension.
+
+    Raises:
+        ValueError: For an unsupported extension.
+        ImportError: For Parquet without pyarrow installed.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    suffix = path.suffix.lower()
+    if suffix in (".csv", ".gz"):
+        frame.to_csv(path, index=False)
+    elif suffix in (".parquet", ".pq"):
+        try:
+            frame.to_parquet(path, index=False)
+        except ImportError as e:
+            raise ImportError("Writing Parquet requires pyarrow: pip install pyarrow") from e
+    else:
+        raise ValueError(f"Unsupported output format: {path.name}. Use .csv or .parquet.")
+    return path
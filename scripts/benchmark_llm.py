@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Benchmark /run/{play} end to end against a fake LLM provider.
+
+Usage:
+  python3 scripts/benchmark_llm.py --play churn --requests 50 --concurrency 4
+  python3 scripts/benchmark_llm.py --provider openai --latency lognormal --latency-ms 800 --error-rate 0.05
+  python3 scripts/benchmark_llm.py --play churn,spend --deferred --json
+  python3 scripts/benchmark_llm.py --api-url http://localhost:8000 --fake-url http://localhost:8089
+
+Starts `aas.llm.fake_server` (unless --fake-url is given), points the
+provider at it, and drives the API in-process (or a running one with
+--api-url, which must already be configured for the fake server). The
+disk cache and similarity reuse are off unless --cache is given, so every
+run reaches the provider. Reports latency percentiles, throughput, the
+rationale statuses seen in the responses and the fake server's counters.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+
+from aas.llm.fake_server import FakeLLMServer, add_config_arguments, config_from_args  # noqa: E402
+
+Post = Callable[[str, Dict[str, Any]], Tuple[int, Dict[str, Any]]]
+
+
+def configure_provider(provider: str, fake_url: str, cache: bool) -> None:
+    """Point the app's `provider` at the fake server (before `aas.api` is imported)."""
+    os.environ["LLM_PROVIDER"] = provider
+    os.environ["OPENAI_BASE_URL"] = f"{fake_url}/v1"
+    os.environ["OLLAMA_BASE_URL"] = f"{fake_url}/api"
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    if not cache:
+        os.environ["LLM_CACHE"] = "off"
+        os.environ["LLM_SIMILARITY"] = "off"
+
+
+def in_process_client() -> Tuple[Post, Callable[[], None]]:
+    from fastapi.testclient import TestClient
+
+    from aas.api import app
+
+    client = TestClient(app, raise_server_exceptions=False)
+    client.__enter__()
+
+    def post(path: str, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        response = client.post(path, json=body)
+        return response.status_code, response.json()
+
+    return post, lambda: client.__exit__(None, None, None)
+
+
+def remote_client(api_url: str) -> Tuple[Post, Callable[[], None]]:
+    client = httpx.Client(base_url=api_url, timeout=120.0)
+
+    def post(path: str, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        response = client.post(path, json=body)
+        return response.status_code, response.json()
+
+    return post, client.close
+
+
+def run_play_requests(post: Post, play: str, requests: int, concurrency: int, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Send `requests` runs of `play`, `concurrency` at a time; latency and status summary."""
+
+    def one(_: int) -> Tuple[float, int, List[str]]:
+        start = time.perf_counter()
+        status, payload = post(f"/run/{play}", {"params": params})
+        elapsed = time.perf_counter() - start
+        statuses = [a.get("rationale_status") or "unset" for a in payload.get("actions", [])] if status == 200 else []
+        return elapsed, status, statuses
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+
+    latencies = np.array([elapsed for elapsed, _, _ in results]) * 1000
+    rationales = Counter(s for _, _, statuses in results for s in statuses)
+    return {
+        "play": play,
+        "requests": requests,
+        "concurrency": concurrency,
+        "ok": sum(1 for _, status, _ in results if status == 200),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+        "throughput_rps": requests / wall if wall else 0.0,
+        "rationales": dict(rationales),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("--play", default="churn", help="Play name, or comma-separated names")
+    p.add_argument("--provider", choices=["ollama", "openai"], default="ollama")
+    p.add_argument("--requests", type=int, default=20)
+    p.add_argument("--concurrency", type=int, default=4)
+    p.add_argument("--warmup", type=int, default=1, help="Untimed runs per play first")
+    p.add_argument("--deferred", action="store_true", help='Run with rationale_mode "deferred"')
+    p.add_argument("--cache", action="store_true", help="Keep the disk cache and similarity reuse on")
+    p.add_argument("--fake-url", help="Use an already running fake server")
+    p.add_argument("--api-url", help="Drive a running API instead of the app in-process")
+    p.add_argument("--json", action="store_true", help="Print results as JSON")
+    add_config_arguments(p)
+    args = p.parse_args()
+
+    server = None
+    if args.fake_url:
+        fake_url = args.fake_url.rstrip("/")
+    else:
+        server = FakeLLMServer(config_from_args(args)).start()
+        fake_url = server.url
+    configure_provider(args.provider, fake_url, args.cache)
+
+    post, close = remote_client(args.api_url) if args.api_url else in_process_client()
+    params = {"rationale_mode": "deferred"} if args.deferred else {}
+    results = []
+    try:
+        for play in [name.strip() for name in args.play.split(",") if name.strip()]:
+            for _ in range(args.warmup):
+                post(f"/run/{play}", {"params": params})
+            results.append(run_play_requests(post, play, args.requests, args.concurrency, params))
+        stats = httpx.get(f"{fake_url}/stats").json()
+    finally:
+        close()
+        if server is not None:
+            server.stop()
+
+    if args.json:
+        print(json.dumps({"provider": args.provider, "fake_url": fake_url, "results": results, "fake_server": stats}, indent=2))
+        return
+
+    print(f"provider={args.provider} fake={fake_url} latency={args.latency}:{args.latency_ms:g}ms "
+          f"error_rate={args.error_rate:g} tokens/s={args.tokens_per_second:g}")
+    for r in results:
+        print(f"{r['play']}: {r['ok']}/{r['requests']} ok, p50 {r['p50_ms']:.0f}ms, p95 {r['p95_ms']:.0f}ms, "
+              f"p99 {r['p99_ms']:.0f}ms, max {r['max_ms']:.0f}ms, {r['throughput_rps']:.1f} runs/s, "
+              f"rationales {r['rationales']}")
+    print(f"fake server: {stats['total']} calls ({stats['errors']} errors, {stats['batch_items']} batched items), "
+          f"first-token p50 {stats['first_token_ms_p50'] or 0:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
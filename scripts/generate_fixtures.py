@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Generate reproducible large fixtures for benchmarking the plays.
+
+Usage:
+  python3 scripts/generate_fixtures.py --kind deals --rows 1000000 --seed 42 --out fixtures/deals.parquet
+  python3 scripts/generate_fixtures.py --kind all --rows 500000 --seed 7 --out-dir fixtures
+  python3 scripts/generate_fixtures.py --kind opportunities --rows 2000000 --table aas_opportunities
+
+Kinds: opportunities, deals, transactions, customers (or all). Files are CSV or
+Parquet by extension (Parquet needs pyarrow); --table loads via Postgres COPY
+using DATABASE_URL.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aas.utils.synthetic_data import GENERATORS, generate, write_frame  # noqa: E402
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--kind", choices=[*GENERATORS, "all"], required=True)
+    p.add_argument("--rows", type=int, default=100_000)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--out", help="Output file (.csv or .parquet) for a single kind")
+    p.add_argument("--out-dir", default="fixtures", help="Output directory when --out is not given")
+    p.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    p.add_argument("--table", help="Load into this Postgres table via COPY instead of writing a file")
+    args = p.parse_args()
+
+    kinds = list(GENERATORS) if args.kind == "all" else [args.kind]
+    for kind in kinds:
+        started = time.time()
+        frame = generate(kind, args.rows, seed=args.seed)
+        generated = time.time() - started
+
+        if args.table:
+            from aas.db import copy_frame, get_conn
+
+            conn = get_conn()
+            copy_frame(conn, frame, args.table)
+            conn.close()
+            target = args.table
+        else:
+            path = args.out if args.out and len(kinds) == 1 else Path(args.out_dir) / f"{kind}.{args.format}"
+            target = write_frame(frame, path)
+
+        print(f"{kind}: {len(frame):,} rows generated in {generated:.2f}s -> {target} ({time.time() - started:.2f}s total)")
+
+
+if __name__ == "__main__":
+    main()
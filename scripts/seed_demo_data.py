@@ -3,9 +3,15 @@
 
 Usage:
   python3 scripts/seed_demo_data.py --database-url "$DATABASE_URL" --rows 800
+  python3 scripts/seed_demo_data.py --rows 2000000 --seed 42 --truncate
+  python3 scripts/seed_demo_data.py --rows 800 --customers 3000000 --seed 42
 
 Notes:
-- This script is intentionally dependency-light. It only needs psycopg2-binary.
+- Opportunities come from the seeded, vectorized generator in
+  `aas.utils.synthetic_data` and are bulk-loaded with COPY, so millions of
+  rows load in seconds. The same --seed always produces the same data.
+- Customers for the churn play are generated and COPY-loaded into `aas_customers`
+  the same way.
 - It generates realistic-ish pipeline data (stages, owners, regions, aging) plus an initial
   queue of pending actions.
 """
@@ -14,54 +20,24 @@ import argparse
 import datetime as dt
 import json
 import os
-import random
-import string
+import sys
 import uuid
+from pathlib import Path
 
 import psycopg2
 
-STAGES = [
-    "Prospecting",
-    "Qualification",
-    "Discovery",
-    "Proposal",
-    "Negotiation",
-    "Closed Won",
-    "Closed Lost",
-]
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-REGIONS = ["East", "Central", "West", "South"]
-SEGMENTS = ["SMB", "Mid-Market", "Enterprise"]
-OWNERS = ["Alice", "Bob", "Carol", "Dave", "Eve", "Frank", "Grace", "Heidi"]
-
-
-def rand_amount(stage: str) -> float:
-    base = {
-        "Prospecting": 15000,
-        "Qualification": 25000,
-        "Discovery": 35000,
-        "Proposal": 50000,
-        "Negotiation": 70000,
-        "Closed Won": 60000,
-        "Closed Lost": 45000,
-    }[stage]
-    return float(max(1000, random.gauss(base, base * 0.55)))
-
-
-def maybe_date(days_back: int, days_forward: int) -> dt.date:
-    start = dt.date.today() - dt.timedelta(days=days_back)
-    span = days_back + days_forward
-    return start + dt.timedelta(days=random.randint(0, span))
-
-
-def opp_id(i: int) -> str:
-    return f"OPP{str(i).zfill(5)}"
+from aas.db import copy_frame  # noqa: E402
+from aas.utils.synthetic_data import generate_customers, generate_opportunities  # noqa: E402
 
 
 def main() -> None:
     p = argparse.ArgumentParser()
     p.add_argument("--database-url", default=os.getenv("DATABASE_URL"), required=False)
     p.add_argument("--rows", type=int, default=800)
+    p.add_argument("--customers", type=int, default=500, help="Customer accounts for the churn play")
+    p.add_argument("--seed", type=int, default=None, help="Seed for reproducible data")
     p.add_argument("--truncate", action="store_true", help="Delete existing demo rows first")
     args = p.parse_args()
 
@@ -73,54 +49,14 @@ def main() -> None:
 
     with conn.cursor() as cur:
         if args.truncate:
-            cur.execute("TRUNCATE aas_executions, aas_actions, aas_findings, aas_pipeline_runs, aas_opportunities RESTART IDENTITY CASCADE;")
-
-        # opportunities
-        for i in range(1, args.rows + 1):
-            stage = random.choices(STAGES, weights=[18, 18, 16, 14, 10, 12, 12])[0]
-            owner = random.choice(OWNERS)
-            region = random.choice(REGIONS)
-            segment = random.choice(SEGMENTS)
-
-            created_at = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=random.randint(5, 120))
-            close_date = maybe_date(10, 120)
-            last_touch = maybe_date(1, 60)
-
-            # stage age tends to be higher in later stages
-            stage_bias = {
-                "Prospecting": 7,
-                "Qualification": 14,
-                "Discovery": 18,
-                "Proposal": 25,
-                "Negotiation": 35,
-                "Closed Won": 2,
-                "Closed Lost": 2,
-            }[stage]
-            stage_age = max(1, int(random.gauss(stage_bias, stage_bias * 0.55)))
-
-            amt = rand_amount(stage)
+            cur.execute("TRUNCATE aas_executions, aas_actions, aas_findings, aas_pipeline_runs, aas_opportunities, aas_customers RESTART IDENTITY CASCADE;")
 
-            cur.execute(
-                """
-                INSERT INTO aas_opportunities (
-                  opportunity_id, owner, region, segment, stage, amount,
-                  created_at, close_date, last_touch_date, stage_age_days
-                ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                ON CONFLICT (opportunity_id) DO NOTHING;
-                """,
-                (
-                    opp_id(i),
-                    owner,
-                    region,
-                    segment,
-                    stage,
-                    amt,
-                    created_at,
-                    close_date,
-                    last_touch,
-                    stage_age,
-                ),
-            )
+        # opportunities (ON CONFLICT DO NOTHING keeps re-runs idempotent)
+        opportunities = generate_opportunities(args.rows, seed=args.seed)
+        copy_frame(conn, opportunities, "aas_opportunities", on_conflict_do_nothing=True)
+
+        customers = generate_customers(args.customers, seed=args.seed)
+        copy_frame(conn, customers, "aas_customers", on_conflict_do_nothing=True)
 
         # initial run + a few actions so Tableau has something before the first audit
         run_id = str(uuid.uuid4())
@@ -177,7 +113,7 @@ def main() -> None:
             )
 
     conn.close()
-    print(f"Seed complete. opportunities={args.rows}, initial_run={run_id}")
+    print(f"Seed complete. opportunities={args.rows}, customers={args.customers}, initial_run={run_id}")
 
 
 if __name__ == "__main__":
@@ -14,6 +14,22 @@ CREATE TABLE IF NOT EXISTS aas_opportunities (
   stage_age_days INT NOT NULL
 );
 
+CREATE TABLE IF NOT EXISTS aas_customers (
+  customer_id TEXT PRIMARY KEY,
+  name TEXT NOT NULL,
+  mrr NUMERIC(14,2) NOT NULL,
+  contract_end_date DATE,
+  support_tickets_30d INT NOT NULL DEFAULT 0,
+  nps_score SMALLINT,
+  usage_trend TEXT CHECK (usage_trend IN ('declining','stable','growing')),
+  last_login_days INT,
+  payment_delays INT NOT NULL DEFAULT 0,
+  account_health_score SMALLINT,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_aas_customers_contract_end ON aas_customers(contract_end_date);
+
 CREATE TABLE IF NOT EXISTS aas_pipeline_runs (
   run_id TEXT PRIMARY KEY,
   run_ts TIMESTAMPTZ NOT NULL,
@@ -32,6 +48,12 @@ CREATE TABLE IF NOT EXISTS aas_findings (
   created_at TIMESTAMPTZ NOT NULL
 );
 
+-- Findings are written once per run (COPY) and read by run, opportunity or driver.
+CREATE INDEX IF NOT EXISTS idx_aas_findings_run_score ON aas_findings(run_id, risk_score DESC);
+CREATE INDEX IF NOT EXISTS idx_aas_findings_opportunity ON aas_findings(opportunity_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_aas_findings_driver_score ON aas_findings(risk_driver, risk_score DESC);
+CREATE INDEX IF NOT EXISTS idx_aas_pipeline_runs_play_ts ON aas_pipeline_runs(play, run_ts DESC);
+
 CREATE TABLE IF NOT EXISTS aas_actions (
   action_id TEXT PRIMARY KEY,
   run_id TEXT NOT NULL REFERENCES aas_pipeline_runs(run_id) ON DELETE CASCADE,
@@ -0,0 +1,167 @@
+"""
+Unit tests for Churn Rescue Agent.
+"""
+
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aas.agents.base import InvalidParams
+from aas.agents.churn_rescue import ChurnRescueAgent
+from aas.analytics.churn import ChurnRiskAggregator, churn_reasons, risk_components, score_customers
+from aas.utils.synthetic_data import generate_customers
+
+TODAY = dt.date(2026, 1, 1)
+
+
+@pytest.fixture
+def customers_df():
+    """Healthy, borderline and failing accounts."""
+    return pd.DataFrame({
+        "customer_id": ["C1", "C2", "C3", "C4"],
+        "name": ["Healthy", "Failing", "Borderline", "Big Failing"],
+        "mrr": [10000, 2000, 5000, 30000],
+        "contract_end_date": ["2026-12-01", "2026-02-01", "2026-06-01", "2026-03-15"],
+        "support_tickets_30d": [0, 12, 4, 9],
+        "nps_score": [9, 2, 6, 3],
+        "usage_trend": ["growing", "declining", "stable", "declining"],
+        "last_login_days": [1, 40, 10, 25],
+        "payment_delays": [0, 4, 1, 2],
+        "account_health_score": [95, 10, 55, 30],
+    })
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Request file paths resolve inside this directory."""
+    monkeypatch.setenv("AAS_DATA_DIR", str(tmp_path))
+    return tmp_path
+
+
+class TestScoreCustomers:
+    """Tests for the vectorized churn score."""
+
+    def test_components_are_capped(self, customers_df):
+        points = risk_components(customers_df)
+
+        np.testing.assert_allclose(points[1], [27, 15, 75 / 7, 10, 15, 15])
+        assert points[0].sum() == pytest.approx(1.5 + 0.5)
+
+    def test_missing_signals_contribute_nothing(self):
+        scores = score_customers(pd.DataFrame({"customer_id": ["C1"], "mrr": [100]}), TODAY)
+
+        assert scores.churn_risk.tolist() == [0.0]
+        assert scores.days_to_renewal is None
+
+    def test_reasons_skip_missing_values(self):
+        """NA in the nullable integer columns gives no reason instead of a TypeError."""
+        row = pd.Series({
+            "account_health_score": pd.NA, "usage_trend": "declining", "nps_score": pd.NA,
+            "support_tickets_30d": 7, "last_login_days": np.nan, "payment_delays": None,
+        })
+
+        assert churn_reasons(row, None) == ["Usage declining", "7 support tickets in 30 days"]
+
+    def test_days_to_renewal(self, customers_df):
+        scores = score_customers(customers_df, TODAY)
+
+        assert scores.days_to_renewal[1] == 31
+
+
+class TestChurnRescueAnalyze:
+    """Tests for ChurnRescueAgent.analyze."""
+
+    def test_at_risk_customers_ranked_by_mrr_at_stake(self, customers_df):
+        analysis = ChurnRiskAggregator(today=TODAY).analyze(customers_df)
+
+        ids = [c["customer_id"] for c in analysis["at_risk_customers"]]
+        assert ids == ["C4", "C2"]
+        assert analysis["metrics"]["mrr_at_risk"] == 32000
+        assert analysis["metrics"]["renewals_at_risk"] == 2
+        assert "Renewal in 31 days" in analysis["at_risk_customers"][1]["reasons"]
+
+    def test_chunked_matches_in_memory(self):
+        customers = generate_customers(5000, seed=3)
+        aggregator = ChurnRiskAggregator(today=TODAY)
+
+        chunks = (customers.iloc[i:i + 700] for i in range(0, len(customers), 700))
+        state = aggregator.merge([])
+        for offset, chunk in zip(range(0, len(customers), 700), chunks):
+            positions = np.arange(offset, offset + len(chunk))
+            state = aggregator.merge([state, aggregator.partial(chunk, positions)])
+
+        assert aggregator.finalize(state) == aggregator.analyze(customers)
+
+    def test_reads_churn_sample_data(self):
+        """The play scores the churn CSV, not pipeline data."""
+        agent = ChurnRescueAgent()
+        data = agent.load_data()
+
+        assert "customer_id" in data.columns
+        assert agent.analyze(data)["metrics"]["customers_scored"] == len(data)
+
+    def test_params_threshold(self, customers_df):
+        agent = ChurnRescueAgent()
+        agent.params = {"risk_threshold": 101}
+
+        assert agent.analyze(customers_df)["at_risk_customers"] == []
+
+    def test_empty(self):
+        assert ChurnRescueAgent().analyze(pd.DataFrame())["at_risk_customers"] == []
+
+    @pytest.mark.parametrize("params", [{"top_n": "abc"}, {"top_n": -1}, {"risk_threshold": "high"}])
+    def test_bad_params_rejected(self, customers_df, params):
+        agent = ChurnRescueAgent()
+        agent.params = params
+
+        with pytest.raises(InvalidParams):
+            agent.analyze(customers_df)
+
+    def test_bad_top_n_is_400(self):
+        from fastapi.testclient import TestClient
+
+        from aas.api import app
+
+        response = TestClient(app).post("/run/churn", json={"params": {"top_n": "abc"}})
+
+        assert response.status_code == 400
+        assert "top_n" in response.json()["detail"]
+
+    def test_actions(self, customers_df, monkeypatch):
+        agent = ChurnRescueAgent()
+        agent.params = {"data": customers_df.to_dict("records")}
+        monkeypatch.setattr(agent, "generate_rationale", lambda context: "rationale")
+
+        result = agent.run()
+
+        types = [a["type"] for a in result["actions"]]
+        assert types == ["salesforce_task", "slack_message"] * 2
+        assert result["actions"][0]["metadata"]["customer_id"] == "C4"
+        assert result["actions"][0]["priority"] == "high"
+
+    def test_csv_with_missing_values(self, customers_df, data_dir, monkeypatch):
+        """Blank cells read as NA in the nullable dtypes; the run still scores and explains."""
+        customers_df.loc[3, ["nps_score", "payment_delays"]] = None
+        customers_df.to_csv(data_dir / "customers.csv", index=False)
+        agent = ChurnRescueAgent()
+        agent.params = {"source_path": "customers.csv"}
+        monkeypatch.setattr(agent, "generate_rationale", lambda context: "rationale")
+
+        data = agent.load_data()
+        result = agent.run()
+
+        assert data["nps_score"].isna().sum() == 1
+        big_failing = next(c for c in result["analysis"]["at_risk_customers"] if c["customer_id"] == "C4")
+        assert "Usage declining" in big_failing["reasons"]
+        assert not any("NPS" in reason for reason in big_failing["reasons"])
+
+    def test_source_path_outside_data_dir_rejected(self, data_dir):
+        for path in ("/etc/passwd", "../customers.csv"):
+            agent = ChurnRescueAgent()
+            agent.params = {"source_path": path}
+            with pytest.raises(InvalidParams):
+                agent.load_data()
+            with pytest.raises(InvalidParams):
+                next(agent.iter_chunks(10))
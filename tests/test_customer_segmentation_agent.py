@@ -0,0 +1,167 @@
+"""
+Unit tests for Customer Segmentation Agent.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aas.agents.base import InvalidParams
+from aas.agents.customer_segmentation import CustomerSegmentationAgent, model_dir
+from aas.analytics.segmentation import SegmentationModel, segment_stats, summarize_segments
+from aas.utils.synthetic_data import generate_customers
+
+
+def _blobs(n_per=300, seed=0):
+    """Three well-separated customer groups."""
+    rng = np.random.default_rng(seed)
+    groups = [
+        {"mrr": 40000, "account_health_score": 90, "nps_score": 9, "usage_trend": "growing"},
+        {"mrr": 2000, "account_health_score": 20, "nps_score": 2, "usage_trend": "declining"},
+        {"mrr": 8000, "account_health_score": 65, "nps_score": 7, "usage_trend": "stable"},
+    ]
+    rows = []
+    for g, profile in enumerate(groups):
+        for i in range(n_per):
+            rows.append({
+                "customer_id": f"G{g}-{i}",
+                "mrr": profile["mrr"] * rng.uniform(0.9, 1.1),
+                "account_health_score": profile["account_health_score"] + rng.normal(0, 3),
+                "nps_score": profile["nps_score"],
+                "usage_trend": profile["usage_trend"],
+                "support_tickets_30d": 1,
+                "last_login_days": 2,
+                "payment_delays": 0,
+                "group": g,
+            })
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def models(tmp_path, monkeypatch):
+    """Saved models live in this directory."""
+    monkeypatch.setenv("AAS_DATA_DIR", str(tmp_path))
+    monkeypatch.delenv("SEGMENTATION_MODEL_DIR", raising=False)
+    assert model_dir() == tmp_path.resolve() / "segmentation_models"
+    return model_dir()
+
+
+class TestSegmentationModel:
+    """Tests for mini-batch k-means."""
+
+    def test_recovers_separated_groups(self):
+        data = _blobs()
+        model = SegmentationModel(n_segments=3, batch_size=128, seed=1).fit(data)
+
+        labels = model.assign(data)
+        for g in range(3):
+            assert len(np.unique(labels[data["group"] == g])) == 1
+        assert len(np.unique(labels)) == 3
+
+    def test_seeded_fit_is_reproducible(self):
+        data = generate_customers(2000, seed=2)
+
+        a = SegmentationModel(n_segments=4, batch_size=256, seed=7).fit(data)
+        b = SegmentationModel(n_segments=4, batch_size=256, seed=7).fit(data)
+
+        np.testing.assert_array_equal(a.centers, b.centers)
+
+    def test_partial_fit_moves_centroids_toward_new_data(self):
+        data = _blobs()
+        model = SegmentationModel(n_segments=3, batch_size=128, seed=1).fit(data)
+        label = model.assign(data[data["group"] == 0].head(1))[0]
+        before = model.centroids().loc[label, "account_health_score"]
+
+        shifted = data[data["group"] == 0].assign(account_health_score=80.0)
+        model.partial_fit(pd.concat([shifted] * 5))
+
+        assert model.centroids().loc[label, "account_health_score"] < before
+
+    def test_save_and_load(self, tmp_path):
+        data = generate_customers(1000, seed=3)
+        model = SegmentationModel(n_segments=3, seed=0).fit(data)
+
+        restored = SegmentationModel.load(model.save(tmp_path / "model.json"))
+
+        np.testing.assert_array_equal(restored.assign(data), model.assign(data))
+        assert restored.segment_names() == model.segment_names()
+
+    def test_assign_requires_fit(self):
+        with pytest.raises(ValueError):
+            SegmentationModel().assign(generate_customers(10, seed=0))
+
+    def test_stats_add_across_chunks(self):
+        data = generate_customers(3000, seed=4)
+        model = SegmentationModel(n_segments=4, seed=0).fit(data)
+
+        whole = segment_stats(data, model.assign(data), 4)
+        parts = sum(segment_stats(c, model.assign(c), 4) for c in (data.iloc[:1000], data.iloc[1000:]))
+
+        np.testing.assert_allclose(parts, whole)
+        assert sum(s["customers"] for s in summarize_segments(whole, model)) == 3000
+
+
+class TestCustomerSegmentationAgent:
+    """Tests for CustomerSegmentationAgent."""
+
+    def test_analyze_sample_customers(self):
+        agent = CustomerSegmentationAgent()
+        analysis = agent.analyze(agent.load_data())
+
+        assert analysis["metrics"]["customers"] == len(agent.load_data())
+        mrr = [s["total_mrr"] for s in analysis["segments"]]
+        assert mrr == sorted(mrr, reverse=True)
+
+    def test_saved_model_is_updated_not_refit(self, models):
+        path = models / "segments.json"
+        agent = CustomerSegmentationAgent()
+        agent.params = {"model_name": "segments", "n_segments": 3}
+        agent.analyze(_blobs())
+        seen = SegmentationModel.load(path).counts.sum()
+
+        agent = CustomerSegmentationAgent()
+        agent.params = {"model_name": "segments"}
+        agent.analyze(_blobs(n_per=10, seed=5))
+
+        assert SegmentationModel.load(path).counts.sum() == seen + 30
+
+    @pytest.mark.parametrize("name", ["../escape", "/tmp/x", "a/b", ".hidden", "bad name", "x" * 65, 7])
+    def test_model_name_cannot_leave_model_dir(self, models, name):
+        agent = CustomerSegmentationAgent()
+        agent.params = {"model_name": name}
+
+        with pytest.raises(InvalidParams):
+            agent.analyze(_blobs(n_per=5))
+        assert list(models.parent.rglob("*.json")) == []
+
+    def test_api_rejects_bad_model_name(self, models):
+        from fastapi.testclient import TestClient
+        from aas.api import app
+
+        response = TestClient(app).post("/run/customer_segmentation", json={"params": {"model_name": "../../etc/cron"}})
+
+        assert response.status_code == 400
+        assert "model_name" in response.json()["detail"]
+
+    def test_assign_new_customers(self):
+        agent = CustomerSegmentationAgent()
+        agent.params = {"n_segments": 3}
+        agent.analyze(_blobs())
+
+        assignments = agent.assign(_blobs(n_per=1, seed=9))
+
+        assert [a["customer_id"] for a in assignments] == ["G0-0", "G1-0", "G2-0"]
+        assert assignments[1]["segment"].endswith("at risk")
+        assert len({a["segment_id"] for a in assignments}) == 3
+
+    def test_actions(self, monkeypatch):
+        agent = CustomerSegmentationAgent()
+        agent.params = {"data": _blobs().to_dict("records"), "n_segments": 3}
+        monkeypatch.setattr(agent, "generate_rationale", lambda context: "rationale")
+
+        result = agent.run()
+
+        titles = [a["title"] for a in result["actions"]]
+        assert any(t.startswith("Retention Campaign") for t in titles)
+        assert any(t.startswith("Expansion Outreach") for t in titles)
+        assert result["actions"][-1]["type"] == "slack_message"
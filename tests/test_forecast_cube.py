@@ -0,0 +1,119 @@
+"""
+Unit tests for the forecast cube.
+"""
+
+import pandas as pd
+import pytest
+
+from aas.analytics.forecast_cube import ForecastCube
+
+
+@pytest.fixture
+def deals():
+    return pd.DataFrame({
+        "opportunity_id": ["A", "B", "C", "D", "E"],
+        "amount": [100000, 200000, 50000, 80000, 40000],
+        "close_date": ["2026-01-05", "2026-01-07", "2026-02-10", "2026-03-02", "2026-03-20"],
+        "stage": ["Proposal", "Negotiation", "Closed Won", "Closed Lost", "Prospecting"],
+        "probability": [50, 75, 100, 0, 10],
+        "segment": ["SMB", "Enterprise", "SMB", "Enterprise", "SMB"],
+        "region": ["EMEA", "EMEA", "APAC", "APAC", "EMEA"],
+        "owner": ["Ana", "Ben", "Ana", "Ben", "Cy"],
+        "created_date": ["2025-12-01", "2025-11-01", "2025-12-11", "2026-01-01", "2026-03-01"],
+    })
+
+
+def _sorted_cells(cube):
+    return cube.cells.sort_index()
+
+
+class TestForecastCube:
+    """Tests for ForecastCube."""
+
+    def test_total_matches_deals(self, deals):
+        """The grand total sums every deal once."""
+        total = ForecastCube.from_deals(deals).query()["total"]
+
+        assert total["deal_count"] == 5
+        assert total["open_count"] == 3
+        assert total["pipeline_amount"] == pytest.approx(340000)
+        assert total["weighted_amount"] == pytest.approx(50000 + 150000 + 4000)
+        assert total["win_rate"] == pytest.approx(0.5)
+        assert total["avg_velocity_days"] == pytest.approx(61)
+        assert total["forecasted_revenue"] == pytest.approx(204000 * 0.5)
+
+    def test_group_by_and_filters(self, deals):
+        """Rollups honour value, list and range filters."""
+        cube = ForecastCube.from_deals(deals)
+
+        by_owner = cube.query(["owner"], {"region": "EMEA"})["rows"]
+        by_month = cube.query(["close_month"], {"close_month": {"from": "2026-02", "to": "2026-03"}})["rows"]
+        smb_week = cube.query(["segment", "close_week"], {"segment": ["SMB"]})["rows"]
+
+        assert [r["owner"] for r in by_owner] == ["Ana", "Ben", "Cy"]
+        assert [r["close_month"] for r in by_month] == ["2026-02", "2026-03"]
+        assert smb_week[0]["close_week"] == "2026-01-05"  # weeks start on Monday
+        # Slices without closed deals fall back to the slice total's win rate
+        assert by_owner[0]["win_rate"] == pytest.approx(0.5)
+
+    def test_unknown_dimension(self, deals):
+        """Unknown dimensions are rejected."""
+        with pytest.raises(ValueError):
+            ForecastCube.from_deals(deals).query(["stage"])
+
+    def test_incremental_updates_match_rebuild(self, deals):
+        """Upserts and removals leave the cube as a full rebuild would."""
+        cube = ForecastCube.from_deals(deals)
+        changed = deals.iloc[[0, 1]].assign(stage=["Closed Won", "Negotiation"], amount=[100000, 250000])
+        added = pd.DataFrame([{
+            "opportunity_id": "F", "amount": 10000, "close_date": "2026-04-01",
+            "stage": "Qualification", "segment": "SMB", "region": "LATAM", "owner": "Cy",
+        }])
+
+        cube.upsert(pd.concat([changed, added]))
+        cube.remove(["D", "missing"])
+
+        expected = pd.concat([changed, deals.iloc[[2, 4]], added])
+        rebuilt = ForecastCube.from_deals(expected)
+        pd.testing.assert_frame_equal(_sorted_cells(cube), _sorted_cells(rebuilt), check_dtype=False)
+        assert len(cube) == 5
+
+    def test_removing_last_deal_drops_cell(self, deals):
+        """Cells with no remaining deals are dropped."""
+        cube = ForecastCube.from_deals(deals)
+
+        cube.remove(["E"])
+
+        assert "Cy" not in cube.cells.index.get_level_values("owner")
+
+    def test_missing_required_column(self):
+        """Deals without the required columns are rejected."""
+        with pytest.raises(ValueError):
+            ForecastCube().upsert(pd.DataFrame({"opportunity_id": ["A"], "amount": [1]}))
+
+    def test_api_cube_is_built_once(self, deals, monkeypatch):
+        """Concurrent first requests share one cube, so no update is lost."""
+        import threading
+
+        import aas.api as api
+
+        builds = []
+        real_from_deals = ForecastCube.from_deals
+
+        def slow_from_deals(*args, **kwargs):
+            builds.append(1)
+            threading.Event().wait(0.05)
+            return real_from_deals(*args, **kwargs)
+
+        monkeypatch.setattr(api, "_forecast_cube", None)
+        monkeypatch.setattr(ForecastCube, "from_deals", staticmethod(slow_from_deals))
+        monkeypatch.setattr(api.RevenueForecastingAgent, "load_data", lambda self: deals)
+        cubes = []
+        threads = [threading.Thread(target=lambda: cubes.append(api._get_forecast_cube())) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(builds) == 1
+        assert all(cube is cubes[0] for cube in cubes)
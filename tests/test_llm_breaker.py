@@ -0,0 +1,118 @@
+"""
+Tests for the per-provider LLM circuit breakers.
+"""
+
+import time
+
+import pytest
+
+from aas.llm.breaker import CALL, CLOSED, HALF_OPEN, OPEN, PROBE, CircuitBreaker, get_breaker, reset_breakers
+
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker("test", window=10, min_calls=4, failure_rate=0.5, cooldown=0.05)
+
+
+class TestCircuitBreaker:
+    """State transitions of CircuitBreaker."""
+
+    def test_opens_on_failure_rate(self, breaker):
+        for ok in (True, False, True):
+            breaker.record(ok)
+        assert breaker.state == CLOSED  # too few calls to judge
+
+        breaker.record(False)
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+    def test_stays_closed_below_rate(self, breaker):
+        for ok in (True, True, False, True, True, False, True):
+            breaker.record(ok)
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+    def test_half_open_allows_one_probe(self, breaker):
+        for _ in range(4):
+            breaker.record(False)
+        time.sleep(0.06)
+
+        assert breaker.state == HALF_OPEN
+        permit = breaker.allow()
+        assert permit is PROBE
+        assert breaker.allow() is None
+
+        breaker.record(True, permit=permit)
+        assert breaker.state == CLOSED
+        assert breaker.allow() is CALL
+
+    def test_failed_probe_reopens(self, breaker):
+        for _ in range(4):
+            breaker.record(False)
+        time.sleep(0.06)
+        permit = breaker.allow()
+
+        breaker.record(False, permit=permit)
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+    def test_released_probe_frees_the_slot(self, breaker):
+        for _ in range(4):
+            breaker.record(False)
+        time.sleep(0.06)
+        permit = breaker.allow()
+
+        breaker.release(permit)
+
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow()
+        assert not breaker.allow()
+
+    def test_late_call_does_not_decide_half_open(self, breaker):
+        """A call let through before the trip that finishes during the probe is only counted."""
+        late = breaker.allow()
+        for _ in range(4):
+            breaker.record(False)
+        time.sleep(0.06)
+        probe = breaker.allow()
+
+        breaker.record(True, 0.1, late)
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow() is None
+
+        breaker.release(late)
+        assert breaker.allow() is None
+
+        breaker.record(True, permit=probe)
+        assert breaker.state == CLOSED
+
+    def test_release_when_closed_records_nothing(self, breaker):
+        for _ in range(3):
+            breaker.record(False)
+        breaker.release()
+        breaker.release()
+
+        assert breaker.state == CLOSED
+
+    def test_latency_percentile(self, breaker):
+        assert breaker.latency_percentile(95) is None
+        for latency in (0.1, 0.2, 0.3, 0.4, 1.0):
+            breaker.record(True, latency)
+        breaker.record(False)
+
+        assert breaker.latency_percentile(50) == pytest.approx(0.3)
+        assert 0.4 < breaker.latency_percentile(95) <= 1.0
+
+
+class TestBreakerRegistry:
+    """Tests for the shared per-provider breakers."""
+
+    def test_shared_and_configured_from_env(self, monkeypatch):
+        reset_breakers()
+        monkeypatch.setenv("LLM_BREAKER_COOLDOWN", "7")
+        try:
+            assert get_breaker("ollama") is get_breaker("ollama")
+            assert get_breaker("ollama") is not get_breaker("openai")
+            assert get_breaker("ollama").cooldown == 7.0
+        finally:
+            reset_breakers()
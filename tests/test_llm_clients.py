@@ -0,0 +1,108 @@
+"""
+Tests for the shared keep-alive LLM HTTP clients.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+
+from aas.llm import clients
+
+
+@pytest.fixture
+def server():
+    """Local HTTP/1.1 server that records the client port of each request."""
+    ports = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            ports.append(self.client_address[1])
+            body = b'{"response": "ok"}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/", ports
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = clients.ClientRegistry()
+    monkeypatch.setattr(clients, "registry", registry)
+    yield registry
+    registry.close()
+
+
+class TestClientRegistry:
+    """Clients are shared per provider and reuse their connections."""
+
+    def test_same_client_per_provider(self, registry):
+        assert clients.get_client("ollama") is clients.get_client("ollama")
+        assert clients.get_client("ollama") is not clients.get_client("openai")
+
+    def test_sync_requests_reuse_one_connection(self, registry, server):
+        url, ports = server
+        for _ in range(5):
+            assert clients.get_client("ollama").post(url, json={}).json() == {"response": "ok"}
+        assert len(ports) == 5
+        assert len(set(ports)) == 1
+
+    def test_async_requests_reuse_connections(self, registry, server):
+        url, ports = server
+
+        async def _calls():
+            for _ in range(5):
+                response = await clients.get_async_client("ollama").post(url, json={})
+                response.raise_for_status()
+
+        clients.run(_calls())
+        clients.run(_calls())
+        assert len(ports) == 10
+        assert len(set(ports)) == 1
+
+    def test_pool_size_follows_concurrency(self, monkeypatch):
+        monkeypatch.setenv("LLM_MAX_CONCURRENCY", "3")
+        monkeypatch.setenv("LLM_KEEPALIVE_EXPIRY", "5")
+        limits = clients.client_limits()
+        assert limits.max_connections == 6
+        assert limits.max_keepalive_connections == 3
+        assert limits.keepalive_expiry == 5.0
+
+    def test_close_then_reuse(self, registry, server):
+        url, _ = server
+        first = clients.get_client("ollama")
+        clients.run(clients.get_async_client("ollama").post(url, json={}))
+        thread = registry._thread
+
+        clients.close_clients()
+        assert first.is_closed
+        assert not thread.is_alive()
+
+        second = clients.get_client("ollama")
+        assert second is not first
+        assert second.post(url, json={}).status_code == 200
+        response = clients.run(clients.get_async_client("ollama").post(url, json={}))
+        assert response.status_code == 200
+
+    def test_api_shutdown_closes_clients(self, registry):
+        from aas.api import app
+
+        with TestClient(app):
+            client = clients.get_client("ollama")
+        assert client.is_closed
+        assert registry._clients == {}
@@ -0,0 +1,153 @@
+"""
+Tests for the fake OpenAI/Ollama-compatible LLM server used for benchmarking.
+"""
+
+import statistics
+import time
+
+import httpx
+import pytest
+
+from aas.llm import LLMRouter, clients, rationale
+from aas.llm.breaker import reset_breakers
+from aas.llm.fake_server import FakeLLMConfig, FakeLLMServer, batch_items
+from aas.llm.similarity import reset_similarity_index
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    """Each test gets fresh clients and breakers, with no cache or similarity reuse."""
+    monkeypatch.setenv("LLM_CACHE", "off")
+    monkeypatch.setenv("LLM_SIMILARITY", "off")
+    registry = clients.ClientRegistry()
+    monkeypatch.setattr(clients, "registry", registry)
+    reset_breakers()
+    reset_similarity_index()
+    yield
+    reset_breakers()
+    registry.close()
+
+
+def _start(monkeypatch, provider="ollama", **config):
+    server = FakeLLMServer(FakeLLMConfig(**{"latency": "fixed", "latency_ms": 0, "tokens_per_second": 0, **config}))
+    server.start()
+    monkeypatch.setenv("LLM_PROVIDER", provider)
+    monkeypatch.setenv("OLLAMA_BASE_URL", f"{server.url}/api")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"{server.url}/v1")
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+    return server
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    servers = []
+
+    def start(**kwargs):
+        servers.append(_start(monkeypatch, **kwargs))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+class TestWireFormats:
+    """The rationale and router paths work unchanged against the fake server."""
+
+    @pytest.mark.parametrize("provider", ["ollama", "openai"])
+    def test_batched_rationales(self, fake, provider):
+        server = fake(provider=provider, reply_tokens=5)
+
+        results = rationale.gather_rationale_results(["Stalled 45 days", "Stalled 52 days", "Churn risk"])
+
+        assert [r.status for r in results] == [rationale.STATUS_GENERATED] * 3
+        assert all(r.text.endswith(".") for r in results)
+        stats = server.stats.to_dict()
+        assert stats["requests"] == {provider: 1}
+        assert stats["batch_items"] == 3
+
+    @pytest.mark.parametrize("provider", ["ollama", "openai"])
+    def test_single_blocking_call(self, fake, provider):
+        fake(provider=provider)
+
+        result = rationale.rationale_result("Stalled 45 days")
+
+        assert result.status == rationale.STATUS_GENERATED
+
+    @pytest.mark.parametrize("provider", ["ollama", "openai"])
+    def test_streaming(self, fake, provider):
+        server = fake(provider=provider, reply_tokens=6)
+
+        chunks = list(LLMRouter(provider=provider).stream("analysis_summary_template", {"metrics": "m", "findings": "f"}))
+
+        assert len(chunks) == 6
+        assert "".join(chunks) == server.sentence()
+        assert server.stats.to_dict()["streams"] == 1
+
+    def test_only_batch_prompts_get_json(self):
+        assert batch_items(rationale.batch_prompt(["a", "b", "c"])) == ["1", "2", "3"]
+        # A single prompt whose instructions happen to be a numbered list
+        assert batch_items(LLMRouter(provider="none")._render("rationale_template", {"context": "c", "action": "a"})) == []
+
+    def test_stats_endpoint(self, fake):
+        server = fake()
+        rationale.rationale_result("Stalled 45 days")
+
+        stats = httpx.get(f"{server.url}/stats").json()
+
+        assert stats["total"] == 1
+        assert stats["config"]["latency"] == "fixed"
+
+
+class TestProviderBehaviour:
+    """Latency, throughput and errors follow the configuration."""
+
+    def test_errors_surface_as_unavailable(self, fake):
+        server = fake(error_rate=1.0)
+
+        result = rationale.rationale_result("Stalled 45 days")
+
+        assert result.status == rationale.STATUS_UNAVAILABLE
+        assert server.stats.to_dict()["errors"] == 1
+
+    def test_token_throughput_paces_replies(self, fake):
+        fake(tokens_per_second=100, reply_tokens=10)
+
+        start = time.perf_counter()
+        rationale.rationale_result("Stalled 45 days")
+
+        assert time.perf_counter() - start >= 0.1
+
+    def test_first_token_latency_is_streamed_early(self, fake):
+        fake(latency_ms=50, tokens_per_second=20, reply_tokens=8)
+        stream = LLMRouter(provider="ollama").stream("rationale_template", {"context": "c", "action": "a"})
+
+        start = time.perf_counter()
+        next(stream)
+        first = time.perf_counter() - start
+        list(stream)
+
+        assert 0.05 <= first < time.perf_counter() - start - 0.2
+
+    @pytest.mark.parametrize("latency", ["fixed", "uniform", "lognormal"])
+    def test_latency_distributions(self, latency):
+        server = FakeLLMServer(FakeLLMConfig(latency=latency, latency_ms=200, latency_sigma=0.5, seed=7))
+        try:
+            delays = [server.first_token_delay() for _ in range(2000)]
+        finally:
+            server.stop()
+
+        assert statistics.median(delays) == pytest.approx(0.2, rel=0.1)
+        assert min(delays) >= 0
+        if latency == "fixed":
+            assert set(delays) == {0.2}
+        elif latency == "uniform":
+            assert 0.1 <= min(delays) and max(delays) <= 0.3
+        else:
+            assert max(delays) > 0.4  # long right tail
+
+    def test_invalid_config(self):
+        with pytest.raises(ValueError):
+            FakeLLMConfig(latency="gaussian")
+        with pytest.raises(ValueError):
+            FakeLLMConfig(error_rate=1.5)
@@ -0,0 +1,111 @@
+"""
+Tests for the precompiled prompt registry and lazy router initialization.
+"""
+
+import pytest
+
+from aas.llm import LLMRouter
+from aas.llm.prompts import (
+    MISSING_VALUE,
+    PromptRegistry,
+    PromptTemplate,
+    estimate_tokens,
+    get_prompt_registry,
+)
+
+
+class TestPromptTemplate:
+    """Templates compile once and render like `str.format`, without failing on data."""
+
+    def test_renders_like_str_format(self):
+        registry = get_prompt_registry()
+        for key, template in registry.templates.items():
+            context = {name: 125000.5 if spec else f"<{name}>" for name, spec, _ in template.slots}
+            assert template.render(context) == template.text.format(**context)
+
+    def test_declared_variables(self):
+        template = PromptTemplate("t", "Deal {name} worth ${amount:,.0f} ({stage!r})")
+        assert template.variables == {"name", "amount", "stage"}
+        assert template.missing({"name": "Acme"}) == {"amount", "stage"}
+
+    @pytest.mark.parametrize("text", ["Unclosed {context", "Stray } brace", "{0}", "{a.b}", "{a[0]}", "{a:{width}}"])
+    def test_malformed_template_fails_at_compile(self, text):
+        with pytest.raises(ValueError):
+            PromptTemplate("bad", text)
+
+    def test_missing_variable_renders_placeholder(self):
+        template = PromptTemplate("t", "Context: {context}\nAction: {action}")
+        assert template.render({"context": "x"}) == f"Context: x\nAction: {MISSING_VALUE}"
+
+    def test_spec_mismatch_falls_back_to_str(self):
+        template = PromptTemplate("t", "Impact ${impact_score:,}")
+        assert template.render({"impact_score": 1500}) == "Impact $1,500"
+        assert template.render({"impact_score": "unknown"}) == "Impact $unknown"
+
+    def test_escaped_braces(self):
+        template = PromptTemplate("t", "Reply as {{\"text\": ...}} for {action}")
+        assert template.variables == {"action"}
+        assert template.render({"action": "x"}) == "Reply as {\"text\": ...} for x"
+
+
+class TestTokenBudget:
+    """Over-long values are cut so the prompt fits, keeping the instructions."""
+
+    def test_short_prompt_untouched(self):
+        template = PromptTemplate("t", "Context: {context}\nAction: {action}")
+        context = {"context": "short", "action": "also short"}
+        assert template.render(context, max_tokens=100) == template.render(context)
+
+    def test_longest_value_trimmed_first(self):
+        template = PromptTemplate("t", "Context: {context}\nAction: {action}\nBe concise.")
+        rendered = template.render({"context": "x" * 5000, "action": "Call the champion"}, max_tokens=100)
+        assert estimate_tokens(rendered) <= 100
+        assert "Action: Call the champion\nBe concise." in rendered
+        assert "x…" in rendered
+
+    def test_router_applies_budget(self, monkeypatch):
+        monkeypatch.setenv("LLM_MAX_PROMPT_TOKENS", "200")
+        router = LLMRouter(provider="none")
+        prompt = router._render("rationale_template", {"context": "y" * 10000, "action": "Act"})
+        assert estimate_tokens(prompt) <= 200
+        assert "Keep the tone professional" in prompt
+
+
+class TestPromptRegistry:
+    """Unknown keys fall back to the generic template."""
+
+    def test_unknown_key_uses_default(self):
+        registry = PromptRegistry({"rationale_template": "Generic {action}", "special": "Special {action}"})
+        assert registry.render("special", {"action": "a"}) == "Special a"
+        assert registry.render("unknown", {"action": "a"}) == "Generic a"
+        assert registry.render("unknown", {"action": "a"}, default=None) == ""
+
+    def test_loaded_once_per_process(self):
+        assert LLMRouter(provider="none").registry is LLMRouter(provider="none").registry
+
+
+class TestLazyRouter:
+    """Constructing a router does not touch the provider."""
+
+    def test_provider_initialized_on_first_use(self, monkeypatch):
+        calls = []
+
+        def _init(self):
+            calls.append(self.provider_name)
+            return None
+
+        monkeypatch.setattr(LLMRouter, "_init_anthropic", _init)
+        router = LLMRouter(provider="anthropic")
+        assert calls == []
+        router._generate_fallback({"priority": "high", "impact_score": 1000})
+        router.generate("rationale_template", {"context": "c", "action": "a"})
+        router.generate("rationale_template", {"context": "d", "action": "b"})
+        assert calls == ["anthropic"]
+
+    def test_unknown_provider_rejected(self):
+        with pytest.raises(ValueError):
+            LLMRouter(provider="nope")
+
+    def test_fallback_renders_impact(self):
+        router = LLMRouter(provider="none")
+        assert "$125,000" in router._generate_fallback({"priority": "high", "impact_score": 125000})
@@ -0,0 +1,75 @@
+"""
+Tests for similar-context rationale reuse.
+"""
+
+import numpy as np
+
+from aas.llm.similarity import SimilarityIndex, embed, retarget, split_numbers
+
+STALLED = (
+    "Opportunity OPP-{id}: Stage Negotiation, Age {age} days, Amount ${amount}, Risk Score {score}. "
+    "Reasons: Stalled in stage {age} days, No activity in {idle} days."
+)
+
+
+def _context(id=1, age=45, amount="120,000", score=85, idle=20):
+    return STALLED.format(id=id, age=age, amount=amount, score=score, idle=idle)
+
+
+class TestRetarget:
+    """Tests for moving a rationale onto another context's numbers."""
+
+    def test_numbers_are_templated_in(self):
+        text = "Stalled 45 days in Negotiation with $120,000 at stake and 20 days idle."
+
+        out = retarget(text, _context(), _context(id=7, age=52, amount="80,000.50", idle=31))
+
+        assert out == "Stalled 52 days in Negotiation with $80,000.50 at stake and 31 days idle."
+
+    def test_number_not_from_context_blocks_reuse(self):
+        assert retarget("Stalled for 6 weeks.", _context(), _context(age=52)) is None
+
+    def test_word_missing_from_new_context_blocks_reuse(self):
+        new = _context().replace("Negotiation", "Proposal")
+
+        assert retarget("Stuck in Negotiation.", _context(), new) is None
+        assert retarget("Deal is stuck.", _context(), new) == "Deal is stuck."
+
+    def test_ambiguous_numbers_block_reuse(self):
+        assert retarget("45 days.", "age 45, idle 45", "age 50, idle 10") is None
+        assert retarget("45 days.", "age 45, idle 45", "age 50") is None
+
+
+class TestSimilarityIndex:
+    """Tests for SimilarityIndex lookups."""
+
+    def test_split_and_embed(self):
+        template, numbers = split_numbers(_context())
+
+        assert numbers == ["1", "45", "120,000", "85", "45", "20"]
+        assert "#" in template and "45" not in template
+        np.testing.assert_allclose(np.linalg.norm(embed(template)), 1.0, rtol=1e-6)
+
+    def test_reuses_close_context(self):
+        index = SimilarityIndex()
+        index.add("ollama:llama3", _context(), "Stalled 45 days; act before the $120,000 deal slips.")
+
+        out = index.lookup("ollama:llama3", _context(id=9, age=60, amount="75,000", score=91, idle=33))
+
+        assert out == "Stalled 60 days; act before the $75,000 deal slips."
+
+    def test_other_namespace_or_wording_misses(self):
+        index = SimilarityIndex()
+        index.add("ollama:llama3", _context(), "Act now.")
+
+        assert index.lookup("openai:gpt-4o", _context()) is None
+        assert index.lookup("ollama:llama3", "Customer Acme: churn risk 80, renewal in 30 days.") is None
+
+    def test_capacity_is_a_ring_buffer(self):
+        index = SimilarityIndex(max_entries=3)
+        for i in range(5):
+            index.add("ns", f"context number {i} variant {'abcde'[i]}", f"text {i}")
+
+        assert len(index) == 3
+        assert index.lookup("ns", "context number 4 variant e") == "text 4"
+        assert index.lookup("ns", "context number 0 variant a") is None
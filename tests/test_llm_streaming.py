@@ -0,0 +1,152 @@
+"""
+Tests for streaming generation through LLMRouter and the /llm/stream endpoint.
+"""
+
+import json
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import aas.llm as llm
+from aas.llm import LLMRouter, clients
+from aas.llm.breaker import reset_breakers
+from aas.llm.providers import AnthropicProvider
+
+CONTEXT = {"context": "Deal stalled 45 days", "action": "Call the champion"}
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """Each test gets its own disk cache, circuit breakers and client registry."""
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm_cache.sqlite3"))
+    registry = clients.ClientRegistry()
+    monkeypatch.setattr(clients, "registry", registry)
+    reset_breakers()
+    yield registry
+    reset_breakers()
+    registry.close()
+
+
+def _serve(registry, provider, chunks, status=200, delay=0.05, fail_after=None):
+    """Answer `provider` requests with `chunks`, one every `delay` seconds."""
+    requests = []
+
+    def body():
+        for i, chunk in enumerate(chunks):
+            if fail_after is not None and i == fail_after:
+                raise httpx.ReadError("connection dropped")
+            time.sleep(delay)
+            yield chunk.encode()
+
+    def handler(request):
+        requests.append(json.loads(request.read()))
+        return httpx.Response(status, content=body())
+
+    registry._clients[provider] = httpx.Client(transport=httpx.MockTransport(handler))
+    return requests
+
+
+def _ollama_chunks(words):
+    lines = [json.dumps({"response": word, "done": False}) + "\n" for word in words]
+    return lines + [json.dumps({"response": "", "done": True}) + "\n"]
+
+
+class TestRouterStream:
+    """Chunks reach the caller as the provider sends them."""
+
+    def test_ollama_streams_tokens(self, isolated):
+        requests = _serve(isolated, "ollama", _ollama_chunks(["Act ", "now ", "to ", "save ", "it."]))
+        router = LLMRouter(provider="ollama")
+
+        start = time.perf_counter()
+        stream = router.stream("rationale_template", CONTEXT)
+        first = next(stream)
+        first_at = time.perf_counter() - start
+        rest = list(stream)
+        total = time.perf_counter() - start
+
+        assert [first] + rest == ["Act ", "now ", "to ", "save ", "it."]
+        assert requests[0]["stream"] is True
+        assert first_at < total / 2
+
+    def test_openai_event_stream(self, isolated, monkeypatch):
+        monkeypatch.setenv("OPENAI_API_KEY", "test")
+        events = [
+            f"data: {json.dumps({'choices': [{'delta': {'content': text}}]})}\n\n"
+            for text in ["Pipeline ", "is ", "at risk."]
+        ]
+        requests = _serve(isolated, "openai", [": keep-alive\n\n"] + events + ["data: [DONE]\n\n"])
+
+        chunks = list(LLMRouter(provider="openai").stream("analysis_summary_template", {"metrics": "m", "findings": "f"}))
+
+        assert chunks == ["Pipeline ", "is ", "at risk."]
+        assert requests[0]["stream"] is True
+
+    def test_finished_stream_is_cached(self, isolated):
+        requests = _serve(isolated, "ollama", _ollama_chunks(["Cached ", "answer."]), delay=0)
+        router = LLMRouter(provider="ollama")
+
+        assert "".join(router.stream("rationale_template", CONTEXT)) == "Cached answer."
+        assert list(router.stream("rationale_template", CONTEXT)) == ["Cached answer."]
+        assert router.generate("rationale_template", CONTEXT) == "Cached answer."
+        assert len(requests) == 1
+
+    def test_http_error_yields_rule_based_text(self, isolated):
+        _serve(isolated, "ollama", ["oops"], status=500, delay=0)
+        router = LLMRouter(provider="ollama")
+
+        assert list(router.stream("rationale_template", CONTEXT)) == [router._generate_fallback(CONTEXT)]
+
+    def test_dropped_stream_ends_and_is_not_cached(self, isolated):
+        requests = _serve(isolated, "ollama", _ollama_chunks(["Half ", "an ", "answer"]), delay=0, fail_after=2)
+        router = LLMRouter(provider="ollama")
+
+        assert list(router.stream("rationale_template", CONTEXT)) == ["Half ", "an "]
+        list(router.stream("rationale_template", CONTEXT))
+        assert len(requests) == 2
+
+    def test_rule_based_mode(self):
+        router = LLMRouter(provider="none")
+
+        assert list(router.stream("rationale_template", {"priority": "high"})) == [
+            router._generate_fallback({"priority": "high"})
+        ]
+
+    def test_sdk_stub_streams_words(self, monkeypatch):
+        monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+        provider = AnthropicProvider()
+        chunks = list(provider.stream("Why is this deal at risk?"))
+
+        assert len(chunks) > 1
+        assert "".join(chunks) == provider.generate("Why is this deal at risk?")
+
+
+class TestStreamEndpoint:
+    """`/llm/stream` forwards chunks as server-sent events."""
+
+    @pytest.fixture
+    def client(self, isolated, monkeypatch):
+        from aas.api import app
+
+        _serve(isolated, "ollama", _ollama_chunks(["Revenue ", "is ", "up."]), delay=0)
+        monkeypatch.setattr(llm, "_router", LLMRouter(provider="ollama"))
+        return TestClient(app)
+
+    def test_token_events_then_done(self, client):
+        with client.stream("POST", "/llm/stream", json={"prompt_key": "rationale_template", "context": CONTEXT}) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            body = response.read().decode()
+
+        events = [block.split("\n") for block in body.strip().split("\n\n")]
+        names = [lines[0].removeprefix("event: ") for lines in events]
+        data = [json.loads(lines[1].removeprefix("data: ")) for lines in events]
+        assert names == ["token", "token", "token", "done"]
+        assert "".join(d["text"] for d in data[:-1]) == "Revenue is up."
+        assert data[-1] == {"provider": "ollama"}
+
+    def test_unknown_prompt(self, client):
+        response = client.post("/llm/stream", json={"prompt_key": "nope"})
+        assert response.status_code == 404
@@ -0,0 +1,123 @@
+"""
+Unit tests for the Monte Carlo revenue forecast.
+"""
+
+import numpy as np
+import pytest
+
+from aas.analytics import monte_carlo
+from aas.analytics.monte_carlo import close_in_window_probability, simulate_revenue
+
+
+@pytest.fixture
+def deals():
+    rng = np.random.default_rng(7)
+    n = 3000
+    return {
+        "amount": rng.integers(10, 500, n) * 1000.0,
+        "probability": rng.choice([0.1, 0.25, 0.5, 0.75], n),
+        "segment": rng.choice(["Enterprise", "Mid-Market", "SMB"], n),
+        "region": rng.choice(["North America", "EMEA", "APAC"], n),
+    }
+
+
+class TestCloseInWindowProbability:
+    """Tests for the sales-cycle timing model."""
+
+    def test_conditional_on_deal_age(self):
+        """Only cycles longer than the deal's age are considered."""
+        velocity = np.array([10, 20, 30, 40, 50, 60, 70, 80, 90, 100])
+
+        prob = close_in_window_probability(
+            age_days=np.array([0, 45, 95]),
+            days_to_close=np.array([30, 30, 30]),
+            window_days=30,
+            velocity_days=velocity,
+        )
+
+        assert prob == pytest.approx([0.3, 3 / 6, 1.0])
+
+    def test_falls_back_to_close_date(self):
+        """Too little history (or deals older than it) use the close date."""
+        prob = close_in_window_probability(
+            age_days=np.array([10, 10]),
+            days_to_close=np.array([5, 120]),
+            window_days=90,
+            velocity_days=np.array([30, 40]),
+        )
+
+        assert prob.tolist() == [1.0, 0.0]
+
+
+class TestSimulateRevenue:
+    """Tests for simulate_revenue."""
+
+    def test_percentiles_are_ordered_and_consistent(self, deals):
+        """P10 <= P50 <= P90 and rollups share one expected value."""
+        result = simulate_revenue(**deals, n_scenarios=5000, seed=1)
+
+        total = result["total"]
+        assert result["method"] == "exact"
+        assert total["p10"] <= total["p50"] <= total["p90"]
+        assert total["expected"] == pytest.approx(float((deals["amount"] * deals["probability"]).sum()))
+        assert sum(s["expected"] for s in result["by_segment"].values()) == pytest.approx(total["expected"])
+        assert sum(r["expected"] for r in result["by_region"].values()) == pytest.approx(total["expected"])
+        assert len(result["by_segment_region"]) == 9
+
+    def test_seeded_runs_repeat(self, deals):
+        """The same seed reproduces the same distribution."""
+        assert simulate_revenue(**deals, n_scenarios=1000, seed=3) == simulate_revenue(
+            **deals, n_scenarios=1000, seed=3
+        )
+
+    def test_stratified_matches_exact(self, deals, monkeypatch):
+        """The stratified fast path agrees with per-deal draws."""
+        exact = simulate_revenue(**deals, n_scenarios=20000, seed=5)
+        monkeypatch.setattr(monte_carlo, "EXACT_DRAW_BUDGET", 0)
+        stratified = simulate_revenue(**deals, n_scenarios=20000, seed=5)
+
+        assert stratified["method"] == "stratified"
+        for key in ("p10", "p50", "p90"):
+            assert stratified["total"][key] == pytest.approx(exact["total"][key], rel=0.01)
+
+    def test_sparse_strata_match_exact_spread(self, monkeypatch):
+        """Cells of a few deals keep the exact path's P10-P90 width."""
+        rng = np.random.default_rng(11)
+        n = 2500
+        deals = {
+            "amount": rng.lognormal(11, 1, n),
+            "probability": rng.uniform(0.05, 0.9, n),
+            "segment": rng.choice([f"S{i}" for i in range(25)], n),
+            "region": rng.choice([f"R{i}" for i in range(10)], n),
+        }
+        monkeypatch.setattr(monte_carlo, "EXACT_DRAW_BUDGET", 10**12)
+        exact = simulate_revenue(**deals, n_scenarios=10000, seed=1)
+        monkeypatch.setattr(monte_carlo, "EXACT_DRAW_BUDGET", 0)
+        stratified = simulate_revenue(**deals, n_scenarios=10000, seed=1)
+
+        def width(summary):
+            return summary["p90"] - summary["p10"]
+
+        assert stratified["method"] == "stratified"
+        assert width(stratified["total"]) == pytest.approx(width(exact["total"]), rel=0.03)
+        ratios = np.array([
+            width(s) / width(e)
+            for s, e in zip(stratified["by_segment_region"], exact["by_segment_region"])
+            if width(e) > 0
+        ])
+        assert np.median(ratios) == pytest.approx(1.0, abs=0.03)
+        assert ratios.min() > 0.85 and ratios.max() < 1.2
+
+    def test_certain_outcomes(self):
+        """Probabilities of 0 and 1 give a degenerate distribution."""
+        result = simulate_revenue([100.0, 200.0], [1.0, 0.0], ["SMB", "SMB"], ["EMEA", "APAC"], n_scenarios=100)
+
+        assert result["by_region"]["EMEA"]["p10"] == result["by_region"]["EMEA"]["p90"] == 100.0
+        assert result["by_region"]["APAC"]["p90"] == 0.0
+
+    def test_no_deals(self):
+        """An empty pipeline simulates zero revenue."""
+        result = simulate_revenue([], [], [], [], n_scenarios=100)
+
+        assert result["total"]["p90"] == 0.0
+        assert result["by_segment"] == {}
@@ -0,0 +1,384 @@
+"""
+Unit tests for Pipeline Leakage Agent.
+"""
+
+import datetime as dt
+import json
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from aas.agents.base import InvalidParams
+from aas.agents.pipeline_leakage import PipelineLeakageAgent
+from aas.analytics.findings import FINDING_COLUMNS, opportunity_findings
+from aas.analytics.pipeline_risk import ExactSum, score_opportunities
+
+
+def _days(offset):
+    return (dt.date.today() + dt.timedelta(days=offset)).isoformat()
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Request file paths resolve inside this directory."""
+    monkeypatch.setenv("AAS_DATA_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def pipeline_df():
+    """Small opportunity frame covering every risk component."""
+    return pd.DataFrame({
+        "opportunity_id": ["OPP1", "OPP2", "OPP3", "OPP4", "OPP5", "OPP6"],
+        "owner": ["Alice", "Bob", "Alice", "Carol", "Bob", "Alice"],
+        "region": ["East", "West", "East", "South", "West", "Central"],
+        "segment": ["SMB", "Enterprise", "SMB", "Mid-Market", "SMB", "Enterprise"],
+        "stage": ["Proposal", "Negotiation", "Discovery", "Proposal", "Prospecting", "Negotiation"],
+        "amount": [50000, 120000, 15000, 80000, 9000, 200000],
+        "close_date": [_days(-5), _days(20), _days(-40), _days(10), _days(60), _days(-1)],
+        "last_touch_date": [_days(-30), _days(-2), _days(-50), _days(-20), _days(-1), _days(-25)],
+        "stage_age": [45, 10, 60, 35, 3, 50],
+    })
+
+
+class TestPipelineLeakageAnalyze:
+    """Tests for PipelineLeakageAgent.analyze."""
+
+    def test_analyze_does_not_mutate_input(self, pipeline_df):
+        """Analysis must leave a shared input frame untouched."""
+        snapshot = pipeline_df.copy(deep=True)
+
+        PipelineLeakageAgent().analyze(pipeline_df)
+
+        pd.testing.assert_frame_equal(pipeline_df, snapshot)
+
+    def test_concurrent_runs_share_one_frame(self, pipeline_df):
+        """Repeated runs over the same frame produce identical results."""
+        agent = PipelineLeakageAgent()
+
+        first = agent.analyze(pipeline_df)
+        second = agent.analyze(pipeline_df)
+
+        assert first == second
+
+    def test_at_risk_deals_are_scored(self, pipeline_df):
+        """Top deals carry scores and reasons in descending risk order."""
+        analysis = PipelineLeakageAgent().analyze(pipeline_df)
+        deals = analysis["at_risk_deals"]
+
+        assert len(deals) == 5
+        scores = [d["risk_score"] for d in deals]
+        assert scores == sorted(scores, reverse=True)
+        assert deals[0]["opportunity_id"] in {"OPP1", "OPP3", "OPP6"}
+        assert "Close date slipped" in deals[0]["reasons"]
+        assert isinstance(deals[0]["close_date"], str)
+
+    def test_metrics(self, pipeline_df):
+        """Stalled metrics only count deals scoring above 50."""
+        metrics = PipelineLeakageAgent().analyze(pipeline_df)["metrics"]
+
+        assert metrics["num_stalled_opportunities"] == 4
+        assert metrics["value_at_risk"] == pytest.approx(50000 + 15000 + 80000 + 200000)
+        assert metrics["expected_revenue_recovered"] == pytest.approx(metrics["value_at_risk"] * 0.7)
+
+    def test_empty_frame(self):
+        """Empty input returns an empty analysis."""
+        analysis = PipelineLeakageAgent().analyze(pd.DataFrame())
+
+        assert analysis["at_risk_deals"] == []
+        assert analysis["stage_distribution"] == {}
+
+
+class TestShardedAnalysis:
+    """Sharded analysis must reproduce the single-process result."""
+
+    @pytest.mark.parametrize("kwargs", [
+        {"partition_key": "region", "partition_by": "value"},
+        {"partition_key": "opportunity_id", "partition_by": "hash", "num_shards": 3},
+        {"num_shards": 4},
+    ])
+    def test_matches_in_memory(self, pipeline_df, kwargs):
+        """Merged shard partials equal the in-memory analysis."""
+        agent = PipelineLeakageAgent()
+
+        sharded = agent.analyze_sharded(pipeline_df, max_workers=1, min_rows=0, **kwargs)
+
+        assert sharded == agent.analyze(pipeline_df)
+
+    def test_process_pool(self, pipeline_df):
+        """Shards analyzed in worker processes merge to the same result."""
+        agent = PipelineLeakageAgent()
+
+        sharded = agent.analyze_sharded(
+            pipeline_df, partition_key="opportunity_id", max_workers=2, min_rows=0
+        )
+
+        assert sharded == agent.analyze(pipeline_df)
+
+    def test_run_dispatches_on_params(self, pipeline_df, monkeypatch):
+        """`analysis_mode=sharded` in params routes run() through the shard path."""
+        agent = PipelineLeakageAgent()
+        agent.params = {"analysis_mode": "sharded", "partition_key": "region", "max_workers": 1}
+        monkeypatch.setattr(agent, "load_data", lambda: pipeline_df)
+        calls = []
+        monkeypatch.setattr(agent, "analyze_sharded", lambda data, **kw: calls.append(kw) or agent.analyze(data))
+        monkeypatch.setattr(agent, "generate_rationale", lambda context: "rationale")
+
+        result = agent.run()
+
+        assert calls and calls[0]["partition_key"] == "region"
+        assert result["analysis"]["metrics"]["num_stalled_opportunities"] == 4
+
+    def test_worker_params_are_coerced_and_capped(self, pipeline_df, monkeypatch):
+        """String counts are accepted; `max_workers` never exceeds the CPU count."""
+        agent = PipelineLeakageAgent()
+        agent.params = {"analysis_mode": "sharded", "max_workers": "512", "num_shards": "3"}
+        monkeypatch.setattr("os.cpu_count", lambda: 4)
+        monkeypatch.setattr(agent, "load_data", lambda: pipeline_df)
+        calls = []
+        monkeypatch.setattr(agent, "analyze_sharded", lambda data, **kw: calls.append(kw) or agent.analyze(data))
+        monkeypatch.setattr(agent, "generate_rationale", lambda context: "rationale")
+
+        agent.run()
+
+        assert calls[0]["max_workers"] == 4
+        assert calls[0]["num_shards"] == 3
+
+    @pytest.mark.parametrize("params", [
+        {"max_workers": 0},
+        {"max_workers": "four"},
+        {"max_workers": 2.5},
+        {"num_shards": -1},
+        {"partition_by": "range"},
+    ])
+    def test_bad_shard_params(self, pipeline_df, monkeypatch, params):
+        agent = PipelineLeakageAgent()
+        agent.params = {"analysis_mode": "sharded", **params}
+        monkeypatch.setattr(agent, "load_data", lambda: pipeline_df)
+
+        with pytest.raises(InvalidParams):
+            agent.run()
+
+    def test_one_shared_pool(self):
+        from aas.analytics import sharding
+
+        try:
+            assert sharding._get_pool() is sharding._get_pool()
+        finally:
+            sharding.shutdown_pools()
+        assert sharding._pool is None
+
+    def test_api_rejects_bad_shard_params(self):
+        from fastapi.testclient import TestClient
+
+        from aas.api import app
+
+        response = TestClient(app).post("/run/pipeline", json={"params": {"analysis_mode": "sharded", "max_workers": "x"}})
+
+        assert response.status_code == 400
+        assert "max_workers" in response.json()["detail"]
+
+
+class TestChunkedAnalysis:
+    """Chunked analysis must reproduce the in-memory result."""
+
+    @pytest.mark.parametrize("chunk_size", [1, 2, 4, 100])
+    def test_csv_chunks_match_in_memory(self, pipeline_df, data_dir, chunk_size):
+        """Folding CSV chunks gives the same analysis as one full read."""
+        path = data_dir / "pipeline.csv"
+        pipeline_df.to_csv(path, index=False)
+        agent = PipelineLeakageAgent()
+        agent.params = {"source_path": str(path)}
+
+        chunked = agent.analyze_chunked(agent.iter_chunks(chunk_size))
+
+        assert chunked == agent.analyze(pd.read_csv(path))
+
+    def test_run_in_chunked_mode(self, pipeline_df, data_dir, monkeypatch):
+        """`analysis_mode=chunked` streams the source without load_data()."""
+        path = data_dir / "pipeline.csv"
+        pipeline_df.to_csv(path, index=False)
+        agent = PipelineLeakageAgent()
+        agent.params = {"analysis_mode": "chunked", "chunk_size": 2, "source_path": str(path)}
+        monkeypatch.setattr(agent, "load_data", lambda: pytest.fail("load_data should not be called"))
+        monkeypatch.setattr(agent, "generate_rationale", lambda context: "rationale")
+
+        result = agent.run()
+
+        assert result["analysis"]["metrics"]["num_stalled_opportunities"] == 4
+        assert len(result["analysis"]["at_risk_deals"]) == 5
+
+    def test_source_path_outside_data_dir_rejected(self, data_dir, tmp_path_factory):
+        outside = tmp_path_factory.mktemp("outside") / "secrets.csv"
+        outside.write_text("opportunity_id\nX\n")
+        for path in (str(outside), "../outside/secrets.csv", "/etc/passwd"):
+            agent = PipelineLeakageAgent()
+            agent.params = {"source_path": path}
+            with pytest.raises(InvalidParams):
+                next(agent.iter_chunks(10))
+
+    def test_relative_source_path(self, pipeline_df, data_dir):
+        pipeline_df.to_csv(data_dir / "pipeline.csv", index=False)
+        agent = PipelineLeakageAgent()
+        agent.params = {"source_path": "pipeline.csv"}
+
+        assert sum(len(chunk) for chunk in agent.iter_chunks(4)) == len(pipeline_df)
+
+    def test_table_export_scores_stage_age(self, data_dir):
+        """A CSV with the table's `stage_age_days` column is scored on stage age."""
+        from aas.utils.synthetic_data import generate_opportunities
+
+        frame = generate_opportunities(200, seed=3)
+        frame.to_csv(data_dir / "opportunities.csv", index=False)
+        agent = PipelineLeakageAgent()
+        agent.params = {"source_path": "opportunities.csv"}
+
+        chunked = agent.analyze_chunked(agent.iter_chunks(50))
+
+        assert chunked == agent.analyze(frame.rename(columns={"stage_age_days": "stage_age"}))
+        assert any("Stalled in stage" in reason for deal in chunked["at_risk_deals"] for reason in deal["reasons"])
+
+    def test_api_rejects_source_path_outside_data_dir(self, data_dir):
+        from fastapi.testclient import TestClient
+
+        from aas.api import app
+
+        response = TestClient(app).post(
+            "/run/pipeline", json={"params": {"analysis_mode": "chunked", "source_path": "/etc/passwd"}}
+        )
+
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize("chunk_size", [0, -5, "abc"])
+    def test_bad_chunk_size(self, chunk_size):
+        agent = PipelineLeakageAgent()
+        agent.params = {"analysis_mode": "chunked", "chunk_size": chunk_size}
+
+        with pytest.raises(InvalidParams):
+            agent.run()
+        with pytest.raises(InvalidParams):
+            next(agent.iter_findings("run-1", "2024-01-01T00:00:00"))
+
+    def test_api_rejects_bad_chunk_size(self):
+        from fastapi.testclient import TestClient
+
+        from aas.api import app
+
+        response = TestClient(app).post("/run/churn", json={"params": {"analysis_mode": "chunked", "chunk_size": 0}})
+
+        assert response.status_code == 400
+        assert "chunk_size" in response.json()["detail"]
+
+    def test_exact_sum_is_order_independent(self):
+        """Partial float sums merge to the same value in any order."""
+        values = [0.1] * 7 + [1e16, -1e16, 3.3, 2.2e-8]
+        forward = ExactSum.of(values[:4]) + ExactSum.of(values[4:])
+        backward = ExactSum.of(values[::-1][:3]) + ExactSum.of(values[::-1][3:])
+
+        assert float(forward) == float(backward) == float(ExactSum.of(values))
+
+
+class TestFindings:
+    """Per-opportunity rows for aas_findings."""
+
+    def test_one_row_per_opportunity(self, pipeline_df):
+        today = dt.date.today()
+        findings = opportunity_findings(pipeline_df, "run1", "2026-01-01T00:00:00+00:00", today)
+
+        assert list(findings.columns) == FINDING_COLUMNS
+        assert findings["opportunity_id"].tolist() == pipeline_df["opportunity_id"].tolist()
+        expected = score_opportunities(pipeline_df, today).risk_score.round(3).tolist()
+        assert findings["risk_score"].tolist() == expected
+        assert findings["risk_driver"].tolist() == [
+            "stage_age", "stage_age", "stage_age", "stage_age", "stage_age", "stage_age"
+        ]
+        details = json.loads(findings["details"].iloc[0])
+        assert details["owner"] == "Alice"
+        assert details["no_recent_touch_points"] == 30
+        assert details["close_slipped_points"] == 30
+
+    def test_driver_is_largest_component(self):
+        frame = pd.DataFrame({
+            "opportunity_id": ["A", "B", "C"],
+            "stage_age": [5, 0, 0],
+            "last_touch_date": [_days(-40), _days(0), _days(0)],
+            "close_date": [_days(5), _days(-3), _days(5)],
+        })
+
+        findings = opportunity_findings(frame, "run1", "2026-01-01", dt.date.today())
+
+        assert findings["risk_driver"].tolist() == ["no_recent_touch", "close_slipped", "none"]
+
+    def test_chunked_findings_have_unique_ids(self, pipeline_df, data_dir):
+        path = data_dir / "pipeline.csv"
+        pipeline_df.to_csv(path, index=False)
+        agent = PipelineLeakageAgent()
+        agent.params = {"source_path": str(path), "chunk_size": 4}
+
+        batches = list(agent.iter_findings("run1", "2026-01-01"))
+
+        assert [len(b) for b in batches] == [4, 2]
+        ids = pd.concat(batches)["finding_id"].tolist()
+        assert ids == [f"run1-{i}" for i in range(6)]
+
+    def test_findings_reuse_the_analyzed_frame(self, pipeline_df, monkeypatch):
+        """After an in-memory run, findings come from the loaded frame, not a second read."""
+        agent = PipelineLeakageAgent()
+        agent.params = {"chunk_size": 4}
+        reads = []
+        monkeypatch.setattr(agent, "_read_source", lambda: reads.append(1) or pipeline_df)
+        monkeypatch.setattr(agent, "generate_rationale", lambda context: "rationale")
+
+        agent.run()
+        batches = list(agent.iter_findings("run1", "2026-01-01"))
+
+        assert reads == [1]
+        assert [len(b) for b in batches] == [4, 2]
+        pd.testing.assert_frame_equal(
+            pd.concat(batches, ignore_index=True), opportunity_findings(pipeline_df, "run1", "2026-01-01", dt.date.today())
+        )
+
+    def test_api_persists_findings_after_the_response(self, pipeline_df, monkeypatch):
+        """`/run/pipeline` hands findings to a background task instead of COPYing inline."""
+        from fastapi.testclient import TestClient
+
+        from aas import api
+
+        monkeypatch.setenv("DATABASE_URL", "postgresql://unused")
+        monkeypatch.setattr(PipelineLeakageAgent, "_read_source", lambda self: pipeline_df)
+        monkeypatch.setattr(PipelineLeakageAgent, "generate_rationale", lambda self, context: "rationale")
+        monkeypatch.setattr(api, "_persist_run", lambda *args, **kwargs: None)
+        persisted = []
+        monkeypatch.setattr(
+            api, "_persist_run_findings", lambda run_id, findings: persisted.append((run_id, list(findings)))
+        )
+
+        response = TestClient(api.app).post("/run/pipeline", json={})
+
+        assert response.status_code == 200
+        [(run_id, batches)] = persisted
+        assert run_id == response.json()["run_id"]
+        assert sum(len(b) for b in batches) == len(pipeline_df)
+
+    def test_api_skips_findings_without_db(self, pipeline_df, monkeypatch):
+        from fastapi.testclient import TestClient
+
+        from aas import api
+
+        monkeypatch.delenv("DATABASE_URL", raising=False)
+        monkeypatch.setattr(PipelineLeakageAgent, "_read_source", lambda self: pipeline_df)
+        monkeypatch.setattr(PipelineLeakageAgent, "generate_rationale", lambda self, context: "rationale")
+        monkeypatch.setattr(PipelineLeakageAgent, "iter_findings", lambda *args: pytest.fail("findings built without a DB"))
+
+        assert TestClient(api.app).post("/run/pipeline", json={}).status_code == 200
+
+    def test_persist_findings_copies_every_batch(self, pipeline_df, monkeypatch):
+        from aas import api
+
+        copied = []
+        monkeypatch.setattr(api, "copy_frame", lambda conn, frame, table, columns: copied.append(table) or len(frame))
+        batches = [opportunity_findings(pipeline_df.iloc[i:i + 3], "run1", "t", dt.date.today(), i) for i in (0, 3)]
+
+        assert api._persist_findings(MagicMock(), "run1", iter(batches)) == 6
+        assert copied == ["aas_findings", "aas_findings"]
@@ -0,0 +1,576 @@
+"""
+Unit tests for batched, concurrent rationale generation.
+"""
+
+import asyncio
+import json
+import re
+import sqlite3
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from aas.agents.base import AgentPlay
+from aas.llm import LLMRouter, clients, rationale
+from aas.llm.breaker import CLOSED, OPEN, get_breaker, reset_breakers
+from aas.llm.similarity import reset_similarity_index
+from aas.llm.providers import AnthropicProvider
+from aas.utils.cache import LLMCache, get_llm_cache
+
+
+class _Agent(AgentPlay):
+    def analyze(self, data):
+        return {}
+
+
+@pytest.fixture(autouse=True)
+def llm_cache(tmp_path, monkeypatch):
+    """Each test gets its own disk cache, similarity index and circuit breakers."""
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm_cache.sqlite3"))
+    reset_breakers()
+    reset_similarity_index()
+    yield get_llm_cache()
+    reset_breakers()
+    reset_similarity_index()
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    """A fresh client registry whose Ollama clients answer after a delay.
+
+    Batch prompts get a JSON reply covering `state["answer_upto"]` items.
+    """
+    monkeypatch.setenv("LLM_PROVIDER", "ollama")
+    registry = clients.ClientRegistry()
+    monkeypatch.setattr(clients, "registry", registry)
+    state = {"delay": 0.2, "in_flight": 0, "peak": 0, "calls": 0, "answer_upto": None}
+
+    async def handler(request):
+        state["calls"] += 1
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        try:
+            await asyncio.sleep(state["delay"])
+        finally:
+            state["in_flight"] -= 1
+        prompt = json.loads(request.read())["prompt"]
+        items = re.findall(r"^(\d+)\. (.*)$", prompt, re.MULTILINE)
+        if items:
+            upto = state["answer_upto"] or len(items)
+            reply = json.dumps({n: f"why {text}" for n, text in items[:upto]})
+        else:
+            reply = f"single {prompt.split(': ', 1)[1]}"
+        return httpx.Response(200, json={"response": reply})
+
+    def sync_handler(request):
+        state["calls"] += 1
+        prompt = json.loads(request.read())["prompt"]
+        return httpx.Response(200, json={"response": f"single {prompt.split(': ', 1)[1]}"})
+
+    registry._async_clients["ollama"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    registry._clients["ollama"] = httpx.Client(transport=httpx.MockTransport(sync_handler))
+    yield state
+    registry.close()
+
+
+class TestParseBatch:
+    """Tests for splitting a batch reply per action."""
+
+    def test_json_object_in_code_fence(self):
+        text = '```json\n{"1": "First.", "3": "Third."}\n```'
+
+        assert rationale.parse_batch(text, 3) == ["First.", None, "Third."]
+
+    def test_json_list_and_numbered_lines(self):
+        assert rationale.parse_batch('["A.", "B."]', 2) == ["A.", "B."]
+        assert rationale.parse_batch("1. A.\n2) B.\n**3**: C.", 3) == ["A.", "B.", "C."]
+
+    def test_garbage(self):
+        assert rationale.parse_batch("I cannot help with that.", 2) == [None, None]
+
+
+class TestGatherRationales:
+    """Tests for the batched async fan-out."""
+
+    def test_one_call_per_batch(self, ollama):
+        texts = rationale.gather_rationales([f"deal {i}" for i in range(10)])
+
+        assert texts == [f"why deal {i}" for i in range(10)]
+        assert ollama["calls"] == 1
+
+    def test_batches_overlap(self, ollama):
+        start = time.perf_counter()
+        texts = rationale.gather_rationales([f"deal {i}" for i in range(8)], size=2)
+        elapsed = time.perf_counter() - start
+
+        assert texts == [f"why deal {i}" for i in range(8)]
+        assert elapsed < 0.2 * 3
+        assert ollama["peak"] == 4
+
+    def test_unparsed_items_are_retried_singly(self, ollama):
+        ollama["answer_upto"] = 1
+        ollama["delay"] = 0.01
+
+        texts = rationale.gather_rationales(["deal a", "deal b", "deal c"])
+
+        assert texts == ["why deal a", "single deal b", "single deal c"]
+        assert ollama["calls"] == 3
+
+    def test_concurrency_is_bounded(self, ollama, monkeypatch):
+        monkeypatch.setenv("LLM_MAX_CONCURRENCY", "2")
+        ollama["delay"] = 0.01
+
+        rationale.gather_rationales(["deal"] * 6, size=1)
+
+        assert ollama["peak"] == 2
+
+    def test_deadline_returns_fallback(self, ollama, monkeypatch):
+        monkeypatch.setenv("LLM_CALL_TIMEOUT", "0.05")
+        ollama["delay"] = 1.0
+
+        assert rationale.gather_rationales(["deal", "deal"]) == [rationale.unavailable_rationale("ollama", "timeout")] * 2
+
+    def test_no_provider_is_rule_based(self, monkeypatch):
+        monkeypatch.setenv("LLM_PROVIDER", "openai")
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+        assert rationale.gather_rationales(["churn risk"]) == [rationale.fallback_rationale("churn risk")]
+
+
+class TestAgentRationales:
+    """Tests for AgentPlay.generate_rationales."""
+
+    def test_uses_batches(self, ollama):
+        assert _Agent().generate_rationales(["deal a", "deal b"]) == ["why deal a", "why deal b"]
+
+    def test_overridden_generate_rationale_is_called_per_context(self, ollama, monkeypatch):
+        agent = _Agent()
+        monkeypatch.setattr(agent, "generate_rationale", lambda context: context.upper())
+
+        assert agent.generate_rationales(["a", "b"]) == ["A", "B"]
+
+
+class TestRunBudget:
+    """Tests for the run-level latency budget."""
+
+    def test_statuses(self, ollama):
+        first = rationale.gather_rationale_results(["deal a", "deal b"])
+        again = rationale.gather_rationale_results(["deal a"])
+
+        assert [r.status for r in first] == [rationale.STATUS_GENERATED] * 2
+        assert again[0].status == rationale.STATUS_CACHED
+
+    def test_spent_budget_degrades_to_rules(self, ollama):
+        ollama["delay"] = 1.0
+        start = time.perf_counter()
+        with rationale.rationale_budget(0.1) as budget:
+            results = rationale.gather_rationale_results(["stage stalled", "deal b"], size=1)
+            later = rationale.rationale_result("deal c")
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.5
+        assert [r.status for r in results + [later]] == [rationale.STATUS_DEGRADED] * 3
+        assert results[0].text == rationale.fallback_rationale("stage stalled")
+        assert budget.exhausted and budget.degraded == 3
+
+    def test_finished_batches_are_kept(self, ollama, monkeypatch):
+        calls = []
+
+        async def _abatch(contexts, provider):
+            calls.append(contexts)
+            await asyncio.sleep(0.01 if contexts == ["fast"] else 1.0)
+            return [rationale.Rationale(f"why {c}", rationale.STATUS_GENERATED) for c in contexts]
+
+        monkeypatch.setattr(rationale, "_abatch", _abatch)
+        with rationale.rationale_budget(0.2):
+            results = rationale.gather_rationale_results(["fast", "slow"], size=1)
+
+        assert [r.status for r in results] == [rationale.STATUS_GENERATED, rationale.STATUS_DEGRADED]
+
+    def test_budget_is_shared_across_calls(self, ollama):
+        ollama["delay"] = 0.05
+        with rationale.rationale_budget(10) as budget:
+            rationale.gather_rationale_results(["deal a"])
+            rationale.rationale_result("deal b")
+
+        assert ollama["calls"] == 2
+        assert 0.05 <= budget.spent < 1
+        assert budget.degraded == 0
+
+    def test_run_marks_actions(self, ollama, monkeypatch):
+        from aas.models.action import Action
+
+        monkeypatch.setenv("LLM_RUN_BUDGET", "0")
+
+        class _Play(_Agent):
+            def recommend_actions(self, analysis):
+                actions = [Action(type="task", description="d")]
+                actions[0].set_rationale(self.generate_rationale_results(["deal"])[0])
+                return actions
+
+        action = _Play().run()["actions"][0]
+        assert action["rationale_status"] == rationale.STATUS_DEGRADED
+        assert action["reasoning"] == rationale.fallback_rationale("deal")
+        assert ollama["calls"] == 0
+
+    def test_router_skips_calls_once_spent(self, monkeypatch):
+        router = LLMRouter(provider="ollama")
+        monkeypatch.setattr(router, "_call", lambda prompt, max_tokens, timeout: "llm answer")
+
+        with rationale.rationale_budget(0):
+            assert router.generate("rationale_template", {"priority": "high"}) == router._generate_fallback({"priority": "high"})
+        assert router.generate("rationale_template", {"priority": "high"}) == "llm answer"
+
+
+class TestBreakersAndHedging:
+    """Tests for provider circuit breakers and hedged calls on the rationale paths."""
+
+    @pytest.fixture
+    def openai(self, ollama, monkeypatch):
+        """OpenAI as the hedge provider, answering quickly."""
+        monkeypatch.setenv("OPENAI_API_KEY", "test")
+        monkeypatch.setenv("LLM_HEDGE_PROVIDER", "openai")
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, json={"choices": [{"message": {"content": "hedged"}}]})
+
+        clients.registry._async_clients["openai"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return calls
+
+    def test_failing_provider_is_skipped(self, ollama, monkeypatch):
+        monkeypatch.setenv("LLM_CALL_TIMEOUT", "0.02")
+        ollama["delay"] = 1.0
+
+        rationale.gather_rationales(["deal"] * 5, size=1)
+        calls = ollama["calls"]
+        start = time.perf_counter()
+        texts = rationale.gather_rationales(["other deal"] * 3, size=1)
+
+        assert get_breaker("ollama").state == OPEN
+        assert ollama["calls"] == calls
+        assert time.perf_counter() - start < 0.1
+        assert texts == [rationale.unavailable_rationale("ollama", "circuit open")] * 3
+        assert rationale.rationale_result("deal").status == rationale.STATUS_UNAVAILABLE
+
+    def test_cancelled_probe_releases_breaker(self, ollama):
+        """A half-open probe that is cancelled (not failed) lets the next call probe."""
+        breaker = get_breaker("ollama")
+        breaker.cooldown = 0.0
+        for _ in range(breaker.min_calls):
+            breaker.record(False)
+        ollama["delay"] = 1.0
+
+        async def cancel_probe():
+            task = asyncio.ensure_future(rationale.acomplete("ollama", "deal"))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_probe())
+        ollama["delay"] = 0.0
+
+        assert asyncio.run(rationale.acomplete("ollama", "deal")).startswith("single")
+        assert breaker.state == CLOSED
+
+    def test_slow_call_is_hedged(self, ollama, openai):
+        ollama["delay"] = 0.01
+        for word in "abcde":
+            rationale.gather_rationales([f"warm {word}"])
+        ollama["delay"] = 1.0
+
+        start = time.perf_counter()
+        assert rationale.gather_rationales(["deal"]) == ["hedged"]
+        assert time.perf_counter() - start < 0.5
+        assert len(openai) == 1
+
+    def test_open_breaker_goes_straight_to_hedge(self, ollama, openai):
+        breaker = get_breaker("ollama")
+        for _ in range(5):
+            breaker.record(False)
+
+        assert rationale.gather_rationales(["deal"]) == ["hedged"]
+        assert ollama["calls"] == 0
+
+    def test_no_hedge_without_latency_history(self, ollama, openai):
+        ollama["delay"] = 0.05
+
+        assert rationale.gather_rationales(["deal"]) == ["single deal"]
+        assert openai == []
+
+    def test_router_uses_breaker(self, monkeypatch):
+        router = LLMRouter(provider="ollama")
+        calls = []
+        monkeypatch.setattr(router, "_call", lambda prompt, max_tokens, timeout: calls.append(prompt))
+        fallback = router._generate_fallback({"priority": "high"})
+
+        for _ in range(7):
+            assert router.generate("rationale_template", {"priority": "high"}) == fallback
+        assert len(calls) == 5
+
+
+class TestDeferredRationales:
+    """Tests for the deferred rationale mode and its enrichment worker."""
+
+    def test_run_returns_placeholders(self, ollama):
+        from aas.models.action import Action
+
+        class _Play(_Agent):
+            params = {"rationale_mode": "deferred"}
+
+            def recommend_actions(self, analysis):
+                actions = [Action(type="task", description=str(i)) for i in range(3)]
+                for action, result in zip(actions, self.generate_rationale_results(["a", "b", "a"])):
+                    action.set_rationale(result)
+                return actions
+
+        play = _Play()
+        actions = play.run()["actions"]
+
+        assert {a["rationale_status"] for a in actions} == {rationale.STATUS_PENDING}
+        assert actions[0]["reasoning"] == rationale.PENDING_RATIONALE
+        assert "rationale_context" not in actions[0]
+        assert play.pending_rationales == [(0, "a"), (1, "b"), (2, "a")]
+        assert ollama["calls"] == 0
+
+    def test_enricher_fills_and_persists(self, ollama):
+        from aas.llm.enrichment import RationaleEnricher
+
+        enricher = RationaleEnricher()
+        persisted = []
+        run = enricher.submit("r1", [(0, "x0", "a"), (1, "x1", "b"), (2, "x2", "a")],
+                              persist=lambda run_id, rationales: persisted.append((run_id, rationales)))
+        try:
+            assert enricher.wait("r1", 5) is run
+            assert run.status == "complete"
+            assert [r["reasoning"] for r in run.rationales] == ["why a", "why b", "why a"]
+            assert [r["action_id"] for r in run.rationales] == ["x0", "x1", "x2"]
+            assert persisted == [("r1", run.rationales)]
+            assert ollama["calls"] == 1  # "a" is only asked once
+        finally:
+            enricher.shutdown()
+
+    def test_shutdown_finishes_queued_runs(self, ollama):
+        from aas.llm.enrichment import RationaleEnricher
+
+        enricher = RationaleEnricher(max_workers=1)
+        persisted = []
+        persist = lambda run_id, rationales: persisted.append(run_id)  # noqa: E731
+        first = enricher.submit("r1", [(0, "x0", "a")], persist=persist)
+        queued = enricher.submit("r2", [(0, "y0", "b"), (1, "y1", "c")], persist=persist)
+        time.sleep(0.05)
+
+        enricher.shutdown()
+
+        assert first.status == queued.status == "complete"
+        assert first.rationales[0]["reasoning"] == "single a"
+        assert {r["rationale_status"] for r in queued.rationales} == {rationale.STATUS_UNAVAILABLE}
+        assert [r["reasoning"] for r in queued.rationales] == [rationale.fallback_rationale(c) for c in "bc"]
+        assert sorted(persisted) == ["r1", "r2"]
+        assert ollama["calls"] == 1
+
+    def test_api_run_and_fetch(self, ollama, monkeypatch):
+        from fastapi.testclient import TestClient
+
+        from aas.api import app
+
+        monkeypatch.delenv("DATABASE_URL", raising=False)
+        ollama["delay"] = 0.3
+        data = [
+            {"customer_id": f"C{i}", "name": f"Account {i}", "mrr": 1000 * (i + 1), "contract_end_date": "2026-02-01",
+             "support_tickets_30d": 12, "nps_score": 2, "usage_trend": "declining", "last_login_days": 40,
+             "payment_delays": 4, "account_health_score": 10}
+            for i in range(3)
+        ]
+        client = TestClient(app)
+
+        start = time.perf_counter()
+        body = client.post("/run/churn", json={"params": {"data": data, "rationale_mode": "deferred"}}).json()
+        assert time.perf_counter() - start < 0.3
+        pending = [a for a in body["actions"] if a["rationale_status"] == rationale.STATUS_PENDING]
+        assert len(pending) == 3
+        assert body["rationales_url"] == f"/runs/{body['run_id']}/rationales"
+
+        done = client.get(body["rationales_url"], params={"wait": 5}).json()
+        assert done["status"] == "complete"
+        assert [r["rationale_status"] for r in done["rationales"]] == [rationale.STATUS_GENERATED] * 3
+        assert all(r["reasoning"].startswith("why ") for r in done["rationales"])
+
+        assert client.get("/runs/unknown/rationales").status_code == 404
+        assert client.get(body["rationales_url"], params={"wait": 60}).status_code == 400
+
+
+class TestSimilarReuse:
+    """Tests for reusing answers to similar contexts."""
+
+    def test_numbers_only_difference_reuses_answer(self, ollama):
+        rationale.gather_rationales(["stalled 45 days, idle 20 days", "spend spike"])
+        calls = ollama["calls"]
+
+        results = rationale.gather_rationale_results(["stalled 52 days, idle 31 days", "churn risk 80"])
+        single = rationale.rationale_result("stalled 60 days, idle 9 days")
+
+        assert results[0] == rationale.Rationale("why stalled 52 days, idle 31 days", rationale.STATUS_REUSED)
+        assert results[1].status == rationale.STATUS_GENERATED
+        assert single.text == "why stalled 60 days, idle 9 days"
+        assert single.status == rationale.STATUS_REUSED
+        assert ollama["calls"] == calls + 1
+
+    def test_can_be_turned_off(self, ollama, monkeypatch):
+        monkeypatch.setenv("LLM_SIMILARITY", "off")
+        rationale.gather_rationales(["stalled 45 days"])
+
+        assert rationale.gather_rationale_results(["stalled 52 days"])[0].status == rationale.STATUS_GENERATED
+        assert ollama["calls"] == 2
+
+
+class TestRationaleCache:
+    """Tests for the disk cache on the rationale paths."""
+
+    def test_rerun_makes_no_calls(self, ollama):
+        contexts = [f"deal {i}" for i in range(4)]
+        first = rationale.gather_rationales(contexts)
+        calls = ollama["calls"]
+
+        assert rationale.gather_rationales(contexts) == first
+        assert rationale.generate_rationale("deal 2") == "why deal 2"
+        assert ollama["calls"] == calls
+
+    def test_only_new_contexts_are_sent(self, ollama):
+        rationale.gather_rationales(["deal a", "deal b"])
+        ollama["calls"] = 0
+
+        texts = rationale.gather_rationales(["deal a", "deal   b ", "deal c"])
+
+        assert texts == ["why deal a", "why deal b", "single deal c"]
+        assert ollama["calls"] == 1
+
+    def test_failures_are_not_cached(self, ollama, llm_cache, monkeypatch):
+        monkeypatch.setenv("LLM_CALL_TIMEOUT", "0.05")
+        ollama["delay"] = 1.0
+
+        rationale.gather_rationales(["deal a"])
+
+        assert llm_cache.size() == 0
+
+    @pytest.fixture
+    def failing_anthropic(self, monkeypatch):
+        """An Anthropic wrapper whose API calls all fail."""
+
+        def fail(**kwargs):
+            raise RuntimeError("overloaded")
+
+        monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+        provider = AnthropicProvider()
+        provider.client = SimpleNamespace(messages=SimpleNamespace(create=fail, stream=fail))
+        return provider
+
+    def test_sdk_errors_are_not_cached(self, failing_anthropic, llm_cache, monkeypatch):
+        """The wrapper's stub text on an API error is neither "generated" nor cached."""
+        monkeypatch.setenv("LLM_PROVIDER", "anthropic")
+        monkeypatch.setitem(rationale._sdk_providers, "anthropic", failing_anthropic)
+
+        result = rationale.rationale_result("deal a")
+
+        assert result.status == rationale.STATUS_UNAVAILABLE
+        assert llm_cache.size() == 0
+
+    def test_router_sdk_errors_fall_back_uncached(self, failing_anthropic, llm_cache):
+        router = LLMRouter(provider="anthropic")
+        router.provider = failing_anthropic
+        context = {"context": "Deal stalled", "action": "Call"}
+
+        assert router.generate("rationale_template", context) == router._generate_fallback(context)
+        assert list(router.stream("rationale_template", context)) == [router._generate_fallback(context)]
+        assert llm_cache.size() == 0
+        assert get_breaker("anthropic")._outcomes.count(False) == 2
+
+
+class TestLLMCache:
+    """Tests for the SQLite cache itself."""
+
+    def test_ttl(self, tmp_path):
+        cache = LLMCache(tmp_path / "c.sqlite3", ttl=0)
+        cache.set("k", "v")
+        time.sleep(0.01)
+
+        assert cache.get("k") is None
+
+    def test_lru_eviction(self, tmp_path):
+        cache = LLMCache(tmp_path / "c.sqlite3", max_entries=2)
+        cache.set("a", "1")
+        time.sleep(0.01)
+        cache.set("b", "2")
+        time.sleep(0.01)
+        cache.get("a")
+        cache.set("c", "3")
+
+        assert cache.get_many(["a", "b", "c"]) == {"a": "1", "c": "3"}
+
+    def test_shared_between_connections(self, tmp_path):
+        LLMCache(tmp_path / "c.sqlite3").set("k", "v")
+
+        assert LLMCache(tmp_path / "c.sqlite3").get("k") == "v"
+
+    def test_unopenable_path_runs_uncached(self, tmp_path, ollama, monkeypatch):
+        """A cache that cannot be opened is logged and skipped, not raised into the run."""
+        (tmp_path / "not-a-dir").write_text("")
+        monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "not-a-dir" / "llm_cache.sqlite3"))
+
+        assert get_llm_cache() is None
+        assert rationale.gather_rationales(["deal a"]) == ["single deal a"]
+        assert LLMRouter(provider="ollama").generate("rationale_template", {"context": "c", "action": "a"})
+
+    def test_locked_database_is_a_miss(self, tmp_path):
+        cache = LLMCache(tmp_path / "c.sqlite3")
+        cache.set("k", "v")
+
+        def locked(*args):
+            raise sqlite3.OperationalError("database is locked")
+
+        cache._conn = SimpleNamespace(execute=locked, executemany=locked, in_transaction=False)
+
+        assert cache.get_many(["k"]) == {}
+        cache.set_many([("k2", "v2")])  # logged and dropped
+
+    def test_key_normalizes_context(self):
+        assert LLMCache.key("p", "m", "t", " a  b\n") == LLMCache.key("p", "m", "t", "a b")
+        assert LLMCache.key("p", "m", "t", {"x": 1, "y": 2}) == LLMCache.key("p", "m", "t", {"y": 2, "x": 1})
+        assert LLMCache.key("p", "m1", "t", "a") != LLMCache.key("p", "m2", "t", "a")
+
+
+class TestRouterBatch:
+    """Tests for LLMRouter.generate_batch."""
+
+    @pytest.fixture
+    def router(self, monkeypatch):
+        router = LLMRouter(provider="ollama")
+        sent = []
+        router.sent = sent
+        monkeypatch.setattr(router, "_complete", lambda prompt, max_tokens=500: sent.append(prompt) or '{"1": "A", "2": "B"}')
+        return router
+
+    def test_single_provider_call(self, router):
+        answers = router.generate_batch("rationale_template", [{"context": "x", "action": "y"}, {"context": "z", "action": "y"}])
+
+        assert answers == ["A", "B"]
+        assert len(router.sent) == 1 and "2. You are an expert" in router.sent[0]
+
+    def test_cached_answers_are_reused(self, router):
+        contexts = [{"context": "x", "action": "y"}, {"context": "z", "action": "y"}]
+        router.generate_batch("rationale_template", contexts)
+
+        assert router.generate_batch("rationale_template", contexts) == ["A", "B"]
+        assert router.generate("rationale_template", contexts[1]) == "B"
+        assert len(router.sent) == 1
+
+    def test_rule_based_mode(self):
+        router = LLMRouter(provider="none")
+
+        answers = router.generate_batch("rationale_template", [{"priority": "high"}, {"priority": "low"}])
+
+        assert answers == [router._generate_fallback({"priority": "high"}), router._generate_fallback({"priority": "low"})]
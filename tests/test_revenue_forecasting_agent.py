@@ -2,6 +2,7 @@
 Unit tests for Revenue Forecasting Agent.
 """
 
+import pandas as pd
 import pytest
 from unittest.mock import Mock, patch
 from aas.agents.revenue_forecasting import RevenueForecastingAgent
@@ -100,6 +101,16 @@ class TestRevenueForecastingAgent:
             # Should have called generate_rationale at least once
             assert mock_rationale.called
     
+    def test_analyze_does_not_mutate_input(self):
+        """Test that analyze leaves the loaded frame untouched."""
+        agent = RevenueForecastingAgent()
+        data = agent.load_data()
+        snapshot = data.copy(deep=True)
+        
+        agent.analyze(data)
+        
+        pd.testing.assert_frame_equal(data, snapshot)
+    
     def test_handles_empty_data_gracefully(self):
         """Test that agent handles empty data without crashing."""
         agent = RevenueForecastingAgent()
@@ -150,3 +161,169 @@ class TestRevenueForecastingLogic:
             # Action type should be one of the valid types (or a custom type)
             assert isinstance(action['type'], str)
             assert len(action['type']) > 0
+    
+    def test_forecast_window_limits_open_deals(self):
+        """Test that open deals closing after the forecast window are excluded."""
+        from datetime import datetime, timedelta
+        
+        def day(offset):
+            return (datetime.now() + timedelta(days=offset)).strftime("%Y-%m-%d")
+        
+        deals = pd.DataFrame({
+            "opportunity_id": ["A", "B", "C", "D"],
+            "amount": [100000, 200000, 50000, 80000],
+            "close_date": [day(10), day(200), day(-30), day(-60)],
+            "stage": ["Proposal", "Negotiation", "Closed Won", "Closed Lost"],
+            "probability": [50, 75, 100, 0],
+            "segment": ["SMB", "Enterprise", "SMB", "Enterprise"],
+            "created_date": [day(-40), day(-20), day(-90), day(-120)],
+        })
+        agent = RevenueForecastingAgent()
+        
+        short = agent.analyze(deals)
+        agent.params["forecast_period_days"] = 365
+        long = agent.analyze(deals)
+        
+        # 90 days: deal A (open) + deal C (recently won)
+        assert short["open_deals"] == 2
+        assert short["weighted_pipeline_value"] == pytest.approx(50000 + 50000)
+        assert "Enterprise" not in short["forecast_by_segment"]
+        # 365 days also picks up deal B
+        assert long["open_deals"] == 3
+        assert long["weighted_pipeline_value"] == pytest.approx(50000 + 150000 + 50000)
+        # Win rate and velocity come from closed deals regardless of window
+        assert short["win_rate"] == long["win_rate"] == pytest.approx(0.5)
+        assert short["avg_deal_velocity_days"] == pytest.approx(60)
+
+
+class TestForecastDistribution:
+    """Tests for the Monte Carlo forecast attached to the analysis."""
+
+    def test_distribution_per_segment_and_region(self):
+        """Analysis carries P10/P50/P90 per segment and region."""
+        agent = RevenueForecastingAgent()
+        agent.params = {"simulation_seed": 0, "simulation_scenarios": 2000}
+        analysis = agent.analyze(agent.load_data())
+
+        distribution = analysis["forecast_distribution"]
+        assert distribution["scenarios"] == 2000
+        assert set(distribution["by_segment"]) == {"Enterprise", "Mid-Market", "SMB"}
+        for summary in distribution["by_region"].values():
+            assert summary["p10"] <= summary["p50"] <= summary["p90"]
+        assert analysis["metrics"]["forecast_p50"] == distribution["total"]["p50"]
+
+    def test_simulation_can_be_disabled(self):
+        """`simulation_scenarios=0` skips the simulation."""
+        agent = RevenueForecastingAgent()
+        agent.params = {"simulation_scenarios": 0}
+        analysis = agent.analyze(agent.load_data())
+
+        assert analysis["forecast_distribution"] == {}
+        assert "forecast_p50" not in analysis["metrics"]
+
+
+class TestForecastSweep:
+    """Tests for batched what-if sweeps."""
+
+    @pytest.fixture
+    def deals(self):
+        from datetime import datetime, timedelta
+
+        def day(offset):
+            return (datetime.now() + timedelta(days=offset)).strftime("%Y-%m-%d")
+
+        return pd.DataFrame({
+            "opportunity_id": ["A", "B", "C", "D", "E"],
+            "amount": [100000, 200000, 50000, 80000, 60000],
+            "close_date": [day(10), day(200), day(-30), day(-60), day(45)],
+            "stage": ["Proposal", "Negotiation", "Closed Won", "Closed Lost", "Qualification"],
+            "probability": [50, 75, 100, 0, 25],
+            "segment": ["SMB", "Enterprise", "SMB", "Enterprise", "Mid-Market"],
+            "created_date": [day(-40), day(-20), day(-90), day(-120), day(-10)],
+        })
+
+    def test_grid_matches_individual_runs(self, deals):
+        """Every grid cell equals the analysis run with those params."""
+        targets, horizons = [None, 150000.0], [30, 90, 365]
+        sweep = RevenueForecastingAgent().sweep(deals, targets, horizons, [None, 0.25])
+
+        for ti, target in enumerate(targets):
+            for hi, horizon in enumerate(horizons):
+                agent = RevenueForecastingAgent()
+                agent.params = {"forecast_period_days": horizon, "simulation_scenarios": 0}
+                if target is not None:
+                    agent.params["target_revenue"] = target
+                analysis = agent.analyze(deals)
+
+                assert sweep["forecasted_revenue"][hi][0] == pytest.approx(analysis["forecasted_revenue"])
+                assert sweep["forecasted_revenue"][hi][1] == pytest.approx(analysis["weighted_pipeline_value"] * 0.25)
+                assert sweep["shortfall"][ti][hi][0] == pytest.approx(analysis["shortfall"])
+                assert sweep["shortfall_pct"][ti][hi][0] == pytest.approx(analysis["shortfall_pct"])
+                assert sweep["open_deals"][hi] == analysis["open_deals"]
+
+    def test_axes_and_shapes(self, deals):
+        """Axes are resolved and matrices are [target][horizon][win_rate]."""
+        sweep = RevenueForecastingAgent().sweep(deals, [1e5, 2e5, 3e5], [30, 90], [None, 0.2, 0.8])
+
+        assert sweep["axes"]["win_rate"] == [pytest.approx(0.5), 0.2, 0.8]
+        assert len(sweep["shortfall"]) == 3
+        assert len(sweep["shortfall"][0]) == 2
+        assert len(sweep["shortfall"][0][0]) == 3
+        assert sweep["weighted_by_segment"]["Mid-Market"] == [0.0, pytest.approx(15000)]
+
+    def test_sweep_param_attaches_matrix(self, deals):
+        """`sweep` in params adds the matrix to the analysis."""
+        agent = RevenueForecastingAgent()
+        agent.params = {"simulation_scenarios": 0, "sweep": {"forecast_period_days": [30, 365]}}
+
+        analysis = agent.analyze(deals)
+
+        assert analysis["sweep"]["axes"]["forecast_period_days"] == [30, 365]
+
+    @pytest.mark.parametrize("sweep", [
+        {"horizon": [30]},
+        {"forecast_period_days": ["soon"]},
+        {"forecast_period_days": [None]},
+        {"win_rate": {"a": 1}},
+        [30, 90],
+    ])
+    def test_bad_sweep_param_rejected(self, deals, sweep):
+        """Unknown keys or non-numeric values raise `InvalidParams` instead of a TypeError."""
+        from aas.agents.base import InvalidParams
+
+        agent = RevenueForecastingAgent()
+        agent.params = {"simulation_scenarios": 0, "sweep": sweep}
+
+        with pytest.raises(InvalidParams):
+            agent.analyze(deals)
+
+    def test_bad_sweep_param_is_400(self, deals):
+        """The API answers an unknown sweep key with 400."""
+        from fastapi.testclient import TestClient
+        from aas.api import app
+
+        response = TestClient(app).post("/run/revenue", json={"params": {
+            "data": deals.to_dict(orient="records"), "simulation_scenarios": 0, "sweep": {"horizon": [30]},
+        }})
+
+        assert response.status_code == 400
+        assert "horizon" in response.json()["detail"]
+
+    @pytest.mark.parametrize("days", ["abc", -30, 0])
+    def test_bad_forecast_period_rejected(self, deals, days):
+        """`forecast_period_days` must be a positive whole number."""
+        from aas.agents.base import InvalidParams
+
+        agent = RevenueForecastingAgent()
+        agent.params = {"simulation_scenarios": 0, "forecast_period_days": days}
+
+        with pytest.raises(InvalidParams):
+            agent.analyze(deals)
+        with pytest.raises(InvalidParams):
+            agent.sweep(deals, win_rate=[0.2])
+
+    def test_string_forecast_period_accepted(self, deals):
+        agent = RevenueForecastingAgent()
+        agent.params = {"simulation_scenarios": 0, "forecast_period_days": "30"}
+
+        assert agent.analyze(deals)["forecast_period_days"] == 30
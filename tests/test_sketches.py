@@ -0,0 +1,115 @@
+"""
+Unit tests for mergeable sketches and the approximate pipeline mode.
+"""
+
+import collections
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aas.agents.pipeline_leakage import PipelineLeakageAgent
+from aas.analytics.pipeline_sketch import PipelineSketchAggregator
+from aas.analytics.sketches import HeavyHitters, HyperLogLog, TDigest
+from aas.utils.synthetic_data import generate_opportunities
+
+
+def _merged(cls, values, parts=7, **kwargs):
+    chunks = np.array_split(np.asarray(values), parts)
+    return sum((cls.of(c, **kwargs) for c in chunks[1:]), cls.of(chunks[0], **kwargs))
+
+
+class TestHeavyHitters:
+    """Tests for the Misra-Gries summary."""
+
+    def test_exact_when_keys_fit(self):
+        keys = ["a"] * 5 + ["b"] * 3 + ["c"]
+        hh = _merged(HeavyHitters, keys, parts=3)
+
+        assert hh.exact
+        assert hh.top() == [("a", 5), ("b", 3), ("c", 1)]
+
+    def test_error_bound(self):
+        keys = np.random.default_rng(0).zipf(1.3, 50_000)
+        hh = _merged(HeavyHitters, keys, capacity=32)
+        true = collections.Counter(keys.tolist())
+
+        assert hh.error <= len(keys) / 33
+        for key, count in hh.top(5):
+            assert true[key] - hh.error <= count <= true[key]
+        assert [k for k, _ in hh.top(3)] == [k for k, _ in true.most_common(3)]
+
+
+class TestTDigest:
+    """Tests for the merging t-digest."""
+
+    def test_quantiles_are_close(self):
+        values = np.random.default_rng(1).lognormal(3, 1, 200_000)
+        digest = _merged(TDigest, values)
+
+        for q in (0.01, 0.5, 0.9, 0.99):
+            assert np.mean(values <= digest.quantile(q)) == pytest.approx(q, abs=0.002)
+        assert digest.mean() == pytest.approx(values.mean())
+        assert len(digest.means) <= 110
+
+    def test_extremes_and_empty(self):
+        digest = TDigest.of([3.0, 1.0, np.nan, 2.0])
+
+        assert digest.count == 3
+        assert digest.quantile(0) == 1.0 and digest.quantile(1) == 3.0
+        assert np.isnan(TDigest().quantile(0.5))
+
+
+class TestHyperLogLog:
+    """Tests for the distinct counter."""
+
+    def test_estimate_within_error(self):
+        ids = pd.Series(np.random.default_rng(2).integers(0, 100_000, 300_000)).map("ACC{:06d}".format)
+        hll = _merged(HyperLogLog, ids.to_numpy())
+
+        assert hll.estimate() == pytest.approx(ids.nunique(), rel=0.03)
+
+    def test_small_counts_and_type_normalization(self):
+        assert HyperLogLog.of(["7", "8", "9"]).estimate() == pytest.approx(3, abs=0.1)
+        assert np.array_equal(HyperLogLog.of([7, 8]).registers, HyperLogLog.of(["7", "8"]).registers)
+
+    def test_merge_is_union(self):
+        a, b = HyperLogLog.of(["x", "y"]), HyperLogLog.of(["y", "z"])
+
+        assert (a + b).estimate() == pytest.approx(3, abs=0.1)
+
+
+class TestApproximatePipeline:
+    """Tests for the sketch-backed pipeline analysis."""
+
+    @pytest.fixture
+    def opportunities(self):
+        return generate_opportunities(20_000, seed=5).rename(columns={"stage_age_days": "stage_age"})
+
+    def test_matches_exact_on_low_cardinality_keys(self, opportunities):
+        exact = PipelineLeakageAgent().analyze(opportunities)
+        agent = PipelineLeakageAgent()
+        agent.params = {"approximate": True}
+        approx = agent.analyze(opportunities)
+
+        assert approx["stage_distribution"] == exact["stage_distribution"]
+        assert approx["drivers_of_slowdown"]["top_high_risk_owners"] == exact["drivers_of_slowdown"]["top_high_risk_owners"]
+        assert approx["metrics"]["value_at_risk"] == exact["metrics"]["value_at_risk"]
+        assert approx["at_risk_deals"] == exact["at_risk_deals"]
+        assert approx["approximate"]["distinct_accounts"] == pytest.approx(20_000, rel=0.03)
+
+    def test_chunked_state_is_bounded_and_consistent(self, opportunities):
+        aggregator = PipelineSketchAggregator()
+        state = aggregator.merge([])
+        for start in range(0, len(opportunities), 2_500):
+            chunk = opportunities.iloc[start:start + 2_500]
+            positions = np.arange(start, start + len(chunk))
+            state = aggregator.merge([state, aggregator.partial(chunk, positions)])
+
+        whole = aggregator.analyze(opportunities)
+        chunked = aggregator.finalize(state)
+        assert chunked["stage_distribution"] == whole["stage_distribution"]
+        assert chunked["at_risk_deals"] == whole["at_risk_deals"]
+        assert len(state.stalled_age.means) <= 110
+        p90 = chunked["approximate"]["stage_age_percentiles"]["p90"]
+        assert p90 == pytest.approx(np.percentile(opportunities["stage_age"], 90), abs=1.5)
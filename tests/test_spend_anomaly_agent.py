@@ -0,0 +1,196 @@
+"""
+Unit tests for Spend Anomaly Agent.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aas.agents.base import InvalidParams
+from aas.agents.spend_anomaly import SpendAnomalyAgent
+from aas.analytics.spend import SpendDetectorConfig, score_transactions, trailing_median_mad
+from aas.utils.synthetic_data import generate_transactions
+
+
+def _ledger(amounts, vendor="AWS", department="Engineering", category="Cloud Services"):
+    return pd.DataFrame({
+        "transaction_id": [f"T{i}" for i in range(len(amounts))],
+        "date": pd.date_range("2026-01-01", periods=len(amounts), freq="D"),
+        "department": department,
+        "category": category,
+        "vendor": vendor,
+        "amount": amounts,
+    })
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Request file paths resolve inside this directory."""
+    monkeypatch.setenv("AAS_DATA_DIR", str(tmp_path))
+    return tmp_path
+
+
+class TestTrailingMedianMad:
+    """Tests for the blocked trailing window."""
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        groups = np.sort(rng.integers(0, 20, 500))
+        values = rng.lognormal(5, 1, 500)
+        starts = np.maximum.accumulate(np.where(np.r_[True, groups[1:] != groups[:-1]], np.arange(500), 0))
+
+        median, mad, history = trailing_median_mad(values, starts, window=6, block_rows=64)
+
+        for i in range(500):
+            window = values[max(starts[i], i - 6):i]
+            assert history[i] == len(window)
+            if len(window):
+                assert median[i] == pytest.approx(np.median(window))
+                assert mad[i] == pytest.approx(np.median(np.abs(window - np.median(window))))
+            else:
+                assert np.isnan(median[i])
+
+
+class TestScoreTransactions:
+    """Tests for score_transactions."""
+
+    def test_spike_is_flagged_and_does_not_mask_the_next(self):
+        """Robust baselines catch consecutive spikes."""
+        scores = score_transactions(_ledger([1000, 1020, 990, 1010, 5000, 1005, 4800]))
+
+        assert scores["is_anomaly"].tolist() == [False, False, False, False, True, False, True]
+        assert scores["baseline"].iloc[4] == pytest.approx(1005)
+
+    def test_baseline_excludes_current_row(self):
+        """A row is never part of its own baseline."""
+        scores = score_transactions(_ledger([100, 100, 100, 100]))
+
+        assert scores["history"].tolist() == [0, 0, 0, 3]
+        assert np.isnan(scores["robust_z"].iloc[0])
+
+    def test_category_fallback_for_new_vendors(self):
+        """Vendors without history are scored against their category."""
+        ledger = pd.concat([
+            _ledger([1000, 1050, 980, 1020], vendor="Azure"),
+            _ledger([9000], vendor="Vultr").assign(date=pd.Timestamp("2026-02-01")),
+        ], ignore_index=True)
+
+        scores = score_transactions(ledger)
+
+        assert scores["baseline_level"].iloc[-1] == "category"
+        assert scores["is_anomaly"].iloc[-1]
+
+    def test_input_order_is_preserved(self):
+        """Scores align with the input rows, however they are ordered."""
+        ledger = generate_transactions(2000, seed=1, anomaly_rate=0.02)
+        shuffled = ledger.sample(frac=1, random_state=2)
+
+        pd.testing.assert_frame_equal(
+            score_transactions(shuffled).loc[ledger.index],
+            score_transactions(ledger),
+        )
+
+    def test_block_size_does_not_change_scores(self):
+        ledger = generate_transactions(3000, seed=3)
+
+        small = score_transactions(ledger, SpendDetectorConfig(block_rows=97))
+        large = score_transactions(ledger)
+
+        pd.testing.assert_frame_equal(small, large)
+
+    def test_recall_on_injected_anomalies(self):
+        """Most injected spikes are found."""
+        ledger = generate_transactions(20000, seed=4, anomaly_rate=0.01, labels=True)
+
+        flagged = score_transactions(ledger)["is_anomaly"]
+
+        assert flagged[ledger["is_injected_anomaly"]].mean() > 0.9
+
+
+class TestSpendAnomalyAgent:
+    """Tests for SpendAnomalyAgent."""
+
+    def test_sample_ledger(self):
+        """The packaged ledger yields the unplanned AWS spikes."""
+        agent = SpendAnomalyAgent()
+        analysis = agent.analyze(agent.load_data())
+
+        ids = [a["transaction_id"] for a in analysis["anomalies"]]
+        assert "T023" in ids and "T043" in ids
+        assert analysis["metrics"]["anomalies_detected"] == len(ids)
+        assert analysis["by_vendor"]["AWS"]["anomalies"] == 2
+
+    def test_actions(self, monkeypatch):
+        agent = SpendAnomalyAgent()
+        monkeypatch.setattr(agent, "generate_rationale", lambda context: "rationale")
+
+        result = agent.run()
+
+        types = [a["type"] for a in result["actions"]]
+        assert types[:2] == ["salesforce_task", "slack_message"]
+        assert result["actions"][0]["metadata"]["vendor"] == "AWS"
+        assert result["actions"][0]["impact_score"] > 0
+
+    def test_params_override_config(self):
+        agent = SpendAnomalyAgent()
+        agent.params = {"threshold": 1000}
+
+        assert agent.analyze(agent.load_data())["anomalies"] == []
+
+    @pytest.mark.parametrize("params", [
+        {"window": 0},
+        {"window": "x"},
+        {"min_history": 0},
+        {"threshold": "high"},
+        {"threshold": float("nan")},
+        {"top_n": -1},
+        {"top_n": "all"},
+    ])
+    def test_bad_params_rejected(self, params):
+        agent = SpendAnomalyAgent()
+        agent.params = params
+
+        with pytest.raises(InvalidParams):
+            agent.analyze(agent.load_data())
+
+    def test_bad_window_is_400(self):
+        from fastapi.testclient import TestClient
+
+        from aas.api import app
+
+        response = TestClient(app).post("/run/spend", json={"params": {"window": 0}})
+
+        assert response.status_code == 400
+        assert "window" in response.json()["detail"]
+
+    def test_empty_ledger(self):
+        analysis = SpendAnomalyAgent().analyze(pd.DataFrame())
+
+        assert analysis["anomalies"] == []
+
+    def test_source_path_inside_data_dir(self, data_dir):
+        generate_transactions(300, seed=4).to_csv(data_dir / "ledger.csv", index=False)
+        agent = SpendAnomalyAgent()
+        agent.params = {"source_path": "ledger.csv"}
+
+        assert len(agent.load_data()) == 300
+
+    def test_source_path_outside_data_dir_rejected(self, data_dir):
+        for path in ("/etc/passwd", "../ledger.parquet"):
+            agent = SpendAnomalyAgent()
+            agent.params = {"source_path": path}
+            with pytest.raises(InvalidParams):
+                agent.load_data()
+
+    def test_missing_approver_falls_back_to_finance(self, monkeypatch):
+        """A NaN approver (e.g. an empty CSV cell) is not used as the task owner."""
+        agent = SpendAnomalyAgent()
+        monkeypatch.setattr(agent, "generate_rationale", lambda context: "rationale")
+        anomaly = {
+            "transaction_id": "T1", "vendor": "AWS", "department": "Engineering", "category": "Cloud Services",
+            "date": "2026-01-05", "amount": 9000.0, "baseline": 1000.0, "robust_z": 12.0, "excess": 8000.0,
+        }
+
+        for approver in (float("nan"), pd.NA, None, ""):
+            actions = agent.recommend_actions({"anomalies": [{**anomaly, "approver": approver}]})
+            assert actions[0].metadata["owner"] == "finance manager"
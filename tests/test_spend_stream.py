@@ -0,0 +1,217 @@
+"""
+Unit tests for the streaming spend scorer.
+"""
+
+import json
+import threading
+
+import pandas as pd
+import pytest
+
+from aas.agents.spend_anomaly import SpendAnomalyAgent
+from aas.analytics.spend_stream import EwmStats, OnlineSpendScorer, validate_events
+
+
+def _events(amounts, start="2026-01-05", vendor="AWS", freq="D"):
+    dates = pd.date_range(start, periods=len(amounts), freq=freq)
+    return [
+        {
+            "transaction_id": f"T{i}",
+            "date": d.date().isoformat(),
+            "vendor": vendor,
+            "department": "Engineering",
+            "category": "Cloud Services",
+            "amount": a,
+        }
+        for i, (d, a) in enumerate(zip(dates, amounts))
+    ]
+
+
+class TestEwmStats:
+    """Tests for the running mean/variance."""
+
+    def test_warm_up_matches_plain_mean_and_variance(self):
+        values = [10.0, 12.0, 9.0, 11.0]
+        stats = EwmStats()
+        for v in values:
+            stats.update(v, alpha=0.1)
+
+        assert stats.mean == pytest.approx(pd.Series(values).mean())
+        assert stats.var == pytest.approx(pd.Series(values).var(ddof=0))
+
+    def test_decays_after_warm_up(self):
+        stats = EwmStats()
+        for v in [100.0] * 50 + [200.0] * 50:
+            stats.update(v, alpha=0.1)
+
+        assert stats.mean == pytest.approx(200.0, rel=0.01)
+
+
+class TestOnlineSpendScorer:
+    """Tests for OnlineSpendScorer."""
+
+    def test_spike_flagged_after_min_history(self):
+        scorer = OnlineSpendScorer()
+        results = scorer.score_batch(_events([1000, 1020, 990, 1010, 1005, 5000]))
+
+        assert [r["is_anomaly"] for r in results] == [False] * 5 + [True]
+        assert results[0]["robust_z"] is None
+        assert results[-1]["baseline"] == pytest.approx(1005)
+
+    def test_spike_is_winsorized(self):
+        """A flagged spike doesn't lift the baseline enough to hide the next one."""
+        scorer = OnlineSpendScorer()
+        results = scorer.score_batch(_events([1000, 1020, 990, 1010, 1005, 5000, 4800]))
+
+        assert results[-1]["is_anomaly"]
+        assert results[-1]["baseline"] < 1200
+
+    def test_weekday_buckets(self):
+        """Weekend spend is judged against weekends once a bucket has history."""
+        amounts = [100 if d.weekday() >= 5 else 1000 for d in pd.date_range("2026-01-05", periods=70)]
+        scorer = OnlineSpendScorer()
+        scorer.score_batch(_events(amounts))
+
+        saturday = scorer.score(_events([110], start="2026-03-21")[0])
+        assert saturday["baseline_level"] == "bucket"
+        assert saturday["baseline"] == pytest.approx(100)
+        assert not saturday["is_anomaly"]
+
+    def test_state_is_per_key_not_per_event(self):
+        scorer = OnlineSpendScorer()
+        scorer.score_batch(_events([1000] * 500))
+
+        assert scorer.stats() == {"events": 500, "keys": 1, "buckets": 7, "categories": 1}
+
+    def test_checkpoint_round_trip(self, tmp_path):
+        path = tmp_path / "state.json"
+        scorer = OnlineSpendScorer(checkpoint_path=path, checkpoint_every=3)
+        scorer.score_batch(_events([1000, 1020, 990]))
+        assert path.exists()
+
+        restored = OnlineSpendScorer.load(path)
+        event = _events([1015], start="2026-02-01")[0]
+
+        assert restored.stats() == scorer.stats()
+        assert restored.score(dict(event)) == scorer.score(dict(event))
+
+    def test_concurrent_checkpoints(self, tmp_path):
+        """Checkpoints from many threads never tear the file or leave temp files behind."""
+        path = tmp_path / "state.json"
+        scorer = OnlineSpendScorer(checkpoint_path=path, checkpoint_every=1)
+        errors = []
+
+        def work(vendor):
+            try:
+                scorer.score_batch(_events([1000 + i for i in range(40)], vendor=vendor))
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(f"V{i}",)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["state.json"]
+        assert json.loads(path.read_text())["events"] == 320
+
+    def test_bad_event_leaves_state_untouched(self):
+        scorer = OnlineSpendScorer()
+        events = _events([1000, 1020, 990])
+        events[2]["amount"] = "lots"
+
+        with pytest.raises(ValueError, match="2: 'amount'"):
+            scorer.score_batch(events)
+        assert scorer.events == 0
+
+    @pytest.mark.parametrize("change, problem", [
+        ({"amount": None}, "'amount' is not a number"),
+        ({"amount": float("nan")}, "'amount' is not finite"),
+        ({"date": "2026-13-45"}, "'date' is not a date"),
+        ({"date": {"day": 1}}, "'date' is not a date"),
+    ])
+    def test_validate_events(self, change, problem):
+        events = _events([1000, 1020])
+        events[1].update(change)
+
+        with pytest.raises(ValueError, match=f"1: {problem}"):
+            validate_events(events)
+
+    def test_category_fallback_for_new_vendors(self):
+        scorer = OnlineSpendScorer()
+        scorer.score_batch(_events([1000, 1050, 980, 1020, 1010], vendor="Azure"))
+
+        result = scorer.score(_events([9000], start="2026-02-01", vendor="Vultr")[0])
+
+        assert result["baseline_level"] == "category"
+        assert result["is_anomaly"]
+
+
+class TestSpendIngest:
+    """Tests for SpendAnomalyAgent.ingest."""
+
+    def test_quiet_batch_has_no_actions(self):
+        agent = SpendAnomalyAgent()
+        result = agent.ingest(_events([1000, 1020, 990, 1010, 1005, 1015]), OnlineSpendScorer())
+
+        assert result["scored"] == 6
+        assert result["anomalies"] == []
+        assert result["actions"] == []
+
+    def test_anomaly_produces_actions(self, monkeypatch):
+        agent = SpendAnomalyAgent()
+        monkeypatch.setattr(agent, "generate_rationale", lambda context: "rationale")
+        scorer = OnlineSpendScorer()
+        agent.ingest(_events([1000, 1020, 990, 1010, 1005]), scorer)
+
+        result = agent.ingest(_events([5000], start="2026-01-10"), scorer)
+
+        assert [a["transaction_id"] for a in result["anomalies"]] == ["T0"]
+        assert [a["type"] for a in result["actions"]] == ["salesforce_task", "slack_message"]
+        assert result["actions"][0]["metadata"]["robust_z"] >= scorer.threshold
+
+
+class TestSpendIngestEndpoint:
+    """Tests for `/ingest/spend`."""
+
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        from fastapi.testclient import TestClient
+
+        import aas.api as api
+
+        monkeypatch.setattr(api, "SPEND_STREAM_STATE", tmp_path / "spend_stream_state.json")
+        monkeypatch.setattr(api, "_spend_scorer", None)
+        return TestClient(api.app)
+
+    @pytest.mark.parametrize("change", [{"amount": "12,50"}, {"date": "yesterday"}, {"amount": None}])
+    def test_malformed_transaction_is_400(self, client, change):
+        transactions = _events([1000, 1020])
+        transactions[1].update(change)
+
+        response = client.post("/ingest/spend", json={"transactions": transactions})
+
+        assert response.status_code == 400
+        assert response.json()["detail"].startswith("Invalid transactions at 1:")
+
+    def test_scorer_is_built_once(self, client, monkeypatch):
+        import aas.api as api
+
+        loads = []
+        real_load = OnlineSpendScorer.load
+
+        def slow_load(*args, **kwargs):
+            loads.append(1)
+            threading.Event().wait(0.05)
+            return real_load(*args, **kwargs)
+
+        monkeypatch.setattr(OnlineSpendScorer, "load", staticmethod(slow_load))
+        threads = [threading.Thread(target=api._get_spend_scorer) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(loads) == 1
@@ -0,0 +1,125 @@
+"""
+Unit tests for the synthetic data generators.
+"""
+
+import datetime as dt
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+
+from aas.agents.revenue_forecasting import RevenueForecastingAgent
+from aas.db import copy_frame
+from aas.utils.synthetic_data import GENERATORS, generate, write_frame
+
+TODAY = dt.date(2026, 1, 15)
+
+
+class TestGenerators:
+    """Tests for the seeded generators."""
+
+    @pytest.mark.parametrize("kind", list(GENERATORS))
+    def test_seeded_and_sized(self, kind):
+        """The same seed reproduces the same frame; ids are unique."""
+        first = generate(kind, 500, seed=11, today=TODAY)
+        second = generate(kind, 500, seed=11, today=TODAY)
+        other = generate(kind, 500, seed=12, today=TODAY)
+
+        pd.testing.assert_frame_equal(first, second)
+        assert not first.equals(other)
+        assert len(first) == 500
+        assert first.iloc[:, 0].is_unique
+
+    def test_opportunities_match_table_schema(self):
+        """Opportunities carry the aas_opportunities columns."""
+        frame = generate("opportunities", 1000, seed=1, today=TODAY)
+
+        assert list(frame.columns) == [
+            "opportunity_id", "owner", "region", "segment", "stage", "amount",
+            "created_at", "close_date", "last_touch_date", "stage_age_days",
+        ]
+        assert frame["amount"].min() >= 1000
+        assert frame["stage_age_days"].min() >= 1
+        assert frame["opportunity_id"].iloc[0] == "OPP00001"
+
+    def test_stale_deals_are_closed(self):
+        """Deals past their close date by 90+ days are won or lost."""
+        frame = generate("deals", 2000, seed=2, today=TODAY)
+        stale = frame["close_date"] < pd.Timestamp(TODAY) - pd.Timedelta(days=90)
+
+        assert frame.loc[stale, "stage"].isin(["Closed Won", "Closed Lost"]).all()
+        assert (frame["created_date"] < frame["close_date"]).all()
+
+    def test_transaction_anomaly_labels(self):
+        """Injected anomalies are labelled and inflated."""
+        frame = generate("transactions", 20000, seed=3, today=TODAY, anomaly_rate=0.02, labels=True)
+        anomalies = frame["is_injected_anomaly"]
+
+        assert frame["date"].is_monotonic_increasing
+        assert 0.01 < anomalies.mean() < 0.03
+        typical = frame.groupby("vendor")["amount"].transform("median")
+        assert (frame.loc[anomalies, "amount"] > typical[anomalies]).mean() > 0.95
+
+    def test_customer_signals_are_correlated(self):
+        """Unhealthy accounts file more tickets and give lower NPS."""
+        frame = generate("customers", 5000, seed=4, today=TODAY)
+
+        assert frame["account_health_score"].corr(frame["nps_score"]) > 0.5
+        assert frame["account_health_score"].corr(frame["support_tickets_30d"]) < -0.3
+
+    def test_unknown_kind(self):
+        with pytest.raises(ValueError):
+            generate("invoices", 10)
+
+    def test_generated_deals_feed_revenue_play(self):
+        """Generated deals run through the revenue analysis unchanged."""
+        agent = RevenueForecastingAgent()
+        agent.params = {"simulation_scenarios": 100}
+
+        analysis = agent.analyze(generate("deals", 3000, seed=5))
+
+        assert analysis["open_deals"] > 0
+        assert analysis["forecast_distribution"]["total"]["p90"] > 0
+
+
+class TestWriters:
+    """Tests for file and COPY output."""
+
+    def test_csv_round_trip(self, tmp_path):
+        frame = generate("deals", 50, seed=6, today=TODAY)
+
+        path = write_frame(frame, tmp_path / "deals.csv")
+        loaded = pd.read_csv(path, parse_dates=["close_date", "created_date"])
+
+        assert loaded["close_date"].dt.strftime("%Y-%m-%d").tolist() == frame["close_date"].dt.strftime("%Y-%m-%d").tolist()
+        assert loaded["amount"].tolist() == frame["amount"].tolist()
+
+    def test_unsupported_extension(self, tmp_path):
+        with pytest.raises(ValueError):
+            write_frame(pd.DataFrame({"a": [1]}), tmp_path / "out.xlsx")
+
+    def test_copy_frame_streams_chunks(self):
+        """COPY sends the frame in bounded CSV chunks."""
+        conn = MagicMock()
+        cur = conn.cursor.return_value.__enter__.return_value
+        sent = []
+        cur.copy_expert.side_effect = lambda sql, buf: sent.append((sql, buf.read()))
+        frame = generate("opportunities", 25, seed=7, today=TODAY)
+
+        rows = copy_frame(conn, frame, "aas_opportunities", chunk_rows=10)
+
+        assert rows == 25
+        assert len(sent) == 3
+        assert sent[0][0].startswith("COPY aas_opportunities (opportunity_id, owner")
+        assert sum(chunk.count("\n") for _, chunk in sent) == 25
+
+    def test_copy_frame_on_conflict_uses_staging_table(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value.__enter__.return_value
+
+        copy_frame(conn, pd.DataFrame({"opportunity_id": ["A"]}), "aas_opportunities", on_conflict_do_nothing=True)
+
+        statements = [call.args[0] for call in cur.execute.call_args_list]
+        assert any("CREATE TEMP TABLE _aas_copy_aas_opportunities" in s for s in statements)
+        assert any("ON CONFLICT DO NOTHING" in s for s in statements)
+        assert "COPY _aas_copy_aas_opportunities" in cur.copy_expert.call_args.args[0]